@@ -2,27 +2,47 @@
 
 import os
 import logging
+import re
 import sys
 import tempfile
+import threading
 import shutil
 
 import six.moves
 import click
-import wiz
 import wiz.filesystem
+import wiz.symbol
+from packaging.requirements import Requirement, InvalidRequirement
+from packaging.utils import canonicalize_name
 
+import qip.cache
+import qip.command
 import qip.definition
+import qip.metadata
 import qip.package
 import qip.environ
+import qip.filesystem
+import qip.system
 
 from qip._version import __version__
 
+#: Installation stages which can be processed concurrently.
+STAGES = ("build", "probe", "copy", "export")
+
+#: Name of the staging folder created within the installation path when
+#: packages are staged on the same file system.
+STAGING_FOLDER = qip.filesystem.STAGING_FOLDER
+
 
 def install(
     requests, output_path, definition_path=None, overwrite=False,
     no_dependencies=False, editable_mode=False, python_target=sys.executable,
     registry_paths=None, update_existing_definitions=False,
-    continue_on_error=False
+    continue_on_error=False, jobs=1, plan=False, stage_jobs=None,
+    cache_path=None, cache_size_limit=None, log_path=None, timeout=None,
+    total_timeout=None, use_fork_server=False, batch=False,
+    stage_in_output=False, copy_jobs=None, delta_overwrite=False,
+    deduplicate=False
 ):
     """Install packages to *output_path* from *requests*.
 
@@ -69,6 +89,72 @@ def install(
     :param continue_on_error: Indicate whether installation process should
         continue if a package cannot be installed. Default is False.
 
+    :param jobs: Maximum number of packages which can be built in parallel.
+        Each worker uses its own temporary installation folder. Default is 1.
+
+    :param stage_jobs: Mapping indicating the maximum number of workers for
+        specific installation stages from :data:`STAGES` (e.g.
+        ``{"copy": 4}``). Default is *jobs* for each stage.
+
+    :param plan: Indicate whether the whole dependency closure should be
+        resolved to concrete versions before installing packages, instead of
+        discovering dependencies from each package installed. Default is False.
+
+    :param cache_path: Path to a persistent cache folder which can be shared
+        between several installation processes. Wheels built from the package
+        index are also kept in this cache so that they are not built again.
+        Default is None, which means that a temporary cache is used and
+        removed after the installation.
+
+    :param cache_size_limit: Maximum size of the persistent cache in bytes.
+        Least recently used files are removed from the cache after the
+        installation when this size is exceeded. Default is None, which means
+        that the cache size is not limited.
+
+    :param log_path: Path to a folder where the full output of commands
+        executed for each package is written (see
+        :func:`qip.command.log_file`). Default is None, which means that only
+        the end of the error output is reported when a command fails.
+
+    :param timeout: Maximum number of seconds for each command executed to
+        install a package. Default is None, which means that commands are not
+        limited individually.
+
+    :param total_timeout: Maximum number of seconds for all commands executed
+        during the installation. Default is None, which means that the
+        installation duration is not limited.
+
+    :param use_fork_server: Indicate whether :term:`Pip` commands should be
+        executed by a server started once within the target environment
+        instead of a new interpreter for each command (see
+        :func:`qip.command.fork_server`). Default is False.
+
+    :param batch: Indicate whether the whole dependency closure should be
+        resolved first, and all packages from the package index installed
+        with a single :term:`Pip` command before being split into their own
+        installation folder (see :func:`_install_batch`). Default is False.
+
+    :param stage_in_output: Indicate whether temporary installation folders
+        should be created within a :data:`STAGING_FOLDER` folder in
+        *output_path* instead of the default temporary folder. Packages are
+        then moved to their destination with a single rename instead of being
+        copied (see :func:`copy_to_destination`). Default is False.
+
+    :param copy_jobs: Maximum number of threads used to copy the files of
+        each package to *output_path* (see :func:`qip.filesystem.copy_tree`).
+        Default is None, which means that packages are copied with
+        :func:`shutil.copytree`.
+
+    :param delta_overwrite: Indicate whether packages overwritten should be
+        updated by only creating, replacing or removing the files which
+        changed (see :func:`qip.filesystem.update_tree`), instead of being
+        replaced entirely. Default is False.
+
+    :param deduplicate: Indicate whether files of packages should be created
+        as hard links to a content store within *output_path* so that
+        identical files are only stored once across packages (see
+        :func:`qip.filesystem.content_store`). Default is False.
+
     :raises: :exc:`RuntimeError` if a package cannot be installed and
         *continue_on_error* is set to False.
 
@@ -81,13 +167,41 @@ def install(
     if definition_path is not None:
         wiz.filesystem.ensure_directory(definition_path)
 
-    # Fetch definition mapping to determining whether a package should be
-    # skipped or updated.
-    definition_mapping = wiz.fetch_definition_mapping(registry_paths or [])
+    # Setup cache folder for Pip. A shared lock is held on persistent cache
+    # so that it is not pruned by another process during the installation.
+    cache_lock = None
+
+    if cache_path is not None:
+        try:
+            cache_lock = qip.cache.acquire_lock(cache_path, shared=True)
+        except RuntimeError as error:
+            logger.warning(
+                "Packages will be installed without persistent cache:\n{}"
+                .format(error)
+            )
+            cache_path = None
+
+    if cache_path is None:
+        pip_cache_path = tempfile.mkdtemp()
+    else:
+        pip_cache_path = qip.cache.fetch_pip_path(cache_path)
+
+    # Setup temporary folder for package installation. Staging folders are
+    # created on the same file system as the destination if requested so that
+    # packages can be renamed instead of copied.
+    staging_path = None
+
+    if stage_in_output:
+        staging_path = os.path.join(output_path, STAGING_FOLDER)
+        wiz.filesystem.ensure_directory(staging_path)
+
+    package_path = tempfile.mkdtemp(dir=staging_path)
+
+    # Setup content store within the destination so that files can be linked.
+    store_path = None
 
-    # Setup temporary folder for package installation.
-    cache_path = tempfile.mkdtemp()
-    package_path = tempfile.mkdtemp()
+    if deduplicate:
+        store_path = os.path.join(output_path, qip.filesystem.STORE_FOLDER)
 
     # Record requests and package installed to prevent duplications.
     installed_packages = set()
@@ -96,76 +210,805 @@ def install(
     # Record packages skipped.
     skipped_packages = set()
 
+    # Record distributions installed by canonical name to skip requests
+    # already satisfied without running Pip.
+    distribution_index = {}
+
     # Fill up queue with requirements extracted from requests.
     queue = six.moves.queue.Queue()
 
     try:
-        # Fetch environment mapping and installation path.
-        context_mapping = fetch_context_mapping(package_path, python_target)
-        library_path = context_mapping["environ"]["PYTHONPATH"]
+        # Commands are limited for the whole installation.
+        with qip.command.time_limit(
+            timeout=timeout, total_timeout=total_timeout
+        ), qip.command.fork_server(
+            enabled=use_fork_server
+        ), qip.filesystem.parallel_copy(
+            jobs=copy_jobs
+        ), qip.filesystem.delta_update(
+            enabled=delta_overwrite
+        ), qip.filesystem.content_store(
+            path=store_path
+        ), qip.filesystem.deferred_removal():
+            # Fetch compact index of definitions in background to determine
+            # whether a package should be skipped or updated. Definitions are
+            # not needed if they are not exported.
+            definition_mapping = None
+
+            if definition_path is not None:
+                definition_mapping = qip.definition.fetch_definition_mapping(
+                    registry_paths or [], cache_path=cache_path,
+                    background=True
+                )
+
+            # Fetch environment mapping and installation path.
+            context_mapping = fetch_context_mapping(
+                package_path, python_target, cache_path=cache_path
+            )
+            library_path = context_mapping["environ"]["PYTHONPATH"]
+
+            for request in requests:
+                queue.put(_create_item(request, editable_mode=editable_mode))
+
+            # Resolve the whole dependency closure before installing anything
+            # so that all dependencies can be scheduled right away.
+            if (plan or batch) and not no_dependencies:
+                planned_requests = _plan(
+                    requests, context_mapping, pip_cache_path,
+                    include_requested=batch and not editable_mode
+                )
+
+                if planned_requests is not None and batch:
+                    overwrite = _install_batch(
+                        planned_requests, output_path, context_mapping,
+                        definition_mapping, pip_cache_path,
+                        installed_packages, installed_requests,
+                        skipped_packages, distribution_index,
+                        definition_path=definition_path,
+                        overwrite=overwrite,
+                        update_existing_definitions=(
+                            update_existing_definitions
+                        ),
+                        continue_on_error=continue_on_error,
+                        artifact_cache_path=cache_path,
+                        log_path=log_path,
+                        staging_path=staging_path
+                    )
+
+                if planned_requests is not None:
+                    for request, parent_identifier in planned_requests:
+                        queue.put(_create_item(request, parent_identifier))
+
+                    # Prevent dependencies to be extracted from packages
+                    # installed.
+                    no_dependencies = True
+
+            # Number of workers for each installation stage.
+            _stage_jobs = dict((stage, jobs) for stage in STAGES)
+            _stage_jobs.update(stage_jobs or {})
+
+            if any(value > 1 for value in _stage_jobs.values()):
+                _install_with_pipeline(
+                    queue, output_path, context_mapping, definition_mapping,
+                    pip_cache_path, installed_packages, installed_requests,
+                    skipped_packages, distribution_index, _stage_jobs,
+                    definition_path=definition_path,
+                    overwrite=overwrite,
+                    no_dependencies=no_dependencies,
+                    update_existing_definitions=update_existing_definitions,
+                    continue_on_error=continue_on_error,
+                    artifact_cache_path=cache_path,
+                    log_path=log_path,
+                    staging_path=staging_path
+                )
+
+            else:
+                while not queue.empty():
+                    item = queue.get()
+                    if item["request"] in installed_requests:
+                        continue
+
+                    if _is_satisfied(item["request"], distribution_index):
+                        installed_requests.add(item["request"])
+                        continue
+
+                    # Clean up before installation.
+                    shutil.rmtree(package_path)
+                    wiz.filesystem.ensure_directory(package_path)
+
+                    # Needed for the editable mode.
+                    wiz.filesystem.ensure_directory(library_path)
+
+                    package_mapping, overwrite = _install(
+                        item["request"], output_path, context_mapping,
+                        definition_mapping, package_path, pip_cache_path,
+                        installed_packages,
+                        definition_path=definition_path,
+                        overwrite=overwrite,
+                        editable_mode=item["editable_mode"],
+                        update_existing_definitions=(
+                            update_existing_definitions
+                        ),
+                        parent_identifier=item["parent_identifier"],
+                        continue_on_error=continue_on_error,
+                        artifact_cache_path=cache_path,
+                        log_path=log_path
+                    )
+                    if package_mapping is None:
+                        continue
+
+                    installed_packages.add(package_mapping["identifier"])
+                    installed_requests.add(item["request"])
+                    _index_distribution(distribution_index, package_mapping)
+
+                    # Indicate if package was skipped.
+                    if package_mapping.get("skipped", False):
+                        skipped_packages.add(package_mapping["identifier"])
+
+                    # Fill up queue with requirements extracted from package
+                    # dependencies.
+                    if not no_dependencies:
+                        identifier = package_mapping["identifier"]
+
+                        for request in package_mapping.get("requirements", []):
+                            queue.put(_create_item(request, identifier))
+
+    finally:
+        shutil.rmtree(package_path, ignore_errors=True)
+
+        # Staging folder is kept if it is used by another process.
+        if staging_path is not None:
+            try:
+                os.rmdir(staging_path)
+            except OSError:
+                pass
+
+        if cache_lock is None:
+            shutil.rmtree(pip_cache_path, ignore_errors=True)
+        else:
+            qip.cache.release_lock(cache_lock)
+
+    # Evict least recently used files from persistent cache unless it is
+    # currently used by another process.
+    if cache_lock is not None and cache_size_limit is not None:
+        qip.cache.prune(cache_path, cache_size_limit, blocking=False)
+
+    # Sort and filter packages installed.
+    installed = sorted(
+        (p for p in installed_packages if p not in skipped_packages),
+        key=lambda _id: _id.lower()
+    )
+
+    if len(installed):
+        logger.info("Packages installed: {}".format(", ".join(installed)))
+
+    return len(installed_packages) > 0
+
+
+def _plan(requests, context_mapping, cache_path, include_requested=False):
+    """Return dependency requests resolved from *requests*.
+
+    :param requests: List of package requests to be installed.
+
+    :param context_mapping: Mapping containing environment and python mapping
+        as returned by :func:`fetch_context_mapping`
+
+    :param cache_path: Directory for the :term:`Pip` cache.
+
+    :param include_requested: Indicate whether packages resolved from
+        *requests* should also be returned. Default is False.
+
+    :return: List of tuples containing a request pinned to a concrete version
+        and the identifier of the first package requiring it for each
+        dependency within the closure of *requests*. None is returned if the
+        dependency closure cannot be resolved.
+
+    """
+    logger = logging.getLogger(__name__ + "._plan")
+
+    try:
+        mappings = qip.package.resolve(requests, context_mapping, cache_path)
 
-        for request in requests:
-            queue.put((request, None, editable_mode))
+    except RuntimeError as error:
+        logger.warning(
+            "Impossible to resolve dependency closure, dependencies will be "
+            "extracted from each package installed:\n{}".format(error)
+        )
+        return None
 
-        while not queue.empty():
-            request, parent_identifier, _editable_mode = queue.get()
-            if request in installed_requests:
+    logger.debug(
+        "Dependency closure resolved: {}".format(
+            ", ".join(mapping["identifier"] for mapping in mappings)
+        )
+    )
+
+    # Record first package requiring each dependency.
+    parents = {}
+
+    for mapping in mappings:
+        for requirement in mapping["requirements"]:
+            try:
+                key = canonicalize_name(Requirement(requirement).name)
+            except InvalidRequirement:
                 continue
 
-            # Clean up before installation.
+            parents.setdefault(key, mapping["identifier"])
+
+    return [
+        (mapping["request"], parents.get(mapping["key"]))
+        for mapping in mappings
+        if include_requested or not mapping["requested"]
+    ]
+
+
+def _install_batch(
+    planned_requests, output_path, context_mapping, definition_mapping,
+    cache_path, installed_packages, installed_requests, skipped_packages,
+    distribution_index, definition_path=None, overwrite=False,
+    update_existing_definitions=False, continue_on_error=False,
+    artifact_cache_path=None, log_path=None, staging_path=None
+):
+    """Install all packages from the package index within *planned_requests*
+    with a single :term:`Pip` command.
+
+    Requests pinned to a specific version are installed together within a
+    temporary prefix (see :func:`qip.package.build_batch`). Each distribution
+    is then moved into its own temporary installation folder (see
+    :func:`qip.package.extract_distribution`) before being copied to
+    *output_path* and exported as with :func:`_install`, so that targets and
+    definitions are identical to packages installed one at a time.
+
+    Requests which cannot be installed in batch (e.g. Git requests or
+    requests skipped before being built) are left to be installed one at a
+    time. If the :term:`Pip` command fails, all requests are left to be
+    installed one at a time.
+
+    :param planned_requests: List of tuples containing a request and the
+        identifier of the first package requiring it, as returned by
+        :func:`_plan`.
+
+    :param distribution_index: mapping of distributions installed as
+        recorded by :func:`_index_distribution`.
+
+    :param staging_path: Path to the folder where temporary installation
+        folders are created. Default is None, which means that the default
+        temporary folder is used.
+
+    :return: New value for the *overwrite* option.
+
+    .. seealso:: :func:`install`
+
+    """
+    logger = logging.getLogger(__name__ + "._install_batch")
+
+    batch_requests = []
+
+    for request, parent_identifier in planned_requests:
+        if qip.package.extract_pinned_mapping(request) is None:
+            continue
+
+        package_mapping = _skip_before_build(
+            request, output_path, context_mapping, definition_mapping,
+            definition_path=definition_path,
+            overwrite=overwrite,
+            artifact_cache_path=artifact_cache_path
+        )
+
+        if package_mapping is not None:
+            installed_packages.add(package_mapping["identifier"])
+            skipped_packages.add(package_mapping["identifier"])
+            installed_requests.add(request)
+            _index_distribution(distribution_index, package_mapping)
+            continue
+
+        batch_requests.append((request, parent_identifier))
+
+    if len(batch_requests) == 0:
+        return overwrite
+
+    batch_path = tempfile.mkdtemp(dir=staging_path)
+    package_path = tempfile.mkdtemp(dir=staging_path)
+
+    try:
+        batch_context_mapping = _relocate_context_mapping(
+            context_mapping, batch_path
+        )
+
+        try:
+            with qip.command.log_file(_fetch_log_file(log_path, "batch")):
+                build_mappings = qip.package.build_batch(
+                    [request for request, _ in batch_requests], batch_path,
+                    batch_context_mapping, cache_path
+                )
+
+        except RuntimeError as error:
+            logger.warning(
+                "Impossible to install packages in batch, packages will be "
+                "installed one at a time:\n{}".format(error)
+            )
+            return overwrite
+
+        for (request, parent_identifier), build_mapping in zip(
+            batch_requests, build_mappings
+        ):
+            # Clean up before extraction.
             shutil.rmtree(package_path)
             wiz.filesystem.ensure_directory(package_path)
 
-            # Needed for the editable mode.
-            wiz.filesystem.ensure_directory(library_path)
+            try:
+                qip.package.extract_distribution(
+                    build_mapping["name"], batch_path, package_path,
+                    context_mapping
+                )
+
+            except RuntimeError as error:
+                logger.warning(
+                    "Impossible to extract '{}' from batch, package will be "
+                    "installed on its own:\n{}".format(request, error)
+                )
+                continue
 
             package_mapping, overwrite = _install(
-                request, output_path, context_mapping, definition_mapping,
-                package_path, cache_path, installed_packages,
+                request, output_path,
+                _relocate_context_mapping(context_mapping, package_path),
+                definition_mapping, package_path, cache_path,
+                installed_packages,
                 definition_path=definition_path,
                 overwrite=overwrite,
-                editable_mode=_editable_mode,
                 update_existing_definitions=update_existing_definitions,
                 parent_identifier=parent_identifier,
-                continue_on_error=continue_on_error
+                continue_on_error=continue_on_error,
+                artifact_cache_path=artifact_cache_path,
+                log_path=log_path,
+                build_mapping=build_mapping
             )
             if package_mapping is None:
                 continue
 
             installed_packages.add(package_mapping["identifier"])
             installed_requests.add(request)
+            _index_distribution(distribution_index, package_mapping)
 
-            # Indicate if package was skipped.
             if package_mapping.get("skipped", False):
                 skipped_packages.add(package_mapping["identifier"])
 
-            # Fill up queue with requirements extracted from package
-            # dependencies.
+    finally:
+        shutil.rmtree(batch_path, ignore_errors=True)
+        shutil.rmtree(package_path, ignore_errors=True)
+
+    return overwrite
+
+
+def _install_with_pipeline(
+    queue, output_path, context_mapping, definition_mapping,
+    cache_path, installed_packages, installed_requests, skipped_packages,
+    distribution_index, stage_jobs, definition_path=None, overwrite=False,
+    no_dependencies=False, update_existing_definitions=False,
+    continue_on_error=False, artifact_cache_path=None, log_path=None,
+    staging_path=None
+):
+    """Install all requests from *queue* through a pipeline of stages.
+
+    Each request goes through the following stages, which are processed by
+    their own pool of workers:
+
+    1. "build": Package is built with :term:`Pip` into a temporary installation
+       folder.
+    2. "probe": Package mapping is fetched from the temporary installation
+       folder and existing definitions are checked.
+    3. "copy": Package is copied to *output_path*.
+    4. "export": :term:`Wiz` definition is exported to *definition_path*.
+
+    Queues between stages are bounded by the number of workers of the
+    receiving stage. Dependencies are queued as soon as the package mapping is
+    fetched so that they can be built while the package is being copied.
+
+    If a package cannot be installed and *continue_on_error* is set to False,
+    remaining requests are dropped, commands being executed by other workers
+    are terminated and the first error is raised.
+
+    :param distribution_index: mapping of distributions installed as
+        recorded by :func:`_index_distribution`.
+
+    :param stage_jobs: mapping indicating the number of workers for each
+        stage in :data:`STAGES`.
+
+    :param staging_path: Path to the folder where temporary installation
+        folders are created. Default is None, which means that the default
+        temporary folder is used.
+
+    .. seealso:: :func:`install`
+
+    """
+    logger = logging.getLogger(__name__ + "._install_with_pipeline")
+
+    lock = threading.Lock()
+    condition = threading.Condition(lock)
+    overwrite_lock = threading.Lock()
+    stop_event = threading.Event()
+    errors = []
+
+    # Record requests currently processed to prevent duplicated builds.
+    pending_requests = set()
+
+    # Record temporary installation folders created and available.
+    staging_paths = []
+    available_staging_paths = []
+
+    # Record latest value of the overwrite option and number of requests
+    # which are still being processed.
+    state = {"overwrite": overwrite, "pending": queue.qsize()}
+
+    queues = {"build": queue}
+    for stage in STAGES[1:]:
+        queues[stage] = six.moves.queue.Queue(maxsize=stage_jobs[stage])
+
+    def _acquire_staging_path(item):
+        """Assign temporary installation folder to *item*."""
+        with lock:
+            if len(available_staging_paths) > 0:
+                path = available_staging_paths.pop()
+            else:
+                path = tempfile.mkdtemp(dir=staging_path)
+                staging_paths.append(path)
+
+        item["package_path"] = path
+        item["context_mapping"] = _relocate_context_mapping(
+            context_mapping, path
+        )
+
+    def _release_staging_path(item):
+        """Make temporary installation folder of *item* available again."""
+        path = item.pop("package_path", None)
+        if path is not None:
+            with lock:
+                available_staging_paths.append(path)
+
+    def _finish(item):
+        """Indicate that *item* has been fully processed."""
+        _release_staging_path(item)
+
+        with condition:
+            if item.get("claimed", False):
+                pending_requests.discard(item["request"])
+
+            state["pending"] -= 1
+            condition.notify_all()
+
+    def _fail(item, error):
+        """Handle *error* raised while processing *item*."""
+        if not continue_on_error:
+            raise error
+
+        prompt = "Request '{}' has failed".format(item["request"])
+        if item["parent_identifier"] is not None:
+            prompt += " [from '{}']".format(item["parent_identifier"])
+
+        logger.error("{}:\n{}".format(prompt, error))
+
+    def _build_stage(item):
+        """Build package from request."""
+        request = item["request"]
+
+        with lock:
+            if request in installed_requests or request in pending_requests:
+                return
+
+            if _is_satisfied(request, distribution_index):
+                installed_requests.add(request)
+                return
+
+            pending_requests.add(request)
+            item["claimed"] = True
+
+        # Attempt to skip pinned package before building it.
+        package_mapping = _skip_before_build(
+            request, output_path, context_mapping, definition_mapping,
+            definition_path=definition_path,
+            overwrite=state["overwrite"],
+            editable_mode=item["editable_mode"],
+            artifact_cache_path=artifact_cache_path
+        )
+
+        if package_mapping is not None:
+            identifier = package_mapping["identifier"]
+
+            with lock:
+                if identifier not in installed_packages:
+                    installed_packages.add(identifier)
+                    skipped_packages.add(identifier)
+
+                installed_requests.add(request)
+                _index_distribution(distribution_index, package_mapping)
+
+            # Fill up queue with requirements recorded for package skipped.
             if not no_dependencies:
-                for request in package_mapping.get("requirements", []):
-                    queue.put((request, package_mapping["identifier"], False))
+                requirements = package_mapping.get("requirements", [])
+
+                with lock:
+                    state["pending"] += len(requirements)
+
+                for _request in requirements:
+                    queue.put(_create_item(_request, identifier))
+
+            return
+
+        _acquire_staging_path(item)
+
+        # Clean up before installation.
+        shutil.rmtree(item["package_path"])
+        wiz.filesystem.ensure_directory(item["package_path"])
+
+        # Needed for the editable mode.
+        wiz.filesystem.ensure_directory(
+            item["context_mapping"]["environ"]["PYTHONPATH"]
+        )
+
+        try:
+            with qip.command.log_file(_fetch_log_file(log_path, request)):
+                item["build_mapping"] = qip.package.build(
+                    request, item["package_path"], item["context_mapping"],
+                    cache_path, editable_mode=item["editable_mode"],
+                    artifact_cache_path=artifact_cache_path
+                )
+        except RuntimeError as error:
+            return _fail(item, error)
+
+        return "probe"
+
+    def _probe_stage(item):
+        """Fetch package mapping and check existing definitions."""
+        try:
+            with qip.command.log_file(
+                _fetch_log_file(log_path, item["request"])
+            ):
+                package_mapping = qip.package.fetch_mapping(
+                    item["build_mapping"], item["context_mapping"]
+                )
+        except RuntimeError as error:
+            return _fail(item, error)
+
+        identifier = package_mapping["identifier"]
+
+        with lock:
+            if identifier in installed_packages:
+                return
+
+            installed_packages.add(identifier)
+            installed_requests.add(item["request"])
+            _index_distribution(distribution_index, package_mapping)
+
+        item["package_mapping"] = package_mapping
+
+        custom_definition, existing_definition, skipped = _fetch_definitions(
+            package_mapping, definition_mapping,
+            definition_path=definition_path,
+            editable_mode=item["editable_mode"]
+        )
+
+        item["custom_definition"] = custom_definition
+        item["existing_definition"] = existing_definition
+
+        # Fill up queue with requirements extracted from package dependencies.
+        if not no_dependencies:
+            requirements = package_mapping.get("requirements", [])
+
+            with lock:
+                state["pending"] += len(requirements)
+
+            for request in requirements:
+                queue.put(_create_item(request, identifier))
+
+        if skipped:
+            package_mapping["skipped"] = True
+
+            with lock:
+                skipped_packages.add(identifier)
+
+            return
+
+        prompt = "Requested '{}'".format(item["request"])
+        if item["parent_identifier"] is not None:
+            prompt += " [from '{}']".format(item["parent_identifier"])
+        logger.info(prompt)
+
+        return "copy"
+
+    def _copy_stage(item):
+        """Copy package to destination."""
+        package_mapping = item["package_mapping"]
+
+        if state["overwrite"] is not None:
+            skipped, _ = copy_to_destination(
+                package_mapping, item["package_path"], output_path,
+                overwrite=state["overwrite"], move=True
+            )
+
+        else:
+            # Serialize copies while a user confirmation can be required.
+            with overwrite_lock:
+                skipped, state["overwrite"] = copy_to_destination(
+                    package_mapping, item["package_path"], output_path,
+                    overwrite=state["overwrite"], move=True
+                )
+
+        _release_staging_path(item)
+
+        package_mapping["skipped"] = skipped
+        if skipped:
+            with lock:
+                skipped_packages.add(package_mapping["identifier"])
+
+            return
+
+        if definition_path is not None:
+            return "export"
+
+    def _export_stage(item):
+        """Export Wiz definition."""
+        qip.definition.export(
+            definition_path, item["package_mapping"], output_path,
+            editable_mode=item["editable_mode"],
+            existing_definition=(
+                item["existing_definition"] if update_existing_definitions
+                else None
+            ),
+            custom_definition=item["custom_definition"]
+        )
+
+    callbacks = {
+        "build": _build_stage,
+        "probe": _probe_stage,
+        "copy": _copy_stage,
+        "export": _export_stage,
+    }
+
+    def _worker(stage):
+        """Process items from *stage* queue until a sentinel is received."""
+        while True:
+            item = queues[stage].get()
+            if item is None:
+                return
+
+            next_stage = None
+
+            try:
+                if not stop_event.is_set():
+                    next_stage = callbacks[stage](item)
+
+            except Exception as error:
+                with lock:
+                    if not stop_event.is_set():
+                        errors.append(error)
+                        stop_event.set()
+
+                # Interrupt builds from other workers.
+                qip.command.terminate()
+
+            if next_stage is None:
+                _finish(item)
+            else:
+                queues[next_stage].put(item)
+
+    threads = []
+
+    for stage in STAGES:
+        for _ in range(stage_jobs[stage]):
+            thread = threading.Thread(target=_worker, args=(stage,))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+    try:
+        # Wait until all requests and extracted requirements are processed.
+        with condition:
+            while state["pending"] > 0:
+                condition.wait(0.1)
+
+        for stage in STAGES:
+            for _ in range(stage_jobs[stage]):
+                queues[stage].put(None)
+
+        for thread in threads:
+            thread.join()
+
+    except BaseException:
+        # Stop workers and commands being executed when the installation is
+        # interrupted (e.g. KeyboardInterrupt), so that staging folders are
+        # not used while being removed.
+        stop_event.set()
+        qip.command.terminate()
+        raise
 
     finally:
-        shutil.rmtree(package_path)
-        shutil.rmtree(cache_path)
+        for path in staging_paths:
+            shutil.rmtree(path, ignore_errors=True)
 
-    # Sort and filter packages installed.
-    installed = sorted(
-        (p for p in installed_packages if p not in skipped_packages),
-        key=lambda _id: _id.lower()
-    )
+    if len(errors) > 0:
+        raise errors[0]
 
-    if len(installed):
-        logger.info("Packages installed: {}".format(", ".join(installed)))
 
-    return len(installed_packages) > 0
+def _index_distribution(index, package_mapping):
+    """Record distribution from *package_mapping* into *index*.
+
+    :param index: mapping of distributions installed per canonical name. Each
+        value is a list of tuples containing the version, the sorted
+        :term:`extra keywords <extras_require>` and the identifier of a
+        distribution installed.
+
+    :param package_mapping: mapping of the python package installed as
+        returned by :func:`qip.package.install`.
+
+    """
+    key = canonicalize_name(package_mapping["name"])
+
+    index.setdefault(key, []).append((
+        package_mapping["version"],
+        tuple(sorted(package_mapping.get("extra", []))),
+        package_mapping["identifier"]
+    ))
+
+
+def _is_satisfied(request, index):
+    """Indicate whether *request* is satisfied by a distribution in *index*.
+
+    A request is satisfied if a distribution with the same canonical name and
+    the same :term:`extra keywords <extras_require>` has been installed with
+    a version matching the request specifier. Requests which are not
+    `PEP 508 <https://www.python.org/dev/peps/pep-0508/>`_ requirements
+    (e.g. paths or Git URLs) are never satisfied.
+
+    :param request: Package request (e.g. "foo >= 1, < 2").
+
+    :param index: mapping of distributions installed as recorded by
+        :func:`_index_distribution`.
+
+    :return: Boolean value.
+
+    """
+    logger = logging.getLogger(__name__ + "._is_satisfied")
+
+    try:
+        requirement = Requirement(request)
+    except InvalidRequirement:
+        return False
+
+    if requirement.url:
+        return False
+
+    extras = tuple(sorted(requirement.extras))
+
+    for version, _extras, identifier in index.get(
+        canonicalize_name(requirement.name), []
+    ):
+        if _extras == extras and requirement.specifier.contains(
+            version, prereleases=True
+        ):
+            logger.debug(
+                "Skip '{}' which is satisfied by '{}'.".format(
+                    request, identifier
+                )
+            )
+            return True
+
+    return False
+
+
+def _create_item(request, parent_identifier=None, editable_mode=False):
+    """Return item to process *request* in :func:`_install_with_pipeline`."""
+    return {
+        "request": request,
+        "parent_identifier": parent_identifier,
+        "editable_mode": editable_mode,
+    }
 
 
 def _install(
     request, output_path, context_mapping, definition_mapping,
     package_path, cache_path, installed_packages, definition_path=None,
     overwrite=False, update_existing_definitions=False, editable_mode=False,
-    continue_on_error=False, parent_identifier=None,
+    continue_on_error=False, parent_identifier=None, artifact_cache_path=None,
+    log_path=None, build_mapping=None
 ):
     """Install single package to *output_path* from *request*.
 
@@ -177,11 +1020,11 @@ def _install(
         as returned by :func:`fetch_context_mapping`
 
     :param definition_mapping: mapping regrouping all available definitions as
-        returned by :func:`wiz.fetch_definition_mapping`.
+        returned by :func:`qip.definition.fetch_definition_mapping`.
 
     :param package_path: Temporary path to install package from :term:`Pip`.
 
-    :param cache_path: Temporary directory for the :term:`Pip` cache.
+    :param cache_path: Directory for the :term:`Pip` cache.
 
     :param installed_packages: Set grouping all Python package identifiers
         already installed to skip current installation if necessary.
@@ -206,6 +1049,18 @@ def _install(
     :param parent_identifier: Indicate Python package which triggered the
         *request*. Default is None.
 
+    :param artifact_cache_path: Path to the persistent cache used to store
+        build artifacts. Default is None, which means that build artifacts
+        are not cached.
+
+    :param log_path: Path to a folder where the full output of commands
+        executed for the package is written. Default is None, which means that
+        no log file is written.
+
+    :param build_mapping: mapping of the package already built in
+        *package_path* as returned by :func:`qip.package.build`. Default is
+        None, which means that the package is built from *request*.
+
     :raises: :exc:`RuntimeError` if a package cannot be installed and
         *continue_on_error* is set to False.
 
@@ -222,11 +1077,31 @@ def _install(
     """
     logger = logging.getLogger(__name__ + "._install")
 
-    try:
-        package_mapping = qip.package.install(
-            request, package_path, context_mapping, cache_path,
-            editable_mode=editable_mode
+    # Attempt to skip pinned package before building it.
+    if build_mapping is None:
+        package_mapping = _skip_before_build(
+            request, output_path, context_mapping, definition_mapping,
+            definition_path=definition_path,
+            overwrite=overwrite,
+            editable_mode=editable_mode,
+            artifact_cache_path=artifact_cache_path
         )
+        if package_mapping is not None:
+            return package_mapping, overwrite
+
+    try:
+        with qip.command.log_file(_fetch_log_file(log_path, request)):
+            if build_mapping is not None:
+                package_mapping = qip.package.fetch_mapping(
+                    build_mapping, context_mapping
+                )
+
+            else:
+                package_mapping = qip.package.install(
+                    request, package_path, context_mapping, cache_path,
+                    editable_mode=editable_mode,
+                    artifact_cache_path=artifact_cache_path
+                )
 
     except RuntimeError as error:
         if not continue_on_error:
@@ -242,28 +1117,15 @@ def _install(
     if package_mapping["identifier"] in installed_packages:
         return None, overwrite
 
-    # Attempt to fetch custom definition from package and existing definition
-    # from definition mapping.
-    custom_definition = None
-    existing_definition = None
-
-    if definition_path is not None:
-        custom_definition = qip.definition.fetch_custom(package_mapping)
-        existing_definition = qip.definition.fetch_existing(
-            package_mapping, definition_mapping,
-            namespace=getattr(custom_definition, "namespace", None),
-        )
+    custom_definition, existing_definition, skipped = _fetch_definitions(
+        package_mapping, definition_mapping,
+        definition_path=definition_path,
+        editable_mode=editable_mode
+    )
 
-        if not editable_mode and _skip_install(
-            existing_definition, package_mapping, definition_path
-        ):
-            logger.warning(
-                "Skip '{0[key]}[{0[python][identifier]}]=={0[version]}' "
-                "which already exists in Wiz registries."
-                .format(package_mapping)
-            )
-            package_mapping["skipped"] = True
-            return package_mapping, overwrite
+    if skipped:
+        package_mapping["skipped"] = True
+        return package_mapping, overwrite
 
     prompt = "Requested '{}'".format(request)
     if parent_identifier is not None:
@@ -273,7 +1135,7 @@ def _install(
     # Install package to destination.
     skipped, overwrite = copy_to_destination(
         package_mapping, package_path, output_path,
-        overwrite=overwrite
+        overwrite=overwrite, move=True
     )
 
     # Extract a wiz definition is requested.
@@ -291,6 +1153,257 @@ def _install(
     return package_mapping, overwrite
 
 
+def _fetch_log_file(path, request):
+    """Return path to log file for *request* within folder *path*.
+
+    Return None if *path* is None.
+
+    """
+    if path is None:
+        return
+
+    # Prevent relative paths to local source trees (e.g. ".") from resulting
+    # in hidden or empty file names.
+    if os.path.isdir(request):
+        request = os.path.abspath(request)
+
+    name = re.sub(r"[^\w.=-]+", "_", request).strip("._")
+    return os.path.join(path, "{}.log".format(name))
+
+
+def _skip_before_build(
+    request, output_path, context_mapping, definition_mapping,
+    definition_path=None, overwrite=False, editable_mode=False,
+    artifact_cache_path=None
+):
+    """Return mapping of package to skip from *request* before building it.
+
+    When *request* is pinned to a specific version, the package identifier and
+    target can be computed before the package is built. When
+    *artifact_cache_path* is specified, Git requests and local source trees
+    are also resolved to a revision and the name and version of the package
+    previously built from this revision are used (see
+    :func:`qip.package.extract_revision_mapping`).
+
+    The package is skipped if a corresponding definition exists in
+    :term:`Wiz` registries (see :func:`_skip_install`) or if the target
+    already exists in *output_path* and *overwrite* is False.
+
+    Requirements of a skipped package are extracted from the existing
+    definition or from the metadata of the package installed, so that
+    dependencies which are missing or which changed are still processed.
+
+    :return: None if the package cannot be skipped before being built,
+        otherwise a package mapping with the "skipped" keyword set as True.
+
+    .. seealso:: :func:`_install`
+
+    """
+    logger = logging.getLogger(__name__ + "._skip_before_build")
+
+    if editable_mode:
+        return
+
+    mapping = qip.package.extract_pinned_mapping(request)
+
+    if mapping is None and artifact_cache_path is not None:
+        mapping = qip.package.extract_revision_mapping(
+            request, artifact_cache_path
+        )
+
+    if mapping is None:
+        return
+
+    _mapping = {
+        "key": qip.package.extract_safe_name(mapping["name"]).lower(),
+        "package_name": mapping["name"],
+        "installed_version": mapping["version"],
+    }
+
+    package_mapping = {
+        "identifier": qip.package.extract_identifier(
+            _mapping, extra_keywords=mapping["extra"]
+        ),
+        "key": qip.package.extract_key(
+            _mapping, extra_keywords=mapping["extra"]
+        ),
+        "name": mapping["name"],
+        "version": mapping["version"],
+        "extra": mapping["extra"],
+        "python": context_mapping["python"],
+        "skipped": True,
+    }
+
+    if definition_path is not None:
+        existing_definition = qip.definition.fetch_existing(
+            package_mapping, definition_mapping
+        )
+
+        if _skip_install(existing_definition, package_mapping, definition_path):
+            logger.warning(
+                "Skip '{0[key]}[{0[python][identifier]}]=={0[version]}' "
+                "which already exists in Wiz registries."
+                .format(package_mapping)
+            )
+
+            requirements = _extract_definition_requirements(
+                existing_definition, context_mapping["python"]["identifier"]
+            )
+            if len(requirements) > 0:
+                package_mapping["requirements"] = requirements
+
+            return package_mapping
+
+    if overwrite is False:
+        result = _find_installed_target(
+            output_path, package_mapping, context_mapping
+        )
+
+        if result is not None:
+            identifier, path = result
+
+            logger.warning(
+                "Skip '{}' which is already installed.".format(identifier)
+            )
+            package_mapping["identifier"] = identifier
+
+            requirements = _fetch_installed_requirements(
+                path, package_mapping, context_mapping
+            )
+            if len(requirements) > 0:
+                package_mapping["requirements"] = requirements
+
+            return package_mapping
+
+
+def _extract_definition_requirements(definition, python_identifier):
+    """Return Python package requirements from existing *definition*.
+
+    Requirements are extracted from the variant corresponding to
+    *python_identifier* and converted back into :term:`Pip` requests (e.g.
+    "library::bim[3.8] >=2, <3" becomes "bim<3,>=2").
+
+    """
+    prefix = qip.definition.NAMESPACE + wiz.symbol.NAMESPACE_SEPARATOR
+    requirements = []
+
+    for variant in definition.variants:
+        if variant.identifier != python_identifier:
+            continue
+
+        for requirement in variant.requirements:
+            if not requirement.name.startswith(prefix):
+                continue
+
+            value = "{}{}".format(
+                requirement.name[len(prefix):], requirement.specifier
+            )
+            if value not in requirements:
+                requirements.append(value)
+
+    return requirements
+
+
+def _fetch_installed_requirements(path, package_mapping, context_mapping):
+    """Return requirements of *package_mapping* installed in *path*.
+
+    Requirements are read from the metadata of the distribution within the
+    library path of the package installed. An empty list is returned if the
+    metadata cannot be found.
+
+    """
+    library_path = os.path.join(path, context_mapping["python"]["library-path"])
+    metadata = qip.metadata.fetch(package_mapping["name"], [library_path])
+    if metadata is None:
+        return []
+
+    dependency_mapping = qip.package.extract_dependency_mapping(
+        metadata, extra_keywords=package_mapping["extra"],
+        environment=context_mapping["python"].get("environment-markers")
+    )
+    return dependency_mapping["requirements"]
+
+
+def _find_installed_target(output_path, package_mapping, context_mapping):
+    """Return identifier and target of *package_mapping* if installed in
+    *output_path*.
+
+    The package folder is looked up from the package name, or from a folder
+    with the same canonical name if it cannot be found. Target paths with and
+    without system restriction are both checked.
+
+    :return: None if the package is not installed, otherwise a tuple with the
+        identifier of the package installed and the path to its target.
+
+    """
+    name = package_mapping["name"]
+
+    if not os.path.isdir(os.path.join(output_path, name)):
+        key = canonicalize_name(name)
+        names = [
+            _name for _name in os.listdir(output_path)
+            if canonicalize_name(_name) == key
+        ]
+        if len(names) == 0:
+            return
+
+        name = names[0]
+
+    identifier = qip.package.extract_identifier(
+        {"package_name": name, "installed_version": package_mapping["version"]},
+        extra_keywords=package_mapping["extra"]
+    )
+
+    for os_mapping in [None, qip.system.query()["os"]]:
+        path = os.path.join(
+            output_path, qip.package.extract_target_path(
+                name, identifier, context_mapping["python"]["identifier"],
+                os_mapping=os_mapping
+            )
+        )
+
+        if os.path.isdir(path):
+            return identifier, path
+
+
+def _fetch_definitions(
+    package_mapping, definition_mapping, definition_path=None,
+    editable_mode=False
+):
+    """Fetch custom and existing definitions for *package_mapping*.
+
+    Custom definition is fetched from package and existing definition from
+    *definition_mapping*. Both are None if *definition_path* is None.
+
+    :return: tuple with custom definition, existing definition and one boolean
+        value indicating whether the installation should be skipped as
+        the package already exists in :term:`Wiz` registries.
+
+    """
+    logger = logging.getLogger(__name__ + "._fetch_definitions")
+
+    if definition_path is None:
+        return None, None, False
+
+    custom_definition = qip.definition.fetch_custom(package_mapping)
+    existing_definition = qip.definition.fetch_existing(
+        package_mapping, definition_mapping,
+        namespace=getattr(custom_definition, "namespace", None),
+    )
+
+    if not editable_mode and _skip_install(
+        existing_definition, package_mapping, definition_path
+    ):
+        logger.warning(
+            "Skip '{0[key]}[{0[python][identifier]}]=={0[version]}' "
+            "which already exists in Wiz registries."
+            .format(package_mapping)
+        )
+        return custom_definition, existing_definition, True
+
+    return custom_definition, existing_definition, False
+
+
 def _skip_install(existing_definition, package_mapping, definition_path):
     """Indicate whether existing definition mandates installation to be skipped.
 
@@ -319,10 +1432,17 @@ def _skip_install(existing_definition, package_mapping, definition_path):
 
 
 def copy_to_destination(
-    mapping, source_path, destination_path, overwrite=False
+    mapping, source_path, destination_path, overwrite=False, move=False
 ):
     """Copy package from *source_path* to *destination_path*.
 
+    The package is published with :func:`qip.filesystem.publish`, so that a
+    partially copied package is never visible in *destination_path*. A
+    package overwritten is replaced in a single step and removed afterwards.
+
+    Files are copied with :func:`qip.filesystem.copy_tree`, which uses several
+    threads when requested with :func:`qip.filesystem.parallel_copy`.
+
     :param mapping: mapping of the python package built as returned by
         :func:`qip.package.install`.
 
@@ -334,6 +1454,11 @@ def copy_to_destination(
         overwritten. If None, a user confirmation will be prompted. Default is
         False.
 
+    :param move: indicate whether *source_path* can be moved to the
+        destination with a single atomic rename when both paths are on the same
+        file system. The package is copied otherwise. An empty folder is left
+        in place of *source_path* so that it can be reused. Default is False.
+
     :return: tuple with one boolean value indicating whether the copy has been
         skipped and one indicating a new value for the *overwrite* option.
 
@@ -354,7 +1479,6 @@ def copy_to_destination(
             logger.warning(
                 "Overwrite '{}' which is already installed.".format(identifier)
             )
-            shutil.rmtree(target)
 
         else:
             logger.warning(
@@ -364,8 +1488,9 @@ def copy_to_destination(
             return True, overwrite_next
 
     wiz.filesystem.ensure_directory(os.path.dirname(target))
-    shutil.copytree(source_path, target)
-    logger.debug("Source copied to '{}'".format(target))
+
+    qip.filesystem.publish(source_path, target, move=move)
+    logger.debug("Source published to '{}'".format(target))
 
     logger.info("\tInstalled '{}'.".format(identifier))
 
@@ -398,7 +1523,7 @@ def _confirm_overwrite(identifier):
     return overwrite, overwrite_next
 
 
-def fetch_context_mapping(path, python_target):
+def fetch_context_mapping(path, python_target, cache_path=None):
     """Return context mapping containing environment and python mapping.
 
     :param path: path where python package has been installed.
@@ -407,6 +1532,11 @@ def fetch_context_mapping(path, python_target):
         a path to a Python executable (e.g. "python==2.7.*" or
         "/path/to/bin/python").
 
+    :param cache_path: Path to a persistent cache folder used to record the
+        environment and python mapping, so that they are not fetched again
+        by following calls. Default is None, which means that the context is
+        always fetched.
+
     :return: Context mapping.
 
         It should be in the form of::
@@ -425,11 +1555,14 @@ def fetch_context_mapping(path, python_target):
 
     """
     environ_mapping = qip.environ.fetch(
-        python_target, mapping={"PYTHONWARNINGS": "ignore"}
+        python_target, mapping={"PYTHONWARNINGS": "ignore"},
+        cache_path=cache_path
     )
 
     # Fetch Python version mapping from environment
-    python_mapping = qip.environ.fetch_python_mapping(environ_mapping)
+    python_mapping = qip.environ.fetch_python_mapping(
+        environ_mapping, cache_path=cache_path
+    )
 
     # Compute the installation path and add it to PYTHONPATH
     install_path = os.path.join(path, python_mapping["library-path"])
@@ -439,3 +1572,25 @@ def fetch_context_mapping(path, python_target):
         "environ": environ_mapping,
         "python": python_mapping
     }
+
+
+def _relocate_context_mapping(context_mapping, path):
+    """Return copy of *context_mapping* targeting installation *path*.
+
+    :param context_mapping: Mapping containing environment and python mapping
+        as returned by :func:`fetch_context_mapping`
+
+    :param path: path where python package will be installed.
+
+    :return: Context mapping.
+
+    """
+    environ_mapping = context_mapping["environ"].copy()
+    environ_mapping["PYTHONPATH"] = os.path.join(
+        path, context_mapping["python"]["library-path"]
+    )
+
+    return {
+        "environ": environ_mapping,
+        "python": context_mapping["python"]
+    }
@@ -0,0 +1,1054 @@
+# :coding: utf-8
+
+import errno
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import six
+import wiz.filesystem
+from packaging.utils import canonicalize_name
+from packaging.version import Version, InvalidVersion
+
+import qip.command
+import qip.system
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+#: Name of the lock file created at the root of the cache.
+LOCK_NAME = ".lock"
+
+#: Name of the cache section used by :term:`Pip`.
+PIP_SECTION = "pip"
+
+#: Name of the cache section used to store built wheels.
+WHEEL_SECTION = "wheels"
+
+#: Name of the folder containing wheels built from a specific revision (Git
+#: commit or source fingerprint) within the wheel cache section.
+WHEEL_REVISION_FOLDER = "_revisions"
+
+#: Name of the cache section used to store Git mirrors.
+GIT_SECTION = "git"
+
+#: Name of the cache section used to record the name and version of packages
+#: built from a specific revision (Git commit or source fingerprint).
+REVISION_SECTION = "revisions"
+
+#: Name of the cache section used to record file hashes of source trees.
+SOURCE_SECTION = "sources"
+
+#: Name of the cache section used to record environment and Python mappings
+#: of target Python environments.
+CONTEXT_SECTION = "contexts"
+
+#: Name of the cache section used to store folders with symbolic links to
+#: target Python executables.
+SHIM_SECTION = "shims"
+
+#: Name of the cache section used to record compact indexes of :term:`Wiz`
+#: registries.
+REGISTRY_SECTION = "registries"
+
+#: Names of folders which are never considered as part of a source tree.
+SOURCE_EXCLUDED_FOLDERS = (
+    ".git", ".hg", ".svn", ".tox", ".nox", ".eggs", ".pytest_cache",
+    "__pycache__", "*.egg-info",
+)
+
+#: Names of top-level folders which are never considered as part of a source
+#: tree.
+SOURCE_EXCLUDED_ROOT_FOLDERS = ("build", "dist")
+
+#: Names of files which are never considered as part of a source tree.
+SOURCE_EXCLUDED_FILES = ("*.pyc", "*.pyo", "*.so", ".DS_Store")
+
+#: Cache sections where each top-level folder is considered as a single entry
+#: which should be removed entirely by :func:`prune`.
+FOLDER_SECTIONS = (GIT_SECTION, SHIM_SECTION)
+
+#: Compiled regular expression to extract name and version from wheel file
+#: name.
+WHEEL_PATTERN = re.compile(
+    r"^(?P<name>[^-]+)-(?P<version>[^-]+)(?:-\d[^-]*)?-[^-]+-[^-]+-[^-]+\.whl$"
+)
+
+#: Compiled regular expression to parse size values.
+SIZE_PATTERN = re.compile(
+    r"^\s*(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>[KMGT]?)(?:i?B)?\s*$",
+    re.IGNORECASE
+)
+
+#: Multiplier for each size unit.
+SIZE_UNITS = {
+    "": 1,
+    "K": 1024,
+    "M": 1024 ** 2,
+    "G": 1024 ** 3,
+    "T": 1024 ** 4,
+}
+
+
+def fetch_pip_path(path):
+    """Return path to the :term:`Pip` cache within cache *path*.
+
+    :param path: root path of the cache.
+
+    :return: Path to the :term:`Pip` cache.
+
+    """
+    pip_path = os.path.join(path, PIP_SECTION)
+    wiz.filesystem.ensure_directory(pip_path)
+    return pip_path
+
+
+def fetch_shim_path(path):
+    """Return path to the folder containing executable shims within *path*.
+
+    :param path: root path of the cache.
+
+    :return: Path to the shim folder.
+
+    .. seealso:: :func:`qip.environ.fetch`
+
+    """
+    shim_path = os.path.join(path, SHIM_SECTION)
+    wiz.filesystem.ensure_directory(shim_path)
+    return shim_path
+
+
+def fetch_wheel(path, name, version, python_identifier):
+    """Return path to wheel built for *name* and *version* from cache *path*.
+
+    The access time of the wheel is updated so that it is considered as
+    recently used by :func:`prune`.
+
+    :param path: root path of the cache.
+
+    :param name: Python package name.
+
+    :param version: Python package version.
+
+    :param python_identifier: Python version identifier (e.g. "2.7").
+
+    :return: Path to the wheel or None if no wheel could be found.
+
+    """
+    try:
+        version = Version(version)
+    except InvalidVersion:
+        return
+
+    folder = os.path.join(
+        _fetch_wheel_folder(path, python_identifier), canonicalize_name(name)
+    )
+
+    if not os.path.isdir(folder):
+        return
+
+    # Versions are compared so that "1.0" matches "1.0.0".
+    for _version in sorted(os.listdir(folder)):
+        try:
+            if Version(_version) != version:
+                continue
+        except InvalidVersion:
+            continue
+
+        wheel_path = _fetch_wheel_from_folder(os.path.join(folder, _version))
+        if wheel_path is not None:
+            return wheel_path
+
+
+def fetch_revision_wheel(path, revision, python_identifier):
+    """Return path to wheel built from *revision* from cache *path*.
+
+    :param path: root path of the cache.
+
+    :param revision: Git commit hash or source fingerprint as returned by
+        :func:`fetch_source_fingerprint`.
+
+    :param python_identifier: Python version identifier (e.g. "2.7").
+
+    :return: Path to the wheel or None if no wheel could be found.
+
+    """
+    return _fetch_wheel_from_folder(
+        os.path.join(
+            _fetch_wheel_folder(path, python_identifier),
+            WHEEL_REVISION_FOLDER, revision
+        )
+    )
+
+
+def _fetch_wheel_from_folder(folder):
+    """Return path to wheel within *folder* and update its access time."""
+    logger = logging.getLogger(__name__ + ".fetch_wheel")
+
+    if not os.path.isdir(folder):
+        return
+
+    names = sorted(
+        name for name in os.listdir(folder) if name.endswith(".whl")
+    )
+    if len(names) == 0:
+        return
+
+    wheel_path = os.path.join(folder, names[0])
+
+    try:
+        os.utime(wheel_path, (time.time(), os.stat(wheel_path).st_mtime))
+    except OSError:
+        return
+
+    logger.debug("Wheel fetched from cache: {}".format(wheel_path))
+    return wheel_path
+
+
+def store_wheel(path, wheel_path, python_identifier, revision=None):
+    """Copy wheel from *wheel_path* into cache *path*.
+
+    The wheel is first copied to a temporary file and renamed, so that another
+    process cannot fetch an incomplete wheel.
+
+    :param path: root path of the cache.
+
+    :param wheel_path: Path to the wheel built.
+
+    :param python_identifier: Python version identifier (e.g. "2.7").
+
+    :param revision: Git commit hash or source fingerprint the wheel has been
+        built from. If specified, the wheel is stored per revision instead of
+        per version, and the package name and version are recorded so that
+        they can be retrieved with :func:`fetch_revision_mapping`. Default is
+        None.
+
+    :raise ValueError: if the name and version cannot be extracted from the
+        wheel file name.
+
+    :return: Path to the wheel stored in the cache.
+
+    """
+    logger = logging.getLogger(__name__ + ".store_wheel")
+
+    wheel_name = os.path.basename(wheel_path)
+
+    match = WHEEL_PATTERN.match(wheel_name)
+    if match is None:
+        raise ValueError(
+            "Name and version could not be extracted from '{}'.".format(
+                wheel_name
+            )
+        )
+
+    try:
+        version = str(Version(match.group("version")))
+    except InvalidVersion:
+        version = match.group("version")
+
+    if revision is not None:
+        folder = os.path.join(
+            _fetch_wheel_folder(path, python_identifier),
+            WHEEL_REVISION_FOLDER, revision
+        )
+
+    else:
+        folder = os.path.join(
+            _fetch_wheel_folder(path, python_identifier),
+            canonicalize_name(match.group("name")), version
+        )
+
+    target = os.path.join(folder, wheel_name)
+    _write_atomically(target, lambda _path: shutil.copyfile(wheel_path, _path))
+    logger.debug("Wheel stored in cache: {}".format(target))
+
+    if revision is not None:
+        store_revision_mapping(
+            path, revision, {"name": match.group("name"), "version": version}
+        )
+
+    return target
+
+
+def _fetch_wheel_folder(path, python_identifier):
+    """Return folder containing wheels for Python and current system.
+
+    The folder is in the form of "wheels/linux-x86_64-centos7/py27".
+
+    """
+    mapping = qip.system.query()
+
+    return os.path.join(
+        path, WHEEL_SECTION, "{platform}-{arch}-{os}{major_version}".format(
+            platform=mapping["platform"],
+            arch=mapping["arch"],
+            os=mapping["os"]["name"],
+            major_version=mapping["os"]["major_version"],
+        ),
+        "py{}".format(python_identifier.replace(".", ""))
+    )
+
+
+def fetch_revision_mapping(path, revision):
+    """Return name and version of package built from *revision*.
+
+    :param path: root path of the cache.
+
+    :param revision: Git commit hash or source fingerprint.
+
+    :return: None if no package has been built from *revision*, otherwise a
+        mapping in the form of::
+
+            {
+                "name": "foo",
+                "version": "0.1.0"
+            }
+
+    """
+    record_path = os.path.join(path, REVISION_SECTION, revision + ".json")
+
+    try:
+        with open(record_path, "r") as stream:
+            mapping = json.load(stream)
+
+    except (IOError, OSError, ValueError):
+        return
+
+    os.utime(record_path, None)
+    return mapping
+
+
+def store_revision_mapping(path, revision, mapping):
+    """Record name and version of package built from *revision*.
+
+    :param path: root path of the cache.
+
+    :param revision: Git commit hash or source fingerprint.
+
+    :param mapping: mapping containing the "name" and "version" of the
+        package built.
+
+    """
+    def _write(_path):
+        """Write *mapping* into *_path*."""
+        with open(_path, "w") as stream:
+            json.dump(
+                {"name": mapping["name"], "version": mapping["version"]},
+                stream
+            )
+
+    _write_atomically(
+        os.path.join(path, REVISION_SECTION, revision + ".json"), _write
+    )
+
+
+def fetch_context(path, identifier):
+    """Return context mapping recorded for *identifier*.
+
+    :param path: root path of the cache.
+
+    :param identifier: identifier computed from the Python target and the
+        state it depends on (see :mod:`qip.environ`).
+
+    :return: None if no mapping has been recorded for *identifier*, otherwise
+        the mapping recorded.
+
+    """
+    record_path = os.path.join(path, CONTEXT_SECTION, identifier + ".json")
+
+    try:
+        with open(record_path, "r") as stream:
+            mapping = json.load(stream)
+
+    except (IOError, OSError, ValueError):
+        return
+
+    os.utime(record_path, None)
+    return mapping
+
+
+def store_context(path, identifier, mapping):
+    """Record context *mapping* for *identifier*.
+
+    :param path: root path of the cache.
+
+    :param identifier: identifier computed from the Python target and the
+        state it depends on (see :mod:`qip.environ`).
+
+    :param mapping: mapping to record, which must be serializable as JSON.
+
+    """
+    def _write(_path):
+        """Write *mapping* into *_path*."""
+        with open(_path, "w") as stream:
+            json.dump(mapping, stream)
+
+    _write_atomically(
+        os.path.join(path, CONTEXT_SECTION, identifier + ".json"), _write
+    )
+
+
+def fetch_registry_record(path, registry_path):
+    """Return index recorded for :term:`Wiz` registry *registry_path*.
+
+    :param path: root path of the cache.
+
+    :param registry_path: path to the registry.
+
+    :return: None if no index has been recorded for *registry_path*,
+        otherwise the index recorded.
+
+    .. seealso:: :func:`qip.definition.fetch_definition_mapping`
+
+    """
+    record_path = os.path.join(
+        path, REGISTRY_SECTION, "{}.json".format(
+            hashlib.sha1(registry_path.encode("utf-8")).hexdigest()
+        )
+    )
+
+    try:
+        with open(record_path, "r") as stream:
+            record = json.load(stream)
+
+    except (IOError, OSError, ValueError):
+        return
+
+    os.utime(record_path, None)
+    return record
+
+
+def store_registry_record(path, registry_path, record):
+    """Record index for :term:`Wiz` registry *registry_path*.
+
+    :param path: root path of the cache.
+
+    :param registry_path: path to the registry.
+
+    :param record: index to record, which must be serializable as JSON.
+
+    .. seealso:: :func:`qip.definition.fetch_definition_mapping`
+
+    """
+    def _write(_path):
+        """Write *record* into *_path*."""
+        with open(_path, "w") as stream:
+            json.dump(record, stream)
+
+    _write_atomically(
+        os.path.join(
+            path, REGISTRY_SECTION, "{}.json".format(
+                hashlib.sha1(registry_path.encode("utf-8")).hexdigest()
+            )
+        ), _write
+    )
+
+
+def fetch_source_fingerprint(path, source_path):
+    """Return fingerprint of source tree *source_path*.
+
+    The fingerprint is computed from the relative path, the content hash and
+    the executable permission of each file within the source tree. If the
+    source tree is managed by Git, files ignored by ".gitignore" are
+    excluded. Otherwise, files matching patterns from the top-level
+    ".gitignore" are excluded. Common build artifacts are always excluded
+    (see :data:`SOURCE_EXCLUDED_FOLDERS`,
+    :data:`SOURCE_EXCLUDED_ROOT_FOLDERS` and :data:`SOURCE_EXCLUDED_FILES`).
+
+    File hashes are recorded in the cache along with the file size and
+    modification time, so that only files modified since the previous call
+    are read again.
+
+    :param path: root path of the cache.
+
+    :param source_path: path to the source tree.
+
+    :return: Fingerprint as an hexadecimal string.
+
+    """
+    logger = logging.getLogger(__name__ + ".fetch_source_fingerprint")
+
+    source_path = os.path.realpath(source_path)
+
+    record_path = os.path.join(
+        path, SOURCE_SECTION, "{}.json".format(
+            hashlib.sha1(source_path.encode("utf-8")).hexdigest()
+        )
+    )
+
+    try:
+        with open(record_path, "r") as stream:
+            record = json.load(stream)
+    except (IOError, OSError, ValueError):
+        record = {"time": 0, "files": {}}
+
+    # Files modified within the same second as the previous record cannot be
+    # trusted from their status as they might have been modified again since.
+    threshold = record["time"] - 1
+
+    timestamp = time.time()
+    files = {}
+    fingerprint = hashlib.sha256()
+
+    for relative_path in sorted(_list_source_files(source_path)):
+        file_path = os.path.join(source_path, relative_path)
+
+        try:
+            stat = os.lstat(file_path)
+        except OSError:
+            continue
+
+        if os.path.islink(file_path):
+            digest = hashlib.sha256(
+                os.readlink(file_path).encode("utf-8")
+            ).hexdigest()
+
+        elif os.path.isfile(file_path):
+            digest = None
+
+            _record = record["files"].get(relative_path)
+            if (
+                _record is not None and _record[0] == stat.st_size
+                and _record[1] == stat.st_mtime and stat.st_mtime < threshold
+            ):
+                digest = _record[2]
+
+            if digest is None:
+                digest = _hash_file(file_path)
+
+        else:
+            continue
+
+        files[relative_path] = [stat.st_size, stat.st_mtime, digest]
+
+        fingerprint.update(
+            "{}\0{}\0{}\n".format(
+                relative_path, digest, int(bool(stat.st_mode & 0o111))
+            ).encode("utf-8")
+        )
+
+    def _write(_path):
+        """Write file hashes into *_path*."""
+        with open(_path, "w") as stream:
+            json.dump({"time": timestamp, "files": files}, stream)
+
+    try:
+        _write_atomically(record_path, _write)
+    except (IOError, OSError) as error:
+        logger.debug(
+            "Impossible to record file hashes for '{}': {}".format(
+                source_path, error
+            )
+        )
+
+    result = fingerprint.hexdigest()
+    logger.debug("Fingerprint of '{}': {}".format(source_path, result))
+    return result
+
+
+def _list_source_files(path):
+    """Return relative paths of files within source tree *path*.
+
+    .. seealso:: :func:`fetch_source_fingerprint`
+
+    """
+    try:
+        output = qip.command.execute(
+            "git -C '{}' ls-files -z --cached --others "
+            "--exclude-standard".format(path), dict(os.environ), quiet=True
+        )
+    except (OSError, RuntimeError):
+        output = None
+
+    if output:
+        return [
+            name for name in (
+                os.path.normpath(_name) for _name in output.split("\0")
+                if len(_name)
+            )
+            if not _is_source_excluded(name)
+        ]
+
+    patterns = []
+
+    try:
+        with open(os.path.join(path, ".gitignore"), "r") as stream:
+            for line in stream:
+                line = line.strip()
+                if len(line) and not line.startswith(("#", "!")):
+                    patterns.append(line.strip("/"))
+    except (IOError, OSError):
+        pass
+
+    paths = []
+
+    for root, folders, files in os.walk(path):
+        relative_root = os.path.relpath(root, path)
+
+        for name in list(folders):
+            relative_path = os.path.normpath(os.path.join(relative_root, name))
+            if _is_source_excluded(
+                relative_path, patterns=patterns, is_folder=True
+            ):
+                folders.remove(name)
+
+        for name in files:
+            relative_path = os.path.normpath(os.path.join(relative_root, name))
+            if not _is_source_excluded(relative_path, patterns=patterns):
+                paths.append(relative_path)
+
+    return paths
+
+
+def _is_source_excluded(relative_path, patterns=None, is_folder=False):
+    """Indicate whether *relative_path* should be excluded from source tree.
+
+    :param relative_path: path relative to the root of the source tree.
+
+    :param patterns: additional patterns extracted from ".gitignore" which
+        are matched against the name and the relative path.
+
+    :param is_folder: indicate whether *relative_path* is a folder. Otherwise,
+        the parent folders and the file name are checked.
+
+    """
+    components = relative_path.split(os.sep)
+    folders = components if is_folder else components[:-1]
+
+    if len(folders) > 0 and any(
+        fnmatch.fnmatch(folders[0], pattern)
+        for pattern in SOURCE_EXCLUDED_ROOT_FOLDERS
+    ):
+        return True
+
+    if any(
+        fnmatch.fnmatch(name, pattern) for name in folders
+        for pattern in SOURCE_EXCLUDED_FOLDERS
+    ):
+        return True
+
+    if not is_folder and any(
+        fnmatch.fnmatch(components[-1], pattern)
+        for pattern in SOURCE_EXCLUDED_FILES
+    ):
+        return True
+
+    return any(
+        fnmatch.fnmatch(components[-1], pattern)
+        or fnmatch.fnmatch(relative_path, pattern)
+        for pattern in patterns or []
+    )
+
+
+def _hash_file(path):
+    """Return content hash of file *path*."""
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as stream:
+        for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def fetch_git_mirror(path, url):
+    """Return path to bare mirror of Git repository *url* within cache *path*.
+
+    The repository is cloned as a bare mirror the first time, and following
+    calls only fetch new objects and references into the existing mirror. A
+    lock is held while the mirror is updated, so that it can be safely used by
+    several processes.
+
+    :param path: root path of the cache.
+
+    :param url: Git repository URL (e.g. "git@gitlab:rnd/foo.git",
+        "/path/to/foo.git").
+
+    :raise RuntimeError: if the repository cannot be cloned or fetched.
+
+    :return: Path to the bare mirror.
+
+    """
+    logger = logging.getLogger(__name__ + ".fetch_git_mirror")
+
+    folder = os.path.join(path, GIT_SECTION)
+    wiz.filesystem.ensure_directory(folder)
+
+    name = re.split(r"[/:]", url.rstrip("/"))[-1]
+    if name.endswith(".git"):
+        name = name[:-4]
+
+    mirror_path = os.path.join(
+        folder, "{}-{}.git".format(
+            name, hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+        )
+    )
+
+    environ_mapping = dict(os.environ)
+    environ_mapping["GIT_TERMINAL_PROMPT"] = "0"
+
+    stream = _acquire(mirror_path + LOCK_NAME)
+
+    try:
+        if os.path.isdir(mirror_path):
+            logger.debug("Fetch '{}' into '{}'".format(url, mirror_path))
+            qip.command.execute(
+                "git --git-dir '{}' fetch --prune --quiet".format(mirror_path),
+                environ_mapping, quiet=True
+            )
+
+        else:
+            logger.debug("Clone '{}' into '{}'".format(url, mirror_path))
+
+            temporary_path = tempfile.mkdtemp(
+                prefix=".{}-".format(os.path.basename(mirror_path)),
+                dir=folder
+            )
+
+            try:
+                qip.command.execute(
+                    "git clone --mirror --quiet '{}' '{}'".format(
+                        url, temporary_path
+                    ), environ_mapping, quiet=True
+                )
+                os.rename(temporary_path, mirror_path)
+
+            finally:
+                shutil.rmtree(temporary_path, ignore_errors=True)
+
+        # Mark mirror as recently used.
+        os.utime(mirror_path, None)
+
+    finally:
+        release_lock(stream)
+
+    return mirror_path
+
+
+def _write_atomically(target, callback):
+    """Write *target* by calling *callback* with a temporary path.
+
+    The temporary file is then renamed to *target*, so that other processes
+    never read a partially written file.
+
+    """
+    folder = os.path.dirname(target)
+    wiz.filesystem.ensure_directory(folder)
+
+    handle, temporary_path = tempfile.mkstemp(
+        prefix=".{}-".format(os.path.basename(target)), dir=folder
+    )
+    os.close(handle)
+
+    try:
+        callback(temporary_path)
+        os.rename(temporary_path, target)
+
+    except (IOError, OSError):
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def acquire_lock(path, shared=False, blocking=True):
+    """Acquire lock on cache *path*.
+
+    Several processes can use the cache at the same time with a shared lock,
+    whereas an exclusive lock is required to remove files from the cache.
+
+    :param path: root path of the cache.
+
+    :param shared: Indicate whether a shared lock should be acquired instead
+        of an exclusive lock. Default is False.
+
+    :param blocking: Indicate whether the function should wait until the lock
+        can be acquired. Default is True.
+
+    .. note::
+
+        Locking is a no-op on platforms which do not provide :mod:`fcntl`.
+
+    :raise RuntimeError: if the lock file cannot be created or opened (e.g.
+        when the cache belongs to another user).
+
+    :return: File object holding the lock, or None if *blocking* is False and
+        the lock is held by another process.
+
+    """
+    try:
+        wiz.filesystem.ensure_directory(path)
+        return _acquire(
+            os.path.join(path, LOCK_NAME), shared=shared, blocking=blocking
+        )
+
+    except (IOError, OSError) as error:
+        raise RuntimeError(
+            "Impossible to use cache '{}': {}".format(path, error)
+        )
+
+
+def _acquire(lock_path, shared=False, blocking=True):
+    """Acquire lock on *lock_path*.
+
+    .. seealso:: :func:`acquire_lock`
+
+    """
+    stream = open(lock_path, "a")
+
+    if fcntl is None:
+        return stream
+
+    operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    if not blocking:
+        operation |= fcntl.LOCK_NB
+
+    try:
+        fcntl.flock(stream.fileno(), operation)
+
+    except (IOError, OSError) as error:
+        stream.close()
+
+        if error.errno in (errno.EAGAIN, errno.EACCES):
+            return None
+        raise
+
+    return stream
+
+
+def release_lock(stream):
+    """Release lock held by *stream* as returned by :func:`acquire_lock`."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(stream.fileno(), fcntl.LOCK_UN)
+    finally:
+        stream.close()
+
+
+def fetch_statistics(path):
+    """Return statistics about cache *path*.
+
+    :param path: root path of the cache.
+
+    :return: mapping in the form of::
+
+            {
+                "files": 42,
+                "size": 1048576,
+                "sections": {
+                    "pip": {"files": 42, "size": 1048576}
+                }
+            }
+
+    """
+    statistics = {"files": 0, "size": 0, "sections": {}}
+
+    for entry in _iter_entries(path):
+        for mapping in [
+            statistics,
+            statistics["sections"].setdefault(
+                entry["section"], {"files": 0, "size": 0}
+            )
+        ]:
+            mapping["files"] += entry["files"]
+            mapping["size"] += entry["size"]
+
+    return statistics
+
+
+def prune(path, size_limit, blocking=True):
+    """Remove least recently used files until cache *path* fits *size_limit*.
+
+    Files are sorted by their latest access or modification time, so that the
+    files which were not used for the longest time are removed first. Folders
+    within sections from :data:`FOLDER_SECTIONS` (e.g. Git mirrors) are
+    considered as a single entry and removed entirely. Empty folders are
+    removed afterwards.
+
+    An exclusive lock is acquired during the operation so that files are not
+    removed while being used by another process.
+
+    :param path: root path of the cache.
+
+    :param size_limit: Maximum size of the cache in bytes.
+
+    :param blocking: Indicate whether the function should wait until other
+        processes stop using the cache. Default is True.
+
+    :return: mapping in the form of ``{"files": 3, "size": 1024}`` indicating
+        the number of files and the size removed, or None if *blocking* is
+        False and the cache is used by another process.
+
+    """
+    logger = logging.getLogger(__name__ + ".prune")
+
+    if not os.path.isdir(path):
+        return {"files": 0, "size": 0}
+
+    stream = acquire_lock(path, blocking=blocking)
+    if stream is None:
+        logger.debug(
+            "Cache '{}' is used by another process and will not be "
+            "pruned.".format(path)
+        )
+        return
+
+    removed = {"files": 0, "size": 0}
+
+    try:
+        entries = list(_iter_entries(path))
+        size = sum(entry["size"] for entry in entries)
+
+        for entry in sorted(
+            entries, key=lambda _entry: (_entry["time"], _entry["path"])
+        ):
+            if size <= size_limit:
+                break
+
+            try:
+                if os.path.isdir(entry["path"]):
+                    shutil.rmtree(entry["path"])
+                else:
+                    os.remove(entry["path"])
+            except OSError:
+                continue
+
+            size -= entry["size"]
+            removed["files"] += entry["files"]
+            removed["size"] += entry["size"]
+
+        _remove_empty_folders(path)
+
+    finally:
+        release_lock(stream)
+
+    if removed["files"] > 0:
+        logger.debug(
+            "Removed {} file(s) ({}) from cache '{}'.".format(
+                removed["files"], format_size(removed["size"]), path
+            )
+        )
+
+    return removed
+
+
+def _iter_entries(path):
+    """Yield mapping for each entry within cache *path*.
+
+    Each mapping contains the "section", the "path", the number of "files",
+    the "size" and the latest access or modification "time" of the entry.
+
+    """
+    for root, folders, files in os.walk(path):
+        relative_root = os.path.relpath(root, path)
+        section = relative_root.split(os.sep)[0]
+
+        if relative_root in FOLDER_SECTIONS:
+            for name in folders:
+                yield _fetch_folder_entry(section, os.path.join(root, name))
+
+            # Prevent walking into folders already accounted for.
+            del folders[:]
+
+        for name in files:
+            if relative_root == os.curdir and name == LOCK_NAME:
+                continue
+
+            entry_path = os.path.join(root, name)
+
+            try:
+                stat = os.lstat(entry_path)
+            except OSError:
+                continue
+
+            yield {
+                "section": section,
+                "path": entry_path,
+                "files": 1,
+                "size": stat.st_size,
+                "time": max(stat.st_atime, stat.st_mtime),
+            }
+
+
+def _fetch_folder_entry(section, path):
+    """Return entry mapping for folder *path* considered as a single entry.
+
+    .. seealso:: :func:`_iter_entries`
+
+    """
+    entry = {"section": section, "path": path, "files": 0, "size": 0}
+
+    try:
+        stat = os.lstat(path)
+        entry["time"] = max(stat.st_atime, stat.st_mtime)
+    except OSError:
+        entry["time"] = 0
+
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+
+            entry["files"] += 1
+            entry["size"] += stat.st_size
+
+    return entry
+
+
+def _remove_empty_folders(path):
+    """Remove empty folders within cache *path*."""
+    for root, _, _ in os.walk(path, topdown=False):
+        if root == path:
+            continue
+
+        try:
+            os.rmdir(root)
+        except OSError:
+            pass
+
+
+def parse_size(value):
+    """Return number of bytes from size *value*.
+
+    :param value: Size as an integer or a string with an optional unit (e.g.
+        "1024", "500M", "10GB", "1.5G").
+
+    :raise ValueError: if *value* is incorrect.
+
+    :return: Number of bytes.
+
+    """
+    if isinstance(value, six.integer_types):
+        return value
+
+    match = SIZE_PATTERN.match(str(value))
+    if match is None:
+        raise ValueError("Size '{}' is incorrect.".format(value))
+
+    return int(
+        float(match.group("value")) * SIZE_UNITS[match.group("unit").upper()]
+    )
+
+
+def format_size(size):
+    """Return human readable string from *size* in bytes (e.g. "1.5 MB")."""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            break
+        size /= 1024.0
+    else:
+        unit = "TB"
+
+    if unit == "B":
+        return "{} B".format(int(size))
+
+    return "{:.1f} {}".format(size, unit)
@@ -1,13 +1,199 @@
 # :coding: utf-8
 
+import collections
+import contextlib
+import io
+import json
 import logging
+import os
 import shlex
+import signal
 import subprocess
+import tempfile
+import threading
+import time
 
+import six
+import wiz.filesystem
 
-def execute(command, environ_mapping, quiet=False):
+#: Maximum number of lines from the error output kept in memory to report
+#: a command failure. The full output is written to the log file if one is
+#: specified (see :func:`log_file`).
+ERROR_TAIL_SIZE = 200
+
+#: Maximum size in bytes of the output kept in memory while a command is
+#: executed. Larger outputs are spooled into a temporary file until the
+#: command completes, but the full output is still returned as a string.
+OUTPUT_SPOOL_SIZE = 1024 * 1024
+
+#: Path to the script started within the target environment to execute
+#: Python commands in forked processes (see :func:`fork_server`).
+FORK_SERVER_SCRIPT = os.path.join(
+    os.path.dirname(__file__), "package_data", "fork_server.py"
+)
+
+#: Line written by the fork server on each stream once a command has
+#: completed.
+FORK_SERVER_SENTINEL = "\x00qip-fork-server:"
+
+#: Number of seconds given to a command to exit once terminated before it is
+#: killed.
+KILL_DELAY = 5
+
+#: Processes currently executed by :func:`execute`.
+_PROCESSES = set()
+
+#: Lock protecting access to :data:`_PROCESSES`.
+_PROCESSES_LOCK = threading.Lock()
+
+#: Thread local storage recording the log file used by :func:`execute` in
+#: each thread.
+_LOCAL = threading.local()
+
+#: Time limits applied to commands executed by :func:`execute` in all
+#: threads (see :func:`time_limit`).
+_TIME_LIMITS = {"timeout": None, "deadline": None}
+
+#: Indicate whether Python commands are executed by fork servers.
+_FORK_SERVER_STATE = {"enabled": False}
+
+#: Fork servers started per thread and :envvar:`PATH`.
+_FORK_SERVERS = {}
+
+#: Lock protecting access to :data:`_FORK_SERVERS`.
+_FORK_SERVERS_LOCK = threading.Lock()
+
+#: Options used to start each command in its own process group, so that all
+#: processes spawned by a command can be terminated at once.
+if six.PY2:
+    _SESSION_OPTIONS = {"preexec_fn": os.setsid}
+else:
+    _SESSION_OPTIONS = {"start_new_session": True}
+
+
+@contextlib.contextmanager
+def log_file(path):
+    """Write output of commands executed in the current thread into *path*.
+
+    Each command is appended to the log file, followed by its output and error
+    lines in the order in which they are received.
+
+    :param path: path to the log file. If None, no log file is written.
+
+    Example::
+
+        >>> with log_file("/path/to/foo.log"):
+        ...     execute("python -m pip install foo", {})
+
+    """
+    if path is None:
+        yield
+        return
+
+    wiz.filesystem.ensure_directory(os.path.dirname(os.path.abspath(path)))
+
+    previous_path = getattr(_LOCAL, "log_path", None)
+    _LOCAL.log_path = path
+
+    try:
+        yield
+    finally:
+        _LOCAL.log_path = previous_path
+
+
+@contextlib.contextmanager
+def time_limit(timeout=None, total_timeout=None):
+    """Limit duration of commands executed within context.
+
+    Limits apply to commands executed from all threads.
+
+    :param timeout: maximum number of seconds for each command. Default is
+        None, which means that commands are not limited individually.
+
+    :param total_timeout: maximum number of seconds for all commands executed
+        within context. Commands started once this duration has elapsed fail
+        immediately. Default is None, which means that the total duration is
+        not limited.
+
+    Example::
+
+        >>> with time_limit(timeout=600, total_timeout=3600):
+        ...     execute("python -m pip install foo", {})
+
+    """
+    previous_limits = _TIME_LIMITS.copy()
+
+    if timeout is not None:
+        _TIME_LIMITS["timeout"] = timeout
+
+    if total_timeout is not None:
+        deadline = time.time() + total_timeout
+        if previous_limits["deadline"] is not None:
+            deadline = min(deadline, previous_limits["deadline"])
+
+        _TIME_LIMITS["deadline"] = deadline
+
+    try:
+        yield
+    finally:
+        _TIME_LIMITS.update(previous_limits)
+
+
+@contextlib.contextmanager
+def fork_server(enabled=True):
+    """Execute Python commands with fork servers within context.
+
+    When enabled, commands starting with "python" are not executed in a new
+    interpreter. A server started within the target environment imports
+    :term:`Pip` once and forks a child process for each command instead (see
+    :data:`FORK_SERVER_SCRIPT`). One server is started per thread and
+    :envvar:`PATH`, and all servers are stopped when leaving the context.
+
+    :param enabled: indicate whether fork servers should be used. Default is
+        True.
+
+    Example::
+
+        >>> with fork_server():
+        ...     execute("python -m pip install foo", {})
+        ...     execute("python -m pip install bar", {})
+
+    """
+    previous_state = _FORK_SERVER_STATE["enabled"]
+    _FORK_SERVER_STATE["enabled"] = enabled
+
+    try:
+        yield
+    finally:
+        _FORK_SERVER_STATE["enabled"] = previous_state
+
+        if enabled and not previous_state:
+            _stop_fork_servers()
+
+
+def execute(command, environ_mapping, quiet=False, timeout=None):
     """Execute *command* within *environ_mapping*.
 
+    Output and error streams are read simultaneously so that the command can
+    never be blocked by a full pipe. Only the last lines of the error output
+    are kept in memory (see :data:`ERROR_TAIL_SIZE`), and the output is
+    spooled into a temporary file once it exceeds :data:`OUTPUT_SPOOL_SIZE`
+    while the command is running. Both streams are written to the log file
+    set for the current thread (see :func:`log_file`).
+
+    .. note::
+
+        The full output is read back from the temporary file and returned
+        once the command has completed, so the memory used still grows with
+        the size of the output.
+
+    The command is started in its own process group. If it exceeds its time
+    limit or if the execution is interrupted, the whole group is terminated,
+    and killed if it did not exit after :data:`KILL_DELAY` seconds.
+
+    Python commands are executed by a fork server when enabled (see
+    :func:`fork_server`).
+
     :param command: command to execute.
 
         It should be in the form of::
@@ -18,8 +204,12 @@ def execute(command, environ_mapping, quiet=False):
         must be set for the *command* to run properly.
     :param quiet: indicate whether output lines should be hidden.
         Default is False.
+    :param timeout: maximum number of seconds for the command to complete.
+        Default is None, which means that limits set with :func:`time_limit`
+        are used.
 
-    :raise RuntimeError: if command execution fails
+    :raise RuntimeError: if command execution fails, exits with a non-zero
+        code or exceeds its time limit.
 
     :return: Command output.
 
@@ -27,32 +217,354 @@ def execute(command, environ_mapping, quiet=False):
     logger = logging.getLogger(__name__ + ".execute")
     logger.debug(command)
 
-    process = subprocess.Popen(
-        shlex.split(command),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        env=environ_mapping
-    )
+    timeout = _fetch_timeout(timeout)
+    if timeout is not None and timeout <= 0:
+        raise RuntimeError(
+            "Time limit exceeded before executing '{}'".format(command)
+        )
+
+    arguments = shlex.split(command)
+
+    process = None
+    sentinel = None
 
-    if not quiet:
-        output = ""
+    if _FORK_SERVER_STATE["enabled"] and _is_forkable(arguments):
+        process = _send_to_fork_server(arguments[1:], environ_mapping)
+        sentinel = FORK_SERVER_SENTINEL
 
-        lines_iterator = iter(process.stdout.readline, b"")
-        while process.poll() is None:
-            for line in lines_iterator:
-                output += line.decode("utf-8")
-                _line = line.rstrip().decode("utf-8")
-                logger.debug(_line)
+    if process is None:
+        process = subprocess.Popen(
+            arguments,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=environ_mapping,
+            **_SESSION_OPTIONS
+        )
 
-        stderr = b"\n".join(process.stderr.readlines()).decode("utf-8")
-    else:
-        output, stderr = process.communicate()
+    with _PROCESSES_LOCK:
+        _PROCESSES.add(process)
 
-        # Decode process output for display
-        output = output.decode("utf-8")
-        stderr = stderr.decode("utf-8")
+    expired = threading.Event()
+
+    def _expire():
+        """Kill process once time limit is exceeded."""
+        expired.set()
+        logger.debug(
+            "Kill process {} after {} seconds".format(process.pid, timeout)
+        )
+        _kill(process)
+
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, _expire)
+        timer.daemon = True
+        timer.start()
+
+    try:
+        output, stderr, code = _communicate(
+            process, logger, quiet=quiet, command=command,
+            log_path=getattr(_LOCAL, "log_path", None), sentinel=sentinel
+        )
+
+    except BaseException:
+        # Ensure that no process is left running when the execution is
+        # interrupted (e.g. KeyboardInterrupt).
+        _kill(process)
+        raise
+
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+        with _PROCESSES_LOCK:
+            _PROCESSES.discard(process)
+
+        # Discard fork server if it has been stopped.
+        if sentinel is not None and process.poll() is not None:
+            _discard_fork_server(process)
+
+    if expired.is_set():
+        raise RuntimeError(
+            "Command '{}' exceeded time limit of {:g} seconds\n{}".format(
+                command, timeout, stderr
+            ).strip()
+        )
 
     if len(stderr):
         raise RuntimeError(stderr)
 
+    if code:
+        raise RuntimeError(
+            "Command '{}' exited with code {}".format(command, code)
+        )
+
     return output
+
+
+def terminate():
+    """Terminate all commands currently executed.
+
+    This is used to interrupt commands running in other threads when the
+    installation process must be aborted. The process group of each command
+    is terminated so that processes spawned by commands are also stopped.
+
+    """
+    logger = logging.getLogger(__name__ + ".terminate")
+
+    with _PROCESSES_LOCK:
+        processes = list(_PROCESSES)
+
+    for process in processes:
+        logger.debug("Terminate process {}".format(process.pid))
+        _signal_group(process, signal.SIGTERM)
+
+
+def _is_forkable(arguments):
+    """Indicate whether command *arguments* can be sent to a fork server.
+
+    Only Python modules (e.g. "python -m pip") and scripts (e.g.
+    "python /path/to/script.py") without interpreter options can be executed
+    by a fork server.
+
+    """
+    if len(arguments) < 2 or arguments[0] != "python":
+        return False
+
+    if arguments[1] == "-m":
+        return len(arguments) > 2
+
+    return not arguments[1].startswith("-")
+
+
+def _send_to_fork_server(arguments, environ_mapping):
+    """Send Python command *arguments* to fork server.
+
+    The server is started if necessary for the current thread and the
+    :envvar:`PATH` within *environ_mapping*. Return None if the command cannot
+    be sent to the server.
+
+    """
+    logger = logging.getLogger(__name__ + "._send_to_fork_server")
+
+    key = (threading.current_thread().ident, environ_mapping.get("PATH"))
+
+    with _FORK_SERVERS_LOCK:
+        process = _FORK_SERVERS.get(key)
+
+    if process is None or process.poll() is not None:
+        process = subprocess.Popen(
+            ["python", FORK_SERVER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=environ_mapping,
+            **_SESSION_OPTIONS
+        )
+        logger.debug("Start fork server {}".format(process.pid))
+
+        # Wait for server to be ready and ignore its initial output.
+        _communicate(
+            process, logger, quiet=True, sentinel=FORK_SERVER_SENTINEL
+        )
+
+        if process.poll() is not None:
+            logger.debug("Fork server {} has failed".format(process.pid))
+            return
+
+        with _FORK_SERVERS_LOCK:
+            _FORK_SERVERS[key] = process
+
+    request = json.dumps({"argv": arguments, "environ": environ_mapping})
+
+    try:
+        process.stdin.write((request + "\n").encode("utf-8"))
+        process.stdin.flush()
+
+    except (IOError, OSError):
+        _discard_fork_server(process)
+        _kill(process)
+        return
+
+    return process
+
+
+def _discard_fork_server(process):
+    """Stop using fork server *process*."""
+    with _FORK_SERVERS_LOCK:
+        for key, _process in list(_FORK_SERVERS.items()):
+            if _process is process:
+                del _FORK_SERVERS[key]
+
+
+def _stop_fork_servers():
+    """Stop all fork servers started."""
+    logger = logging.getLogger(__name__ + "._stop_fork_servers")
+
+    with _FORK_SERVERS_LOCK:
+        processes = list(_FORK_SERVERS.values())
+        _FORK_SERVERS.clear()
+
+    for process in processes:
+        logger.debug("Stop fork server {}".format(process.pid))
+
+        try:
+            process.stdin.close()
+        except (IOError, OSError):
+            pass
+
+        _kill(process)
+
+
+def _fetch_timeout(timeout=None):
+    """Return number of seconds left for a command to complete.
+
+    *timeout* overrides the limit set for each command with
+    :func:`time_limit`, but never exceeds the remaining total duration.
+    Return None if the command is not limited.
+
+    """
+    if timeout is None:
+        timeout = _TIME_LIMITS["timeout"]
+
+    deadline = _TIME_LIMITS["deadline"]
+    if deadline is not None:
+        remaining = deadline - time.time()
+        timeout = remaining if timeout is None else min(timeout, remaining)
+
+    return timeout
+
+
+def _kill(process):
+    """Terminate process group of *process* and wait for it to exit.
+
+    The group is killed if the process did not exit after
+    :data:`KILL_DELAY` seconds. Remaining processes within the group are
+    killed in any case.
+
+    """
+    _signal_group(process, signal.SIGTERM)
+
+    end_time = time.time() + KILL_DELAY
+    while process.poll() is None and time.time() < end_time:
+        time.sleep(0.05)
+
+    _signal_group(process, signal.SIGKILL)
+
+
+def _signal_group(process, signal_number):
+    """Send *signal_number* to process group of *process*."""
+    try:
+        os.killpg(process.pid, signal_number)
+    except OSError:
+        # Process group has already exited.
+        pass
+
+
+def _communicate(
+    process, logger, quiet=False, command=None, log_path=None, sentinel=None
+):
+    """Return output, error and exit code from *process* once it has
+    completed.
+
+    Each stream is read line by line in its own thread. Output is spooled into
+    a temporary file once it exceeds :data:`OUTPUT_SPOOL_SIZE`, and is read
+    back in full once *process* has completed. Error returned only contains
+    the last :data:`ERROR_TAIL_SIZE` lines.
+
+    If *sentinel* is specified, each stream is read until a line containing
+    *sentinel* is received, without waiting for *process* to exit. The exit
+    code is then read from the line following *sentinel* on the output
+    stream.
+
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=OUTPUT_SPOOL_SIZE)
+    errors = collections.deque(maxlen=ERROR_TAIL_SIZE)
+    error_count = [0]
+    codes = []
+
+    lock = threading.Lock()
+    stream = None
+
+    if log_path is not None and command is not None:
+        stream = io.open(log_path, "a", encoding="utf-8")
+        stream.write(u"$ {}\n".format(command))
+        stream.flush()
+
+    def _record_output(line):
+        """Record *line* from output stream."""
+        output.write(line.encode("utf-8"))
+
+        if not quiet:
+            logger.debug(line.rstrip())
+
+    def _record_error(line):
+        """Record *line* from error stream."""
+        errors.append(line)
+        error_count[0] += 1
+
+    def _read(pipe, callback):
+        """Read lines from *pipe* until it is closed or *sentinel* is read."""
+        for line in iter(pipe.readline, b""):
+            line = line.decode("utf-8", "replace")
+
+            if sentinel is not None and sentinel in line:
+                index = line.index(sentinel)
+
+                if callback is _record_output:
+                    try:
+                        codes.append(int(line[index + len(sentinel):]))
+                    except ValueError:
+                        codes.append(1)
+
+                line = line[:index]
+                if len(line):
+                    _write(line, callback)
+                return
+
+            _write(line, callback)
+
+        pipe.close()
+
+    def _write(line, callback):
+        """Record *line* and write it into log file."""
+        callback(line)
+
+        if stream is not None:
+            with lock:
+                stream.write(line)
+
+    threads = [
+        threading.Thread(target=_read, args=(process.stdout, _record_output)),
+        threading.Thread(target=_read, args=(process.stderr, _record_error)),
+    ]
+
+    try:
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        if sentinel is None or process.stdout.closed:
+            codes.append(process.wait())
+
+        output.seek(0)
+        content = output.read().decode("utf-8")
+
+    finally:
+        output.close()
+
+        if stream is not None:
+            stream.close()
+
+    stderr = "".join(errors)
+
+    if error_count[0] > len(errors):
+        stderr = "[{} lines truncated{}]\n{}".format(
+            error_count[0] - len(errors),
+            ", see '{}'".format(log_path) if log_path is not None else "",
+            stderr
+        )
+
+    return content, stderr, codes[0] if len(codes) else None
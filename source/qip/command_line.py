@@ -2,6 +2,7 @@
 
 import logging
 import os
+import signal
 import sys
 import tempfile
 import textwrap
@@ -12,6 +13,8 @@ import wiz.config
 
 import qip
 import qip._logging
+import qip.cache
+import qip.filesystem
 from qip import __version__
 
 # Initiate logging handler to display potential warning when fetching config.
@@ -155,6 +158,148 @@ def main(**kwargs):
     is_flag=True,
     default=False
 )
+@click.option(
+    "--plan",
+    help=(
+        "Resolve the whole dependency closure before installing packages "
+        "instead of discovering dependencies from each package installed."
+    ),
+    is_flag=True,
+    default=False
+)
+@click.option(
+    "--batch",
+    help=(
+        "Resolve the whole dependency closure and install all packages from "
+        "the package index with a single Pip command."
+    ),
+    is_flag=True,
+    default=_CONFIG.get("qip", {}).get("batch", False),
+)
+@click.option(
+    "--stage-in-output",
+    help=(
+        "Create temporary installation folders within the output path so "
+        "that packages are moved instead of copied to their destination."
+    ),
+    is_flag=True,
+    default=_CONFIG.get("qip", {}).get("stage_in_output", False),
+)
+@click.option(
+    "-j", "--jobs",
+    help="Maximum number of packages to build in parallel.",
+    type=click.IntRange(min=1),
+    show_default=True,
+    metavar="NUMBER",
+    default=1
+)
+@click.option(
+    "--delta-overwrite",
+    help=(
+        "Update packages overwritten by only creating, replacing or removing "
+        "the files which changed."
+    ),
+    is_flag=True,
+    default=_CONFIG.get("qip", {}).get("delta_overwrite", False),
+)
+@click.option(
+    "--deduplicate",
+    help=(
+        "Create files of packages as hard links to a content store within "
+        "the output path so that identical files are only stored once."
+    ),
+    is_flag=True,
+    default=_CONFIG.get("qip", {}).get("deduplicate", False),
+)
+@click.option(
+    "--copy-jobs",
+    help=(
+        "Maximum number of threads used to copy the files of each package to "
+        "the output path. By default, files are copied one at a time."
+    ),
+    type=click.IntRange(min=1),
+    metavar="NUMBER",
+    default=_CONFIG.get("qip", {}).get("copy_jobs"),
+)
+@click.option(
+    "--stage-jobs",
+    help=(
+        "Maximum number of workers for a specific installation stage, in the "
+        "form of STAGE=NUMBER with STAGE in {}. Default is the number of "
+        "jobs for each stage.".format(", ".join(qip.STAGES))
+    ),
+    metavar="STAGE=NUMBER",
+    multiple=True,
+    callback=lambda context, param, value: _parse_stage_jobs(value),
+)
+@click.option(
+    "--cache-path",
+    help=(
+        "Persistent cache folder shared between installation processes. "
+        "Default is the value of the QIP_CACHE_PATH environment variable. "
+        "A temporary cache is used if no path is set."
+    ),
+    type=click.Path(),
+    metavar="PATH",
+    envvar="QIP_CACHE_PATH",
+    default=_CONFIG.get("qip", {}).get("cache_path"),
+)
+@click.option(
+    "--cache-size-limit",
+    help=(
+        "Maximum size of the persistent cache (e.g. 500M, 10G). Least "
+        "recently used files are removed when this size is exceeded."
+    ),
+    show_default=True,
+    metavar="SIZE",
+    default=_CONFIG.get("qip", {}).get("cache_size_limit", "5G"),
+    callback=lambda context, param, value: _parse_size(value),
+)
+@click.option(
+    "--no-cache",
+    help="Use a temporary cache which is removed after the installation.",
+    is_flag=True,
+    default=False
+)
+@click.option(
+    "--log-path",
+    help=(
+        "Folder where the full output of commands executed for each package "
+        "is written."
+    ),
+    type=click.Path(),
+    metavar="PATH",
+    default=_CONFIG.get("qip", {}).get("log_path"),
+)
+@click.option(
+    "--timeout",
+    help=(
+        "Maximum number of seconds for each command executed to install a "
+        "package."
+    ),
+    type=click.FloatRange(min=0),
+    metavar="SECONDS",
+    default=_CONFIG.get("qip", {}).get("timeout"),
+)
+@click.option(
+    "--total-timeout",
+    help=(
+        "Maximum number of seconds for all commands executed during the "
+        "installation."
+    ),
+    type=click.FloatRange(min=0),
+    metavar="SECONDS",
+    default=_CONFIG.get("qip", {}).get("total_timeout"),
+)
+@click.option(
+    "--fork-server",
+    help=(
+        "Execute Pip commands with a server started once within the target "
+        "environment instead of starting a new interpreter for each command."
+    ),
+    is_flag=True,
+    default=_CONFIG.get("qip", {}).get("fork_server", False),
+)
 @click.argument(
     "requests",
     nargs=-1,
@@ -175,6 +320,10 @@ def install(**kwargs):
     if kwargs["update"]:
         registry_paths += [definition_path]
 
+    # Raise an interruption when the process is terminated so that commands
+    # being executed are stopped and temporary folders are removed.
+    previous_handler = signal.signal(signal.SIGTERM, _interrupt)
+
     try:
         success = qip.install(
             kwargs["requests"], output_path,
@@ -186,14 +335,256 @@ def install(**kwargs):
             registry_paths=registry_paths,
             update_existing_definitions=kwargs["update"],
             continue_on_error=kwargs["continue_on_error"],
+            jobs=kwargs["jobs"],
+            plan=kwargs["plan"],
+            stage_jobs=kwargs["stage_jobs"],
+            cache_path=None if kwargs["no_cache"] else kwargs["cache_path"],
+            cache_size_limit=kwargs["cache_size_limit"],
+            log_path=kwargs["log_path"],
+            timeout=kwargs["timeout"],
+            total_timeout=kwargs["total_timeout"],
+            use_fork_server=kwargs["fork_server"],
+            batch=kwargs["batch"],
+            stage_in_output=kwargs["stage_in_output"],
+            copy_jobs=kwargs["copy_jobs"],
+            delta_overwrite=kwargs["delta_overwrite"],
+            deduplicate=kwargs["deduplicate"],
         )
     except RuntimeError as error:
         raise click.exceptions.ClickException(
             "Impossible to resume installation process:\n\n{}".format(error)
         )
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
 
     if not success:
         raise click.exceptions.ClickException("No packages installed.")
 
     logger.info("Package output directory: {!r}".format(output_path))
     logger.info("Definition output directory: {!r}".format(definition_path))
+
+
+@main.group(
+    name="cache",
+    help=textwrap.dedent(
+        """
+        Inspect and prune the persistent cache.
+
+        Command example:
+
+        \b
+        >>> qip cache stats
+        >>> qip cache prune
+        >>> qip cache prune --size-limit 500M
+        >>> qip cache prune --size-limit 0
+        """
+    ),
+    short_help="Inspect and prune the persistent cache.",
+    context_settings=CONTEXT_SETTINGS
+)
+@click.option(
+    "--cache-path",
+    help=(
+        "Persistent cache folder. Default is the value of the QIP_CACHE_PATH "
+        "environment variable."
+    ),
+    type=click.Path(),
+    metavar="PATH",
+    envvar="QIP_CACHE_PATH",
+    default=_CONFIG.get("qip", {}).get("cache_path"),
+)
+@click.pass_context
+def cache(click_context, **kwargs):
+    """Inspect and prune the persistent cache."""
+    if kwargs["cache_path"] is None:
+        raise click.UsageError(
+            "No persistent cache path set, use --cache-path or the "
+            "QIP_CACHE_PATH environment variable."
+        )
+
+    click_context.obj = {"cache_path": kwargs["cache_path"]}
+
+
+@cache.command(
+    name="stats",
+    help="Display the size of the persistent cache.",
+    short_help="Display the size of the persistent cache.",
+    context_settings=CONTEXT_SETTINGS
+)
+@click.pass_context
+def cache_stats(click_context):
+    """Display the size of the persistent cache."""
+    logger = logging.getLogger(__name__ + ".cache_stats")
+
+    cache_path = click_context.obj["cache_path"]
+    statistics = qip.cache.fetch_statistics(cache_path)
+
+    logger.info("Cache directory: {!r}".format(cache_path))
+
+    for section in sorted(statistics["sections"]):
+        mapping = statistics["sections"][section]
+        logger.info(
+            "\t{}: {} file(s), {}".format(
+                section, mapping["files"],
+                qip.cache.format_size(mapping["size"])
+            )
+        )
+
+    logger.info(
+        "Total: {} file(s), {}".format(
+            statistics["files"], qip.cache.format_size(statistics["size"])
+        )
+    )
+
+
+@cache.command(
+    name="prune",
+    help=(
+        "Remove least recently used files from the persistent cache until it "
+        "fits the size limit."
+    ),
+    short_help="Remove least recently used files from the persistent cache.",
+    context_settings=CONTEXT_SETTINGS
+)
+@click.option(
+    "-l", "--size-limit",
+    help="Maximum size of the cache to keep (e.g. 500M, 10G, 0).",
+    show_default=True,
+    metavar="SIZE",
+    default=_CONFIG.get("qip", {}).get("cache_size_limit", "5G"),
+    callback=lambda context, param, value: _parse_size(value),
+)
+@click.pass_context
+def cache_prune(click_context, **kwargs):
+    """Remove least recently used files from the persistent cache."""
+    logger = logging.getLogger(__name__ + ".cache_prune")
+
+    cache_path = click_context.obj["cache_path"]
+
+    try:
+        removed = qip.cache.prune(cache_path, kwargs["size_limit"])
+    except RuntimeError as error:
+        raise click.exceptions.ClickException(
+            "Impossible to prune cache:\n\n{}".format(error)
+        )
+
+    logger.info(
+        "Removed {} file(s), {} from {!r}".format(
+            removed["files"], qip.cache.format_size(removed["size"]),
+            cache_path
+        )
+    )
+
+
+@main.command(
+    name="gc",
+    help=textwrap.dedent(
+        """
+        Remove temporary folders left in the output path.
+
+        Packages overwritten are removed in background during the
+        installation. Folders which could not be removed because the
+        installation was interrupted are removed by this command, as well
+        as files from the content store which are not used by any package
+        anymore.
+
+        Command example:
+
+        \b
+        >>> qip gc
+        >>> qip gc -o /path/to/packages
+        """
+    ),
+    short_help="Remove temporary folders left in the output path.",
+    context_settings=CONTEXT_SETTINGS
+)
+@click.option(
+    "-o", "--output-path",
+    help=(
+        "Destination for the package installation data. Default is "
+        "'<TEMPORARY_FOLDER>/qip/packages'"
+    ),
+    type=click.Path(),
+    metavar="PATH",
+    default=(
+        _CONFIG.get("qip", {}).get(
+            "packages_output", os.path.join(
+                tempfile.gettempdir(), "qip", "packages"
+            )
+        )
+    ),
+)
+def gc(**kwargs):
+    """Remove temporary folders left in the output path."""
+    logger = logging.getLogger(__name__ + ".gc")
+
+    output_path = kwargs["output_path"]
+    removed = qip.filesystem.collect_garbage(output_path)
+
+    logger.info(
+        "Removed {} folder(s) from {!r}".format(len(removed), output_path)
+    )
+
+    store_path = os.path.join(output_path, qip.filesystem.STORE_FOLDER)
+    removed = qip.filesystem.prune_store(store_path)
+
+    if removed["files"] > 0:
+        logger.info(
+            "Removed {} file(s), {} from {!r}".format(
+                removed["files"], qip.cache.format_size(removed["size"]),
+                store_path
+            )
+        )
+
+
+def _interrupt(signal_number, frame):
+    """Raise :exc:`KeyboardInterrupt` when receiving *signal_number*."""
+    raise KeyboardInterrupt()
+
+
+def _parse_size(value):
+    """Return number of bytes from size *value*.
+
+    :param value: Size with an optional unit (e.g. "500M", "10G").
+
+    :raise click.BadParameter: if *value* is incorrect.
+
+    :return: Number of bytes, or None if *value* is None.
+
+    """
+    if value is None:
+        return
+
+    try:
+        return qip.cache.parse_size(value)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+
+
+def _parse_stage_jobs(values):
+    """Return mapping of stage jobs from *values*.
+
+    :param values: List of values in the form of "STAGE=NUMBER".
+
+    :raise click.BadParameter: if a value is incorrect.
+
+    :return: Mapping of number of workers per stage, or None if *values* is
+        empty.
+
+    """
+    mapping = {}
+
+    for value in values:
+        stage, _, number = value.partition("=")
+
+        if stage not in qip.STAGES or not number.isdigit() or int(number) < 1:
+            raise click.BadParameter(
+                "'{}' must be in the form of STAGE=NUMBER with STAGE in {} "
+                "and NUMBER greater than 0.".format(
+                    value, ", ".join(qip.STAGES)
+                )
+            )
+
+        mapping[stage] = int(number)
+
+    return mapping or None
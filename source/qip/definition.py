@@ -2,14 +2,25 @@
 
 import logging
 import functools
+import json
 import os
+import sys
+import threading
+import time
+
+import six
+from six.moves import collections_abc
 
 import wiz
 import wiz.definition
 import wiz.environ
 import wiz.exception
 import wiz.symbol
+import wiz.system
 import wiz.utility
+from packaging.version import Version, InvalidVersion
+
+import qip.cache
 
 #: Common namespace for all :term:`Wiz` definition.
 NAMESPACE = "library"
@@ -128,6 +139,226 @@ def fetch_custom(package_mapping):
         return definition
 
 
+def fetch_definition_mapping(paths, cache_path=None, background=False):
+    """Return compact index of :term:`Wiz` definitions available under *paths*.
+
+    Definitions are not loaded. Only the qualified identifier, the version and
+    the variant identifiers of each definition are extracted, so that
+    definitions can be loaded when requested by :func:`fetch_existing`.
+
+    When *cache_path* is specified, the index of each registry is recorded in
+    the cache along with the size and modification time of each definition
+    file, so that only definitions modified since the previous call are read
+    again.
+
+    :param paths: List of registry paths to recursively index definitions
+        from.
+
+    :param cache_path: Path to a persistent cache folder used to record the
+        index of each registry. Default is None, which means that definitions
+        are always read.
+
+    :param background: Indicate whether definitions should be indexed in a
+        background thread. A mapping is returned immediately and any access to
+        its content waits for the index to be complete. Default is False.
+
+    :return: Definition mapping in the form of::
+
+            {
+                "registries": ["/path/to/registry", ...],
+                "system": {"platform": "linux", ...},
+                "index": {
+                    "library::foo": [
+                        {
+                            "path": "/path/to/registry/foo-0.1.0.json",
+                            "registry": "/path/to/registry",
+                            "version": "0.1.0",
+                            "variants": ["3.7", "2.7"]
+                        },
+                        ...
+                    ],
+                    ...
+                }
+            }
+
+    """
+    if background:
+        return _DeferredMapping(
+            fetch_definition_mapping, paths, cache_path=cache_path
+        )
+
+    index = {}
+
+    for path in paths:
+
+        # Ignore empty paths that could resolve to current directory.
+        if not len(path.strip()):
+            continue
+
+        registry_path = os.path.abspath(path.strip())
+
+        for entry in _fetch_registry_entries(registry_path, cache_path):
+            index.setdefault(entry["identifier"], []).append(entry)
+
+    return {
+        "registries": paths,
+        "system": wiz.system.query(),
+        "index": index,
+    }
+
+
+class _DeferredMapping(collections_abc.Mapping):
+    """Mapping computed in a background thread.
+
+    Any access to the content of the mapping waits for the thread to complete.
+    An exception raised while computing the mapping is raised again on access.
+
+    """
+
+    def __init__(self, function, *args, **kwargs):
+        """Initialize mapping and start computing it with *function*."""
+        self._mapping = None
+        self._exc_info = None
+
+        self._thread = threading.Thread(
+            target=self._compute, args=(function,) + args, kwargs=kwargs
+        )
+
+        # Do not prevent process from exiting if mapping is never used.
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _compute(self, function, *args, **kwargs):
+        """Compute mapping with *function*."""
+        try:
+            self._mapping = function(*args, **kwargs)
+        except Exception:
+            self._exc_info = sys.exc_info()
+
+    def _fetch(self):
+        """Return mapping once computed."""
+        self._thread.join()
+
+        if self._exc_info is not None:
+            six.reraise(*self._exc_info)
+
+        return self._mapping
+
+    def __getitem__(self, key):
+        """Return value for *key*."""
+        return self._fetch()[key]
+
+    def __iter__(self):
+        """Iterate over keys."""
+        return iter(self._fetch())
+
+    def __len__(self):
+        """Return number of keys."""
+        return len(self._fetch())
+
+
+def _fetch_registry_entries(registry_path, cache_path=None):
+    """Return index entries for definitions under *registry_path*.
+
+    .. seealso:: :func:`fetch_definition_mapping`
+
+    """
+    logger = logging.getLogger(__name__ + "._fetch_registry_entries")
+
+    record = None
+    if cache_path is not None:
+        record = qip.cache.fetch_registry_record(cache_path, registry_path)
+
+    if record is None:
+        record = {"time": 0, "files": {}}
+
+    # Files modified within the same second as the previous record cannot be
+    # trusted from their status as they might have been modified again since.
+    threshold = record["time"] - 1
+
+    timestamp = time.time()
+    files = {}
+    entries = []
+
+    for root, _, names in os.walk(registry_path):
+        for name in names:
+            if os.path.splitext(name)[1] != ".json":
+                continue
+
+            file_path = os.path.join(root, name)
+            relative_path = os.path.relpath(file_path, registry_path)
+
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+
+            _record = record["files"].get(relative_path)
+            if (
+                _record is not None and _record[0] == stat.st_size
+                and _record[1] == stat.st_mtime and stat.st_mtime < threshold
+            ):
+                entry = _record[2]
+            else:
+                entry = _extract_index_entry(file_path)
+
+            files[relative_path] = [stat.st_size, stat.st_mtime, entry]
+
+            if entry is not None:
+                entries.append(
+                    dict(entry, path=file_path, registry=registry_path)
+                )
+
+    if cache_path is not None:
+        try:
+            qip.cache.store_registry_record(
+                cache_path, registry_path,
+                {"time": timestamp, "files": files}
+            )
+        except (IOError, OSError) as error:
+            logger.debug(
+                "Impossible to record index for '{}': {}".format(
+                    registry_path, error
+                )
+            )
+
+    return entries
+
+
+def _extract_index_entry(path):
+    """Return index entry from definition *path*.
+
+    Return None if the definition cannot be read.
+
+    .. seealso:: :func:`fetch_definition_mapping`
+
+    """
+    try:
+        with open(path, "r") as stream:
+            data = json.load(stream)
+
+        identifier = data["identifier"]
+        if data.get("namespace") is not None:
+            identifier = "{}{}{}".format(
+                data["namespace"], wiz.symbol.NAMESPACE_SEPARATOR, identifier
+            )
+
+        return {
+            "identifier": identifier,
+            "version": (
+                str(data["version"]) if data.get("version") is not None
+                else None
+            ),
+            "variants": [
+                variant.get("identifier")
+                for variant in data.get("variants", [])
+            ]
+        }
+
+    except (IOError, OSError, ValueError, TypeError, KeyError, AttributeError):
+        return
+
+
 def fetch_existing(package_mapping, definition_mapping, namespace=None):
     """Retrieve corresponding :term:`Wiz` definition in definition mapping.
 
@@ -135,7 +366,10 @@ def fetch_existing(package_mapping, definition_mapping, namespace=None):
         :func:`qip.package.install`.
 
     :param definition_mapping: mapping regrouping all available definitions as
-        returned by :func:`wiz.fetch_definition_mapping`.
+        returned by :func:`wiz.fetch_definition_mapping`, or compact index of
+        definitions as returned by :func:`fetch_definition_mapping`. In the
+        latter case, only definitions matching the identifier and version of
+        the package are loaded.
 
     :param namespace: Namespace of the definition to fetch. Default is
         :data:`NAMESPACE`.
@@ -146,6 +380,14 @@ def fetch_existing(package_mapping, definition_mapping, namespace=None):
     """
     namespace = namespace or NAMESPACE
 
+    if "index" in definition_mapping:
+        definition_mapping = _load_definition_mapping(
+            definition_mapping, "{}{}{}".format(
+                namespace, wiz.symbol.NAMESPACE_SEPARATOR,
+                package_mapping["key"]
+            ), package_mapping["version"]
+        )
+
     try:
         return wiz.fetch_definition(
             "{0}::{1[key]}=={1[version]}".format(namespace, package_mapping),
@@ -155,6 +397,64 @@ def fetch_existing(package_mapping, definition_mapping, namespace=None):
         pass
 
 
+def _load_definition_mapping(definition_mapping, identifier, version):
+    """Return definition mapping with definitions matching *identifier*.
+
+    Only definitions from compact *definition_mapping* which are not versioned
+    or which match *version* are loaded. Definitions which are disabled or
+    incompatible with the current system are filtered out as with
+    :func:`wiz.fetch_definition_mapping`.
+
+    .. seealso:: :func:`fetch_definition_mapping`
+
+    """
+    logger = logging.getLogger(__name__ + "._load_definition_mapping")
+
+    mapping = {}
+
+    for entry in definition_mapping["index"].get(identifier, []):
+        if entry["version"] is not None and not _is_same_version(
+            entry["version"], version
+        ):
+            continue
+
+        try:
+            definition = wiz.definition.load(
+                entry["path"], registry_path=entry["registry"]
+            )
+
+        except (IOError, ValueError, TypeError, wiz.exception.WizError):
+            logger.warning(
+                "Error occurred trying to load definition from {!r}"
+                .format(entry["path"])
+            )
+            continue
+
+        if (
+            not wiz.system.validate(definition, definition_mapping["system"])
+            or definition.disabled
+        ):
+            continue
+
+        mapping.setdefault(definition.qualified_identifier, {})
+        mapping[definition.qualified_identifier][
+            str(definition.version or wiz.symbol.UNSET_VALUE)
+        ] = definition
+
+    return {
+        wiz.symbol.PACKAGE_REQUEST_TYPE: mapping,
+        "registries": definition_mapping["registries"]
+    }
+
+
+def _is_same_version(version1, version2):
+    """Indicate whether *version1* is equal to *version2*."""
+    try:
+        return Version(version1) == Version(version2)
+    except (InvalidVersion, TypeError):
+        return version1 == version2
+
+
 def create(
     package_mapping, output_path, editable_mode=False, additional_variants=None
 ):
@@ -1,23 +1,45 @@
 # :coding: utf-8
 
+import glob
+import hashlib
 import logging
 import json
 import os
+import platform
+import shutil
 import tempfile
 
 import wiz
+import wiz.environ
+import wiz.registry
 
+import qip.cache
 import qip.command
+import qip.system
+from qip._version import __version__
 
 #: Path to the python info script.
 PYTHON_INFO_SCRIPT = os.path.join(
     os.path.dirname(__file__), "package_data", "python_info.py"
 )
 
+#: Name of the folder containing executable shims within the temporary
+#: directory when no cache is used.
+SHIM_FOLDER = "qip-shims-{uid}"
 
-def fetch(python_target, mapping=None):
+
+def fetch(python_target, mapping=None, cache_path=None):
     """Fetch mapping with all environment variables required.
 
+    When a path to a Python executable is provided, a folder containing a
+    symbolic link to this executable is prepended to the :envvar:`PATH`. This
+    folder is created once per executable and reused by following calls.
+
+    When a :term:`Wiz` request is provided and *cache_path* is specified, the
+    environment resolved is recorded in the cache along with the state of the
+    default :term:`Wiz` registries, so that the context is only resolved again
+    when definitions are modified.
+
     :param python_target: Target a specific Python version via a Wiz request or
         a path to a Python executable (e.g. "python==2.7.*" or
         "/path/to/bin/python").
@@ -25,6 +47,11 @@ def fetch(python_target, mapping=None):
     :param mapping: optional custom environment mapping to be added to initial
         environment.
 
+    :param cache_path: Path to a persistent cache folder used to record
+        environment resolved and executable shims. Default is None, which means
+        that the environment is always resolved and that shims are kept in the
+        temporary directory.
+
     :return: environment mapping
 
         It should be in the form of::
@@ -49,32 +76,110 @@ def fetch(python_target, mapping=None):
     # If a Python executable is provided, use it instead of the Wiz request.
     if os.path.isfile(python_target) or os.sep in python_target:
 
-        # Use symlink to executable in isolated new folder to ensure that
+        # Use symlink to executable in isolated folder to ensure that
         # no other python version gets picked up.
-        path = tempfile.mkdtemp(prefix="qip-env-")
-        exec_name = os.path.basename(python_target)
-        exec_path = os.path.join(path, exec_name)
-        os.symlink(python_target, exec_path)
-
-        # If executable is not named "python", create extra symlink.
-        if exec_name != "python":
-            os.symlink(exec_path, os.path.join(path, "python"))
+        path = _fetch_shim(python_target, cache_path=cache_path)
 
         environ_mapping = mapping.copy()
         environ_mapping.update({"PATH": "{}:${{PATH}}".format(path)})
-        context = {"environ": environ_mapping}
+        return environ_mapping
 
-    else:
+    if cache_path is None:
         context = wiz.resolve_context([python_target], environ_mapping=mapping)
+        return context["environ"]
+
+    identifier = _compute_identifier({
+        "request": python_target,
+        "environ": wiz.environ.initiate(mapping),
+        "registries": _fetch_registry_state(wiz.registry.get_defaults()),
+        "system": qip.system.query(),
+    })
+
+    environ_mapping = qip.cache.fetch_context(cache_path, identifier)
+    if environ_mapping is not None:
+        logger.debug(
+            "Environment for '{}' fetched from cache.".format(python_target)
+        )
+        return environ_mapping
 
+    context = wiz.resolve_context([python_target], environ_mapping=mapping)
+    qip.cache.store_context(cache_path, identifier, context["environ"])
     return context["environ"]
 
 
-def fetch_python_mapping(environ_mapping):
+def _fetch_shim(python_target, cache_path=None):
+    """Return folder containing symbolic link to *python_target*.
+
+    The folder is named after the path to the executable so that it can be
+    reused by following calls. It is created within the cache if
+    *cache_path* is specified, or within a folder only accessible by the
+    current user in the temporary directory otherwise.
+
+    A link named "python" is added if the executable has a different name.
+
+    """
+    python_target = os.path.abspath(python_target)
+
+    if cache_path is not None:
+        root = qip.cache.fetch_shim_path(cache_path)
+
+    else:
+        root = os.path.join(
+            tempfile.gettempdir(), SHIM_FOLDER.format(uid=os.getuid())
+        )
+
+        try:
+            os.mkdir(root, 0o700)
+        except OSError:
+            pass
+
+        # Do not reuse a folder which could have been created or modified by
+        # another user.
+        stat = os.lstat(root)
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o022:
+            root = tempfile.mkdtemp(prefix="qip-env-")
+
+    path = os.path.join(
+        root, hashlib.sha1(python_target.encode("utf-8")).hexdigest()
+    )
+
+    if os.path.isdir(path):
+        os.utime(path, None)
+        return path
+
+    # Create links in temporary folder renamed once complete so that
+    # concurrent processes never use an incomplete folder.
+    temporary_path = tempfile.mkdtemp(prefix=".", dir=root)
+
+    exec_name = os.path.basename(python_target)
+    os.symlink(python_target, os.path.join(temporary_path, exec_name))
+
+    if exec_name != "python":
+        os.symlink(exec_name, os.path.join(temporary_path, "python"))
+
+    try:
+        os.rename(temporary_path, path)
+    except OSError:
+        # Folder has been created by another process in the meantime.
+        shutil.rmtree(temporary_path)
+
+    return path
+
+
+def fetch_python_mapping(environ_mapping, cache_path=None):
     """Fetch Python version mapping.
 
+    When *cache_path* is specified, the mapping is recorded in the cache
+    for the Python executable found in the :envvar:`PATH`, so that it is only
+    queried again when this executable or its library folders are modified
+    (e.g. when :term:`Pip` is upgraded, see :func:`_fetch_library_state`).
+
     :param environ_mapping: mapping of environment variables
 
+    :param cache_path: Path to a persistent cache folder used to record
+        Python mappings. Default is None, which means that the mapping is
+        always queried.
+
     :return: python mapping.
 
         It should be in the form of::
@@ -86,6 +191,32 @@ def fetch_python_mapping(environ_mapping):
             }
 
     """
+    identifier = None
+
+    if cache_path is not None:
+        executable = _find_executable("python", environ_mapping)
+
+        try:
+            stat = os.stat(executable)
+        except (OSError, TypeError):
+            pass
+        else:
+            # Environment markers depend on the host (e.g.
+            # "platform_release"), and cache can be shared between hosts.
+            identifier = _compute_identifier({
+                "executable": os.path.realpath(executable),
+                "size": stat.st_size,
+                "time": stat.st_mtime,
+                "libraries": _fetch_library_state(executable, environ_mapping),
+                "host": platform.node(),
+                "release": platform.release(),
+                "version": __version__,
+            })
+
+            mapping = qip.cache.fetch_context(cache_path, identifier)
+            if mapping is not None:
+                return mapping
+
     result = qip.command.execute(
         "python {}".format(PYTHON_INFO_SCRIPT), environ_mapping, quiet=True
     )
@@ -96,4 +227,104 @@ def fetch_python_mapping(environ_mapping):
             "Impossible to fetch Python version mapping'"
         )
 
+    if identifier is not None:
+        qip.cache.store_context(cache_path, identifier, mapping)
+
     return mapping
+
+
+def _find_executable(name, environ_mapping):
+    """Return path to executable *name* from *environ_mapping*.
+
+    Return None if the executable cannot be found within the :envvar:`PATH`.
+    Unresolved variables (e.g. "${PATH}") are ignored.
+
+    """
+    for folder in environ_mapping.get("PATH", "").split(os.pathsep):
+        if not len(folder) or "$" in folder:
+            continue
+
+        path = os.path.join(folder, name)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+
+
+def _fetch_library_state(executable, environ_mapping):
+    """Return modification time of library folders used by *executable*.
+
+    Library folders are searched within the prefix of the executable, before
+    and after resolving symbolic links so that virtual environments are
+    handled, and within the :envvar:`PYTHONPATH` of *environ_mapping*. The
+    state is used to detect whether :term:`Pip` has been upgraded or
+    downgraded since a Python mapping has been recorded, as its metadata
+    folder is then replaced within the library folder.
+
+    """
+    paths = [
+        path for path in environ_mapping.get("PYTHONPATH", "").split(
+            os.pathsep
+        ) if len(path) and "$" not in path
+    ]
+
+    for _executable in [executable, os.path.realpath(executable)]:
+        prefix = os.path.dirname(os.path.dirname(_executable))
+
+        for name in ["site-packages", "dist-packages"]:
+            paths += sorted(
+                glob.glob(os.path.join(prefix, "lib", "python*", name))
+            )
+
+    state = []
+
+    for path in paths:
+        path = os.path.abspath(path)
+        if path in [item[0] for item in state]:
+            continue
+
+        try:
+            state.append([path, os.stat(path).st_mtime])
+        except OSError:
+            continue
+
+    return state
+
+
+def _fetch_registry_state(paths):
+    """Return modification time of folders within registries under *paths*.
+
+    The state is used to detect whether definitions have been added, removed
+    or renamed within registries since a context has been resolved. Only
+    folders are checked so that definition files are not accessed one by one,
+    which would be slow for large registries on network file systems.
+
+    .. warning::
+
+        Definitions rewritten in place do not modify the folder containing
+        them, so the context is not resolved again in this case.
+
+    """
+    state = []
+
+    for path in paths:
+        # Ignore empty paths that could resolve to current directory.
+        if not len(path.strip()):
+            continue
+
+        path = os.path.abspath(path.strip())
+
+        for root, folders, _ in os.walk(path):
+            folders.sort()
+
+            try:
+                state.append([root, os.stat(root).st_mtime])
+            except OSError:
+                continue
+
+    return state
+
+
+def _compute_identifier(mapping):
+    """Return identifier computed from serializable *mapping*."""
+    return hashlib.sha1(
+        json.dumps(mapping, sort_keys=True).encode("utf-8")
+    ).hexdigest()
@@ -0,0 +1,1255 @@
+# :coding: utf-8
+
+import contextlib
+import csv
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import io
+import logging
+import os
+import re
+import shutil
+import stat
+import sys
+import threading
+import time
+import uuid
+
+import six.moves
+
+import qip.cache
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+#: Methods attempted in order by :func:`copy_file` to copy the content of a
+#: file within the kernel. Content is read and written by Python if none of
+#: these methods can be used.
+COPY_METHODS = ("reflink", "copy_file_range", "sendfile")
+
+#: Linux ioctl request to share the extents of a file with another file on
+#: file systems supporting copy-on-write (e.g. Btrfs, XFS).
+FICLONE = 0x40049409
+
+#: Size of the buffer used to copy the content of a file with Python.
+COPY_BUFFER_SIZE = 1024 * 1024
+
+#: Compiled regular expression to detect temporary folders created next to
+#: the folders published by :func:`publish` (e.g. ".Foo-0.1.0.qip-new-1a2b3c",
+#: ".Foo-0.1.0.qip-old-1a2b3c").
+TEMPORARY_PATTERN = re.compile(
+    r"^\.(?P<name>.+)\.qip-(?P<type>new|old)-[0-9a-f]+$"
+)
+
+#: Number of seconds after which temporary folders which are being filled are
+#: considered abandoned by :func:`collect_garbage`, and after which files
+#: which are not used anymore are removed by :func:`prune_store`.
+GARBAGE_DELAY = 24 * 3600
+
+#: Name of the content store folder created within the installation path
+#: when files are deduplicated (see :func:`content_store`).
+STORE_FOLDER = ".qip-store"
+
+#: Name of the staging folder created within the installation path when
+#: packages are staged on the same file system (see :func:`qip.install`).
+STAGING_FOLDER = ".qip-staging"
+
+#: Flag used with the renameat2 system call to exchange two paths.
+RENAME_EXCHANGE = 2
+
+#: Special value used with the renameat2 system call to indicate that paths
+#: are relative to the current working directory.
+_AT_FDCWD = -100
+
+#: Options used to copy folders within context.
+_COPY_OPTIONS = {"jobs": None, "store": None}
+
+#: Error numbers indicating that a copy method cannot be used for a file.
+_FALLBACK_ERRORS = set(
+    getattr(errno, name) for name in (
+        "EBADF", "EINVAL", "ENOSYS", "ENOTSUP", "EOPNOTSUPP", "ENOTTY",
+        "EPERM", "ETXTBSY", "EXDEV"
+    ) if hasattr(errno, name)
+)
+
+#: Error numbers indicating that a copy method cannot be used between two
+#: file systems.
+_UNSUPPORTED_ERRORS = set(
+    getattr(errno, name) for name in (
+        "ENOSYS", "ENOTSUP", "EOPNOTSUPP", "ENOTTY", "EXDEV"
+    ) if hasattr(errno, name)
+)
+
+#: Record copy methods which cannot be used between two devices.
+_UNSUPPORTED_METHODS = set()
+
+#: Error numbers indicating that a file cannot be linked from the content
+#: store.
+_LINK_ERRORS = set(
+    getattr(errno, name) for name in (
+        "EMLINK", "ENOTSUP", "EOPNOTSUPP", "EPERM", "EXDEV"
+    ) if hasattr(errno, name)
+)
+
+#: Queue of folders to remove in background within context.
+_REMOVAL_STATE = {"queue": None}
+
+#: Options used to publish folders within context.
+_PUBLISH_OPTIONS = {"delta": False}
+
+
+@contextlib.contextmanager
+def parallel_copy(jobs=None):
+    """Copy folders with several threads within context.
+
+    Folders copied with :func:`copy_tree` from all threads use *jobs* threads
+    to copy their files.
+
+    :param jobs: Maximum number of threads used to copy files of each folder.
+        Default is None, which means that folders are copied with
+        :func:`shutil.copytree`.
+
+    Example::
+
+        >>> with parallel_copy(jobs=16):
+        ...     copy_tree("/path/to/source", "/path/to/destination")
+
+    """
+    previous_options = _COPY_OPTIONS.copy()
+
+    if jobs is not None:
+        _COPY_OPTIONS["jobs"] = jobs
+
+    try:
+        yield
+    finally:
+        _COPY_OPTIONS.update(previous_options)
+
+
+@contextlib.contextmanager
+def content_store(path=None):
+    """Deduplicate files copied within context.
+
+    Files copied with :func:`copy_tree` and :func:`update_tree` from all
+    threads are added to a content store at *path*, where each file is named
+    after the hash of its content and its mode. Files are then created as
+    hard links to the files of the store instead of being copied, so that
+    identical files are only written once. Files which are not used anymore
+    can be removed from the store with :func:`prune_store`.
+
+    .. warning::
+
+        Files sharing the same content are the same file on disk, so a file
+        modified in place is modified for all folders using it.
+
+    :param path: path to the content store, which should be on the same file
+        system as the folders copied (e.g. "/path/to/packages/.qip-store").
+        Default is None, which means that files are not deduplicated.
+
+    Example::
+
+        >>> with content_store("/path/to/destination/.qip-store"):
+        ...     copy_tree("/path/to/source", "/path/to/destination/foo")
+
+    """
+    previous_options = _COPY_OPTIONS.copy()
+    _COPY_OPTIONS["store"] = path
+
+    try:
+        yield
+    finally:
+        _COPY_OPTIONS.update(previous_options)
+
+
+def copy_tree(source_path, destination_path, jobs=None):
+    """Copy folder *source_path* to *destination_path*.
+
+    When several threads are used, all folders are created first so that
+    files can be copied concurrently. Files are copied with their mode and
+    modification time, and symbolic links are recreated instead of being
+    followed. This hides the latency of each file creation on network file
+    systems.
+
+    The content of each file is copied with :func:`copy_file`, or linked from
+    the content store within :func:`content_store` context.
+
+    :param source_path: path to the folder to copy.
+
+    :param destination_path: path to the folder to create. It must not exist.
+
+    :param jobs: Maximum number of threads used to copy files. Default is None,
+        which means that the number of threads set with :func:`parallel_copy`
+        is used. If no number of threads is set, the folder is copied with
+        :func:`shutil.copytree`.
+
+    :raise RuntimeError: if the folder cannot be copied with several threads.
+
+    :return: mapping in the form of ``{"files": 3, "size": 1024, "duration":
+        0.1}`` indicating the number of files and symbolic links copied, the
+        size copied in bytes and the duration of the copy in seconds, or None
+        if the folder was copied with :func:`shutil.copytree`.
+
+    """
+    logger = logging.getLogger(__name__ + ".copy_tree")
+
+    jobs = jobs or _COPY_OPTIONS["jobs"]
+    if jobs is None:
+        if not six.PY2:
+            shutil.copytree(
+                source_path, destination_path, copy_function=_copy_with_stat
+            )
+            return
+
+        if _COPY_OPTIONS["store"] is None:
+            shutil.copytree(source_path, destination_path)
+            return
+
+        # Copy function cannot be customized with Python 2.
+        jobs = 1
+
+    start = time.time()
+
+    folders, files, links, size = _scan(source_path)
+
+    os.makedirs(destination_path)
+
+    for folder in folders:
+        os.mkdir(os.path.join(destination_path, folder))
+
+    def _copy(item):
+        """Copy file or symbolic link *item* to destination."""
+        relative_path, is_link = item
+        source = os.path.join(source_path, relative_path)
+        target = os.path.join(destination_path, relative_path)
+
+        if is_link:
+            os.symlink(os.readlink(source), target)
+        else:
+            _copy_with_stat(source, target)
+
+    execute_parallel(
+        _copy, [(path, False) for path in files] +
+        [(path, True) for path in links], jobs
+    )
+
+    # Folder modes are copied last so that read-only folders can be filled.
+    for folder in reversed(folders):
+        shutil.copystat(
+            os.path.join(source_path, folder),
+            os.path.join(destination_path, folder)
+        )
+
+    shutil.copystat(source_path, destination_path)
+
+    statistics = {
+        "files": len(files) + len(links),
+        "size": size,
+        "duration": time.time() - start,
+    }
+
+    logger.debug(
+        "Copied {} files ({}) to '{}' in {:.2f}s ({}/s).".format(
+            statistics["files"], qip.cache.format_size(size),
+            destination_path, statistics["duration"],
+            qip.cache.format_size(size / max(statistics["duration"], 1e-6))
+        )
+    )
+
+    return statistics
+
+
+def copy_file(source_path, target_path):
+    """Copy content of file *source_path* to *target_path*.
+
+    The content is copied within the kernel when possible, with the first
+    method from :data:`COPY_METHODS` which can be used for this file:
+
+    * "reflink": Extents are shared with the :data:`FICLONE` ioctl request on
+      file systems supporting copy-on-write, so that no data is copied.
+    * "copy_file_range": Data is copied with :func:`os.copy_file_range`,
+      which can be offloaded to the server on network file systems.
+    * "sendfile": Data is copied with :func:`os.sendfile`.
+
+    The next method is attempted for the same file when one cannot be used
+    or when it copied less data than the size of the file, and the content is
+    read and written by Python as a last resort. Methods which are not
+    supported between two devices are not attempted again.
+
+    :param source_path: path to the file to copy.
+
+    :param target_path: path to the file to create or replace.
+
+    :raise RuntimeError: if the size of the file copied differs from the
+        size of *source_path*.
+
+    :return: name of the method used to copy the content, or "read" if the
+        content was copied by Python.
+
+    """
+    with io.open(source_path, "rb") as source:
+        with io.open(target_path, "wb") as target:
+            source_status = os.fstat(source.fileno())
+            target_status = os.fstat(target.fileno())
+            devices = (source_status.st_dev, target_status.st_dev)
+
+            for method in COPY_METHODS:
+                function = _COPY_FUNCTIONS.get(method)
+                if function is None or source_status.st_size == 0:
+                    continue
+
+                if (method, devices) in _UNSUPPORTED_METHODS:
+                    continue
+
+                try:
+                    copied = function(
+                        source.fileno(), target.fileno(),
+                        source_status.st_size
+                    )
+
+                except (IOError, OSError) as error:
+                    if error.errno not in _FALLBACK_ERRORS:
+                        raise
+
+                    if error.errno in _UNSUPPORTED_ERRORS:
+                        _UNSUPPORTED_METHODS.add((method, devices))
+
+                    copied = None
+
+                if copied == source_status.st_size:
+                    return method
+
+                # Discard content partially copied. Some file systems return
+                # no data instead of an error when a method is not supported.
+                os.ftruncate(target.fileno(), 0)
+                os.lseek(target.fileno(), 0, os.SEEK_SET)
+
+            shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+            target.flush()
+
+            size = os.fstat(target.fileno()).st_size
+            if size != source_status.st_size:
+                raise RuntimeError(
+                    "Impossible to copy '{}' to '{}': {} bytes copied "
+                    "instead of {}".format(
+                        source_path, target_path, size, source_status.st_size
+                    )
+                )
+
+            return "read"
+
+
+@contextlib.contextmanager
+def delta_update(enabled=True):
+    """Update existing folders with changed files only within context.
+
+    Folders published with :func:`publish` from all threads replace existing
+    folders with :func:`update_tree` when enabled.
+
+    :param enabled: Indicate whether existing folders should be updated
+        instead of being replaced. Default is True.
+
+    Example::
+
+        >>> with delta_update():
+        ...     publish("/path/to/source", "/path/to/existing/destination")
+
+    """
+    previous_options = _PUBLISH_OPTIONS.copy()
+    _PUBLISH_OPTIONS["delta"] = enabled
+
+    try:
+        yield
+    finally:
+        _PUBLISH_OPTIONS.update(previous_options)
+
+
+def publish(source_path, target_path, move=False):
+    """Publish folder *source_path* to *target_path* atomically.
+
+    The folder is first copied with :func:`copy_tree` into a temporary folder
+    next to *target_path*, and then renamed to *target_path*, so that a
+    partial folder is never visible at *target_path*. If *move* is True, the
+    folder is moved to the temporary folder instead when both paths are on
+    the same file system, and an empty folder is left in place of
+    *source_path* so that it can be reused.
+
+    If *target_path* already exists, it is exchanged with the temporary
+    folder in a single step when the file system supports it, or renamed
+    aside right before the temporary folder is renamed. The folder replaced
+    is then removed with :func:`remove_tree`. Within :func:`delta_update`
+    context, an existing *target_path* is updated with :func:`update_tree`
+    instead.
+
+    :param source_path: path to the folder to publish.
+
+    :param target_path: path to the folder to create or replace.
+
+    :param move: indicate whether *source_path* can be moved instead of being
+        copied. Default is False.
+
+    :return: statistics returned by :func:`copy_tree` or
+        :func:`update_tree`, or None if the folder was not copied with several
+        threads.
+
+    """
+    logger = logging.getLogger(__name__ + ".publish")
+
+    if _PUBLISH_OPTIONS["delta"] and os.path.isdir(target_path):
+        return update_tree(source_path, target_path, move=move)
+
+    temporary_path = _create_sibling_path(target_path, "new")
+    statistics = None
+
+    try:
+        # Files cannot be deduplicated if the folder is moved.
+        move = move and _COPY_OPTIONS["store"] is None
+
+        if move and _rename(source_path, temporary_path):
+            os.mkdir(source_path)
+        else:
+            statistics = copy_tree(source_path, temporary_path)
+
+    except BaseException:
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        raise
+
+    if not os.path.isdir(target_path):
+        os.rename(temporary_path, target_path)
+        logger.debug("Published '{}'.".format(target_path))
+        return statistics
+
+    try:
+        previous_path = _replace(temporary_path, target_path)
+    except BaseException:
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        raise
+
+    logger.debug("Replaced '{}'.".format(target_path))
+    remove_tree(previous_path)
+
+    return statistics
+
+
+def update_tree(source_path, target_path, move=False):
+    """Update folder *target_path* to match folder *source_path*.
+
+    Only files which differ between both folders are created, replaced or
+    removed. Files are considered identical when their hashes recorded in
+    the :file:`RECORD` files of both folders match. Otherwise, they are
+    compared by size and modification time, then by content if their sizes
+    match.
+
+    The updated folder is first assembled into a temporary folder next to
+    *target_path*. Unchanged files are hard linked from *target_path*, while
+    files created or replaced are copied, or moved if *move* is True and both
+    folders are on the same file system. Files which are not in *source_path*
+    anymore are simply not added. The temporary folder then replaces
+    *target_path* in a single step as with :func:`publish`, so that a mix of
+    previous and new files is never visible, and the folder replaced is
+    removed with :func:`remove_tree`.
+
+    :param source_path: path to the folder to publish.
+
+    :param target_path: path to the existing folder to update.
+
+    :param move: indicate whether files from *source_path* can be moved
+        instead of being copied. An empty folder is left in place of
+        *source_path*. Default is False.
+
+    :return: mapping in the form of ``{"created": 1, "replaced": 2,
+        "removed": 0, "unchanged": 1024}`` indicating the number of files and
+        symbolic links created, replaced, removed and left unchanged.
+
+    """
+    logger = logging.getLogger(__name__ + ".update_tree")
+
+    source_entries = _fetch_entries(source_path)
+    target_entries = _fetch_entries(target_path)
+
+    source_records = _fetch_records(source_path, source_entries)
+    target_records = _fetch_records(target_path, target_entries)
+
+    move = move and _COPY_OPTIONS["store"] is None and (
+        os.stat(source_path).st_dev
+        == os.stat(os.path.dirname(os.path.abspath(target_path))).st_dev
+    )
+
+    changes = set()
+    statistics = {"created": 0, "replaced": 0, "removed": 0, "unchanged": 0}
+
+    for relative_path, status in sorted(source_entries.items()):
+        if stat.S_ISDIR(status.st_mode):
+            continue
+
+        target_status = target_entries.get(relative_path)
+
+        if target_status is None or stat.S_ISDIR(target_status.st_mode):
+            statistics["created"] += 1
+
+        else:
+            identical = _is_identical(
+                source_path, target_path, relative_path, status,
+                target_status, source_records.get(relative_path),
+                target_records.get(relative_path),
+            )
+
+            if identical:
+                statistics["unchanged"] += 1
+
+                # File is copied when only its mode changed, as updating the
+                # mode of a hard link would also update the existing file.
+                if stat.S_ISLNK(status.st_mode) or stat.S_IMODE(
+                    status.st_mode
+                ) == stat.S_IMODE(target_status.st_mode):
+                    continue
+
+            else:
+                statistics["replaced"] += 1
+
+        changes.add(relative_path)
+
+    # Files removed, including files replaced by a folder.
+    statistics["removed"] = len([
+        relative_path for relative_path, status in target_entries.items()
+        if not stat.S_ISDIR(status.st_mode) and (
+            relative_path not in source_entries
+            or stat.S_ISDIR(source_entries[relative_path].st_mode)
+        )
+    ])
+
+    temporary_path = _create_sibling_path(target_path, "new")
+
+    try:
+        os.mkdir(temporary_path)
+
+        for relative_path, status in sorted(source_entries.items()):
+            if stat.S_ISDIR(status.st_mode):
+                os.mkdir(os.path.join(temporary_path, relative_path))
+
+        def _stage(relative_path):
+            """Link, copy or move file *relative_path* to temporary folder."""
+            source = os.path.join(source_path, relative_path)
+            target = os.path.join(temporary_path, relative_path)
+
+            if relative_path not in changes:
+                source = os.path.join(target_path, relative_path)
+
+            if stat.S_ISLNK(source_entries[relative_path].st_mode):
+                os.symlink(os.readlink(source), target)
+            elif relative_path not in changes:
+                _link_or_copy(source, target)
+            elif move:
+                os.rename(source, target)
+            else:
+                _copy_with_stat(source, target)
+
+        execute_parallel(
+            _stage, [
+                relative_path for relative_path, status
+                in sorted(source_entries.items())
+                if not stat.S_ISDIR(status.st_mode)
+            ],
+            _COPY_OPTIONS["jobs"] or 1
+        )
+
+        for relative_path, status in sorted(
+            source_entries.items(), reverse=True
+        ):
+            if stat.S_ISDIR(status.st_mode):
+                shutil.copystat(
+                    os.path.join(source_path, relative_path),
+                    os.path.join(temporary_path, relative_path)
+                )
+
+        shutil.copystat(source_path, temporary_path)
+
+        previous_path = _replace(temporary_path, target_path)
+
+    except BaseException:
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        raise
+
+    remove_tree(previous_path)
+
+    if move:
+        shutil.rmtree(source_path)
+        os.mkdir(source_path)
+
+    logger.debug(
+        "Updated '{}': {created} created, {replaced} replaced, {removed} "
+        "removed, {unchanged} unchanged.".format(target_path, **statistics)
+    )
+
+    return statistics
+
+
+@contextlib.contextmanager
+def deferred_removal():
+    """Remove folders in background within context.
+
+    Folders removed with :func:`remove_tree` from all threads are removed one
+    at a time by a background thread, so that the caller is not blocked.
+    Removals which are still pending are awaited when leaving the context.
+
+    Example::
+
+        >>> with deferred_removal():
+        ...     remove_tree("/path/to/folder")
+
+    """
+    logger = logging.getLogger(__name__ + ".deferred_removal")
+
+    queue = six.moves.queue.Queue()
+    previous_queue = _REMOVAL_STATE["queue"]
+
+    def _worker():
+        """Remove folders from queue until a sentinel is received."""
+        while True:
+            path = queue.get()
+            if path is None:
+                return
+
+            shutil.rmtree(path, ignore_errors=True)
+            logger.debug("Removed '{}'.".format(path))
+
+    thread = threading.Thread(target=_worker)
+    thread.daemon = True
+    thread.start()
+
+    _REMOVAL_STATE["queue"] = queue
+
+    try:
+        yield
+    finally:
+        _REMOVAL_STATE["queue"] = previous_queue
+
+        if queue.qsize() > 0:
+            logger.debug(
+                "Waiting for removal of {} folder(s)...".format(queue.qsize())
+            )
+
+        queue.put(None)
+        thread.join()
+
+
+def remove_tree(path):
+    """Remove folder *path*.
+
+    The folder is removed in background when called within
+    :func:`deferred_removal` context. Folders which could not be removed can
+    be cleaned up later with :func:`collect_garbage`.
+
+    :param path: path to the folder to remove.
+
+    """
+    queue = _REMOVAL_STATE["queue"]
+    if queue is not None:
+        queue.put(path)
+        return
+
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def collect_garbage(path, delay=GARBAGE_DELAY):
+    """Remove temporary folders left within installation *path*.
+
+    Temporary folders are created next to the folders published with
+    :func:`publish` and within the :data:`STAGING_FOLDER` folder, and can be
+    left behind when an installation is interrupted. Temporary folders which
+    are being filled and staging folders are only removed when they have not
+    been modified for *delay* seconds, as they could be used by another
+    installation process. A staging folder is considered modified when any
+    folder within it has been modified.
+
+    :param path: installation path containing folders published by
+        :func:`publish` (e.g. "/path/to/packages").
+
+    :param delay: Number of seconds after which temporary folders which are
+        being filled are considered abandoned. Default is
+        :data:`GARBAGE_DELAY`.
+
+    :return: List of folders removed.
+
+    """
+    logger = logging.getLogger(__name__ + ".collect_garbage")
+
+    if not os.path.isdir(path):
+        return []
+
+    folders = [path] + [
+        os.path.join(path, name) for name in sorted(os.listdir(path))
+        if os.path.isdir(os.path.join(path, name))
+    ]
+
+    removed = []
+
+    for folder in folders:
+        for name in sorted(os.listdir(folder)):
+            match = TEMPORARY_PATTERN.match(name)
+            if match is None:
+                continue
+
+            _path = os.path.join(folder, name)
+
+            if match.group("type") == "new" and (
+                time.time() - os.lstat(_path).st_mtime < delay
+            ):
+                continue
+
+            shutil.rmtree(_path, ignore_errors=True)
+            logger.debug("Removed '{}'.".format(_path))
+            removed.append(_path)
+
+    staging_path = os.path.join(path, STAGING_FOLDER)
+
+    if os.path.isdir(staging_path):
+        for name in sorted(os.listdir(staging_path)):
+            _path = os.path.join(staging_path, name)
+
+            # Packages are built within nested folders, so the most recent
+            # modification within the staging folder is used.
+            mtimes = [os.lstat(_path).st_mtime] + [
+                os.lstat(os.path.join(root, _name)).st_mtime
+                for root, folders, _ in os.walk(_path)
+                for _name in folders
+            ]
+
+            if time.time() - max(mtimes) < delay:
+                continue
+
+            if os.path.isdir(_path) and not os.path.islink(_path):
+                shutil.rmtree(_path, ignore_errors=True)
+            else:
+                os.remove(_path)
+
+            logger.debug("Removed '{}'.".format(_path))
+            removed.append(_path)
+
+    return removed
+
+
+def prune_store(path, delay=GARBAGE_DELAY):
+    """Remove files which are not used anymore from content store *path*.
+
+    Files of the content store are used as long as they are linked to at
+    least one folder, which is indicated by their number of hard links.
+    Files are only removed when their status has not changed for *delay*
+    seconds, so that files which were just added by another installation
+    process are not removed before being linked.
+
+    :param path: path to the content store (see :func:`content_store`).
+
+    :param delay: Number of seconds after which files which are not used are
+        removed. Default is :data:`GARBAGE_DELAY`.
+
+    :return: mapping in the form of ``{"files": 3, "size": 1024}`` indicating
+        the number of files and the size removed.
+
+    """
+    logger = logging.getLogger(__name__ + ".prune_store")
+
+    removed = {"files": 0, "size": 0}
+
+    if not os.path.isdir(path):
+        return removed
+
+    for root, _, names in os.walk(path):
+        for name in names:
+            _path = os.path.join(root, name)
+            status = os.lstat(_path)
+
+            if time.time() - status.st_ctime < delay:
+                continue
+
+            # Temporary files are left when adding a file is interrupted.
+            if status.st_nlink > 1 and TEMPORARY_PATTERN.match(name) is None:
+                continue
+
+            try:
+                os.remove(_path)
+            except OSError:
+                continue
+
+            removed["files"] += 1
+            removed["size"] += status.st_size
+
+    logger.debug(
+        "Removed {} file(s), {} from '{}'.".format(
+            removed["files"], qip.cache.format_size(removed["size"]), path
+        )
+    )
+
+    return removed
+
+
+def execute_parallel(function, items, jobs):
+    """Execute *function* for each item of *items* with *jobs* threads.
+
+    Remaining items are not processed once an error is raised.
+
+    :raise RuntimeError: if *function* raises an error for one item.
+
+    """
+    queue = six.moves.queue.Queue()
+    for item in items:
+        queue.put(item)
+
+    errors = []
+
+    def _worker():
+        """Process items from queue until it is empty or an error is raised.
+        """
+        while not len(errors):
+            try:
+                item = queue.get_nowait()
+            except six.moves.queue.Empty:
+                return
+
+            try:
+                function(item)
+            except Exception as error:
+                errors.append(error)
+
+    threads = [
+        threading.Thread(target=_worker)
+        for _ in range(max(1, min(jobs, len(items))))
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    if len(errors):
+        error = errors[0]
+        if isinstance(error, RuntimeError):
+            raise error
+
+        raise RuntimeError(str(error))
+
+
+def _scan(path):
+    """Return content of folder *path*.
+
+    :return: tuple with lists of folders, files and symbolic links relative to
+        *path*, sorted from top to bottom, and the total size of files in
+        bytes.
+
+    """
+    folders = []
+    files = []
+    links = []
+    size = 0
+
+    for root, folder_names, file_names in os.walk(path):
+        relative_root = os.path.relpath(root, path)
+        if relative_root == os.curdir:
+            relative_root = ""
+
+        for name in sorted(folder_names):
+            relative_path = os.path.join(relative_root, name)
+            if os.path.islink(os.path.join(root, name)):
+                links.append(relative_path)
+            else:
+                folders.append(relative_path)
+
+        for name in sorted(file_names):
+            relative_path = os.path.join(relative_root, name)
+            status = os.lstat(os.path.join(root, name))
+
+            if stat.S_ISLNK(status.st_mode):
+                links.append(relative_path)
+            else:
+                files.append(relative_path)
+                size += status.st_size
+
+    return folders, files, links, size
+
+
+def _fetch_entries(path):
+    """Return mapping of entries within folder *path*.
+
+    :return: mapping of :func:`os.lstat` results per path relative to *path*
+        for all folders, files and symbolic links within *path*.
+
+    """
+    entries = {}
+
+    for root, folder_names, file_names in os.walk(path):
+        relative_root = os.path.relpath(root, path)
+        if relative_root == os.curdir:
+            relative_root = ""
+
+        for name in folder_names + file_names:
+            entries[os.path.join(relative_root, name)] = os.lstat(
+                os.path.join(root, name)
+            )
+
+    return entries
+
+
+def _fetch_records(path, entries):
+    """Return hashes recorded in :file:`RECORD` files within folder *path*.
+
+    :param entries: mapping of entries within *path* as returned by
+        :func:`_fetch_entries`.
+
+    :return: mapping of hashes (e.g. "sha256=...") per path relative to
+        *path*.
+
+    """
+    records = {}
+
+    for relative_path in entries:
+        folder, name = os.path.split(relative_path)
+        if name != "RECORD" or not folder.endswith(".dist-info"):
+            continue
+
+        library_path = os.path.dirname(folder)
+
+        with io.open(
+            os.path.join(path, relative_path), "r", encoding="utf-8"
+        ) as stream:
+            for row in csv.reader(stream.read().splitlines()):
+                if len(row) < 2 or not len(row[1]):
+                    continue
+
+                _path = os.path.normpath(os.path.join(library_path, row[0]))
+                records[_path] = row[1]
+
+    return records
+
+
+def _is_identical(
+    source_path, target_path, relative_path, source_status, target_status,
+    source_record=None, target_record=None
+):
+    """Indicate whether *relative_path* is identical in both folders.
+
+    :param source_status: :func:`os.lstat` result of the source entry.
+
+    :param target_status: :func:`os.lstat` result of the target entry.
+
+    :param source_record: hash of the source file recorded in :file:`RECORD`
+        file if available.
+
+    :param target_record: hash of the target file recorded in :file:`RECORD`
+        file if available.
+
+    """
+    source = os.path.join(source_path, relative_path)
+    target = os.path.join(target_path, relative_path)
+
+    if stat.S_ISLNK(source_status.st_mode) or stat.S_ISLNK(
+        target_status.st_mode
+    ):
+        return (
+            stat.S_ISLNK(source_status.st_mode)
+            and stat.S_ISLNK(target_status.st_mode)
+            and os.readlink(source) == os.readlink(target)
+        )
+
+    if source_status.st_size != target_status.st_size:
+        return False
+
+    if source_record is not None and target_record is not None:
+        return source_record == target_record
+
+    if int(source_status.st_mtime) == int(target_status.st_mtime):
+        return True
+
+    return _hash_file(source) == _hash_file(target)
+
+
+def _hash_file(path):
+    """Return hash of content of file *path*."""
+    digest = hashlib.sha256()
+
+    with io.open(path, "rb") as stream:
+        for chunk in iter(lambda: stream.read(COPY_BUFFER_SIZE), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def _copy_with_stat(source_path, target_path):
+    """Copy file *source_path* to *target_path* with its mode and times.
+
+    The file is linked from the content store instead when possible (see
+    :func:`content_store`).
+
+    """
+    store_path = _COPY_OPTIONS["store"]
+    if store_path is not None and _link_from_store(
+        source_path, target_path, store_path
+    ):
+        return
+
+    copy_file(source_path, target_path)
+    shutil.copystat(source_path, target_path)
+
+
+def _link_or_copy(source_path, target_path):
+    """Create *target_path* as hard link to *source_path*.
+
+    The file is copied with :func:`_copy_with_stat` instead if hard links
+    cannot be used.
+
+    """
+    try:
+        os.link(source_path, target_path)
+
+    except OSError as error:
+        if error.errno not in _LINK_ERRORS:
+            raise
+
+        _copy_with_stat(source_path, target_path)
+
+
+def _link_from_store(source_path, target_path, store_path):
+    """Create *target_path* as hard link to content of *source_path* in store.
+
+    The file is added to the content store at *store_path* if necessary.
+
+    :return: Boolean value indicating whether *target_path* was linked, or
+        False if hard links cannot be used.
+
+    """
+    status = os.stat(source_path)
+    name = "{}-{:o}".format(
+        _hash_file(source_path), stat.S_IMODE(status.st_mode)
+    )
+    path = os.path.join(store_path, name[:2], name)
+
+    # File can be removed from store by another process before being linked.
+    for _ in range(2):
+        try:
+            if not os.path.isfile(path):
+                _add_to_store(source_path, path)
+
+            os.link(path, target_path)
+
+        except OSError as error:
+            if error.errno == errno.ENOENT:
+                continue
+
+            if error.errno in _LINK_ERRORS:
+                return False
+
+            raise
+
+        return True
+
+    return False
+
+
+def _add_to_store(source_path, path):
+    """Copy *source_path* to *path* within the content store atomically.
+
+    The copy is hard linked to *path* instead of being renamed, so that an
+    entry added concurrently by another thread or process is never replaced
+    by another file with the same content. Files already linked to the
+    existing entry therefore keep sharing it.
+
+    """
+    try:
+        os.makedirs(os.path.dirname(path))
+    except OSError as error:
+        if error.errno != errno.EEXIST:
+            raise
+
+    temporary_path = _create_sibling_path(path, "new")
+
+    try:
+        copy_file(source_path, temporary_path)
+        shutil.copystat(source_path, temporary_path)
+
+        try:
+            os.link(temporary_path, path)
+        except OSError as error:
+            # Entry has been added concurrently.
+            if error.errno != errno.EEXIST:
+                raise
+
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def _reflink(source, target, size):
+    """Share extents of file descriptor *source* with *target*.
+
+    Return *size* as the whole content is shared.
+
+    """
+    fcntl.ioctl(target, FICLONE, source)
+    return size
+
+
+def _copy_file_range(source, target, size):
+    """Copy *size* bytes from file descriptor *source* to *target* with
+    :func:`os.copy_file_range`.
+
+    Return number of bytes copied, which is less than *size* if no data could
+    be copied before the end of the file.
+
+    """
+    offset = 0
+
+    while offset < size:
+        copied = os.copy_file_range(
+            source, target, size - offset, offset, offset
+        )
+        if copied == 0:
+            break
+
+        offset += copied
+
+    return offset
+
+
+def _sendfile(source, target, size):
+    """Copy *size* bytes from file descriptor *source* to *target* with
+    :func:`os.sendfile`.
+
+    Return number of bytes copied, which is less than *size* if no data could
+    be copied before the end of the file.
+
+    """
+    offset = 0
+
+    while offset < size:
+        copied = os.sendfile(target, source, offset, size - offset)
+        if copied == 0:
+            break
+
+        offset += copied
+
+    return offset
+
+
+#: Functions used for each copy method available on this platform.
+_COPY_FUNCTIONS = {}
+
+if sys.platform.startswith("linux"):
+    if fcntl is not None:
+        _COPY_FUNCTIONS["reflink"] = _reflink
+
+    if hasattr(os, "copy_file_range"):
+        _COPY_FUNCTIONS["copy_file_range"] = _copy_file_range
+
+    if hasattr(os, "sendfile"):
+        _COPY_FUNCTIONS["sendfile"] = _sendfile
+
+
+def _create_sibling_path(path, name):
+    """Return path to temporary folder next to *path*.
+
+    *name* is the type of temporary folder, as detected by
+    :data:`TEMPORARY_PATTERN`.
+
+    """
+    folder, base_name = os.path.split(path)
+    return os.path.join(
+        folder, ".{}.qip-{}-{}".format(base_name, name, uuid.uuid4().hex[:12])
+    )
+
+
+def _rename(source_path, target_path):
+    """Rename *source_path* to *target_path* if both are on the same file
+    system.
+
+    :return: Boolean value indicating whether *source_path* was renamed.
+
+    """
+    try:
+        os.rename(source_path, target_path)
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+
+        return False
+
+    return True
+
+
+def _replace(temporary_path, target_path):
+    """Replace existing folder *target_path* with *temporary_path*.
+
+    Both folders are exchanged in a single step when the file system supports
+    it. Otherwise, *target_path* is renamed aside right before
+    *temporary_path* is renamed to *target_path*.
+
+    :return: path to the folder replaced, which should be removed.
+
+    """
+    previous_path = _create_sibling_path(target_path, "old")
+
+    if _exchange(temporary_path, target_path):
+        os.rename(temporary_path, previous_path)
+
+    else:
+        os.rename(target_path, previous_path)
+
+        try:
+            os.rename(temporary_path, target_path)
+        except OSError:
+            os.rename(previous_path, target_path)
+            raise
+
+    return previous_path
+
+
+def _exchange(path1, path2):
+    """Exchange *path1* and *path2* atomically.
+
+    :return: Boolean value indicating whether paths were exchanged, or False
+        if the operation is not supported by the platform or the file system.
+
+    """
+    if _RENAMEAT2 is None:
+        return False
+
+    result = _RENAMEAT2(
+        _AT_FDCWD, _encode_path(path1), _AT_FDCWD, _encode_path(path2),
+        RENAME_EXCHANGE
+    )
+
+    if result != 0:
+        error_number = ctypes.get_errno()
+        if error_number in _UNSUPPORTED_ERRORS or error_number == errno.EINVAL:
+            return False
+
+        raise OSError(error_number, os.strerror(error_number), path1)
+
+    return True
+
+
+def _encode_path(path):
+    """Return *path* encoded for system calls."""
+    if isinstance(path, six.text_type):
+        return path.encode(sys.getfilesystemencoding())
+
+    return path
+
+
+def _fetch_renameat2():
+    """Return renameat2 function from the C library or None."""
+    if not sys.platform.startswith("linux"):
+        return
+
+    try:
+        library = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    except OSError:
+        return
+
+    return getattr(library, "renameat2", None)
+
+
+#: renameat2 function used to exchange two paths, if available.
+_RENAMEAT2 = _fetch_renameat2()
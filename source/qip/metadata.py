@@ -0,0 +1,386 @@
+# :coding: utf-8
+
+import csv
+import email.parser
+import io
+import os
+import re
+
+from packaging.markers import (
+    InvalidMarker, UndefinedComparison, UndefinedEnvironmentName
+)
+from packaging.requirements import Requirement, InvalidRequirement
+from packaging.utils import canonicalize_name
+
+from qip.package_data.python_info import fetch_environment_markers
+
+#: Compiled regular expression to extract name and version from metadata
+#: folder name (e.g. "Foo_Bar-0.1.0.dist-info", "Foo-0.1.0-py2.7.egg-info").
+FOLDER_PATTERN = re.compile(
+    r"^(?P<name>[^-]+)(?:-(?P<version>[^-]+))?(?:-.*)?"
+    r"\.(?P<type>dist-info|egg-info)$"
+)
+
+
+def fetch(name, paths):
+    """Return metadata mapping of distribution *name* installed in *paths*.
+
+    Metadata are read from the :file:`.dist-info` or :file:`.egg-info` folder
+    of the distribution. Distributions installed in editable mode with a
+    :file:`.egg-link` file are read from the source folder targeted by the
+    link.
+
+    :param name: Python package name (e.g. "Foo", "foo_bar").
+
+    :param paths: List of library paths to search the distribution in.
+
+    :return: None if the distribution cannot be found, otherwise a metadata
+        mapping as returned by :func:`load`.
+
+    """
+    path = find(name, paths)
+    if path is not None:
+        return load(path)
+
+
+def find(name, paths):
+    """Return path to metadata folder of distribution *name* installed in
+    *paths*.
+
+    :param name: Python package name (e.g. "Foo", "foo_bar").
+
+    :param paths: List of library paths to search the distribution in.
+
+    :return: None if the distribution cannot be found, otherwise the path to
+        the :file:`.dist-info` or :file:`.egg-info` folder of the
+        distribution.
+
+    .. seealso:: :func:`fetch`
+
+    """
+    key = canonicalize_name(name)
+
+    for path in paths:
+        if not os.path.isdir(path):
+            continue
+
+        names = sorted(os.listdir(path))
+
+        for _name in names:
+            match = FOLDER_PATTERN.match(_name)
+            if match is not None and canonicalize_name(
+                match.group("name")
+            ) == key:
+                return os.path.join(path, _name)
+
+        for _name in names:
+            if not _name.endswith(".egg-link"):
+                continue
+
+            if canonicalize_name(_name[:-len(".egg-link")]) != key:
+                continue
+
+            with io.open(
+                os.path.join(path, _name), "r", encoding="utf-8"
+            ) as stream:
+                source_path = os.path.join(path, stream.readline().strip())
+
+            metadata_path = find(name, [source_path])
+            if metadata_path is not None:
+                return metadata_path
+
+
+def load(path):
+    """Return metadata mapping from :file:`.dist-info` or :file:`.egg-info`
+    *path*.
+
+    :param path: path to the metadata folder of a distribution.
+
+    :return: metadata mapping in the form of::
+
+            {
+                "name": "Foo",
+                "version": "0.1.0",
+                "summary": "This is a Python package",
+                "location": "/path/to/lib/python2.7/site-packages",
+                "classifiers": [
+                    "Operating System :: OS Independent"
+                ],
+                "requirements": [
+                    "bim<3,>=2",
+                    "baz; extra == \"test\""
+                ],
+                "entry-points": {
+                    "console_scripts": {
+                        "foo": "foo.__main__:main"
+                    }
+                },
+                "top-level": ["foo"]
+            }
+
+    """
+    match = FOLDER_PATTERN.match(os.path.basename(path))
+    is_wheel = match is not None and match.group("type") == "dist-info"
+
+    if is_wheel:
+        content = _read(path, "METADATA")
+    elif os.path.isdir(path):
+        content = _read(path, "PKG-INFO")
+    else:
+        # Single file egg-info installed by distutils.
+        with io.open(path, "r", encoding="utf-8", errors="replace") as stream:
+            content = stream.read()
+
+    headers = email.parser.Parser().parsestr(content or "", headersonly=True)
+
+    name = headers.get("Name")
+    version = headers.get("Version")
+
+    if match is not None:
+        name = name or match.group("name")
+        version = version or match.group("version")
+
+    if is_wheel:
+        requirements = headers.get_all("Requires-Dist") or []
+    else:
+        requirements = _extract_egg_requirements(_read(path, "requires.txt"))
+
+    summary = headers.get("Summary")
+
+    mapping = {
+        "name": name,
+        "version": version,
+        "location": os.path.dirname(os.path.abspath(path)),
+        "classifiers": headers.get_all("Classifier") or [],
+        "requirements": requirements,
+        "entry-points": _extract_entry_points(
+            _read(path, "entry_points.txt")
+        ),
+        "top-level": (_read(path, "top_level.txt") or "").split(),
+    }
+
+    if summary is not None and len(summary.strip()):
+        mapping["summary"] = summary.strip()
+
+    return mapping
+
+
+def extract_record(path):
+    """Return files installed with distribution from metadata *path*.
+
+    Files are read from the :file:`RECORD` file of :file:`.dist-info` folders,
+    or from the :file:`installed-files.txt` file of :file:`.egg-info` folders.
+
+    :param path: path to the metadata folder of a distribution.
+
+    :raise RuntimeError: if no record of installed files can be found.
+
+    :return: List of file paths relative to the folder containing the metadata
+        folder (e.g. "foo/__init__.py", "../../../bin/foo").
+
+    """
+    content = _read(path, "RECORD")
+    if content is not None:
+        return [
+            row[0] for row in csv.reader(content.splitlines())
+            if len(row) and len(row[0])
+        ]
+
+    content = _read(path, "installed-files.txt")
+    if content is not None:
+        name = os.path.basename(path)
+        return [
+            os.path.normpath(os.path.join(name, line.strip()))
+            for line in content.splitlines() if len(line.strip())
+        ]
+
+    raise RuntimeError(
+        "Impossible to find files installed from '{}'".format(path)
+    )
+
+
+def load_report_item(item):
+    """Return partial metadata mapping from installation report *item*.
+
+    *item* is an installation item from the :term:`JSON` report written by
+    :term:`Pip` with the ``--report`` option, which contains the core metadata
+    of the distribution installed. Entry points, top level modules and
+    location are not part of the core metadata and are therefore not included.
+
+    :param item: installation item from the :term:`Pip` installation report.
+
+    :return: metadata mapping in the form of::
+
+            {
+                "name": "Foo",
+                "version": "0.1.0",
+                "summary": "This is a Python package",
+                "classifiers": [
+                    "Operating System :: OS Independent"
+                ],
+                "requirements": [
+                    "bim<3,>=2",
+                    "baz; extra == \"test\""
+                ]
+            }
+
+    """
+    metadata = item["metadata"]
+
+    mapping = {
+        "name": metadata["name"],
+        "version": metadata["version"],
+        "classifiers": metadata.get("classifier", []),
+        "requirements": metadata.get("requires_dist", []),
+    }
+
+    summary = metadata.get("summary")
+    if summary is not None and len(summary.strip()):
+        mapping["summary"] = summary.strip()
+
+    return mapping
+
+
+def extract_requirements(metadata, extra_keywords=None, environment=None):
+    """Return requirements from *metadata* which apply to *environment*.
+
+    Requirements are evaluated in the same way as
+    :meth:`pkg_resources.Distribution.requires`, so that requirements for
+    *extra_keywords* are included, and requirements with markers which do not
+    match *environment* are excluded.
+
+    :param metadata: metadata mapping as returned by :func:`load`.
+
+    :param extra_keywords: List of :term:`extra requirement keywords
+        <extras_require>` if required. Default is None.
+
+    :param environment: mapping of environment markers for the target Python
+        (see `PEP 508 <https://www.python.org/dev/peps/pep-0508/>`_). Default
+        is None, which means that markers are evaluated for the current
+        Python.
+
+    :return: List of :class:`packaging.requirements.Requirement` instances.
+
+    """
+    _environment = fetch_environment_markers()
+    _environment.update(environment or {})
+
+    extras = [""] + [_normalize_extra(key) for key in extra_keywords or []]
+    requirements = []
+
+    for item in metadata["requirements"]:
+        try:
+            requirement = Requirement(item)
+        except InvalidRequirement:
+            continue
+
+        if requirement.marker is not None and not any(
+            _evaluate(requirement.marker, dict(_environment, extra=extra))
+            for extra in extras
+        ):
+            continue
+
+        if str(requirement) not in [str(item) for item in requirements]:
+            requirements.append(requirement)
+
+    return requirements
+
+
+def _evaluate(marker, environment):
+    """Indicate whether *marker* applies to *environment*."""
+    try:
+        return marker.evaluate(environment)
+    except (InvalidMarker, UndefinedComparison, UndefinedEnvironmentName):
+        return False
+
+
+def _normalize_extra(name):
+    """Return normalized extra keyword *name*."""
+    return re.sub(r"[^A-Za-z0-9.-]+", "_", name).lower()
+
+
+def _read(path, name):
+    """Return content of file *name* within metadata *path* or None."""
+    try:
+        with io.open(
+            os.path.join(path, name), "r", encoding="utf-8", errors="replace"
+        ) as stream:
+            return stream.read()
+    except (IOError, OSError):
+        return
+
+
+def _split_sections(content):
+    """Return list of sections and lines from INI-like *content*.
+
+    Lines before the first section are returned within a section named None.
+
+    """
+    sections = [(None, [])]
+
+    for line in (content or "").splitlines():
+        line = line.strip()
+        if not len(line) or line.startswith(("#", ";")):
+            continue
+
+        if line.startswith("[") and line.endswith("]"):
+            sections.append((line[1:-1].strip(), []))
+        else:
+            sections[-1][1].append(line)
+
+    return sections
+
+
+def _extract_entry_points(content):
+    """Return entry point mapping from :file:`entry_points.txt` *content*."""
+    mapping = {}
+
+    for section, lines in _split_sections(content):
+        if section is None:
+            continue
+
+        group = mapping.setdefault(section, {})
+
+        for line in lines:
+            if "=" not in line:
+                continue
+
+            alias, value = line.split("=", 1)
+            group[alias.strip()] = value.strip()
+
+    return mapping
+
+
+def _extract_egg_requirements(content):
+    """Return requirements from :file:`requires.txt` *content*.
+
+    Sections for extra keywords and environment markers (e.g.
+    "[test:python_version < '3']") are converted into requirement markers.
+
+    """
+    requirements = []
+
+    for section, lines in _split_sections(content):
+        markers = []
+
+        if section is not None:
+            extra, _, marker = section.partition(":")
+            if len(marker.strip()):
+                markers.append("({})".format(marker.strip()))
+            if len(extra.strip()):
+                markers.append("extra == \"{}\"".format(
+                    _normalize_extra(extra.strip())
+                ))
+
+        for line in lines:
+            if len(markers):
+                line, _, marker = line.partition(";")
+                _markers = markers[:]
+                if len(marker.strip()):
+                    _markers.insert(0, "({})".format(marker.strip()))
+
+                line = "{}; {}".format(line.strip(), " and ".join(_markers))
+
+            requirements.append(line)
+
+    return requirements
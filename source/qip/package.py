@@ -4,26 +4,67 @@ import logging
 import json
 import os
 import re
+import shutil
+import tempfile
+import threading
 
 import wiz.filesystem
+from packaging.requirements import Requirement, InvalidRequirement
+from packaging.utils import canonicalize_name
+from packaging.version import Version, InvalidVersion
 
+import qip.cache
 import qip.command
 import qip.environ
+import qip.metadata
 import qip.system
+import qip.wheel
 
 #: Compiled regular expression to detect git input.
 GIT_PATTERN = re.compile(r"^git@[\w._-]+:")
 
+#: Compiled regular expression to extract repository name and reference from
+#: git input.
+GIT_REFERENCE_PATTERN = re.compile(
+    r"^git@[\w._-]+:(?:.+/)?(?P<name>[\w._-]+?)(?:\.git)?@(?P<ref>[^@/]+)$"
+)
+
+#: Compiled regular expression to extract repository URL and optional
+#: reference from git input.
+GIT_URL_PATTERN = re.compile(
+    r"^(?P<url>git@[\w._-]+:[^@]+?)(?:@(?P<ref>[^@/]+))?$"
+)
+
+#: Compiled regular expression to extract path and optional extra option
+#: from local source tree input.
+SOURCE_PATH_PATTERN = re.compile(r"^(?P<path>.+?)(?:\[[^\]]*\])?$")
+
 #: Compiled regular expression to detect request with extra option.
 EXTRA_REQUEST_PATTERN = re.compile(r"(?:.*)\s*\[(.+)]")
 
-#: Path to the Python package info script.
-PACKAGE_INFO_SCRIPT = os.path.join(
-    os.path.dirname(__file__), "package_data", "package_info.py"
-)
+#: Minimum version of :term:`Pip` writing a stable installation report with
+#: the ``--report`` option.
+REPORT_PIP_VERSION = Version("23.0")
+
+#: Git commits resolved by :func:`resolve_git_request` per cache path and
+#: request, so that mirrors are only fetched once per process.
+_GIT_COMMITS = {}
 
+#: Lock protecting access to :data:`_GIT_COMMITS`.
+_GIT_COMMITS_LOCK = threading.Lock()
 
-def install(request, path, context_mapping, cache_path, editable_mode=False):
+#: Fingerprints computed by :func:`resolve_source_request` per cache path and
+#: source path, so that source trees are only hashed once per process.
+_SOURCE_FINGERPRINTS = {}
+
+#: Lock protecting access to :data:`_SOURCE_FINGERPRINTS`.
+_SOURCE_FINGERPRINTS_LOCK = threading.Lock()
+
+
+def install(
+    request, path, context_mapping, cache_path, editable_mode=False,
+    artifact_cache_path=None
+):
     """Install package in *path* from *request*.
 
     :param request: package to be installed. A request can be one of::
@@ -42,10 +83,14 @@ def install(request, path, context_mapping, cache_path, editable_mode=False):
     :param context_mapping: contain environment mapping and python mapping, as
         returned from :func:`qip.fetch_context_mapping`.
 
-    :param cache_path: Temporary directory for the pip cache.
+    :param cache_path: Directory for the pip cache.
 
     :param editable_mode: install in editable mode. Default is False.
 
+    :param artifact_cache_path: Path to the persistent cache used to store
+        build artifacts. Default is None, which means that build artifacts
+        are not cached.
+
     :raise RuntimeError: if :term:`Pip` fails to install Python package.
 
     :raise ValueError: if the Python package name can not be extracted from
@@ -83,13 +128,267 @@ def install(request, path, context_mapping, cache_path, editable_mode=False):
             }
 
     """
-    logger = logging.getLogger(__name__ + ".install")
+    build_mapping = build(
+        request, path, context_mapping, cache_path,
+        editable_mode=editable_mode,
+        artifact_cache_path=artifact_cache_path
+    )
 
-    if GIT_PATTERN.match(request) is not None:
-        request = "git+ssh://" + request.replace(":", "/")
+    return fetch_mapping(build_mapping, context_mapping)
+
+
+def build(
+    request, path, context_mapping, cache_path, editable_mode=False,
+    artifact_cache_path=None
+):
+    """Build and install package in *path* from *request* with :term:`Pip`.
+
+    When *artifact_cache_path* is specified, requests from the package index
+    pinned to a specific version (e.g. as resolved by :func:`resolve`) are
+    built into wheels which are kept in the persistent cache (see
+    :func:`qip.cache.store_wheel`), so that they are installed from the wheel
+    cached for the same Python version and system without being built again.
+    Other requests from the package index are installed directly with
+    :term:`Pip`. Git requests are built from a mirror
+    kept in the persistent cache and the wheel is cached per commit (see
+    :func:`fetch_git_wheel`). Local source trees are built into wheels
+    which are cached per fingerprint of the source tree content (see
+    :func:`fetch_source_wheel`). Wheels from the persistent cache are unpacked
+    directly without :term:`Pip` (see :func:`qip.wheel.install`). Local wheel
+    files (e.g. "/path/to/foo-0.1.0-py3-none-any.whl") and requests from a
+    wheelhouse are still installed with :term:`Pip`.
+
+    :param request: package to be installed.
+
+    :param path: path to install Python packages to.
+
+    :param context_mapping: contain environment mapping and python mapping, as
+        returned from :func:`qip.fetch_context_mapping`.
+
+    :param cache_path: Directory for the pip cache.
+
+    :param editable_mode: install in editable mode. Default is False.
+
+    :param artifact_cache_path: Path to the persistent cache used to store
+        build artifacts. Default is None, which means that build artifacts
+        are not cached.
+
+    :raise RuntimeError: if :term:`Pip` fails to install Python package.
+
+    :raise ValueError: if the Python package name can not be extracted from
+        *request*.
+
+    :return: mapping with the name of the package installed. It should be in
+        the form of::
+
+            {
+                "request": "foo[test] >= 0.1.0, < 1",
+                "name": "foo",
+                "extra": ["test"]
+            }
+
+        When :term:`Pip` >= 23.0 is available within the environment, the
+        name is read from the installation report written by :term:`Pip`, and
+        the mapping also contains the metadata from the report (see
+        :func:`qip.metadata.load_report_item`). Otherwise, the name is
+        extracted from the output of the command.
+
+    .. seealso:: :func:`install`
+
+    """
+    logger = logging.getLogger(__name__ + ".build")
+
+    requirement = convert_request(request)
+    wheel_path = None
+
+    if artifact_cache_path is not None and not editable_mode:
+        if GIT_PATTERN.match(request) is not None:
+            wheel_path = fetch_git_wheel(
+                request, context_mapping, cache_path, artifact_cache_path
+            )
+
+        elif _extract_source_path(request) is not None:
+            wheel_path = fetch_source_wheel(
+                request, context_mapping, cache_path, artifact_cache_path
+            )
+
+        # Requests which are not pinned cannot be fetched from the cache, so
+        # building a wheel first would only slow down the installation.
+        elif _is_index_request(request) and (
+            extract_pinned_mapping(request) is not None
+        ):
+            wheel_path = fetch_wheel(
+                request, context_mapping, cache_path, artifact_cache_path
+            )
+
+    request = requirement
+
+    if wheel_path is not None:
+        requirement = wheel_path
+
+        # Unpack wheel from cache directly when possible.
+        if os.path.isfile(wheel_path):
+            try:
+                metadata = qip.wheel.install(
+                    wheel_path, path, context_mapping
+                )
+
+            except RuntimeError as error:
+                logger.warning(
+                    "Impossible to unpack '{}', Pip will be used instead:\n{}"
+                    .format(wheel_path, error)
+                )
+
+                # Clean up before installation.
+                shutil.rmtree(path)
+                wiz.filesystem.ensure_directory(path)
+
+            else:
+                return {
+                    "request": request,
+                    "name": metadata["name"],
+                    "extra": extract_extra_keywords(request),
+                }
+
+    # Request installation report to gather metadata when supported.
+    report_path = None
+    if _supports_report(context_mapping):
+        handle, report_path = tempfile.mkstemp(
+            prefix="qip-report-", suffix=".json"
+        )
+        os.close(handle)
 
     logger.debug("Installing '{}'...".format(request))
-    result = qip.command.execute(
+
+    try:
+        result = qip.command.execute(
+            "python -m pip install "
+            "--ignore-installed "
+            "--no-deps "
+            "--prefix {destination} "
+            "--no-warn-script-location "
+            "--disable-pip-version-check "
+            "--cache-dir {cache_dir} "
+            "{report}"
+            "{editable_mode}"
+            "'{requirement}'".format(
+                report=(
+                    "--report {} ".format(report_path) if report_path
+                    else ""
+                ),
+                editable_mode="-e " if editable_mode else "",
+                destination=path,
+                requirement=requirement,
+                cache_dir=cache_path
+            ),
+            context_mapping["environ"]
+        )
+
+        item = _load_report_item(report_path)
+
+    finally:
+        if report_path is not None and os.path.exists(report_path):
+            os.remove(report_path)
+
+    if item is not None:
+        metadata = qip.metadata.load_report_item(item)
+
+        return {
+            "request": request,
+            "name": metadata["name"],
+            "extra": extract_extra_keywords(request),
+            "metadata": metadata,
+        }
+
+    # Fall back on output parsing when installation report is not available.
+    match_name = re.search("(?<=Installing collected packages: ).*", result)
+    if match_name is None:
+        raise ValueError(
+            "Package name could not be extracted from '{}'.".format(request)
+        )
+
+    return {
+        "request": request,
+        "name": match_name.group().strip(),
+        "extra": extract_extra_keywords(request),
+    }
+
+
+def _supports_report(context_mapping):
+    """Indicate whether :term:`Pip` within *context_mapping* can write an
+    installation report.
+
+    The version of :term:`Pip` is recorded in the Python mapping (see
+    :func:`qip.environ.fetch_python_mapping`).
+
+    """
+    version = context_mapping.get("python", {}).get("pip-version")
+    if version is None:
+        return False
+
+    try:
+        return Version(version) >= REPORT_PIP_VERSION
+    except InvalidVersion:
+        return False
+
+
+def _load_report_item(path):
+    """Return item installed from :term:`Pip` installation report *path*.
+
+    Return None if *path* is None or if the report cannot be read.
+
+    """
+    if path is None:
+        return
+
+    try:
+        with open(path, "r") as stream:
+            report = json.load(stream)
+    except (IOError, OSError, ValueError):
+        return
+
+    items = report.get("install", [])
+    if not len(items):
+        return
+
+    # Only one item is expected as dependencies are not installed.
+    for item in items:
+        if item.get("requested", False):
+            return item
+
+    return items[0]
+
+
+def build_batch(requests, path, context_mapping, cache_path):
+    """Build and install packages in *path* from *requests* with a single
+    :term:`Pip` command.
+
+    All distributions are installed within the same prefix, and can then be
+    extracted into their own installation folder with
+    :func:`extract_distribution`.
+
+    :param requests: List of package requests pinned to a specific version
+        (e.g. ["foo==0.1.0", "bim==2.1.0"]).
+
+    :param path: path to install Python packages to.
+
+    :param context_mapping: contain environment mapping and python mapping, as
+        returned from :func:`qip.fetch_context_mapping`.
+
+    :param cache_path: Directory for the pip cache.
+
+    :raise RuntimeError: if :term:`Pip` fails to install Python packages.
+
+    :return: List of mappings with the name of each package installed, in the
+        same order as *requests*, as returned by :func:`build`.
+
+    """
+    logger = logging.getLogger(__name__ + ".build_batch")
+
+    requests = [convert_request(request) for request in requests]
+
+    logger.debug("Installing {} packages...".format(len(requests)))
+    qip.command.execute(
         "python -m pip install "
         "--ignore-installed "
         "--no-deps "
@@ -97,23 +396,503 @@ def install(request, path, context_mapping, cache_path, editable_mode=False):
         "--no-warn-script-location "
         "--disable-pip-version-check "
         "--cache-dir {cache_dir} "
-        "{editable_mode}"
-        "'{requirement}'".format(
-            editable_mode="-e " if editable_mode else "",
+        "{requirements}".format(
             destination=path,
-            requirement=request,
+            requirements=" ".join(
+                "'{}'".format(request) for request in requests
+            ),
             cache_dir=cache_path
         ),
         context_mapping["environ"]
     )
 
-    match_name = re.search("(?<=Installing collected packages: ).*", result)
-    if match_name is None:
-        raise ValueError(
-            "Package name could not be extracted from '{}'.".format(request)
+    return [
+        {
+            "request": request,
+            "name": Requirement(request).name,
+            "extra": extract_extra_keywords(request),
+        }
+        for request in requests
+    ]
+
+
+def extract_distribution(name, source_path, destination_path, context_mapping):
+    """Move files of distribution *name* from *source_path* to
+    *destination_path*.
+
+    Files installed with the distribution are listed from its metadata (see
+    :func:`qip.metadata.extract_record`) and moved to the same relative
+    location within *destination_path*, so that it contains the same files
+    as if the distribution was installed alone in this folder.
+
+    :param name: Python package name.
+
+    :param source_path: path where Python packages have been installed (see
+        :func:`build_batch`).
+
+    :param destination_path: path to move Python package files to.
+
+    :param context_mapping: contain environment mapping and python mapping, as
+        returned from :func:`qip.fetch_context_mapping`.
+
+    :raise RuntimeError: if the distribution or the files installed with it
+        cannot be found.
+
+    :return: None
+
+    """
+    logger = logging.getLogger(__name__ + ".extract_distribution")
+
+    library_path = os.path.join(
+        source_path, context_mapping["python"]["library-path"]
+    )
+
+    metadata_path = qip.metadata.find(name, [library_path])
+    if metadata_path is None:
+        raise RuntimeError(
+            "Impossible to fetch installed package for '{}'".format(name)
+        )
+
+    for item in qip.metadata.extract_record(metadata_path):
+        path = os.path.normpath(os.path.join(library_path, item))
+
+        relative_path = os.path.relpath(path, source_path)
+        if relative_path.startswith(os.pardir):
+            logger.debug(
+                "Ignore '{}' installed outside of prefix.".format(path)
+            )
+            continue
+
+        # Some files recorded might not be installed (e.g. byte-compiled files)
+        if not os.path.lexists(path):
+            continue
+
+        target = os.path.join(destination_path, relative_path)
+        wiz.filesystem.ensure_directory(os.path.dirname(target))
+        shutil.move(path, target)
+
+
+def fetch_wheel(request, context_mapping, cache_path, artifact_cache_path):
+    """Return path to wheel corresponding to *request* in the artifact cache.
+
+    If *request* is pinned to a specific version, the wheel is fetched from
+    the cache for the current Python version and system. Otherwise, or if no
+    wheel can be found, a wheel is built with :term:`Pip` and stored in the
+    cache.
+
+    :param request: package request (e.g. "foo==0.1.0").
+
+    :param context_mapping: contain environment mapping and python mapping, as
+        returned from :func:`qip.fetch_context_mapping`.
+
+    :param cache_path: Directory for the pip cache.
+
+    :param artifact_cache_path: Path to the persistent cache used to store
+        build artifacts.
+
+    :raise RuntimeError: if :term:`Pip` fails to build the wheel.
+
+    :return: Path to the wheel within the cache.
+
+    """
+    python_identifier = context_mapping["python"]["identifier"]
+
+    mapping = extract_pinned_mapping(request)
+    if mapping is not None:
+        wheel_path = qip.cache.fetch_wheel(
+            artifact_cache_path, mapping["name"], mapping["version"],
+            python_identifier
         )
-    name = match_name.group().strip()
 
+        if wheel_path is not None:
+            return wheel_path
+
+    return _build_wheel(
+        request, context_mapping, cache_path, artifact_cache_path
+    )
+
+
+def fetch_git_wheel(request, context_mapping, cache_path, artifact_cache_path):
+    """Return path to wheel corresponding to Git *request* in artifact cache.
+
+    The Git repository is mirrored within the cache and the reference targeted
+    by *request* is resolved to a commit (see :func:`resolve_git_request`).
+    The wheel is fetched from the cache if a wheel has already been built from
+    this commit for the current Python version and system. Otherwise, the
+    wheel is built with :term:`Pip` from the local mirror and stored in the
+    cache.
+
+    :param request: Git request (e.g. "git@gitlab:rnd/foo.git@dev").
+
+    :param context_mapping: contain environment mapping and python mapping, as
+        returned from :func:`qip.fetch_context_mapping`.
+
+    :param cache_path: Directory for the pip cache.
+
+    :param artifact_cache_path: Path to the persistent cache used to store
+        build artifacts.
+
+    :raise RuntimeError: if the Git repository cannot be fetched or if
+        :term:`Pip` fails to build the wheel.
+
+    :return: Path to the wheel within the cache.
+
+    """
+    mapping = resolve_git_request(request, artifact_cache_path)
+
+    wheel_path = qip.cache.fetch_revision_wheel(
+        artifact_cache_path, mapping["commit"],
+        context_mapping["python"]["identifier"]
+    )
+    if wheel_path is not None:
+        return wheel_path
+
+    return _build_wheel(
+        "git+file://{mirror}@{commit}".format(**mapping),
+        context_mapping, cache_path, artifact_cache_path,
+        revision=mapping["commit"]
+    )
+
+
+def fetch_source_wheel(
+    request, context_mapping, cache_path, artifact_cache_path
+):
+    """Return path to wheel corresponding to local source tree *request*.
+
+    The source tree targeted by *request* is fingerprinted from its content
+    (see :func:`resolve_source_request`). The wheel is fetched from the cache
+    if a wheel has already been built from the same content for the current
+    Python version and system. Otherwise, the wheel is built with :term:`Pip`
+    from the source tree and stored in the cache.
+
+    :param request: path to a source tree (e.g. "/path/to/foo/", ".").
+
+    :param context_mapping: contain environment mapping and python mapping, as
+        returned from :func:`qip.fetch_context_mapping`.
+
+    :param cache_path: Directory for the pip cache.
+
+    :param artifact_cache_path: Path to the persistent cache used to store
+        build artifacts.
+
+    :raise ValueError: if *request* is not a path to a source tree.
+
+    :raise RuntimeError: if :term:`Pip` fails to build the wheel.
+
+    :return: Path to the wheel within the cache.
+
+    """
+    fingerprint = resolve_source_request(request, artifact_cache_path)
+
+    wheel_path = qip.cache.fetch_revision_wheel(
+        artifact_cache_path, fingerprint,
+        context_mapping["python"]["identifier"]
+    )
+    if wheel_path is not None:
+        return wheel_path
+
+    return _build_wheel(
+        _extract_source_path(request), context_mapping, cache_path,
+        artifact_cache_path, revision=fingerprint
+    )
+
+
+def _build_wheel(
+    request, context_mapping, cache_path, artifact_cache_path, revision=None
+):
+    """Build wheel from *request* and store it in the artifact cache.
+
+    :return: Path to the wheel within the cache.
+
+    .. seealso:: :func:`qip.cache.store_wheel`
+
+    """
+    logger = logging.getLogger(__name__ + "._build_wheel")
+
+    wheel_folder = tempfile.mkdtemp()
+
+    try:
+        logger.debug("Building wheel for '{}'...".format(request))
+        qip.command.execute(
+            "python -m pip wheel "
+            "--no-deps "
+            "--wheel-dir {destination} "
+            "--disable-pip-version-check "
+            "--cache-dir {cache_dir} "
+            "'{requirement}'".format(
+                destination=wheel_folder,
+                requirement=request,
+                cache_dir=cache_path
+            ),
+            context_mapping["environ"]
+        )
+
+        names = [
+            name for name in os.listdir(wheel_folder) if name.endswith(".whl")
+        ]
+        if len(names) != 1:
+            raise RuntimeError(
+                "Impossible to build wheel for '{}'".format(request)
+            )
+
+        return qip.cache.store_wheel(
+            artifact_cache_path, os.path.join(wheel_folder, names[0]),
+            context_mapping["python"]["identifier"], revision=revision
+        )
+
+    finally:
+        shutil.rmtree(wheel_folder, ignore_errors=True)
+
+
+def resolve_git_request(request, artifact_cache_path):
+    """Return mirror and commit targeted by Git *request*.
+
+    The Git repository is mirrored within the artifact cache (see
+    :func:`qip.cache.fetch_git_mirror`) and the reference targeted by
+    *request* is resolved to a commit. The default branch is used if no
+    reference is specified. Results are kept for the lifetime of the process
+    so that the mirror is only fetched once per request.
+
+    :param request: Git request (e.g. "git@gitlab:rnd/foo.git@dev"). Git URLs
+        prefixed with "git+" are also accepted (e.g.
+        "git+file:///path/to/foo.git@dev").
+
+    :param artifact_cache_path: Path to the persistent cache used to store
+        build artifacts.
+
+    :raise ValueError: if *request* is not a Git request.
+
+    :raise RuntimeError: if the Git repository cannot be fetched or if the
+        reference cannot be resolved.
+
+    :return: mapping in the form of::
+
+            {
+                "mirror": "/path/to/cache/git/foo-0123456789ab.git",
+                "commit": "d670460b4b4aece5915caf5c68d12f560a9fe3e4"
+            }
+
+    """
+    key = (artifact_cache_path, request)
+
+    with _GIT_COMMITS_LOCK:
+        if key in _GIT_COMMITS:
+            return _GIT_COMMITS[key]
+
+    url, reference = _extract_git_url(request)
+
+    mirror_path = qip.cache.fetch_git_mirror(artifact_cache_path, url)
+
+    try:
+        commit = qip.command.execute(
+            "git --git-dir '{}' rev-parse --verify --quiet '{}^{{commit}}'"
+            .format(mirror_path, reference or "HEAD"), dict(os.environ),
+            quiet=True
+        ).strip()
+
+    # Reference cannot be verified if it does not exist in repository.
+    except RuntimeError:
+        commit = ""
+
+    if not len(commit):
+        raise RuntimeError(
+            "Impossible to resolve reference '{}' from '{}'".format(
+                reference or "HEAD", url
+            )
+        )
+
+    mapping = {"mirror": mirror_path, "commit": commit}
+
+    with _GIT_COMMITS_LOCK:
+        _GIT_COMMITS[key] = mapping
+
+    return mapping
+
+
+def _extract_git_url(request):
+    """Return repository URL and reference from Git *request*.
+
+    :raise ValueError: if *request* is not a Git request.
+
+    """
+    match = GIT_URL_PATTERN.match(request)
+    if match is not None:
+        return match.group("url"), match.group("ref")
+
+    if not request.startswith("git+"):
+        raise ValueError("'{}' is not a Git request.".format(request))
+
+    url = request[4:].split("#", 1)[0]
+    reference = None
+
+    # Reference is separated by the last "@" following the repository path.
+    if "@" in url.partition("://")[2].rsplit("/", 1)[-1]:
+        url, reference = url.rsplit("@", 1)
+
+    return url, reference
+
+
+def resolve_source_request(request, artifact_cache_path):
+    """Return fingerprint of local source tree targeted by *request*.
+
+    Results are kept for the lifetime of the process so that the source tree
+    is only hashed once per request.
+
+    :param request: path to a source tree (e.g. "/path/to/foo/", ".").
+
+    :param artifact_cache_path: Path to the persistent cache used to store
+        build artifacts.
+
+    :raise ValueError: if *request* is not a path to a source tree.
+
+    :return: Fingerprint as an hexadecimal string.
+
+    .. seealso:: :func:`qip.cache.fetch_source_fingerprint`
+
+    """
+    path = _extract_source_path(request)
+    if path is None:
+        raise ValueError("'{}' is not a source tree.".format(request))
+
+    key = (artifact_cache_path, os.path.realpath(path))
+
+    with _SOURCE_FINGERPRINTS_LOCK:
+        if key in _SOURCE_FINGERPRINTS:
+            return _SOURCE_FINGERPRINTS[key]
+
+    fingerprint = qip.cache.fetch_source_fingerprint(artifact_cache_path, path)
+
+    with _SOURCE_FINGERPRINTS_LOCK:
+        _SOURCE_FINGERPRINTS[key] = fingerprint
+
+    return fingerprint
+
+
+def _extract_source_path(request):
+    """Return path to local source tree targeted by *request*.
+
+    Return None if *request* does not target an existing folder. Paths must be
+    explicit (e.g. "./foo", "/path/to/foo") to be distinguished from package
+    names.
+
+    """
+    path = SOURCE_PATH_PATTERN.match(request).group("path").strip()
+
+    if not (path.startswith(".") or os.sep in path):
+        return
+
+    if not os.path.isdir(path):
+        return
+
+    return path
+
+
+def extract_revision_mapping(request, artifact_cache_path):
+    """Return name and version of the package built from *request* revision.
+
+    Git requests are resolved to a commit (see :func:`resolve_git_request`)
+    and local source trees are resolved to a fingerprint of their content
+    (see :func:`resolve_source_request`). The name and version recorded when
+    a package was last built from this revision are returned.
+
+    :param request: package request.
+
+    :param artifact_cache_path: Path to the persistent cache used to store
+        build artifacts.
+
+    :return: None if *request* is neither a Git request nor a local source
+        tree, or if no package has been built from the revision targeted,
+        otherwise a mapping in the form of::
+
+            {
+                "name": "foo",
+                "version": "0.1.0",
+                "extra": ["test"]
+            }
+
+    """
+    logger = logging.getLogger(__name__ + ".extract_revision_mapping")
+
+    if GIT_PATTERN.match(request) is not None:
+        try:
+            revision = resolve_git_request(
+                request, artifact_cache_path
+            )["commit"]
+        except RuntimeError as error:
+            logger.debug(
+                "Impossible to resolve commit from '{}': {}".format(
+                    request, error
+                )
+            )
+            return
+
+    elif _extract_source_path(request) is not None:
+        revision = resolve_source_request(request, artifact_cache_path)
+
+    else:
+        return
+
+    revision_mapping = qip.cache.fetch_revision_mapping(
+        artifact_cache_path, revision
+    )
+    if revision_mapping is None:
+        return
+
+    return {
+        "name": revision_mapping["name"],
+        "version": revision_mapping["version"],
+        "extra": extract_extra_keywords(request),
+    }
+
+
+def _is_index_request(request):
+    """Indicate whether *request* targets a package from the package index.
+
+    Paths, Git URLs and direct references cannot be cached by version as
+    their content can change without the version being updated.
+
+    """
+    try:
+        requirement = Requirement(request)
+    except InvalidRequirement:
+        return False
+
+    return not requirement.url
+
+
+def fetch_mapping(build_mapping, context_mapping):
+    """Return a mapping with information about the Python package built.
+
+    :param build_mapping: mapping of the package built as returned by
+        :func:`build`.
+
+    :param context_mapping: contain environment mapping and python mapping, as
+        returned from :func:`qip.fetch_context_mapping`.
+
+    :return: mapping with information about the package gathered from the
+        environment, as returned by :func:`install`.
+
+    """
+    mapping = fetch_mapping_from_environ(
+        build_mapping["name"], context_mapping,
+        extra_keywords=build_mapping["extra"],
+        metadata=build_mapping.get("metadata")
+    )
+
+    mapping["request"] = build_mapping["request"]
+    mapping["extra"] = build_mapping["extra"]
+    return mapping
+
+
+def extract_extra_keywords(request):
+    """Return sorted list of :term:`extra requirement keywords
+    <extras_require>` from *request*.
+
+    :param request: package request (e.g. "foo[test, dev] >= 0.1.0").
+
+    :return: List of extra keywords (e.g. ["dev", "test"]).
+
+    """
     extra_keywords = []
 
     matched_extra = EXTRA_REQUEST_PATTERN.match(request)
@@ -122,19 +901,200 @@ def install(request, path, context_mapping, cache_path, editable_mode=False):
         extra_keywords = sorted(key.strip() for key in extra_keywords)
         extra_keywords = [key for key in extra_keywords if len(key)]
 
-    mapping = fetch_mapping_from_environ(
-        name, context_mapping,
-        extra_keywords=extra_keywords
+    return extra_keywords
+
+
+def resolve(requests, context_mapping, cache_path):
+    """Resolve dependency closure of *requests* without installing it.
+
+    :term:`Pip` is used in "dry-run" mode to resolve all requirements to
+    concrete versions in a single pass and report the result as a :term:`JSON`
+    encoded mapping.
+
+    .. note::
+
+        This requires :term:`Pip` >= 22.2 within the environment.
+
+    :param requests: List of package requests to be resolved.
+
+    :param context_mapping: contain environment mapping and python mapping, as
+        returned from :func:`qip.fetch_context_mapping`.
+
+    :param cache_path: Directory for the pip cache.
+
+    :raise RuntimeError: if :term:`Pip` fails to resolve the dependency
+        closure.
+
+    :return: List of mappings for each Python package of the dependency
+        closure. It should be in the form of::
+
+            [
+                {
+                    "identifier": "Foo-0.1.0",
+                    "key": "foo",
+                    "request": "foo==0.1.0",
+                    "version": "0.1.0",
+                    "requested": True,
+                    "requirements": ["bim<3,>=2"]
+                },
+                ...
+            ]
+
+    """
+    logger = logging.getLogger(__name__ + ".resolve")
+    logger.debug("Resolving dependency closure...")
+
+    result = qip.command.execute(
+        "python -m pip install "
+        "--dry-run "
+        "--ignore-installed "
+        "--quiet "
+        "--report - "
+        "--disable-pip-version-check "
+        "--cache-dir {cache_dir} "
+        "{requirements}".format(
+            cache_dir=cache_path,
+            requirements=" ".join(
+                "'{}'".format(convert_request(request)) for request in requests
+            )
+        ),
+        context_mapping["environ"],
+        quiet=True
     )
 
-    mapping["request"] = request
-    mapping["extra"] = extra_keywords
-    return mapping
+    try:
+        report = json.loads(result)
+    except ValueError:
+        raise RuntimeError(
+            "Impossible to resolve dependency closure for '{}'".format(
+                ", ".join(requests)
+            )
+        )
+
+    mappings = []
+
+    for item in report.get("install", []):
+        metadata = item["metadata"]
+
+        mappings.append({
+            "identifier": wiz.filesystem.sanitize_value(
+                "{0[name]}-{0[version]}".format(metadata)
+            ),
+            "key": canonicalize_name(metadata["name"]),
+            "request": _extract_pinned_request(item),
+            "version": metadata["version"],
+            "requested": item.get("requested", False),
+            "requirements": metadata.get("requires_dist", []),
+        })
+
+    return mappings
+
+
+def _extract_pinned_request(item):
+    """Return request pinned to the distribution resolved within *item*.
+
+    *item* is an installation item from the :term:`Pip` installation report.
+
+    """
+    metadata = item["metadata"]
+    download_info = item.get("download_info", {})
+
+    if not item.get("is_direct", False):
+        return "{0[name]}=={0[version]}".format(metadata)
+
+    url = download_info["url"]
+
+    vcs_info = download_info.get("vcs_info")
+    if vcs_info is not None:
+        url = "{vcs}+{url}@{commit}".format(
+            vcs=vcs_info["vcs"], url=url, commit=vcs_info["commit_id"]
+        )
+
+    return "{name} @ {url}".format(name=metadata["name"], url=url)
+
+
+def extract_pinned_mapping(request):
+    """Return name and version of the package targeted by *request* if pinned.
+
+    A request is pinned when it targets one exact version of a package (e.g.
+    "foo==0.1.0") or a Git tag which is a valid `PEP 440
+    <https://www.python.org/dev/peps/pep-0440/>`_ version (e.g.
+    "git@gitlab:rnd/foo.git@0.1.0"). In the latter case, the name of the
+    repository is used as package name.
+
+    :param request: package request.
+
+    :return: None if *request* is not pinned, otherwise a mapping in the form
+        of::
+
+            {
+                "name": "foo",
+                "version": "0.1.0",
+                "extra": ["test"]
+            }
+
+    """
+    match = GIT_REFERENCE_PATTERN.match(request)
+    if match is not None:
+        name, version = match.group("name"), match.group("ref")
+
+    else:
+        try:
+            requirement = Requirement(request)
+        except InvalidRequirement:
+            return
+
+        specifiers = list(requirement.specifier)
+        if requirement.url or len(specifiers) != 1:
+            return
+
+        specifier = specifiers[0]
+        if specifier.operator not in ("==", "===") or "*" in specifier.version:
+            return
+
+        name, version = requirement.name, specifier.version
+
+    try:
+        version = str(Version(version))
+    except InvalidVersion:
+        return
+
+    return {
+        "name": name,
+        "version": version,
+        "extra": extract_extra_keywords(request),
+    }
+
+
+def convert_request(request):
+    """Return *request* converted into a requirement understood by :term:`Pip`.
+
+    Private Git URLs are converted from ``git@host:group/project.git`` to
+    ``git+ssh://git@host/group/project.git``.
+
+    :param request: package request (e.g. "foo", "git@gitlab:rnd/foo.git").
+
+    :return: Converted request.
+
+    """
+    if GIT_PATTERN.match(request) is not None:
+        request = "git+ssh://" + request.replace(":", "/")
+
+    return request
 
 
-def fetch_mapping_from_environ(name, context_mapping, extra_keywords=None):
+def fetch_mapping_from_environ(
+    name, context_mapping, extra_keywords=None, metadata=None
+):
     """Return a mapping with information about the Python package *name*.
 
+    Metadata of the package are read from the library path defined by the
+    :envvar:`PYTHONPATH` within the environment (see
+    :func:`qip.metadata.fetch`). When *metadata* are already known from the
+    :term:`Pip` installation report, they take precedence over the metadata
+    read from the library path, which are then only used for entry points,
+    top level modules and location.
+
     :param name: Python package name.
 
     :param context_mapping: contain environment mapping and python mapping, as
@@ -143,6 +1103,12 @@ def fetch_mapping_from_environ(name, context_mapping, extra_keywords=None):
     :param extra_keywords: List of :term:`extra requirement keywords
         <extras_require>` if required. Default is None.
 
+    :param metadata: partial metadata mapping as returned by
+        :func:`qip.metadata.load_report_item`. Default is None.
+
+    :raise RuntimeError: if the package cannot be found within the library
+        path.
+
     :return: mapping with information about the package gathered from the
         environment. It should be in the form of::
 
@@ -175,19 +1141,24 @@ def fetch_mapping_from_environ(name, context_mapping, extra_keywords=None):
     """
     logger = logging.getLogger(__name__ + ".fetch_mapping_from_environ")
 
+    paths = [
+        path for path in context_mapping["environ"].get(
+            "PYTHONPATH", ""
+        ).split(os.pathsep) if len(path) and "$" not in path
+    ]
+
+    installed_metadata = qip.metadata.fetch(name, paths)
+    if installed_metadata is None:
+        raise RuntimeError(
+            "Impossible to fetch installed package for '{}'".format(name)
+        )
+
+    metadata = dict(installed_metadata, **(metadata or {}))
+
     # Extract package information and its dependency.
     dependency_mapping = extract_dependency_mapping(
-        name, context_mapping["environ"],
-        extra_keywords=extra_keywords
-    )
-
-    # Run pip show command to find extra information from extended metadata.
-    metadata = qip.command.execute(
-        "python -m pip show "
-        "--disable-pip-version-check "
-        "'{}' -v".format(name),
-        context_mapping["environ"],
-        quiet=True
+        metadata, extra_keywords=extra_keywords,
+        environment=context_mapping["python"].get("environment-markers")
     )
 
     mapping = {
@@ -205,13 +1176,10 @@ def fetch_mapping_from_environ(name, context_mapping, extra_keywords=None):
         "python": context_mapping["python"]
     }
 
-    match_description = re.search("(?<=Summary: ).+", metadata)
-    if match_description is not None:
-        mapping["description"] = match_description.group().strip()
+    if "summary" in metadata:
+        mapping["description"] = metadata["summary"]
 
-    match_location = re.search("(?<=Location: ).+", metadata)
-    if match_location is not None:
-        mapping["location"] = match_location.group().strip()
+    mapping["location"] = metadata["location"]
 
     if is_system_required(metadata):
         mapping["system"] = qip.system.query()
@@ -238,19 +1206,22 @@ def fetch_mapping_from_environ(name, context_mapping, extra_keywords=None):
     return mapping
 
 
-def extract_dependency_mapping(name, environ_mapping, extra_keywords=None):
+def extract_dependency_mapping(
+    metadata, extra_keywords=None, environment=None
+):
     """Return mapping for Python package with all dependency requirements.
 
-    :param name: Python package name.
-
-    :param environ_mapping: mapping of environment variables.
+    :param metadata: metadata mapping as returned by
+        :func:`qip.metadata.load`.
 
     :param extra_keywords: List of :term:`extra requirement keywords
         <extras_require>` if required. Default is None.
 
-    :return: None if the package *name* cannot be found in dependency mapping,
-        otherwise return dependency mapping. A valid mapping should be in the
-        form of::
+    :param environment: mapping of environment markers used to evaluate
+        requirements (see :func:`qip.metadata.extract_requirements`). Default
+        is None.
+
+    :return: dependency mapping in the form of::
 
             {
                 "package": {
@@ -265,24 +1236,35 @@ def extract_dependency_mapping(name, environ_mapping, extra_keywords=None):
             }
 
     """
-    identifier = name.lower()
-    if extra_keywords is not None and len(extra_keywords):
-        identifier += "[{}]".format(",".join(extra_keywords))
-
-    command = "python {script} {identifier}".format(
-        script=PACKAGE_INFO_SCRIPT,
-        identifier=identifier
-    )
-
-    result = qip.command.execute(command, environ_mapping, quiet=True)
-    try:
-        mapping = json.loads(result)
-    except ValueError:
-        raise RuntimeError(
-            "Impossible to fetch installed package for '{}'".format(identifier)
+    package_name = extract_safe_name(metadata["name"])
+
+    # Module name should be fetched from the metadata, but we will use the
+    # package name if the top_level.txt file is not available.
+    module_name = package_name
+    if len(metadata["top-level"]) > 0:
+        module_name = "\n".join(metadata["top-level"])
+
+    requirements = []
+
+    for requirement in qip.metadata.extract_requirements(
+        metadata, extra_keywords=extra_keywords, environment=environment
+    ):
+        value = "{}{}".format(
+            extract_safe_name(requirement.name).lower(),
+            requirement.specifier
         )
-
-    return mapping
+        if value not in requirements:
+            requirements.append(value)
+
+    return {
+        "package": {
+            "key": package_name.lower(),
+            "package_name": package_name,
+            "module_name": module_name,
+            "installed_version": metadata["version"],
+        },
+        "requirements": requirements
+    }
 
 
 def extract_identifier(mapping, extra_keywords=None):
@@ -315,6 +1297,20 @@ def extract_identifier(mapping, extra_keywords=None):
     )
 
 
+def extract_safe_name(name):
+    """Return *name* with runs of non-alphanumeric characters replaced.
+
+    This follows the same convention as :func:`pkg_resources.safe_name` which
+    is used to compute the package key.
+
+    :param name: Python package name (e.g. "foo_bar").
+
+    :return: Corresponding name (e.g. "foo-bar").
+
+    """
+    return re.sub(r"[^A-Za-z0-9.]+", "-", name)
+
+
 def extract_key(mapping, extra_keywords=None):
     """Compute key for package *mapping*.
 
@@ -350,13 +1346,16 @@ def is_system_required(metadata):
     Package `classifiers <https://pypi.org/classifiers/>`_ are retrieved from
     *metadata* to indicate if a specific operating system is required.
 
-    :param metadata: string resulting from the `pip show -v
-        <https://pip.pypa.io/en/stable/reference/pip_show/>`_ command.
+    :param metadata: metadata mapping as returned by
+        :func:`qip.metadata.load`.
 
     :return: Boolean value.
 
     """
-    classifiers = re.findall("Operating System :: .*", metadata)
+    classifiers = [
+        classifier for classifier in metadata.get("classifiers", [])
+        if classifier.startswith("Operating System ::")
+    ]
 
     # Check if the package is os independent.
     os_independent = (
@@ -377,8 +1376,8 @@ def extract_command_mapping(metadata, extra_keywords=None):
     Provided *extra_keywords* are used when commands depend on optional
     dependencies.
 
-    :param metadata: string resulting from the `pip show -v
-        <https://pip.pypa.io/en/stable/reference/pip_show/>`_ command.
+    :param metadata: metadata mapping as returned by
+        :func:`qip.metadata.load`.
 
     :param extra_keywords: List of :term:`extra requirement keywords
         <extras_require>` if required. Default is None.
@@ -395,35 +1394,20 @@ def extract_command_mapping(metadata, extra_keywords=None):
     """
     mapping = {}
 
-    # Convention: command name can only have alpha-numeric characters, hyphens
-    # and points.
-    entry_points = re.search(
-        r"Entry-points:\n\s*\[console_scripts]\n((?:\s*.+\s*=\s*.+\s*\n)+)",
-        metadata
-    )
-    if entry_points is not None:
-        entry_points = entry_points.group(1)
+    entry_points = metadata.get("entry-points", {}).get("console_scripts", {})
 
-        for element in entry_points.split("\n"):
-            element = element.strip()
-            if not len(element):
+    for alias, script in entry_points.items():
+        matched_extra = EXTRA_REQUEST_PATTERN.match(script)
+        if matched_extra:
+            authorized = set(matched_extra.group(1).split(","))
+            if authorized.difference(extra_keywords or []):
                 continue
 
-            alias, script = element.split("=")
-            alias = alias.strip()
-            script = script.strip()
-
-            matched_extra = EXTRA_REQUEST_PATTERN.match(script)
-            if matched_extra:
-                authorized = set(matched_extra.group(1).split(","))
-                if authorized.difference(extra_keywords or []):
-                    continue
-
-            command = script.split(":")[0].strip()
-            if command.endswith(".__main__"):
-                command = command[:-9]
+        command = script.split(":")[0].strip()
+        if command.endswith(".__main__"):
+            command = command[:-9]
 
-            mapping[alias] = "python -m {}".format(command)
+        mapping[alias] = "python -m {}".format(command)
 
     return mapping
 
@@ -0,0 +1,147 @@
+# :coding: utf-8
+
+import json
+import os
+import runpy
+import sys
+
+#: Line written on output and error streams once a command has completed. The
+#: exit code of the command is appended to the line.
+SENTINEL = "\x00qip-fork-server:"
+
+
+def serve():
+    """Execute Python commands received from standard input in child processes.
+
+    :term:`Pip` is imported once when the server starts, and a child process is
+    forked for each command, so that following commands do not have to pay for
+    the interpreter startup and the import of :term:`Pip`.
+
+    Each command is received as a :term:`JSON` encoded mapping on one line in
+    the form of::
+
+        {
+            "argv": ["-m", "pip", "install", "foo"],
+            "environ": {"PATH": "/path/to/bin"}
+        }
+
+    Output and errors of the command are written on the standard output and
+    error streams of the server, followed by a line starting with
+    :data:`SENTINEL` on each stream to indicate that the command has
+    completed. The same line is written once the server is ready.
+
+    :return: None
+
+    """
+    try:
+        import pip._internal.cli.main  # noqa: F401
+    except ImportError:
+        try:
+            import pip._internal  # noqa: F401
+        except ImportError:
+            pass
+
+    initial_paths = _extract_paths(os.environ)
+    _complete(0)
+
+    for line in iter(sys.stdin.readline, ""):
+        request = json.loads(line)
+
+        pid = os.fork()
+        if pid == 0:
+            _execute(request["argv"], request["environ"], initial_paths)
+
+        _, status = os.waitpid(pid, 0)
+
+        if os.WIFSIGNALED(status):
+            _complete(128 + os.WTERMSIG(status))
+        else:
+            _complete(os.WEXITSTATUS(status))
+
+
+def _execute(argv, environ, initial_paths):
+    """Execute Python command from *argv* within *environ* and exit.
+
+    *initial_paths* are the paths added to :data:`sys.path` from the
+    :envvar:`PYTHONPATH` of the server, which are replaced by paths from the
+    :envvar:`PYTHONPATH` within *environ*.
+
+    """
+    code = 0
+
+    try:
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, sys.stdin.fileno())
+
+        os.environ.clear()
+        os.environ.update(environ)
+
+        sys.path[:] = [
+            path for path in sys.path
+            if not len(path) or os.path.abspath(path) not in initial_paths
+        ]
+        sys.path[1:1] = _extract_paths(environ)
+        _refresh_distributions()
+
+        if argv[0] == "-m":
+            sys.argv = [argv[1]] + argv[2:]
+            runpy.run_module(argv[1], run_name="__main__", alter_sys=True)
+        else:
+            sys.argv = list(argv)
+            sys.path[0] = os.path.dirname(os.path.abspath(argv[0]))
+            runpy.run_path(argv[0], run_name="__main__")
+
+    except SystemExit as error:
+        code = error.code
+        if code is not None and not isinstance(code, int):
+            sys.stderr.write("{}\n".format(code))
+            code = 1
+
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+        code = 1
+
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code or 0)
+
+
+def _refresh_distributions():
+    """Refresh distributions discovered from :data:`sys.path`.
+
+    Distributions found by modules imported within the server are discarded so
+    that distributions from the new :data:`sys.path` are found instead.
+
+    """
+    try:
+        import importlib
+        importlib.invalidate_caches()
+    except AttributeError:
+        pass
+
+    for name in ("pkg_resources", "pip._vendor.pkg_resources"):
+        module = sys.modules.get(name)
+        if hasattr(module, "_initialize_master_working_set"):
+            module._initialize_master_working_set()
+
+
+def _extract_paths(environ):
+    """Return absolute paths from :envvar:`PYTHONPATH` within *environ*."""
+    return [
+        os.path.abspath(path)
+        for path in environ.get("PYTHONPATH", "").split(os.pathsep)
+        if len(path) and "$" not in path
+    ]
+
+
+def _complete(code):
+    """Indicate that a command has completed with exit *code*."""
+    for stream in (sys.stdout, sys.stderr):
+        stream.write("{}{}\n".format(SENTINEL, code))
+        stream.flush()
+
+
+if __name__ == "__main__":
+    sys.exit(serve())
@@ -3,6 +3,7 @@
 import argparse
 import json
 import os
+import platform
 import sys
 
 
@@ -21,7 +22,14 @@ def display_python_mapping():
         {
             "identifier": "2.7",
             "request": "python >= 2.7, < 2.8",
-            "library-path": "lib/python2.7/site-packages"
+            "library-path": "lib/python2.7/site-packages",
+            "executable": "/path/to/bin/python",
+            "pip-version": "20.3.4",
+            "environment-markers": {
+                "python_version": "2.7",
+                "python_full_version": "2.7.18",
+                ...
+            }
         }
 
 
@@ -43,12 +51,63 @@ def display_python_mapping():
             minor=python_version.minor,
             next_minor=python_version.minor + 1
         ),
-        "library-path": os.path.join("lib", name, "site-packages")
+        "library-path": os.path.join("lib", name, "site-packages"),
+        "executable": sys.executable,
+        "pip-version": fetch_pip_version(),
+        "environment-markers": fetch_environment_markers(),
     }
 
     print(json.dumps(mapping, sort_keys=True, indent=4))
 
 
+def fetch_pip_version():
+    """Return version of :term:`Pip` for current Python.
+
+    Return None if :term:`Pip` is not installed.
+
+    """
+    try:
+        import pip
+    except ImportError:
+        return
+
+    return getattr(pip, "__version__", None)
+
+
+def fetch_environment_markers():
+    """Return environment markers for current Python.
+
+    Markers are used to evaluate requirements of installed packages (see
+    `PEP 508 <https://www.python.org/dev/peps/pep-0508/>`_).
+
+    """
+    if hasattr(sys, "implementation"):
+        info = sys.implementation.version
+        implementation_version = "{0.major}.{0.minor}.{0.micro}".format(info)
+        if info.releaselevel != "final":
+            implementation_version += "{}{}".format(
+                info.releaselevel[0], info.serial
+            )
+        implementation_name = sys.implementation.name
+    else:
+        implementation_version = "0"
+        implementation_name = ""
+
+    return {
+        "implementation_name": implementation_name,
+        "implementation_version": implementation_version,
+        "os_name": os.name,
+        "platform_machine": platform.machine(),
+        "platform_release": platform.release(),
+        "platform_system": platform.system(),
+        "platform_version": platform.version(),
+        "python_full_version": platform.python_version(),
+        "platform_python_implementation": platform.python_implementation(),
+        "python_version": ".".join(platform.python_version_tuple()[:2]),
+        "sys_platform": sys.platform,
+    }
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         prog="python-info",
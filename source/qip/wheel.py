@@ -0,0 +1,477 @@
+# :coding: utf-8
+
+import base64
+import csv
+import hashlib
+import io
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import zipfile
+import zlib
+
+import six.moves
+
+import qip.command
+import qip.filesystem
+import qip.metadata
+
+#: Maximum number of threads used to extract members of a wheel.
+MAX_WORKERS = 8
+
+#: Size of chunks decompressed and written while extracting a member, so that
+#: large members are never held in memory.
+CHUNK_SIZE = 1024 * 1024
+
+#: Maximum length of a shebang line supported by the kernel. Scripts use a
+#: shell wrapper to execute interpreters with longer paths, as :term:`Pip`
+#: would do.
+MAX_SHEBANG_LENGTH = 127
+
+#: Compiled regular expression to detect the metadata folder of a wheel.
+DIST_INFO_PATTERN = re.compile(r"^(?P<name>[^/]+)\.dist-info/WHEEL$")
+
+#: Template used to create scripts from entry points.
+SCRIPT_TEMPLATE = """{shebang}
+# -*- coding: utf-8 -*-
+import re
+import sys
+from {module} import {import_name}
+if __name__ == "__main__":
+    sys.argv[0] = re.sub(r"(-script\\.pyw|\\.exe)?$", "", sys.argv[0])
+    sys.exit({function}())
+"""
+
+#: Size of the local file header of members within a zip archive.
+_LOCAL_HEADER_SIZE = 30
+
+#: Signature of the local file header of members within a zip archive.
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+
+def install(path, prefix, context_mapping, jobs=None):
+    """Install wheel *path* into *prefix* without :term:`Pip`.
+
+    The wheel is memory-mapped and its members are decompressed and written
+    in chunks by several threads. Files from the :file:`purelib` and
+    :file:`platlib` folders are installed into the library path, and
+    :file:`scripts`, :file:`headers` and :file:`data` folders are installed
+    into *prefix* as :term:`Pip` would do. Scripts use the path to the
+    targeted Python interpreter, scripts are created for console and GUI
+    entry points, Python files are byte-compiled with the targeted Python,
+    and the :file:`RECORD` file is rewritten with the files installed.
+
+    .. note::
+
+        Wheels are expected to be compatible with the targeted Python version,
+        which is the case for wheels from the persistent cache. Local wheel
+        files and requests from a wheelhouse are not unpacked by
+        this function and are still installed with :term:`Pip` (see
+        :func:`qip.package.build`).
+
+    :param path: path to the wheel file.
+
+    :param prefix: path to install the Python package to.
+
+    :param context_mapping: contain environment mapping and python mapping, as
+        returned from :func:`qip.fetch_context_mapping`.
+
+    :param jobs: Maximum number of threads used to extract members. Default is
+        None, which means that up to :data:`MAX_WORKERS` threads are used.
+
+    :raise RuntimeError: if the wheel cannot be read or if its files cannot
+        be written into *prefix*.
+
+    :return: metadata mapping of the distribution installed as returned by
+        :func:`qip.metadata.load`.
+
+    """
+    logger = logging.getLogger(__name__ + ".install")
+    logger.debug("Unpacking '{}'...".format(path))
+
+    python_mapping = context_mapping["python"]
+    shebang = _create_shebang(python_mapping.get("executable"))
+
+    prefix = os.path.abspath(prefix)
+    library_path = os.path.join(prefix, python_mapping["library-path"])
+
+    try:
+        with io.open(path, "rb") as stream:
+            with zipfile.ZipFile(stream) as archive:
+                members = [
+                    info for info in archive.infolist()
+                    if not info.filename.endswith("/")
+                ]
+
+            data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+    except (IOError, OSError, ValueError, zipfile.BadZipfile) as error:
+        raise RuntimeError(
+            "Impossible to read wheel '{}': {}".format(path, error)
+        )
+
+    try:
+        dist_info = _find_dist_info(members, path)
+        name = dist_info[:-len(".dist-info")].rsplit("-", 1)[0]
+
+        # Compute target of each member.
+        targets = {}
+
+        for info in members:
+            targets[info.filename] = _compute_target(
+                info.filename, dist_info, name, prefix, library_path,
+                python_mapping
+            )
+
+        # Create all folders before extracting files in parallel.
+        for folder in sorted(set(
+            os.path.dirname(target) for target in targets.values()
+        )):
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+
+        records = {}
+        lock = threading.Lock()
+        script_path = os.path.join(prefix, "bin") + os.sep
+
+        def _extract(info):
+            """Extract member *info* to its target."""
+            target = targets[info.filename]
+            chunks = _iter_member(data, info)
+
+            # Replace placeholder interpreter of scripts, which are small
+            # enough to be read at once.
+            is_script = target.startswith(script_path)
+            if is_script:
+                content = b"".join(chunks)
+                if content.startswith(b"#!python"):
+                    _, newline, remaining = content.partition(b"\n")
+                    content = shebang.encode("utf-8") + newline + remaining
+
+                chunks = [content]
+
+            digest = hashlib.sha256()
+            size = 0
+
+            with io.open(target, "wb") as stream:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    stream.write(chunk)
+
+            mode = (info.external_attr >> 16) & 0o777
+            if is_script or mode & 0o111:
+                os.chmod(target, os.stat(target).st_mode | 0o111)
+
+            with lock:
+                records[target] = _format_record(digest, size)
+
+        record_path = os.path.join(library_path, dist_info, "RECORD")
+
+        qip.filesystem.execute_parallel(
+            _extract, [
+                info for info in members
+                if targets[info.filename] != record_path
+            ],
+            jobs or MAX_WORKERS
+        )
+
+        metadata_path = os.path.join(library_path, dist_info)
+        metadata = qip.metadata.load(metadata_path)
+
+        # Create scripts from entry points.
+        for group in ("console_scripts", "gui_scripts"):
+            entry_points = metadata["entry-points"].get(group, {})
+
+            for alias, value in entry_points.items():
+                target = os.path.join(prefix, "bin", alias)
+                content = _create_script(value, shebang).encode("utf-8")
+
+                if not os.path.isdir(os.path.dirname(target)):
+                    os.makedirs(os.path.dirname(target))
+
+                with io.open(target, "wb") as stream:
+                    stream.write(content)
+
+                os.chmod(target, 0o755)
+                records[target] = _compute_record(content)
+
+        records.update(
+            _compile(library_path, context_mapping["environ"], targets)
+        )
+
+        for _name, content in [("INSTALLER", b"qip\n"), ("REQUESTED", b"")]:
+            target = os.path.join(metadata_path, _name)
+            with io.open(target, "wb") as stream:
+                stream.write(content)
+
+            records[target] = _compute_record(content)
+
+        _write_record(record_path, records, library_path)
+
+    except (IOError, OSError) as error:
+        raise RuntimeError(
+            "Impossible to install wheel '{}': {}".format(path, error)
+        )
+
+    finally:
+        data.close()
+
+    logger.debug(
+        "Wheel '{}' unpacked with {} files.".format(path, len(records) + 1)
+    )
+
+    return metadata
+
+
+def _find_dist_info(members, path):
+    """Return name of metadata folder from wheel *members*.
+
+    :raise RuntimeError: if wheel *path* does not contain exactly one metadata
+        folder.
+
+    """
+    names = [
+        match.group("name") for match in (
+            DIST_INFO_PATTERN.match(info.filename) for info in members
+        ) if match is not None
+    ]
+
+    if len(names) != 1:
+        raise RuntimeError(
+            "Impossible to find metadata folder in wheel '{}'".format(path)
+        )
+
+    return names[0] + ".dist-info"
+
+
+def _compute_target(
+    name, dist_info, distribution_name, prefix, library_path, python_mapping
+):
+    """Return path where wheel member *name* should be installed.
+
+    :raise RuntimeError: if the member targets an unknown installation
+        folder or a path outside of its installation folder.
+
+    """
+    data_folder = dist_info[:-len(".dist-info")] + ".data/"
+
+    if name.startswith(data_folder):
+        scheme, _, relative_path = name[len(data_folder):].partition("/")
+
+        if scheme in ("purelib", "platlib"):
+            root = library_path
+        elif scheme == "scripts":
+            root = os.path.join(prefix, "bin")
+        elif scheme == "headers":
+            root = os.path.join(
+                prefix, "include", "python{}".format(
+                    python_mapping["identifier"]
+                ), distribution_name
+            )
+        elif scheme == "data":
+            root = prefix
+        else:
+            raise RuntimeError(
+                "Unknown installation folder for '{}'".format(name)
+            )
+
+    else:
+        root = library_path
+        relative_path = name
+
+    target = os.path.normpath(os.path.join(root, relative_path))
+    if not target.startswith(os.path.normpath(root) + os.sep):
+        raise RuntimeError("Invalid path for '{}'".format(name))
+
+    return target
+
+
+def _iter_member(data, info):
+    """Yield decompressed content of member *info* from mapped *data*.
+
+    The content is decompressed in chunks of :data:`CHUNK_SIZE` bytes and
+    its checksum is verified once the last chunk has been decompressed.
+
+    :raise RuntimeError: if the member is encrypted, compressed with an
+        unsupported method or corrupted.
+
+    """
+    if info.flag_bits & 0x1:
+        raise RuntimeError("Encrypted member '{}'".format(info.filename))
+
+    if info.compress_type == zipfile.ZIP_DEFLATED:
+        decompressor = zlib.decompressobj(-15)
+    elif info.compress_type == zipfile.ZIP_STORED:
+        decompressor = None
+    else:
+        raise RuntimeError(
+            "Unsupported compression for '{}'".format(info.filename)
+        )
+
+    offset = info.header_offset
+    header = data[offset:offset + _LOCAL_HEADER_SIZE]
+    if header[:4] != _LOCAL_HEADER_SIGNATURE:
+        raise RuntimeError("Invalid header for '{}'".format(info.filename))
+
+    name_size, extra_size = struct.unpack("<HH", header[26:30])
+    start = offset + _LOCAL_HEADER_SIZE + name_size + extra_size
+    end = start + info.compress_size
+
+    checksum = 0
+
+    try:
+        for position in six.moves.range(start, end, CHUNK_SIZE):
+            chunk = data[position:min(position + CHUNK_SIZE, end)]
+            if decompressor is not None:
+                chunk = decompressor.decompress(chunk)
+
+            checksum = zlib.crc32(chunk, checksum)
+            yield chunk
+
+        if decompressor is not None:
+            chunk = decompressor.flush()
+            checksum = zlib.crc32(chunk, checksum)
+            yield chunk
+
+    except zlib.error:
+        raise RuntimeError("Corrupted member '{}'".format(info.filename))
+
+    if checksum & 0xffffffff != info.CRC:
+        raise RuntimeError("Corrupted member '{}'".format(info.filename))
+
+
+def _compute_record(content):
+    """Return tuple with hash and size of *content* for :file:`RECORD` file."""
+    return _format_record(hashlib.sha256(content), len(content))
+
+
+def _format_record(digest, size):
+    """Return tuple with *digest* and *size* for :file:`RECORD` file.
+
+    *digest* should be a :func:`hashlib.sha256` object.
+
+    """
+    encoded = base64.urlsafe_b64encode(digest.digest())
+    return "sha256={}".format(encoded.decode("ascii").rstrip("=")), size
+
+
+def _compile(library_path, environ_mapping, targets):
+    """Byte-compile Python files installed into *library_path*.
+
+    Files are compiled with the Python found within *environ_mapping*, as
+    :term:`Pip` would do. Files which cannot be compiled are ignored.
+
+    *targets* is the mapping of paths installed per member name. Only files
+    compiled from these paths are recorded, which are the only Python files
+    within *library_path* as each package is installed in its own prefix.
+
+    Return mapping of records per path of compiled file created.
+
+    """
+    logger = logging.getLogger(__name__ + "._compile")
+
+    sources = sorted(
+        target for target in targets.values()
+        if target.endswith(".py") and target.startswith(library_path + os.sep)
+    )
+
+    if not len(sources):
+        return {}
+
+    try:
+        qip.command.execute(
+            "python -m compileall -q {}".format(
+                six.moves.shlex_quote(library_path)
+            ), environ_mapping, quiet=True
+        )
+    except RuntimeError as error:
+        logger.debug("Some files could not be compiled:\n{}".format(error))
+
+    records = {}
+
+    for source in sources:
+        folder, name = os.path.split(source)
+        cache_folder = os.path.join(folder, "__pycache__")
+
+        # Python 3 writes compiled files within a cache folder, while
+        # Python 2 writes them next to the source file.
+        paths = [source + "c"]
+        if os.path.isdir(cache_folder):
+            paths += [
+                os.path.join(cache_folder, _name)
+                for _name in os.listdir(cache_folder)
+                if _name.startswith(name[:-3] + ".")
+                and _name.endswith(".pyc")
+            ]
+
+        for path in paths:
+            if os.path.isfile(path):
+                with io.open(path, "rb") as stream:
+                    records[path] = _compute_record(stream.read())
+
+    return records
+
+
+def _write_record(path, records, library_path):
+    """Write :file:`RECORD` file *path* from *records*.
+
+    Paths are recorded relatively to *library_path*.
+
+    """
+    rows = []
+
+    for target, (digest, size) in sorted(records.items()):
+        relative_path = os.path.relpath(target, library_path)
+        rows.append([relative_path.replace(os.sep, "/"), digest, str(size)])
+
+    rows.append([
+        os.path.relpath(path, library_path).replace(os.sep, "/"), "", ""
+    ])
+
+    stream = six.moves.StringIO()
+    csv.writer(stream, lineterminator="\n").writerows(rows)
+
+    with io.open(path, "w", encoding="utf-8") as _stream:
+        _stream.write(six.text_type(stream.getvalue()))
+
+
+def _create_shebang(executable):
+    """Return shebang line to execute scripts with *executable*.
+
+    A shell wrapper is returned if *executable* is too long or contains spaces
+    to be used in a shebang line, as :term:`Pip` would do. The Python found in
+    the :envvar:`PATH` is used if *executable* is None.
+
+    """
+    if executable is None:
+        return "#!/usr/bin/env python"
+
+    if len(executable) + 2 > MAX_SHEBANG_LENGTH or " " in executable:
+        return "#!/bin/sh\n'''exec' {} \"$0\" \"$@\"\n' '''".format(
+            six.moves.shlex_quote(executable)
+        )
+
+    return "#!{}".format(executable)
+
+
+def _create_script(value, shebang):
+    """Return content of script for entry point *value*.
+
+    *value* should be in the form of "module:function [extra]", and *shebang*
+    is the first line of the script as returned by :func:`_create_shebang`.
+
+    """
+    value = value.split("[", 1)[0].strip()
+    module, _, function = value.partition(":")
+
+    return SCRIPT_TEMPLATE.format(
+        shebang=shebang,
+        module=module.strip(),
+        import_name=function.strip().split(".")[0],
+        function=function.strip()
+    )
+
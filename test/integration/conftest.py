@@ -11,7 +11,6 @@ import wiz.utility
 import qip.command
 import qip.system
 from qip.environ import PYTHON_INFO_SCRIPT
-from qip.package import PACKAGE_INFO_SCRIPT
 
 #: Context mapping mocked for Python 2.7
 PYTHON_MAPPING_27 = {
@@ -29,97 +28,123 @@ PACKAGE_OUTPUT_PATH = {
     "baz": os.path.join("Baz", "Baz-4.5.2-py27"),
 }
 
-#: Collection of all packages dependency mapping.
-PACKAGE_DEPENDENCY_MAPPING = {
+#: Collection of metadata per package request.
+METADATA_MAPPING = {
     "foo": {
-        "package": {
-            "installed_version": "1.2.0",
-            "key": "foo",
-            "module_name": "foo",
-            "package_name": "Foo"
-        },
-        "requirements": [
-            "bim >= 3.4, < 5"
-        ]
+        "name": "Foo",
+        "version": "1.2.0",
+        "metadata": [
+            "Summary: Foo Python Package.",
+            "Requires-Dist: bim (<5,>=3.4)",
+        ],
+        "entry_points": textwrap.dedent(
+            """
+            [console_scripts]
+            foo = foo.__main__:main
+            foo1 = foo.other:main [test]
+            """
+        ),
     },
     "bar": {
-        "package": {
-            "installed_version": "0.1.0",
-            "key": "bar",
-            "module_name": "bar",
-            "package_name": "Bar"
-        },
-        "requirements": [
-            "foo"
-        ]
+        "name": "Bar",
+        "version": "0.1.0",
+        "metadata": [
+            "Summary: Bar Python Package.",
+            "Classifier: Operating System :: Unix",
+            "Requires-Dist: foo",
+        ],
     },
     "bim": {
-        "package": {
-            "installed_version": "3.6.2",
-            "key": "bim",
-            "module_name": "bim",
-            "package_name": "BIM"
-        }
-    },
-    "bim[test1]": {
-        "package": {
-            "installed_version": "3.6.2",
-            "key": "bim",
-            "module_name": "bim",
-            "package_name": "BIM"
-        },
-        "requirements": [
-            "baz"
-        ]
+        "name": "BIM",
+        "version": "3.6.2",
+        "metadata": [
+            "Summary: Bim Python Package.",
+            "Requires-Dist: baz ; extra == 'test1'",
+        ],
+        "entry_points": textwrap.dedent(
+            """
+            [console_scripts]
+            bim1 = bim.__main__:main [test1]
+            bim2 = bim.other:main [test1, test2]
+            """
+        ),
     },
     "baz": {
-        "package": {
-            "installed_version": "4.5.2",
-            "key": "baz",
-            "module_name": "baz",
-            "package_name": "Baz"
-        },
+        "name": "Baz",
+        "version": "4.5.2",
+        "metadata": [
+            "Summary: Baz Python Package.",
+        ],
     },
-
 }
 
-#: Collection of metadata per package name.
-METADATA_MAPPING = {
-    "foo": textwrap.dedent(
-        """
-        Summary: Foo Python Package.
-        Location: /path/to/foo
-        Entry-points:
-          [console_scripts]
-          foo = foo.__main__:main
-          foo1 = foo.other:main [test]
-        """
-    ),
-    "bar": textwrap.dedent(
-        """
-        Summary: Bar Python Package.
-        Location: /path/to/bar
-        Classifiers:
-          Operating System :: Unix
-        """
-    ),
-    "bim": textwrap.dedent(
-        """
-        Summary: Bim Python Package.
-        Location: /path/to/bim
-        Entry-points:
-          [console_scripts]
-          bim1 = bim.__main__:main [test1]
-          bim2 = bim.other:main [test1, test2]
-        """
-    ),
-    "baz": textwrap.dedent(
-        """
-        Summary: Baz Python Package.
-        Location: /path/to/baz
-        """
-    ),
-}
+
+def _write_metadata(path, name, editable_mode=False):
+    """Write metadata of package *name* installed within prefix *path*.
+
+    Packages installed in *editable_mode* are linked to a source folder
+    named after the package within *path*.
+
+    """
+    mapping = METADATA_MAPPING[name]
+    library_path = os.path.join(path, PYTHON_MAPPING_27["library-path"])
+
+    if editable_mode:
+        source_path = os.path.join(path, "src", name)
+        metadata_path = os.path.join(
+            source_path, "{}.egg-info".format(mapping["name"])
+        )
+        metadata_file = "PKG-INFO"
+        os.makedirs(library_path)
+        with open(os.path.join(
+            library_path, "{}.egg-link".format(mapping["name"])
+        ), "w") as stream:
+            stream.write("{}\n.".format(source_path))
+
+    else:
+        metadata_path = os.path.join(
+            library_path, "{}-{}.dist-info".format(
+                mapping["name"], mapping["version"]
+            )
+        )
+        metadata_file = "METADATA"
+
+    os.makedirs(metadata_path)
+
+    lines = [
+        "Name: {}".format(mapping["name"]),
+        "Version: {}".format(mapping["version"]),
+    ] + mapping["metadata"]
+
+    if editable_mode:
+        # Egg metadata record requirements in a separated file.
+        requirements = [
+            line[len("Requires-Dist: "):] for line in lines
+            if line.startswith("Requires-Dist: ")
+        ]
+        lines = [
+            line for line in lines if not line.startswith("Requires-Dist: ")
+        ]
+
+        with open(os.path.join(metadata_path, "requires.txt"), "w") as stream:
+            for requirement in requirements:
+                requirement, _, marker = requirement.partition(";")
+                if len(marker):
+                    extra = re.search(r"extra == '(.+)'", marker).group(1)
+                    stream.write("[{}]\n".format(extra))
+                stream.write("{}\n".format(requirement.strip()))
+
+    with open(os.path.join(metadata_path, metadata_file), "w") as stream:
+        stream.write("\n".join(lines) + "\n")
+
+    with open(os.path.join(metadata_path, "top_level.txt"), "w") as stream:
+        stream.write("{}\n".format(name))
+
+    if "entry_points" in mapping:
+        with open(
+            os.path.join(metadata_path, "entry_points.txt"), "w"
+        ) as stream:
+            stream.write(mapping["entry_points"])
 
 
 @pytest.fixture(autouse=True)
@@ -137,16 +162,11 @@ def mock_commands(mocker):
             requirement = wiz.utility.get_requirement(request)
             _id = "-".join([requirement.name] + sorted(requirement.extras))
             os.makedirs(os.path.join(output, PACKAGE_OUTPUT_PATH[_id]))
+            _write_metadata(
+                output, requirement.name, editable_mode=" -e " in command
+            )
             return "Installing collected packages: {}".format(requirement.name)
 
-        elif command.startswith("python {}".format(PACKAGE_INFO_SCRIPT)):
-            identifier = command.rsplit(" ", 1)[-1]
-            return json.dumps(PACKAGE_DEPENDENCY_MAPPING[identifier])
-
-        elif command.startswith("python -m pip show"):
-            name = re.search(r"'(.+)'", command).group(1)
-            return METADATA_MAPPING[name]
-
     mocker.patch.object(qip.command, "execute", _command_execute)
 
 
@@ -8,10 +8,8 @@ from click.testing import CliRunner
 import wiz
 import wiz.registry
 import wiz.config
-import wiz.definition
 
 import qip.command_line
-import qip.command
 
 
 @pytest.fixture(autouse=True)
@@ -217,7 +215,13 @@ def test_install_editable_mode(temporary_directory, logger):
 
     path = os.path.join(definitions_path, expected_definitions[0])
     definition = wiz.load_definition(path)
-    assert definition.data() == {
+    data = definition.data()
+
+    # Packages installed in editable mode are located in source folder.
+    location = data["variants"][0].pop("install-location")
+    assert location.endswith(os.path.join("src", "bar"))
+
+    assert data == {
         "identifier": "bar",
         "version": "0.1.0",
         "description": "Bar Python Package.",
@@ -233,7 +237,6 @@ def test_install_editable_mode(temporary_directory, logger):
         "variants": [
             {
                 "identifier": "2.7",
-                "install-location": "/path/to/bar",
                 "requirements": [
                     "python >= 2.7, < 2.8",
                     "library::foo[2.7]"
@@ -269,7 +272,13 @@ def test_install_editable_mode(temporary_directory, logger):
 
     path = os.path.join(definitions_path, expected_definitions[2])
     definition = wiz.load_definition(path)
-    assert definition.data() == {
+    data = definition.data()
+
+    # Packages installed in editable mode are located in source folder.
+    location = data["variants"][0].pop("install-location")
+    assert location.endswith(os.path.join("src", "foo"))
+
+    assert data == {
         "identifier": "foo",
         "version": "1.2.0",
         "description": "Foo Python Package.",
@@ -283,7 +292,6 @@ def test_install_editable_mode(temporary_directory, logger):
         "variants": [
             {
                 "identifier": "2.7",
-                "install-location": "/path/to/foo",
                 "requirements": [
                     "python >= 2.7, < 2.8",
                     "library::bim[2.7] >=3.4, <5"
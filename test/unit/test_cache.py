@@ -0,0 +1,535 @@
+# :coding: utf-8
+
+import errno
+import os
+import subprocess
+
+import pytest
+
+import qip.cache
+import qip.system
+
+
+@pytest.fixture()
+def mocked_system_query(mocker):
+    """Return mocked 'qip.system.query' function."""
+    return mocker.patch.object(
+        qip.system, "query", return_value={
+            "platform": "linux",
+            "arch": "x86_64",
+            "os": {"name": "centos", "major_version": 7}
+        }
+    )
+
+
+def _create_file(path, size, timestamp):
+    """Create file of *size* bytes with *timestamp* as access time."""
+    folder = os.path.dirname(path)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    with open(path, "wb") as stream:
+        stream.write(b"0" * size)
+
+    os.utime(path, (timestamp, timestamp))
+
+
+def _git(*args, **kwargs):
+    """Execute git command and return its output."""
+    environ = dict(os.environ)
+    environ.update({
+        "GIT_AUTHOR_NAME": "qip", "GIT_AUTHOR_EMAIL": "qip@localhost",
+        "GIT_COMMITTER_NAME": "qip", "GIT_COMMITTER_EMAIL": "qip@localhost",
+    })
+
+    return subprocess.check_output(
+        ["git"] + list(args), env=environ, cwd=kwargs.get("cwd")
+    ).decode("utf-8").strip()
+
+
+@pytest.fixture()
+def git_repository(temporary_directory):
+    """Return path to bare Git repository with one commit."""
+    source_path = os.path.join(temporary_directory, "source")
+    repository_path = os.path.join(temporary_directory, "foo.git")
+
+    _git("init", "--quiet", source_path)
+    _create_file(os.path.join(source_path, "setup.py"), 10, 1000)
+    _git("add", "setup.py", cwd=source_path)
+    _git("commit", "--quiet", "-m", "Initial commit", cwd=source_path)
+    _git("clone", "--quiet", "--bare", source_path, repository_path)
+    _git("remote", "add", "origin", repository_path, cwd=source_path)
+
+    return repository_path
+
+
+def test_fetch_pip_path(temporary_directory):
+    """Return Pip cache path."""
+    path = qip.cache.fetch_pip_path(temporary_directory)
+    assert path == os.path.join(temporary_directory, "pip")
+    assert os.path.isdir(path)
+
+
+@pytest.mark.parametrize("name, folder", [
+    ("foo-0.1.0-py2.py3-none-any.whl", os.path.join("foo", "0.1.0")),
+    (
+        "Foo_Bar-1.0-1-cp27-cp27mu-linux_x86_64.whl",
+        os.path.join("foo-bar", "1.0")
+    ),
+    ("foo-1.0a1-py3-none-any.whl", os.path.join("foo", "1.0a1")),
+], ids=[
+    "pure",
+    "with-build-tag",
+    "pre-release",
+])
+def test_store_wheel(
+    temporary_directory, mocked_system_query, name, folder
+):
+    """Store wheel in cache."""
+    wheel_path = os.path.join(temporary_directory, "build", name)
+    _create_file(wheel_path, 10, 1000)
+
+    path = os.path.join(temporary_directory, "cache")
+
+    result = qip.cache.store_wheel(path, wheel_path, "2.7")
+    assert result == os.path.join(
+        path, "wheels", "linux-x86_64-centos7", "py27", folder, name
+    )
+    assert os.listdir(os.path.dirname(result)) == [name]
+
+    with open(result, "rb") as stream:
+        assert stream.read() == b"0" * 10
+
+
+def test_store_wheel_fail(temporary_directory, mocked_system_query):
+    """Fail to store wheel with incorrect name."""
+    wheel_path = os.path.join(temporary_directory, "build", "foo.whl")
+    _create_file(wheel_path, 10, 1000)
+
+    with pytest.raises(ValueError) as error:
+        qip.cache.store_wheel(temporary_directory, wheel_path, "2.7")
+
+    assert (
+        "Name and version could not be extracted from 'foo.whl'."
+    ) in str(error.value)
+
+
+def test_fetch_wheel(temporary_directory, mocked_system_query):
+    """Fetch wheel from cache."""
+    wheel_path = os.path.join(
+        temporary_directory, "build", "Foo_Bar-1.0-py3-none-any.whl"
+    )
+    _create_file(wheel_path, 10, 1000)
+
+    path = os.path.join(temporary_directory, "cache")
+    target = qip.cache.store_wheel(path, wheel_path, "3.7")
+    os.utime(target, (1000, 1000))
+
+    result = qip.cache.fetch_wheel(path, "foo-bar", "1.0.0", "3.7")
+    assert result == target
+
+    # Access time is updated.
+    assert os.stat(result).st_atime > 1000
+    assert os.stat(result).st_mtime == 1000
+
+    assert qip.cache.fetch_wheel(path, "foo-bar", "1.1", "3.7") is None
+    assert qip.cache.fetch_wheel(path, "foo-bar", "1.0", "2.7") is None
+    assert qip.cache.fetch_wheel(path, "foo-bar", "incorrect", "3.7") is None
+
+
+def test_fetch_revision_wheel(temporary_directory, mocked_system_query):
+    """Fetch wheel built from commit."""
+    wheel_path = os.path.join(
+        temporary_directory, "build", "Foo_Bar-1.0-py3-none-any.whl"
+    )
+    _create_file(wheel_path, 10, 1000)
+
+    path = os.path.join(temporary_directory, "cache")
+    assert qip.cache.fetch_revision_wheel(path, "0123", "3.7") is None
+
+    target = qip.cache.store_wheel(path, wheel_path, "3.7", revision="0123")
+    assert target == os.path.join(
+        path, "wheels", "linux-x86_64-centos7", "py37", "_revisions", "0123",
+        "Foo_Bar-1.0-py3-none-any.whl"
+    )
+
+    assert qip.cache.fetch_revision_wheel(path, "0123", "3.7") == target
+    assert qip.cache.fetch_revision_wheel(path, "0123", "2.7") is None
+    assert qip.cache.fetch_revision_wheel(path, "4567", "3.7") is None
+
+    # Commits are not mixed up with versions.
+    assert qip.cache.fetch_wheel(path, "foo-bar", "1.0", "3.7") is None
+
+    assert qip.cache.fetch_revision_mapping(path, "0123") == {
+        "name": "Foo_Bar", "version": "1.0"
+    }
+
+
+def test_fetch_revision_mapping(temporary_directory):
+    """Record and fetch package built from revision."""
+    assert qip.cache.fetch_revision_mapping(temporary_directory, "0123") is None
+
+    qip.cache.store_revision_mapping(
+        temporary_directory, "0123", {"name": "foo", "version": "0.1.0"}
+    )
+    assert qip.cache.fetch_revision_mapping(temporary_directory, "0123") == {
+        "name": "foo", "version": "0.1.0"
+    }
+    assert os.listdir(os.path.join(temporary_directory, "revisions")) == [
+        "0123.json"
+    ]
+
+
+def test_fetch_shim_path(temporary_directory):
+    """Return shim path."""
+    path = qip.cache.fetch_shim_path(temporary_directory)
+    assert path == os.path.join(temporary_directory, "shims")
+    assert os.path.isdir(path)
+
+
+def test_fetch_context(temporary_directory):
+    """Record and fetch context mapping."""
+    assert qip.cache.fetch_context(temporary_directory, "0123") is None
+
+    qip.cache.store_context(temporary_directory, "0123", {"KEY": "VALUE"})
+    assert qip.cache.fetch_context(temporary_directory, "0123") == {
+        "KEY": "VALUE"
+    }
+    assert os.listdir(os.path.join(temporary_directory, "contexts")) == [
+        "0123.json"
+    ]
+
+
+def test_fetch_source_fingerprint(mocker, temporary_directory):
+    """Fingerprint source tree and reuse hashes of files unchanged."""
+    path = os.path.join(temporary_directory, "cache")
+    source_path = os.path.join(temporary_directory, "source")
+
+    _create_file(os.path.join(source_path, "setup.py"), 10, 1000)
+    _create_file(os.path.join(source_path, "foo", "__init__.py"), 10, 1000)
+
+    fingerprint = qip.cache.fetch_source_fingerprint(path, source_path)
+    assert qip.cache.fetch_source_fingerprint(path, source_path) == fingerprint
+    assert os.listdir(os.path.join(path, "sources"))[0].endswith(".json")
+
+    # Files unchanged are not read again.
+    mocked_hash_file = mocker.patch.object(qip.cache, "_hash_file")
+    assert qip.cache.fetch_source_fingerprint(path, source_path) == fingerprint
+    mocked_hash_file.assert_not_called()
+    mocker.stopall()
+
+    # Modified file changes fingerprint.
+    _create_file(os.path.join(source_path, "foo", "__init__.py"), 10, 2000)
+    assert qip.cache.fetch_source_fingerprint(path, source_path) == fingerprint
+
+    with open(os.path.join(source_path, "foo", "__init__.py"), "w") as stream:
+        stream.write("__version__ = '0.1.0'")
+
+    _fingerprint = qip.cache.fetch_source_fingerprint(path, source_path)
+    assert _fingerprint != fingerprint
+
+    # New file changes fingerprint.
+    _create_file(os.path.join(source_path, "foo", "bar.py"), 10, 1000)
+    assert qip.cache.fetch_source_fingerprint(path, source_path) not in [
+        fingerprint, _fingerprint
+    ]
+
+
+def test_fetch_source_fingerprint_excluded(temporary_directory):
+    """Fingerprint source tree without build artifacts and ignored files."""
+    path = os.path.join(temporary_directory, "cache")
+    source_path = os.path.join(temporary_directory, "source")
+
+    _create_file(os.path.join(source_path, "setup.py"), 10, 1000)
+    fingerprint = qip.cache.fetch_source_fingerprint(path, source_path)
+
+    with open(os.path.join(source_path, ".gitignore"), "w") as stream:
+        stream.write("# Comment\n/data/\n*.log\n")
+
+    _fingerprint = qip.cache.fetch_source_fingerprint(path, source_path)
+    assert _fingerprint != fingerprint
+
+    for name in [
+        os.path.join("build", "lib", "foo.py"),
+        os.path.join("dist", "foo-0.1.0.tar.gz"),
+        os.path.join("foo.egg-info", "PKG-INFO"),
+        os.path.join("foo", "__pycache__", "bar.cpython-37.pyc"),
+        os.path.join("foo", "bar.pyc"),
+        os.path.join("data", "foo.json"),
+        "debug.log",
+    ]:
+        _create_file(os.path.join(source_path, name), 10, 1000)
+
+    assert qip.cache.fetch_source_fingerprint(path, source_path) == _fingerprint
+
+    # Folder named as a build artifact is only excluded at the top-level.
+    _create_file(os.path.join(source_path, "foo", "build", "bar.py"), 10, 1000)
+    assert qip.cache.fetch_source_fingerprint(path, source_path) != _fingerprint
+
+
+def test_fetch_source_fingerprint_from_git(temporary_directory):
+    """Fingerprint source tree managed by Git."""
+    path = os.path.join(temporary_directory, "cache")
+    source_path = os.path.join(temporary_directory, "source")
+
+    _git("init", "--quiet", source_path)
+    _create_file(os.path.join(source_path, "setup.py"), 10, 1000)
+    _create_file(os.path.join(source_path, "foo", "__init__.py"), 10, 1000)
+
+    with open(os.path.join(source_path, "foo", ".gitignore"), "w") as stream:
+        stream.write("*.tmp\n")
+
+    fingerprint = qip.cache.fetch_source_fingerprint(path, source_path)
+
+    # Untracked files are considered unless ignored by nested ".gitignore".
+    _create_file(os.path.join(source_path, "foo", "bar.tmp"), 10, 1000)
+    _create_file(os.path.join(source_path, "foo.egg-info", "PKG-INFO"), 1, 1)
+    assert qip.cache.fetch_source_fingerprint(path, source_path) == fingerprint
+
+    _create_file(os.path.join(source_path, "foo", "bar.py"), 10, 1000)
+    assert qip.cache.fetch_source_fingerprint(path, source_path) != fingerprint
+
+
+def test_fetch_git_mirror(temporary_directory, git_repository):
+    """Clone and update Git mirror."""
+    path = os.path.join(temporary_directory, "cache")
+
+    mirror_path = qip.cache.fetch_git_mirror(path, git_repository)
+    assert os.path.dirname(mirror_path) == os.path.join(path, "git")
+    assert os.path.basename(mirror_path).startswith("foo-")
+    assert mirror_path.endswith(".git")
+
+    commit = _git("rev-parse", "HEAD", cwd=git_repository)
+    assert _git("--git-dir", mirror_path, "rev-parse", "HEAD") == commit
+
+    # Push new commit and tag to repository.
+    source_path = os.path.join(temporary_directory, "source")
+    _create_file(os.path.join(source_path, "foo.py"), 10, 1000)
+    _git("add", "foo.py", cwd=source_path)
+    _git("commit", "--quiet", "-m", "Second commit", cwd=source_path)
+    _git("tag", "0.1.0", cwd=source_path)
+    _git("push", "--quiet", "origin", "HEAD", "0.1.0", cwd=source_path)
+
+    commit = _git("rev-parse", "HEAD", cwd=git_repository)
+
+    assert qip.cache.fetch_git_mirror(path, git_repository) == mirror_path
+    assert _git("--git-dir", mirror_path, "rev-parse", "HEAD") == commit
+    assert _git("--git-dir", mirror_path, "rev-parse", "0.1.0^{}") == commit
+
+    # Mirror is considered as a single entry.
+    statistics = qip.cache.fetch_statistics(path)
+    assert list(statistics["sections"].keys()) == ["git"]
+
+    result = qip.cache.prune(path, 0)
+    assert result["files"] == statistics["files"]
+    assert os.listdir(path) == [".lock"]
+
+
+def test_fetch_git_mirror_fail(temporary_directory):
+    """Fail to clone Git mirror."""
+    path = os.path.join(temporary_directory, "cache")
+
+    with pytest.raises(RuntimeError):
+        qip.cache.fetch_git_mirror(
+            path, os.path.join(temporary_directory, "incorrect.git")
+        )
+
+    # Only the lock file remains.
+    names = os.listdir(os.path.join(path, "git"))
+    assert len(names) == 1
+    assert names[0].endswith(".git.lock")
+
+
+def test_acquire_shared_lock(temporary_directory):
+    """Acquire shared lock several times."""
+    path = os.path.join(temporary_directory, "cache")
+
+    stream1 = qip.cache.acquire_lock(path, shared=True)
+    stream2 = qip.cache.acquire_lock(path, shared=True, blocking=False)
+    assert stream1 is not None
+    assert stream2 is not None
+    assert os.path.isfile(os.path.join(path, ".lock"))
+
+    # Exclusive lock cannot be acquired while shared locks are held.
+    assert qip.cache.acquire_lock(path, blocking=False) is None
+
+    qip.cache.release_lock(stream1)
+    qip.cache.release_lock(stream2)
+
+    stream = qip.cache.acquire_lock(path, blocking=False)
+    assert stream is not None
+    qip.cache.release_lock(stream)
+
+
+def test_acquire_lock_without_permission(mocker, temporary_directory):
+    """Fail to acquire lock on cache owned by another user."""
+    path = os.path.join(temporary_directory, "cache")
+    mocker.patch.object(
+        qip.cache, "_acquire",
+        side_effect=IOError(errno.EACCES, "Permission denied")
+    )
+
+    with pytest.raises(RuntimeError) as error:
+        qip.cache.acquire_lock(path)
+
+    assert str(error.value) == (
+        "Impossible to use cache '{}': [Errno 13] Permission denied"
+        .format(path)
+    )
+
+
+def test_acquire_lock_without_fcntl(mocker, temporary_directory):
+    """Acquire lock without locking when fcntl is not available."""
+    mocker.patch.object(qip.cache, "fcntl", None)
+    path = os.path.join(temporary_directory, "cache")
+
+    stream1 = qip.cache.acquire_lock(path)
+    stream2 = qip.cache.acquire_lock(path, blocking=False)
+    assert stream1 is not None
+    assert stream2 is not None
+
+    qip.cache.release_lock(stream1)
+    qip.cache.release_lock(stream2)
+
+
+def test_fetch_statistics(temporary_directory):
+    """Return cache statistics."""
+    _create_file(
+        os.path.join(temporary_directory, "pip", "http", "a"), 10, 1000
+    )
+    _create_file(
+        os.path.join(temporary_directory, "pip", "wheels", "b"), 20, 1000
+    )
+    _create_file(os.path.join(temporary_directory, "other", "c"), 5, 1000)
+    _create_file(os.path.join(temporary_directory, ".lock"), 0, 1000)
+
+    assert qip.cache.fetch_statistics(temporary_directory) == {
+        "files": 3,
+        "size": 35,
+        "sections": {
+            "pip": {"files": 2, "size": 30},
+            "other": {"files": 1, "size": 5},
+        }
+    }
+
+
+def test_fetch_statistics_empty(temporary_directory):
+    """Return statistics for empty cache."""
+    path = os.path.join(temporary_directory, "cache")
+    assert qip.cache.fetch_statistics(path) == {
+        "files": 0, "size": 0, "sections": {}
+    }
+
+
+def test_prune(temporary_directory):
+    """Remove least recently used files from cache."""
+    _create_file(os.path.join(temporary_directory, "pip", "a", "1"), 10, 3000)
+    _create_file(os.path.join(temporary_directory, "pip", "b", "2"), 10, 1000)
+    _create_file(os.path.join(temporary_directory, "pip", "b", "3"), 10, 2000)
+    _create_file(os.path.join(temporary_directory, "pip", "c", "4"), 10, 4000)
+
+    result = qip.cache.prune(temporary_directory, 25)
+    assert result == {"files": 2, "size": 20}
+
+    assert sorted(os.listdir(os.path.join(temporary_directory, "pip"))) == [
+        "a", "c"
+    ]
+
+
+def test_prune_all(temporary_directory):
+    """Remove all files from cache."""
+    _create_file(os.path.join(temporary_directory, "pip", "a", "1"), 10, 3000)
+    _create_file(os.path.join(temporary_directory, "pip", "b", "2"), 10, 1000)
+
+    result = qip.cache.prune(temporary_directory, 0)
+    assert result == {"files": 2, "size": 20}
+
+    assert os.listdir(temporary_directory) == [".lock"]
+
+
+def test_prune_within_limit(temporary_directory):
+    """Do not remove files from cache within size limit."""
+    _create_file(os.path.join(temporary_directory, "pip", "a", "1"), 10, 3000)
+
+    result = qip.cache.prune(temporary_directory, 10)
+    assert result == {"files": 0, "size": 0}
+
+    assert os.path.isfile(os.path.join(temporary_directory, "pip", "a", "1"))
+
+
+def test_prune_locked(temporary_directory):
+    """Do not prune cache used by another process."""
+    _create_file(os.path.join(temporary_directory, "pip", "a", "1"), 10, 3000)
+
+    stream = qip.cache.acquire_lock(temporary_directory, shared=True)
+
+    result = qip.cache.prune(temporary_directory, 0, blocking=False)
+    assert result is None
+
+    qip.cache.release_lock(stream)
+
+    assert os.path.isfile(os.path.join(temporary_directory, "pip", "a", "1"))
+
+
+def test_prune_missing(temporary_directory):
+    """Prune cache which does not exist."""
+    path = os.path.join(temporary_directory, "cache")
+    assert qip.cache.prune(path, 0) == {"files": 0, "size": 0}
+
+
+@pytest.mark.parametrize("value, expected", [
+    (1024, 1024),
+    ("1024", 1024),
+    ("10K", 10 * 1024),
+    ("500M", 500 * 1024 ** 2),
+    ("500MB", 500 * 1024 ** 2),
+    ("1.5G", int(1.5 * 1024 ** 3)),
+    ("10 GiB", 10 * 1024 ** 3),
+    ("2t", 2 * 1024 ** 4),
+], ids=[
+    "integer",
+    "bytes",
+    "kilobytes",
+    "megabytes",
+    "megabytes-with-suffix",
+    "float",
+    "gibibytes",
+    "lowercase",
+])
+def test_parse_size(value, expected):
+    """Parse size."""
+    assert qip.cache.parse_size(value) == expected
+
+
+@pytest.mark.parametrize("value", [
+    "big", "-1", "10X", ""
+], ids=[
+    "word",
+    "negative",
+    "incorrect-unit",
+    "empty",
+])
+def test_parse_size_fail(value):
+    """Fail to parse incorrect size."""
+    with pytest.raises(ValueError) as error:
+        qip.cache.parse_size(value)
+
+    assert "Size '{}' is incorrect.".format(value) in str(error.value)
+
+
+@pytest.mark.parametrize("size, expected", [
+    (0, "0 B"),
+    (512, "512 B"),
+    (1536, "1.5 KB"),
+    (5 * 1024 ** 3, "5.0 GB"),
+    (2 * 1024 ** 4, "2.0 TB"),
+], ids=[
+    "empty",
+    "bytes",
+    "kilobytes",
+    "gigabytes",
+    "terabytes",
+])
+def test_format_size(size, expected):
+    """Format size."""
+    assert qip.cache.format_size(size) == expected
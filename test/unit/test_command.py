@@ -1,6 +1,11 @@
 # :coding: utf-8
 
+import os
+import shlex
+import signal
 import subprocess
+import sys
+import time
 
 import pytest
 
@@ -20,20 +25,20 @@ def mocked_process(mocker):
     return mocker.Mock()
 
 
-def test_execute_verbose(mocked_subprocess, mocked_process, logger):
-    """Execute a command verbose."""
-    mocked_subprocess.return_value = mocked_process
-    mocked_process.poll.side_effect = [None, None, None, False]
-    mocked_process.stdout.readline.side_effect = [
-        b"line one\n", b"line two\n", b"line three\n"
-    ]
-    mocked_process.stderr.readlines.return_value = []
+def _python_command(script):
+    """Return command executing Python *script*."""
+    return "{} -c \"{}\"".format(sys.executable, script)
 
-    command = "pip install foo"
-    output = qip.command.execute(command, {})
+
+def test_execute_verbose(logger):
+    """Execute a command verbose."""
+    command = _python_command(
+        "print('line one'); print('line two'); print('line three')"
+    )
+    output = qip.command.execute(command, dict(os.environ))
 
     assert logger.debug.call_count == 4
-    logger.debug.assert_any_call("pip install foo")
+    logger.debug.assert_any_call(command)
     logger.debug.assert_any_call("line one")
     logger.debug.assert_any_call("line two")
     logger.debug.assert_any_call("line three")
@@ -41,27 +46,398 @@ def test_execute_verbose(mocked_subprocess, mocked_process, logger):
     assert output == "line one\nline two\nline three\n"
 
 
-def test_execute_quiet(mocked_subprocess, mocked_process, capsys):
+def test_execute_quiet(logger):
     """Execute a command quiet."""
-    mocked_subprocess.return_value = mocked_process
-    mocked_process.communicate.return_value = (
-        b"line one\nline two\nline three\n", b""
+    command = _python_command(
+        "print('line one'); print('line two'); print('line three')"
     )
+    output = qip.command.execute(command, dict(os.environ), quiet=True)
 
-    command = "pip install foo"
-    output = qip.command.execute(command, {}, quiet=True)
-
-    stdout_message, _ = capsys.readouterr()
-    assert stdout_message == ""
+    logger.debug.assert_called_once_with(command)
     assert output == "line one\nline two\nline three\n"
 
 
-def test_execute_stderr(mocked_subprocess, mocked_process):
+def test_execute_stderr():
     """Fail to execute a command."""
-    mocked_subprocess.return_value = mocked_process
-    mocked_process.communicate.return_value = (b"", b"stderr")
-    command = "pip install foo"
+    command = _python_command("import sys; sys.stderr.write('stderr')")
 
     with pytest.raises(RuntimeError) as error:
-        qip.command.execute(command, {}, quiet=True)
+        qip.command.execute(command, dict(os.environ), quiet=True)
     assert str(error.value) == "stderr"
+
+
+def test_execute_exit_code():
+    """Fail to execute a command exiting with non-zero code."""
+    command = _python_command("import sys; sys.exit(3)")
+
+    with pytest.raises(RuntimeError) as error:
+        qip.command.execute(command, dict(os.environ), quiet=True)
+
+    assert str(error.value) == (
+        "Command '{}' exited with code 3".format(command)
+    )
+
+
+def test_execute_spooled_output(mocker):
+    """Execute a command writing more output than kept in memory."""
+    mocker.patch.object(qip.command, "OUTPUT_SPOOL_SIZE", 100)
+
+    command = _python_command(
+        "import sys; "
+        "[sys.stdout.write('output %d\\n' % i) for i in range(1000)]"
+    )
+    output = qip.command.execute(command, dict(os.environ), quiet=True)
+
+    assert output == "".join("output {}\n".format(i) for i in range(1000))
+
+
+def test_execute_large_outputs(mocker):
+    """Execute a command writing large amount of data on both streams."""
+    mocker.patch.object(qip.command, "ERROR_TAIL_SIZE", 2)
+
+    # Error stream is filled before output stream is written, which would
+    # block the command if streams were not read simultaneously.
+    command = _python_command(
+        "import sys; "
+        "[sys.stderr.write('error %d\\n' % i) for i in range(100000)]; "
+        "[sys.stdout.write('output %d\\n' % i) for i in range(100000)]"
+    )
+
+    with pytest.raises(RuntimeError) as error:
+        qip.command.execute(command, dict(os.environ), quiet=True)
+
+    assert str(error.value) == (
+        "[99998 lines truncated]\nerror 99998\nerror 99999\n"
+    )
+
+
+def test_execute_with_log_file(mocker, temporary_directory):
+    """Execute commands with log file."""
+    mocker.patch.object(qip.command, "ERROR_TAIL_SIZE", 1)
+    path = os.path.join(temporary_directory, "logs", "foo.log")
+
+    command1 = _python_command("print('line one')")
+    command2 = _python_command(
+        "import sys; sys.stderr.write('error one\\nerror two\\n')"
+    )
+
+    with qip.command.log_file(path):
+        qip.command.execute(command1, dict(os.environ), quiet=True)
+
+        with pytest.raises(RuntimeError) as error:
+            qip.command.execute(command2, dict(os.environ), quiet=True)
+
+    assert str(error.value) == (
+        "[1 lines truncated, see '{}']\nerror two\n".format(path)
+    )
+
+    # Commands executed outside of the context are not logged.
+    qip.command.execute(command1, dict(os.environ), quiet=True)
+
+    with open(path, "r") as stream:
+        assert stream.read() == (
+            "$ {}\nline one\n$ {}\nerror one\nerror two\n".format(
+                command1, command2
+            )
+        )
+
+
+def test_log_file_none(temporary_directory):
+    """Execute commands without log file."""
+    with qip.command.log_file(None):
+        qip.command.execute(
+            _python_command("print('line one')"), dict(os.environ), quiet=True
+        )
+
+    assert os.listdir(temporary_directory) == []
+
+
+@pytest.fixture()
+def mocked_timer(mocker, logger):
+    """Return mocked timer expiring once 'ready' is written by the command.
+
+    Commands must be executed without the *quiet* option.
+
+    """
+    timers = []
+
+    def _create_timer(interval, function):
+        """Return timer which is never started."""
+        timer = mocker.Mock(interval=interval, function=function)
+        timers.append(timer)
+        return timer
+
+    def _debug(message):
+        """Expire last timer created when 'ready' is received."""
+        if message == "ready":
+            timers[-1].function()
+
+    logger.debug.side_effect = _debug
+
+    return mocker.patch.object(
+        qip.command.threading, "Timer", side_effect=_create_timer
+    )
+
+
+def test_execute_timeout(mocked_timer):
+    """Kill process group of a command exceeding its time limit."""
+    # Child process keeps the output stream open, so the command would never
+    # complete if the child process was not killed as well.
+    command = _python_command(
+        "import signal, subprocess, sys; "
+        "subprocess.Popen("
+        "[sys.executable, '-c', 'import signal; signal.pause()']); "
+        "sys.stdout.write('ready\\n'); sys.stdout.flush(); "
+        "signal.pause()"
+    )
+
+    with pytest.raises(RuntimeError) as error:
+        qip.command.execute(command, dict(os.environ), timeout=0.5)
+
+    mocked_timer.assert_called_once()
+    assert mocked_timer.call_args[0][0] == 0.5
+
+    assert str(error.value) == (
+        "Command '{}' exceeded time limit of 0.5 seconds".format(command)
+    )
+
+
+def test_execute_with_time_limit(mocker, mocked_subprocess):
+    """Execute commands with time limits."""
+    mocker.patch.object(time, "time", return_value=100)
+    mocked_timer = mocker.patch.object(qip.command.threading, "Timer")
+    mocker.patch.object(
+        qip.command, "_communicate", return_value=("output", "", 0)
+    )
+
+    with qip.command.time_limit(timeout=60, total_timeout=50):
+        qip.command.execute("pip install foo", {})
+
+        with qip.command.time_limit(timeout=10):
+            qip.command.execute("pip install bar", {})
+
+        # Limit set for the command overrides the default limit.
+        qip.command.execute("pip install baz", {}, timeout=20)
+
+    # Limits are reset outside of context.
+    qip.command.execute("pip install bim", {})
+
+    assert mocked_timer.call_count == 3
+    assert [_call[0][0] for _call in mocked_timer.call_args_list] == [
+        50, 10, 20
+    ]
+    assert qip.command._TIME_LIMITS == {"timeout": None, "deadline": None}
+
+
+def test_execute_time_limit_exceeded(mocked_subprocess):
+    """Fail to execute a command once total time limit is exceeded."""
+    with qip.command.time_limit(total_timeout=0):
+        with pytest.raises(RuntimeError) as error:
+            qip.command.execute("pip install foo", {})
+
+    assert str(error.value) == (
+        "Time limit exceeded before executing 'pip install foo'"
+    )
+    mocked_subprocess.assert_not_called()
+
+
+def test_execute_interrupted(mocker, mocked_subprocess, mocked_process):
+    """Kill process group of a command when execution is interrupted."""
+    mocked_subprocess.return_value = mocked_process
+    mocked_kill = mocker.patch.object(qip.command, "_kill")
+    mocker.patch.object(
+        qip.command, "_communicate", side_effect=KeyboardInterrupt
+    )
+
+    with pytest.raises(KeyboardInterrupt):
+        qip.command.execute("pip install foo", {})
+
+    mocked_kill.assert_called_once_with(mocked_process)
+    assert mocked_process not in qip.command._PROCESSES
+
+
+@pytest.fixture()
+def script_path(temporary_directory):
+    """Return path to Python script displaying its arguments."""
+    path = os.path.join(temporary_directory, "script.py")
+
+    with open(path, "w") as stream:
+        stream.write(
+            "import os, signal, sys\n"
+            "if sys.argv[1:] == ['error']:\n"
+            "    sys.stderr.write('error')\n"
+            "elif sys.argv[1:] == ['exit']:\n"
+            "    sys.exit(3)\n"
+            "elif sys.argv[1:] == ['wait']:\n"
+            "    sys.stdout.write('ready\\n')\n"
+            "    sys.stdout.flush()\n"
+            "    signal.pause()\n"
+            "else:\n"
+            "    print(' '.join(sys.argv[1:] + [os.environ['FOO']]))\n"
+        )
+
+    return path
+
+
+def test_execute_with_fork_server(script_path):
+    """Execute Python commands with fork server."""
+    environ = dict(os.environ, FOO="bar")
+
+    with qip.command.fork_server():
+        assert qip.command.execute(
+            "python {} one".format(script_path), environ, quiet=True
+        ) == "one bar\n"
+
+        assert len(qip.command._FORK_SERVERS) == 1
+        server = list(qip.command._FORK_SERVERS.values())[0]
+
+        assert qip.command.execute(
+            "python {} two".format(script_path), dict(environ, FOO="baz"),
+            quiet=True
+        ) == "two baz\n"
+
+        with pytest.raises(RuntimeError) as error:
+            qip.command.execute(
+                "python {} error".format(script_path), environ, quiet=True
+            )
+
+        assert str(error.value) == "error"
+
+        with pytest.raises(RuntimeError) as error:
+            qip.command.execute(
+                "python {} exit".format(script_path), environ, quiet=True
+            )
+
+        assert str(error.value) == (
+            "Command 'python {} exit' exited with code 3".format(script_path)
+        )
+
+        # Server is reused for all commands.
+        assert list(qip.command._FORK_SERVERS.values()) == [server]
+        assert server.poll() is None
+
+    # Server is stopped when leaving the context.
+    assert qip.command._FORK_SERVERS == {}
+    assert server.poll() is not None
+
+
+def test_execute_with_fork_server_timeout(mocked_timer, script_path):
+    """Stop fork server executing a command exceeding its time limit."""
+    environ = dict(os.environ, FOO="bar")
+
+    with qip.command.fork_server():
+        with pytest.raises(RuntimeError):
+            qip.command.execute(
+                "python {} wait".format(script_path), environ, timeout=0.5
+            )
+
+        assert qip.command._FORK_SERVERS == {}
+
+        # A new server is started for following commands.
+        assert qip.command.execute(
+            "python {} one".format(script_path), environ, quiet=True
+        ) == "one bar\n"
+
+
+def test_execute_with_fork_server_disabled(mocker, script_path):
+    """Execute Python commands without fork server."""
+    mocked_send = mocker.patch.object(qip.command, "_send_to_fork_server")
+
+    with qip.command.fork_server(enabled=False):
+        assert qip.command.execute(
+            "python {} one".format(script_path), dict(os.environ, FOO="bar"),
+            quiet=True
+        ) == "one bar\n"
+
+    mocked_send.assert_not_called()
+
+
+@pytest.mark.parametrize("command, expected", [
+    ("python -m pip install foo", True),
+    ("python /path/to/script.py foo", True),
+    ("python -c 'print(1)'", False),
+    ("python -m", False),
+    ("python", False),
+    ("git clone foo", False),
+], ids=[
+    "module",
+    "script",
+    "options",
+    "incomplete",
+    "interpreter",
+    "other",
+])
+def test_is_forkable(command, expected):
+    """Indicate whether command can be sent to fork server."""
+    assert qip.command._is_forkable(shlex.split(command)) is expected
+
+
+def test_execute_registered(mocked_subprocess, mocked_process):
+    """Register process while the command is executed."""
+    mocked_subprocess.return_value = mocked_process
+    mocked_process.wait.return_value = 0
+
+    def _readline():
+        assert mocked_process in qip.command._PROCESSES
+        return b""
+
+    mocked_process.stdout.readline.side_effect = _readline
+    mocked_process.stderr.readline.side_effect = _readline
+
+    output = qip.command.execute("pip install foo", {}, quiet=True)
+    assert output == ""
+    assert mocked_process not in qip.command._PROCESSES
+
+
+def test_kill(mocker):
+    """Kill process group which did not exit after termination."""
+    mocker.patch.object(time, "time", side_effect=[100, 100, 102, 106])
+    mocked_sleep = mocker.patch.object(time, "sleep")
+    mocked_killpg = mocker.patch.object(os, "killpg")
+
+    process = mocker.Mock(pid=1)
+    process.poll.return_value = None
+
+    qip.command._kill(process)
+
+    assert mocked_killpg.call_args_list == [
+        mocker.call(1, signal.SIGTERM),
+        mocker.call(1, signal.SIGKILL),
+    ]
+    assert mocked_sleep.call_count == 2
+
+
+def test_kill_exited(mocker):
+    """Kill remaining processes of group once process exited."""
+    mocker.patch.object(time, "time", return_value=100)
+    mocked_sleep = mocker.patch.object(time, "sleep")
+    mocked_killpg = mocker.patch.object(os, "killpg")
+    mocked_killpg.side_effect = [None, OSError]
+
+    process = mocker.Mock(pid=1)
+    process.poll.return_value = -15
+
+    qip.command._kill(process)
+
+    assert mocked_killpg.call_args_list == [
+        mocker.call(1, signal.SIGTERM),
+        mocker.call(1, signal.SIGKILL),
+    ]
+    mocked_sleep.assert_not_called()
+
+
+def test_terminate(mocker):
+    """Terminate all commands currently executed."""
+    mocked_killpg = mocker.patch.object(os, "killpg")
+    mocked_killpg.side_effect = [None, OSError]
+
+    process1 = mocker.Mock(pid=1)
+    process2 = mocker.Mock(pid=2)
+
+    mocker.patch.object(qip.command, "_PROCESSES", {process1, process2})
+
+    qip.command.terminate()
+
+    assert mocked_killpg.call_count == 2
+    mocked_killpg.assert_any_call(1, signal.SIGTERM)
+    mocked_killpg.assert_any_call(2, signal.SIGTERM)
@@ -18,6 +18,10 @@ def reset_configuration(mocker):
     """Ensure that no personal configuration is fetched during tests."""
     mocker.patch.object(os.path, "expanduser", return_value="__HOME__")
 
+    # Ensure that persistent cache is not set from environment.
+    mocker.patch.dict(os.environ)
+    os.environ.pop("QIP_CACHE_PATH", None)
+
     # Mock temporary directory path before reloading module to reset default
     # values.
     mocker.patch.object(tempfile, "gettempdir", return_value="/tmp")
@@ -33,6 +37,30 @@ def mocked_install(mocker):
     return mocker.patch.object(qip, "install")
 
 
+@pytest.fixture()
+def mocked_cache_prune(mocker):
+    """Return mocked 'qip.cache.prune' function."""
+    return mocker.patch.object(qip.cache, "prune")
+
+
+@pytest.fixture()
+def mocked_cache_fetch_statistics(mocker):
+    """Return mocked 'qip.cache.fetch_statistics' function."""
+    return mocker.patch.object(qip.cache, "fetch_statistics")
+
+
+@pytest.fixture()
+def mocked_filesystem_collect_garbage(mocker):
+    """Return mocked 'qip.filesystem.collect_garbage' function."""
+    return mocker.patch.object(qip.filesystem, "collect_garbage")
+
+
+@pytest.fixture()
+def mocked_filesystem_prune_store(mocker):
+    """Return mocked 'qip.filesystem.prune_store' function."""
+    return mocker.patch.object(qip.filesystem, "prune_store")
+
+
 @pytest.fixture()
 def mocked_get_defaults_registries(mocker):
     """Return mocked 'wiz.registry.get_defaults' function."""
@@ -77,7 +105,21 @@ def test_missing_output(mocked_install, mocked_get_defaults_registries):
         python_target=sys.executable,
         registry_paths=["/registry1", "/registry2"],
         update_existing_definitions=False,
-        continue_on_error=False
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
     )
     mocked_get_defaults_registries.assert_called_once_with()
 
@@ -119,7 +161,21 @@ def test_install_packages(
         python_target=sys.executable,
         registry_paths=["/registry1", "/registry2"],
         update_existing_definitions=False,
-        continue_on_error=False
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
     )
     mocked_get_defaults_registries.assert_called_once_with()
 
@@ -146,7 +202,21 @@ def test_install_package_with_custom_paths(
         python_target=sys.executable,
         registry_paths=["/registry1", "/registry2"],
         update_existing_definitions=False,
-        continue_on_error=False
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
     )
     mocked_get_defaults_registries.assert_called_once_with()
 
@@ -173,7 +243,21 @@ def test_install_package_without_dependencies(
         python_target=sys.executable,
         registry_paths=["/registry1", "/registry2"],
         update_existing_definitions=False,
-        continue_on_error=False
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
     )
     mocked_get_defaults_registries.assert_called_once_with()
 
@@ -200,7 +284,21 @@ def test_install_package_overwrite(
         python_target=sys.executable,
         registry_paths=["/registry1", "/registry2"],
         update_existing_definitions=False,
-        continue_on_error=False
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
     )
     mocked_get_defaults_registries.assert_called_once_with()
 
@@ -227,7 +325,21 @@ def test_install_package_skip(
         python_target=sys.executable,
         registry_paths=["/registry1", "/registry2"],
         update_existing_definitions=False,
-        continue_on_error=False
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
     )
     mocked_get_defaults_registries.assert_called_once_with()
 
@@ -254,7 +366,21 @@ def test_install_package_editable(
         python_target=sys.executable,
         registry_paths=["/registry1", "/registry2"],
         update_existing_definitions=False,
-        continue_on_error=False
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
     )
     mocked_get_defaults_registries.assert_called_once_with()
 
@@ -284,7 +410,21 @@ def test_install_package_update_output(
             os.path.join("/tmp", "qip", "definitions")
         ],
         update_existing_definitions=True,
-        continue_on_error=False
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
     )
     mocked_get_defaults_registries.assert_called_once_with()
 
@@ -309,7 +449,21 @@ def test_install_package_ignore_registries(
         python_target=sys.executable,
         registry_paths=[],
         update_existing_definitions=False,
-        continue_on_error=False
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
     )
     mocked_get_defaults_registries.assert_not_called()
 
@@ -338,7 +492,21 @@ def test_install_package_update_and_ignore_registries(
             os.path.join("/tmp", "qip", "definitions")
         ],
         update_existing_definitions=True,
-        continue_on_error=False
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
     )
     mocked_get_defaults_registries.assert_not_called()
 
@@ -366,11 +534,748 @@ def test_install_continue_on_error(
         python_target=sys.executable,
         registry_paths=["/registry1", "/registry2"],
         update_existing_definitions=False,
-        continue_on_error=True
+        continue_on_error=True,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
+    )
+    mocked_get_defaults_registries.assert_called_once_with()
+
+
+def test_install_with_jobs(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages with several workers."""
+    mocked_get_defaults_registries.return_value = ["/registry1", "/registry2"]
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, ["foo", "bar", "--jobs", "4"]
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo", "bar"), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=["/registry1", "/registry2"],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=4,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
     )
     mocked_get_defaults_registries.assert_called_once_with()
 
 
+def test_install_with_plan(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages with dependency closure resolved first."""
+    mocked_get_defaults_registries.return_value = ["/registry1", "/registry2"]
+
+    runner = CliRunner()
+    result = runner.invoke(qip.command_line.install, ["foo", "--plan"])
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo",), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=["/registry1", "/registry2"],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=1,
+        plan=True,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
+    )
+    mocked_get_defaults_registries.assert_called_once_with()
+
+
+def test_install_with_stage_jobs(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages with several workers for specific stages."""
+    mocked_get_defaults_registries.return_value = ["/registry1", "/registry2"]
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, [
+            "foo", "-j", "2", "--stage-jobs", "copy=8",
+            "--stage-jobs", "export=4"
+        ]
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo",), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=["/registry1", "/registry2"],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=2,
+        plan=False,
+        stage_jobs={"copy": 8, "export": 4},
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
+    )
+
+
+@pytest.mark.parametrize("value", [
+    "copy", "copy=0", "copy=two", "incorrect=2"
+], ids=[
+    "missing-number",
+    "null-number",
+    "incorrect-number",
+    "incorrect-stage",
+])
+def test_install_with_incorrect_stage_jobs(
+    mocked_install, mocked_get_defaults_registries, value
+):
+    """Fail to install packages with incorrect stage jobs."""
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, ["foo", "--stage-jobs", value]
+    )
+    assert result.exit_code == 2
+    assert "must be in the form of STAGE=NUMBER" in result.output
+
+    mocked_install.assert_not_called()
+
+
+def test_install_with_incorrect_jobs(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Fail to install packages with incorrect number of workers."""
+    runner = CliRunner()
+    result = runner.invoke(qip.command_line.install, ["foo", "-j", "0"])
+    assert result.exit_code == 2
+    assert result.exception
+
+    mocked_install.assert_not_called()
+
+
+def test_install_with_cache_options(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages with custom cache options."""
+    mocked_get_defaults_registries.return_value = ["/registry1", "/registry2"]
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, [
+            "foo", "--cache-path", "/path/to/cache",
+            "--cache-size-limit", "500M"
+        ]
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo",), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=["/registry1", "/registry2"],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path="/path/to/cache",
+        cache_size_limit=500 * 1024 ** 2,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
+    )
+
+
+def test_install_with_cache_environ(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages with persistent cache set from environment."""
+    mocked_get_defaults_registries.return_value = ["/registry1", "/registry2"]
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, ["foo"],
+        env={"QIP_CACHE_PATH": "/path/to/cache"}
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo",), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=["/registry1", "/registry2"],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path="/path/to/cache",
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
+    )
+
+
+def test_install_without_cache(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages with temporary cache."""
+    mocked_get_defaults_registries.return_value = ["/registry1", "/registry2"]
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, ["foo", "--no-cache"],
+        env={"QIP_CACHE_PATH": "/path/to/cache"}
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo",), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=["/registry1", "/registry2"],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
+    )
+
+
+def test_install_with_log_path(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages with log path."""
+    mocked_get_defaults_registries.return_value = []
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, ["foo", "--log-path", "/path/to/logs"]
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo",), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=[],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path="/path/to/logs",
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
+    )
+
+
+def test_install_with_timeouts(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages with time limits."""
+    mocked_get_defaults_registries.return_value = []
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, [
+            "foo", "--timeout", "600", "--total-timeout", "3600"
+        ]
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo",), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=[],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=600,
+        total_timeout=3600,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
+    )
+
+
+def test_install_with_fork_server(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages with fork server."""
+    mocked_get_defaults_registries.return_value = []
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, ["foo", "--fork-server"]
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo",), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=[],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=True,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
+    )
+
+
+def test_install_with_batch(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages in batch."""
+    mocked_get_defaults_registries.return_value = []
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, ["foo", "--batch"]
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo",), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=[],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=True,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
+    )
+
+
+def test_install_with_stage_in_output(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages with staging folders within output path."""
+    mocked_get_defaults_registries.return_value = []
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, ["foo", "--stage-in-output"]
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo",), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=[],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=True,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
+    )
+
+
+def test_install_with_copy_jobs(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages with several threads to copy files."""
+    mocked_get_defaults_registries.return_value = []
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, ["foo", "--copy-jobs", "8"]
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo",), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=[],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=8,
+        delta_overwrite=False,
+        deduplicate=False
+    )
+
+
+def test_install_with_delta_overwrite(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages with delta overwrite."""
+    mocked_get_defaults_registries.return_value = []
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, ["foo", "--delta-overwrite"]
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo",), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=[],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=True,
+        deduplicate=False
+    )
+
+
+def test_install_with_deduplicate(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Install packages with files deduplicated."""
+    mocked_get_defaults_registries.return_value = []
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, ["foo", "--deduplicate"]
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_install.assert_called_once_with(
+        ("foo",), os.path.join("/tmp", "qip", "packages"),
+        definition_path=os.path.join("/tmp", "qip", "definitions"),
+        editable_mode=False,
+        no_dependencies=False,
+        overwrite=None,
+        python_target=sys.executable,
+        registry_paths=[],
+        update_existing_definitions=False,
+        continue_on_error=False,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=True
+    )
+
+
+def test_install_with_incorrect_cache_size_limit(
+    mocked_install, mocked_get_defaults_registries
+):
+    """Fail to install packages with incorrect cache size limit."""
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.install, ["foo", "--cache-size-limit", "big"]
+    )
+    assert result.exit_code == 2
+    assert "Size 'big' is incorrect." in result.output
+
+    mocked_install.assert_not_called()
+
+
+def test_cache_stats(mocked_cache_fetch_statistics):
+    """Display cache statistics."""
+    mocked_cache_fetch_statistics.return_value = {
+        "files": 3, "size": 3072,
+        "sections": {"pip": {"files": 3, "size": 3072}}
+    }
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.main,
+        ["cache", "--cache-path", "/path/to/cache", "stats"]
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_cache_fetch_statistics.assert_called_once_with("/path/to/cache")
+
+
+@pytest.mark.parametrize("options, environ, path", [
+    (["--cache-path", "/path/to/cache"], {}, "/path/to/cache"),
+    ([], {"QIP_CACHE_PATH": "/path/to/env/cache"}, "/path/to/env/cache"),
+], ids=[
+    "with-cache-path",
+    "with-environment",
+])
+def test_cache_prune(mocked_cache_prune, options, environ, path):
+    """Prune cache."""
+    mocked_cache_prune.return_value = {"files": 0, "size": 0}
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.main, ["cache"] + options + ["prune"], env=environ
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_cache_prune.assert_called_once_with(path, 5 * 1024 ** 3)
+
+
+def test_cache_prune_without_cache_path(mocked_cache_prune):
+    """Fail to prune cache when no persistent cache path is set."""
+    runner = CliRunner()
+    result = runner.invoke(qip.command_line.main, ["cache", "prune"])
+    assert result.exit_code == 2
+    assert "No persistent cache path set" in result.output
+
+    mocked_cache_prune.assert_not_called()
+
+
+def test_cache_prune_fails(mocked_cache_prune):
+    """Fail to prune cache which cannot be used."""
+    mocked_cache_prune.side_effect = RuntimeError("Oh Shit")
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.main,
+        ["cache", "--cache-path", "/path/to/cache", "prune"]
+    )
+    assert result.exit_code == 1
+    assert "Error: Impossible to prune cache:\n\nOh Shit" in result.output
+
+
+def test_cache_prune_with_size_limit(mocked_cache_prune):
+    """Prune cache with custom size limit."""
+    mocked_cache_prune.return_value = {"files": 0, "size": 0}
+
+    runner = CliRunner()
+    result = runner.invoke(
+        qip.command_line.main, [
+            "cache", "--cache-path", "/path/to/cache", "prune",
+            "--size-limit", "0"
+        ]
+    )
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_cache_prune.assert_called_once_with("/path/to/cache", 0)
+
+
+@pytest.mark.parametrize("options, path", [
+    ([], os.path.join("/tmp", "qip", "packages")),
+    (["-o", "/path/to/packages"], "/path/to/packages"),
+], ids=[
+    "default",
+    "with-output-path",
+])
+def test_gc(
+    mocked_filesystem_collect_garbage, mocked_filesystem_prune_store,
+    options, path
+):
+    """Remove temporary folders and unused files from output path."""
+    mocked_filesystem_collect_garbage.return_value = []
+    mocked_filesystem_prune_store.return_value = {"files": 2, "size": 2048}
+
+    runner = CliRunner()
+    result = runner.invoke(qip.command_line.main, ["gc"] + options)
+    assert result.exit_code == 0
+    assert not result.exception
+
+    mocked_filesystem_collect_garbage.assert_called_once_with(path)
+    mocked_filesystem_prune_store.assert_called_once_with(
+        os.path.join(path, ".qip-store")
+    )
+
+
 def test_install_fails(
     mocked_install, mocked_get_defaults_registries
 ):
@@ -397,6 +1302,20 @@ def test_install_fails(
         python_target=sys.executable,
         registry_paths=["/registry1", "/registry2"],
         update_existing_definitions=False,
-        continue_on_error=True
+        continue_on_error=True,
+        jobs=1,
+        plan=False,
+        stage_jobs=None,
+        cache_path=None,
+        cache_size_limit=5 * 1024 ** 3,
+        log_path=None,
+        timeout=None,
+        total_timeout=None,
+        use_fork_server=False,
+        batch=False,
+        stage_in_output=False,
+        copy_jobs=None,
+        delta_overwrite=False,
+        deduplicate=False
     )
     mocked_get_defaults_registries.assert_called_once_with()
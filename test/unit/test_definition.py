@@ -2,11 +2,13 @@
 
 import os
 import functools
+import json
 
 import pytest
 import wiz
 import wiz.exception
 import wiz.definition
+import wiz.system
 
 import qip.definition
 
@@ -376,6 +378,214 @@ def test_fetch_existing_empty(mocked_wiz_fetch_definition, options, namespace):
     assert result is None
 
 
+def _create_definition(path, data):
+    """Create definition file in *path* from *data*."""
+    folder = os.path.dirname(path)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    with open(path, "w") as stream:
+        json.dump(data, stream)
+
+
+@pytest.fixture()
+def registry(temporary_directory):
+    """Return path to registry with several definitions."""
+    path = os.path.join(temporary_directory, "registry")
+
+    _create_definition(os.path.join(path, "foo", "foo-0.1.0.json"), {
+        "identifier": "foo", "namespace": "library", "version": "0.1.0",
+        "variants": [{"identifier": "3.7"}, {"identifier": "2.7"}]
+    })
+    _create_definition(os.path.join(path, "foo", "foo-0.2.json"), {
+        "identifier": "foo", "namespace": "library", "version": "0.2",
+        "variants": [{"identifier": "3.7"}]
+    })
+    _create_definition(os.path.join(path, "bar-0.1.0.json"), {
+        "identifier": "bar", "namespace": "library", "version": "0.1.0",
+        "disabled": True
+    })
+    _create_definition(os.path.join(path, "baz.json"), {
+        "identifier": "baz"
+    })
+
+    with open(os.path.join(path, "incorrect.json"), "w") as stream:
+        stream.write("{{{")
+
+    return path
+
+
+def test_fetch_definition_mapping(mocker, temporary_directory, registry):
+    """Fetch compact index of definitions."""
+    mocker.patch.object(wiz.system, "query", return_value={"platform": "linux"})
+
+    result = qip.definition.fetch_definition_mapping(["", registry])
+    assert result["registries"] == ["", registry]
+    assert result["system"] == {"platform": "linux"}
+    assert sorted(result["index"].keys()) == [
+        "baz", "library::bar", "library::foo"
+    ]
+
+    entries = sorted(
+        result["index"]["library::foo"], key=lambda entry: entry["version"]
+    )
+    assert entries == [
+        {
+            "path": os.path.join(registry, "foo", "foo-0.1.0.json"),
+            "registry": registry,
+            "version": "0.1.0",
+            "variants": ["3.7", "2.7"],
+            "identifier": "library::foo",
+        },
+        {
+            "path": os.path.join(registry, "foo", "foo-0.2.json"),
+            "registry": registry,
+            "version": "0.2",
+            "variants": ["3.7"],
+            "identifier": "library::foo",
+        }
+    ]
+    assert result["index"]["baz"][0]["version"] is None
+
+
+def test_fetch_definition_mapping_with_cache(
+    mocker, temporary_directory, registry
+):
+    """Fetch compact index of definitions with persistent cache."""
+    cache_path = os.path.join(temporary_directory, "cache")
+    definition_path = os.path.join(registry, "foo", "foo-0.2.json")
+
+    # Record definitions as older than the index.
+    for root, _, names in os.walk(registry):
+        for name in names:
+            os.utime(os.path.join(root, name), (1000, 1000))
+
+    result = qip.definition.fetch_definition_mapping(
+        [registry], cache_path=cache_path
+    )
+    assert os.listdir(os.path.join(cache_path, "registries"))
+
+    # Definitions unchanged are not read again.
+    spy = mocker.spy(qip.definition, "_extract_index_entry")
+    assert qip.definition.fetch_definition_mapping(
+        [registry], cache_path=cache_path
+    ) == result
+    spy.assert_not_called()
+
+    # Definition modified is read again.
+    _create_definition(definition_path, {
+        "identifier": "foo", "namespace": "library", "version": "0.2",
+        "variants": [{"identifier": "3.7"}, {"identifier": "3.8"}]
+    })
+
+    result = qip.definition.fetch_definition_mapping(
+        [registry], cache_path=cache_path
+    )
+    spy.assert_called_once_with(definition_path)
+
+    entry = [
+        _entry for _entry in result["index"]["library::foo"]
+        if _entry["path"] == definition_path
+    ][0]
+    assert entry["variants"] == ["3.7", "3.8"]
+
+
+def test_fetch_definition_mapping_in_background(mocker, registry):
+    """Fetch compact index of definitions in background thread."""
+    result = qip.definition.fetch_definition_mapping(
+        [registry], background=True
+    )
+    assert "index" in result
+    assert dict(result) == qip.definition.fetch_definition_mapping([registry])
+
+
+def test_fetch_definition_mapping_in_background_error(mocker, registry):
+    """Raise error from background thread when mapping is accessed."""
+    mocker.patch.object(
+        qip.definition, "_fetch_registry_entries",
+        side_effect=OSError("Oh Shit")
+    )
+
+    result = qip.definition.fetch_definition_mapping(
+        [registry], background=True
+    )
+
+    with pytest.raises(OSError) as error:
+        result["index"]
+
+    assert "Oh Shit" in str(error.value)
+
+
+@pytest.mark.parametrize("version, expected", [
+    ("0.1.0", "0.1.0"),
+    ("0.2.0", "0.2"),
+    ("0.3.0", None),
+], ids=[
+    "exact-version",
+    "equivalent-version",
+    "missing-version",
+])
+def test_fetch_existing_from_index(registry, version, expected):
+    """Fetch existing definition from compact index of definitions."""
+    definition_mapping = qip.definition.fetch_definition_mapping([registry])
+
+    result = qip.definition.fetch_existing(
+        {"key": "foo", "version": version}, definition_mapping
+    )
+
+    if expected is None:
+        assert result is None
+    else:
+        assert str(result.version) == expected
+        assert result.registry_path == registry
+
+
+def test_fetch_existing_from_index_lazily(mocker, registry):
+    """Load definitions matching identifier and version only."""
+    definition_mapping = qip.definition.fetch_definition_mapping([registry])
+    spy = mocker.spy(wiz.definition, "load")
+
+    qip.definition.fetch_existing(
+        {"key": "foo", "version": "0.1.0"}, definition_mapping
+    )
+    spy.assert_called_once_with(
+        os.path.join(registry, "foo", "foo-0.1.0.json"),
+        registry_path=registry
+    )
+
+
+@pytest.mark.parametrize("package_mapping, options", [
+    ({"key": "bar", "version": "0.1.0"}, {}),
+    ({"key": "bim", "version": "0.1.0"}, {}),
+    ({"key": "foo", "version": "0.1.0"}, {"namespace": "test"}),
+], ids=[
+    "disabled",
+    "missing",
+    "other-namespace",
+])
+def test_fetch_existing_from_index_empty(registry, package_mapping, options):
+    """Fail to fetch existing definition from compact index of definitions."""
+    definition_mapping = qip.definition.fetch_definition_mapping([registry])
+
+    assert qip.definition.fetch_existing(
+        package_mapping, definition_mapping, **options
+    ) is None
+
+
+def test_fetch_existing_from_index_incompatible_system(mocker, registry):
+    """Do not fetch existing definition incompatible with current system."""
+    _create_definition(os.path.join(registry, "foo", "foo-0.1.0.json"), {
+        "identifier": "foo", "namespace": "library", "version": "0.1.0",
+        "system": {"platform": "incompatible"}
+    })
+
+    definition_mapping = qip.definition.fetch_definition_mapping([registry])
+
+    assert qip.definition.fetch_existing(
+        {"key": "foo", "version": "0.1.0"}, definition_mapping
+    ) is None
+
+
 def test_create(logger):
     """Create a definition from package mapping."""
     mapping = {
@@ -1,12 +1,17 @@
 # :coding: utf-8
 
+import json
+import os
+import platform
 import tempfile
 
 import pytest
 import wiz
+import wiz.registry
 
 import qip.environ
 import qip.command
+import qip.system
 
 
 @pytest.fixture()
@@ -27,6 +32,30 @@ def mocked_command_execute(mocker):
     return mocker.patch.object(qip.command, "execute")
 
 
+@pytest.fixture()
+def mocked_registry_get_defaults(mocker):
+    """Return mocked 'wiz.registry.get_defaults' function"""
+    return mocker.patch.object(wiz.registry, "get_defaults")
+
+
+@pytest.fixture()
+def mocked_system_query(mocker):
+    """Return mocked 'qip.system.query' function"""
+    return mocker.patch.object(
+        qip.system, "query", return_value={"platform": "linux"}
+    )
+
+
+def _create_definition(path, content):
+    """Create definition file in *path* with *content*."""
+    folder = os.path.dirname(path)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    with open(path, "w") as stream:
+        stream.write(json.dumps(content))
+
+
 def test_fetch_environ(mocked_mkdtemp, mocked_wiz_resolve_context):
     """Fetch and return environment mapping."""
     mocked_wiz_resolve_context.return_value = {"environ": "__ENVIRON__"}
@@ -53,19 +82,95 @@ def test_fetch_environ_with_mapping(mocked_mkdtemp, mocked_wiz_resolve_context):
     mocked_mkdtemp.assert_not_called()
 
 
+def test_fetch_environ_with_cache(
+    temporary_directory, mocked_wiz_resolve_context,
+    mocked_registry_get_defaults, mocked_system_query
+):
+    """Fetch environment mapping from cache until registries are modified."""
+    cache_path = os.path.join(temporary_directory, "cache")
+    registry_path = os.path.join(temporary_directory, "registry")
+    definition_path = os.path.join(registry_path, "foo", "python.json")
+
+    _create_definition(definition_path, {"identifier": "python"})
+
+    mocked_registry_get_defaults.return_value = [registry_path]
+    mocked_wiz_resolve_context.return_value = {"environ": {"KEY": "VALUE"}}
+
+    for _ in range(2):
+        environ = qip.environ.fetch("python==2.7.*", cache_path=cache_path)
+        assert environ == {"KEY": "VALUE"}
+
+    mocked_wiz_resolve_context.assert_called_once_with(
+        ["python==2.7.*"], environ_mapping={}
+    )
+
+    # Resolve context again for different request.
+    qip.environ.fetch("python==3.7.*", cache_path=cache_path)
+    assert mocked_wiz_resolve_context.call_count == 2
+
+    # Definition files are not checked individually.
+    assert qip.environ._fetch_registry_state([registry_path]) == [
+        [registry_path, os.stat(registry_path).st_mtime],
+        [
+            os.path.dirname(definition_path),
+            os.stat(os.path.dirname(definition_path)).st_mtime
+        ],
+    ]
+
+    # Resolve context again when definition is added.
+    _create_definition(
+        os.path.join(registry_path, "foo", "python3.json"),
+        {"identifier": "python3"}
+    )
+    os.utime(os.path.join(registry_path, "foo"), (1000, 1000))
+    qip.environ.fetch("python==2.7.*", cache_path=cache_path)
+    assert mocked_wiz_resolve_context.call_count == 3
+
+
+@pytest.mark.parametrize("name", ["python", "python3.7"], ids=[
+    "python",
+    "versioned-python",
+])
 def test_fetch_environ_with_python_path(
-    temporary_directory, mocked_mkdtemp, mocked_wiz_resolve_context
+    mocker, temporary_directory, mocked_wiz_resolve_context, name
 ):
     """Fetch and return environment mapping with python path."""
-    mocked_wiz_resolve_context.return_value = {"environ": "__ENVIRON__"}
-    mocked_mkdtemp.return_value = temporary_directory
+    mocker.patch.object(
+        tempfile, "gettempdir", return_value=temporary_directory
+    )
+    python_target = os.path.join(temporary_directory, "bin", name)
+
+    environ = qip.environ.fetch(python_target)
+    path = environ["PATH"].split(":")[0]
+    assert environ == {"PATH": "{}:${{PATH}}".format(path)}
+    assert os.path.dirname(path) == os.path.join(
+        temporary_directory, "qip-shims-{}".format(os.getuid())
+    )
 
-    environ = qip.environ.fetch("/bin/python")
-    assert environ == {"PATH": "{}:${{PATH}}".format(temporary_directory)}
+    assert os.readlink(os.path.join(path, name)) == python_target
+    assert os.path.realpath(os.path.join(path, "python")) == python_target
+
+    # Shim is reused.
+    assert qip.environ.fetch(python_target) == environ
+    assert len(os.listdir(os.path.dirname(path))) == 1
 
     mocked_wiz_resolve_context.assert_not_called()
 
 
+def test_fetch_environ_with_python_path_and_cache(
+    temporary_directory, mocked_wiz_resolve_context
+):
+    """Fetch and return environment mapping with python path in cache."""
+    cache_path = os.path.join(temporary_directory, "cache")
+
+    environ = qip.environ.fetch("/bin/python", cache_path=cache_path)
+    path = environ["PATH"].split(":")[0]
+    assert os.path.dirname(path) == os.path.join(cache_path, "shims")
+    assert os.readlink(os.path.join(path, "python")) == "/bin/python"
+
+    assert qip.environ.fetch("/bin/python", cache_path=cache_path) == environ
+
+
 def test_fetch_python_mapping(mocked_command_execute):
     """Fetch and return Python mapping."""
     mocked_command_execute.return_value = "{\"python\": \"__MAPPING__\"}"
@@ -74,6 +179,131 @@ def test_fetch_python_mapping(mocked_command_execute):
     assert mapping == {"python": "__MAPPING__"}
 
 
+def test_fetch_python_mapping_with_cache(
+    temporary_directory, mocked_command_execute
+):
+    """Fetch Python mapping from cache until executable is modified."""
+    cache_path = os.path.join(temporary_directory, "cache")
+    executable = os.path.join(temporary_directory, "bin", "python")
+
+    os.makedirs(os.path.dirname(executable))
+    with open(executable, "w") as stream:
+        stream.write("#!/bin/sh")
+
+    os.chmod(executable, 0o755)
+    os.utime(executable, (1000, 1000))
+
+    mocked_command_execute.return_value = "{\"identifier\": \"2.7\"}"
+
+    environ_mapping = {
+        "PATH": "{}:${{PATH}}".format(os.path.dirname(executable))
+    }
+
+    for _ in range(2):
+        mapping = qip.environ.fetch_python_mapping(
+            environ_mapping, cache_path=cache_path
+        )
+        assert mapping == {"identifier": "2.7"}
+
+    mocked_command_execute.assert_called_once_with(
+        "python {}".format(qip.environ.PYTHON_INFO_SCRIPT), environ_mapping,
+        quiet=True
+    )
+
+    # Query mapping again when executable is modified.
+    os.utime(executable, (2000, 2000))
+    qip.environ.fetch_python_mapping(environ_mapping, cache_path=cache_path)
+    assert mocked_command_execute.call_count == 2
+
+
+@pytest.mark.parametrize("attribute", ["node", "release"], ids=[
+    "host",
+    "release",
+])
+def test_fetch_python_mapping_with_cache_other_host(
+    mocker, temporary_directory, mocked_command_execute, attribute
+):
+    """Fetch Python mapping again from another host sharing the cache."""
+    cache_path = os.path.join(temporary_directory, "cache")
+    executable = os.path.join(temporary_directory, "bin", "python")
+
+    os.makedirs(os.path.dirname(executable))
+    with open(executable, "w") as stream:
+        stream.write("#!/bin/sh")
+
+    os.chmod(executable, 0o755)
+
+    mocked_command_execute.return_value = "{\"identifier\": \"2.7\"}"
+
+    environ_mapping = {"PATH": os.path.dirname(executable)}
+
+    for _ in range(2):
+        qip.environ.fetch_python_mapping(
+            environ_mapping, cache_path=cache_path
+        )
+
+    assert mocked_command_execute.call_count == 1
+
+    mocker.patch.object(platform, attribute, return_value="__OTHER__")
+    qip.environ.fetch_python_mapping(environ_mapping, cache_path=cache_path)
+    assert mocked_command_execute.call_count == 2
+
+
+def test_fetch_python_mapping_with_cache_pip_updated(
+    temporary_directory, mocked_command_execute
+):
+    """Fetch Python mapping again when library folder is modified."""
+    cache_path = os.path.join(temporary_directory, "cache")
+    executable = os.path.join(temporary_directory, "bin", "python")
+    library_path = os.path.join(
+        temporary_directory, "lib", "python3.8", "site-packages"
+    )
+
+    os.makedirs(os.path.dirname(executable))
+    os.makedirs(os.path.join(library_path, "pip-20.0.dist-info"))
+    os.utime(library_path, (1000, 1000))
+
+    with open(executable, "w") as stream:
+        stream.write("#!/bin/sh")
+
+    os.chmod(executable, 0o755)
+
+    mocked_command_execute.return_value = "{\"identifier\": \"3.8\"}"
+
+    environ_mapping = {"PATH": os.path.dirname(executable)}
+
+    for _ in range(2):
+        qip.environ.fetch_python_mapping(
+            environ_mapping, cache_path=cache_path
+        )
+
+    assert mocked_command_execute.call_count == 1
+
+    # Query mapping again when Pip is upgraded.
+    os.rename(
+        os.path.join(library_path, "pip-20.0.dist-info"),
+        os.path.join(library_path, "pip-23.0.dist-info")
+    )
+    os.utime(library_path, (2000, 2000))
+
+    qip.environ.fetch_python_mapping(environ_mapping, cache_path=cache_path)
+    assert mocked_command_execute.call_count == 2
+
+
+def test_fetch_python_mapping_without_executable(
+    temporary_directory, mocked_command_execute
+):
+    """Fetch Python mapping when executable is not found."""
+    mocked_command_execute.return_value = "{\"identifier\": \"2.7\"}"
+
+    for _ in range(2):
+        qip.environ.fetch_python_mapping(
+            {"PATH": "${PATH}"}, cache_path=temporary_directory
+        )
+
+    assert mocked_command_execute.call_count == 2
+
+
 def test_fetch_python_mapping_error(mocked_command_execute):
     """Fail to fetch and return Python mapping."""
     mocked_command_execute.return_value = "{{{"
@@ -0,0 +1,920 @@
+# :coding: utf-8
+
+import errno
+import os
+import shutil
+import stat
+
+import pytest
+import six
+
+import qip.filesystem
+
+
+@pytest.fixture()
+def source_path(temporary_directory):
+    """Return path to folder to copy."""
+    path = os.path.join(temporary_directory, "source")
+    os.makedirs(os.path.join(path, "lib", "foo"))
+    os.makedirs(os.path.join(path, "bin"))
+
+    with open(os.path.join(path, "lib", "foo", "__init__.py"), "w") as stream:
+        stream.write("import os\n")
+
+    with open(os.path.join(path, "bin", "foo"), "w") as stream:
+        stream.write("#!/bin/sh\n")
+
+    os.chmod(os.path.join(path, "bin", "foo"), 0o755)
+    os.symlink("foo", os.path.join(path, "bin", "foo-link"))
+    os.symlink(os.path.join("lib", "foo"), os.path.join(path, "foo"))
+
+    return path
+
+
+def test_copy_tree(mocker, temporary_directory, source_path):
+    """Copy folder with shutil.copytree by default."""
+    mocked_copytree = mocker.patch.object(shutil, "copytree")
+
+    path = os.path.join(temporary_directory, "destination")
+    assert qip.filesystem.copy_tree(source_path, path) is None
+
+    if six.PY2:
+        mocked_copytree.assert_called_once_with(source_path, path)
+    else:
+        mocked_copytree.assert_called_once_with(
+            source_path, path, copy_function=qip.filesystem._copy_with_stat
+        )
+
+
+@pytest.mark.parametrize("jobs", [1, 4], ids=[
+    "one-job",
+    "several-jobs",
+])
+def test_copy_tree_parallel(temporary_directory, source_path, jobs):
+    """Copy folder with several threads."""
+    path = os.path.join(temporary_directory, "destination")
+
+    statistics = qip.filesystem.copy_tree(source_path, path, jobs=jobs)
+    assert statistics["files"] == 4
+    assert statistics["size"] == 20
+    assert statistics["duration"] >= 0
+
+    with open(os.path.join(path, "lib", "foo", "__init__.py")) as stream:
+        assert stream.read() == "import os\n"
+
+    # Modes are preserved.
+    assert os.stat(os.path.join(path, "bin", "foo")).st_mode & stat.S_IXUSR
+    assert not (
+        os.stat(os.path.join(path, "lib", "foo", "__init__.py")).st_mode
+        & stat.S_IXUSR
+    )
+
+    # Symbolic links are preserved.
+    assert os.readlink(os.path.join(path, "bin", "foo-link")) == "foo"
+    assert os.readlink(os.path.join(path, "foo")) == os.path.join("lib", "foo")
+
+
+def test_copy_tree_with_parallel_copy(temporary_directory, source_path):
+    """Copy folder with number of threads set within context."""
+    path = os.path.join(temporary_directory, "destination")
+
+    with qip.filesystem.parallel_copy(jobs=2):
+        statistics = qip.filesystem.copy_tree(source_path, path)
+
+    assert statistics["files"] == 4
+    assert os.path.islink(os.path.join(path, "foo"))
+
+    assert qip.filesystem._COPY_OPTIONS == {"jobs": None, "store": None}
+
+
+def test_copy_tree_existing(temporary_directory, source_path):
+    """Fail to copy folder to existing destination."""
+    with pytest.raises(OSError):
+        qip.filesystem.copy_tree(source_path, temporary_directory, jobs=2)
+
+
+@pytest.fixture()
+def file_path(temporary_directory):
+    """Return path to file to copy."""
+    path = os.path.join(temporary_directory, "source.bin")
+    with open(path, "wb") as stream:
+        stream.write(os.urandom(1024 * 100))
+
+    return path
+
+
+@pytest.fixture()
+def mocked_unsupported_methods(mocker):
+    """Reset copy methods recorded as unsupported."""
+    return mocker.patch.object(qip.filesystem, "_UNSUPPORTED_METHODS", set())
+
+
+def _read(path):
+    """Return content of file *path*."""
+    with open(path, "rb") as stream:
+        return stream.read()
+
+
+def test_copy_file(temporary_directory, file_path, mocked_unsupported_methods):
+    """Copy file content."""
+    path = os.path.join(temporary_directory, "target.bin")
+
+    method = qip.filesystem.copy_file(file_path, path)
+    assert method in qip.filesystem.COPY_METHODS + ("read",)
+    assert _read(path) == _read(file_path)
+
+
+def test_copy_file_empty(mocker, temporary_directory):
+    """Copy empty file without copy methods."""
+    source_path = os.path.join(temporary_directory, "source.bin")
+    open(source_path, "w").close()
+
+    function = mocker.Mock()
+    mocker.patch.dict(
+        qip.filesystem._COPY_FUNCTIONS, {"reflink": function}, clear=True
+    )
+
+    path = os.path.join(temporary_directory, "target.bin")
+    assert qip.filesystem.copy_file(source_path, path) == "read"
+    assert _read(path) == b""
+
+    function.assert_not_called()
+
+
+@pytest.mark.parametrize("error_number", [
+    errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL
+], ids=[
+    "not-supported",
+    "cross-device",
+    "invalid",
+])
+def test_copy_file_fallback(
+    mocker, temporary_directory, file_path, mocked_unsupported_methods,
+    error_number
+):
+    """Copy file content with next method when one cannot be used."""
+    def _reflink(source, target, size):
+        os.write(target, b"__PARTIAL__")
+        raise OSError(error_number, os.strerror(error_number))
+
+    mocked_reflink = mocker.Mock(side_effect=_reflink)
+    mocker.patch.dict(
+        qip.filesystem._COPY_FUNCTIONS, {"reflink": mocked_reflink},
+        clear=True
+    )
+
+    path = os.path.join(temporary_directory, "target.bin")
+    assert qip.filesystem.copy_file(file_path, path) == "read"
+    assert _read(path) == _read(file_path)
+
+    # Method is not attempted again for the same devices if not supported.
+    qip.filesystem.copy_file(file_path, path)
+
+    if error_number == errno.EINVAL:
+        assert mocked_reflink.call_count == 2
+        assert len(mocked_unsupported_methods) == 0
+    else:
+        assert mocked_reflink.call_count == 1
+        assert len(mocked_unsupported_methods) == 1
+
+
+def test_copy_file_with_sendfile(
+    mocker, temporary_directory, file_path, mocked_unsupported_methods
+):
+    """Copy file content with sendfile."""
+    if not hasattr(os, "sendfile"):
+        pytest.skip("sendfile is not available")
+
+    mocker.patch.dict(
+        qip.filesystem._COPY_FUNCTIONS,
+        {"sendfile": qip.filesystem._sendfile}, clear=True
+    )
+
+    path = os.path.join(temporary_directory, "target.bin")
+    assert qip.filesystem.copy_file(file_path, path) == "sendfile"
+    assert _read(path) == _read(file_path)
+
+
+def test_copy_file_with_copy_file_range(
+    mocker, temporary_directory, file_path, mocked_unsupported_methods
+):
+    """Copy file content with copy_file_range."""
+    if not hasattr(os, "copy_file_range"):
+        pytest.skip("copy_file_range is not available")
+
+    mocker.patch.dict(
+        qip.filesystem._COPY_FUNCTIONS,
+        {"copy_file_range": qip.filesystem._copy_file_range}, clear=True
+    )
+
+    path = os.path.join(temporary_directory, "target.bin")
+    assert qip.filesystem.copy_file(file_path, path) == "copy_file_range"
+    assert _read(path) == _read(file_path)
+
+
+@pytest.mark.parametrize("method", ["copy_file_range", "sendfile"])
+def test_copy_file_incomplete(
+    mocker, temporary_directory, file_path, mocked_unsupported_methods,
+    method
+):
+    """Copy file content with next method when no data is copied."""
+    if not hasattr(os, method):
+        pytest.skip("{} is not available".format(method))
+
+    mocked_function = mocker.patch.object(os, method, return_value=0)
+    mocker.patch.dict(
+        qip.filesystem._COPY_FUNCTIONS, {
+            method: getattr(qip.filesystem, "_" + method)
+        }, clear=True
+    )
+
+    path = os.path.join(temporary_directory, "target.bin")
+    assert qip.filesystem.copy_file(file_path, path) == "read"
+    assert _read(path) == _read(file_path)
+
+    mocked_function.assert_called_once()
+
+
+def test_copy_file_partial(
+    mocker, temporary_directory, file_path, mocked_unsupported_methods
+):
+    """Discard content partially copied by a method."""
+    def _copy(source, target, size):
+        os.write(target, b"__PARTIAL__")
+        return len(b"__PARTIAL__")
+
+    mocker.patch.dict(
+        qip.filesystem._COPY_FUNCTIONS, {"reflink": _copy}, clear=True
+    )
+
+    path = os.path.join(temporary_directory, "target.bin")
+    assert qip.filesystem.copy_file(file_path, path) == "read"
+    assert _read(path) == _read(file_path)
+
+
+def test_copy_file_size_mismatch(
+    mocker, temporary_directory, file_path, mocked_unsupported_methods
+):
+    """Fail to copy file when size of the copy differs."""
+    mocker.patch.dict(qip.filesystem._COPY_FUNCTIONS, {}, clear=True)
+    mocker.patch.object(shutil, "copyfileobj")
+
+    path = os.path.join(temporary_directory, "target.bin")
+
+    with pytest.raises(RuntimeError) as error:
+        qip.filesystem.copy_file(file_path, path)
+
+    assert str(error.value) == (
+        "Impossible to copy '{}' to '{}': 0 bytes copied instead of "
+        "{}".format(file_path, path, os.path.getsize(file_path))
+    )
+
+
+def test_copy_file_error(
+    mocker, temporary_directory, file_path, mocked_unsupported_methods
+):
+    """Fail to copy file content."""
+    mocker.patch.dict(
+        qip.filesystem._COPY_FUNCTIONS, {
+            "reflink": mocker.Mock(side_effect=OSError(errno.EIO, "Oops"))
+        }, clear=True
+    )
+
+    with pytest.raises(OSError):
+        qip.filesystem.copy_file(
+            file_path, os.path.join(temporary_directory, "target.bin")
+        )
+
+
+def _write(path, content):
+    """Write *content* into file *path*."""
+    folder = os.path.dirname(path)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    with open(path, "w") as stream:
+        stream.write(content)
+
+
+@pytest.fixture()
+def target_path(temporary_directory):
+    """Return path to folder to publish to."""
+    return os.path.join(temporary_directory, "destination", "Foo", "Foo-0.1.0")
+
+
+def test_publish(source_path, target_path):
+    """Publish folder to new target."""
+    os.makedirs(os.path.dirname(target_path))
+
+    qip.filesystem.publish(source_path, target_path)
+
+    assert _read(os.path.join(target_path, "bin", "foo")) == b"#!/bin/sh\n"
+    assert os.listdir(os.path.dirname(target_path)) == ["Foo-0.1.0"]
+
+    # Source folder is left untouched.
+    assert os.path.isfile(os.path.join(source_path, "bin", "foo"))
+
+
+def test_publish_move(source_path, target_path):
+    """Publish folder to new target by moving it."""
+    os.makedirs(os.path.dirname(target_path))
+
+    qip.filesystem.publish(source_path, target_path, move=True)
+
+    assert _read(os.path.join(target_path, "bin", "foo")) == b"#!/bin/sh\n"
+    assert os.listdir(os.path.dirname(target_path)) == ["Foo-0.1.0"]
+
+    # Empty source folder is left to be reused.
+    assert os.listdir(source_path) == []
+
+
+def test_publish_move_across_file_systems(mocker, source_path, target_path):
+    """Publish folder by copying it when it cannot be moved."""
+    os.makedirs(os.path.dirname(target_path))
+
+    rename = os.rename
+
+    def _rename(path1, path2):
+        if path1 == source_path:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        rename(path1, path2)
+
+    mocker.patch.object(os, "rename", side_effect=_rename)
+
+    qip.filesystem.publish(source_path, target_path, move=True)
+
+    assert _read(os.path.join(target_path, "bin", "foo")) == b"#!/bin/sh\n"
+    assert os.path.isfile(os.path.join(source_path, "bin", "foo"))
+
+
+def test_publish_move_error(mocker, source_path, target_path):
+    """Fail to publish folder which cannot be moved."""
+    os.makedirs(os.path.dirname(target_path))
+
+    mocker.patch.object(
+        os, "rename", side_effect=OSError(errno.EACCES, "Permission denied")
+    )
+
+    with pytest.raises(OSError):
+        qip.filesystem.publish(source_path, target_path, move=True)
+
+    assert os.listdir(os.path.dirname(target_path)) == []
+
+
+def test_publish_copy_error(mocker, source_path, target_path):
+    """Remove temporary folder when folder cannot be copied."""
+    os.makedirs(os.path.dirname(target_path))
+
+    mocker.patch.object(
+        qip.filesystem, "copy_file", side_effect=IOError("Oops")
+    )
+
+    with pytest.raises(RuntimeError):
+        with qip.filesystem.parallel_copy(jobs=2):
+            qip.filesystem.publish(source_path, target_path)
+
+    assert os.listdir(os.path.dirname(target_path)) == []
+
+
+@pytest.mark.parametrize("exchange", [True, False], ids=[
+    "with-exchange",
+    "without-exchange",
+])
+def test_publish_replace(mocker, source_path, target_path, exchange):
+    """Publish folder by replacing existing target."""
+    _write(os.path.join(target_path, "old.py"), "")
+
+    if not exchange:
+        mocker.patch.object(qip.filesystem, "_RENAMEAT2", None)
+
+    elif qip.filesystem._RENAMEAT2 is None:
+        pytest.skip("renameat2 is not available")
+
+    mocked_remove_tree = mocker.patch.object(qip.filesystem, "remove_tree")
+
+    qip.filesystem.publish(source_path, target_path)
+
+    assert sorted(os.listdir(target_path)) == ["bin", "foo", "lib"]
+
+    # Previous folder is removed afterwards.
+    names = sorted(os.listdir(os.path.dirname(target_path)))
+    assert len(names) == 2
+    assert names[1] == "Foo-0.1.0"
+
+    previous_path = os.path.join(os.path.dirname(target_path), names[0])
+    assert qip.filesystem.TEMPORARY_PATTERN.match(names[0]).group("type") == (
+        "old"
+    )
+    assert os.listdir(previous_path) == ["old.py"]
+
+    mocked_remove_tree.assert_called_once_with(previous_path)
+
+
+def _fetch_tree(path):
+    """Return mapping of content per relative path within folder *path*."""
+    mapping = {}
+
+    for root, folder_names, file_names in os.walk(path):
+        for name in folder_names + file_names:
+            _path = os.path.join(root, name)
+            relative_path = os.path.relpath(_path, path)
+
+            if os.path.islink(_path):
+                mapping[relative_path] = "-> " + os.readlink(_path)
+            elif os.path.isdir(_path):
+                mapping[relative_path] = None
+            else:
+                mapping[relative_path] = _read(_path)
+
+    return mapping
+
+
+@pytest.fixture()
+def updated_source_path(source_path, target_path):
+    """Return path to folder to update existing target from.
+
+    Target is created from initial source folder before source is updated.
+
+    """
+    os.makedirs(os.path.dirname(target_path))
+    qip.filesystem.copy_tree(source_path, target_path, jobs=1)
+
+    # Modify content.
+    _write(os.path.join(source_path, "lib", "foo", "__init__.py"), "import re")
+    _write(os.path.join(source_path, "lib", "foo", "new.py"), "")
+    os.remove(os.path.join(source_path, "bin", "foo-link"))
+
+    # Replace symbolic link to folder with file.
+    os.remove(os.path.join(source_path, "foo"))
+    _write(os.path.join(source_path, "foo"), "foo")
+
+    # Write same content with another modification time.
+    path = os.path.join(source_path, "bin", "foo")
+    os.remove(path)
+    _write(path, "#!/bin/sh\n")
+    os.chmod(path, 0o755)
+    os.utime(path, (0, 0))
+
+    return source_path
+
+
+def test_update_tree(updated_source_path, target_path):
+    """Update existing folder with changed files only."""
+    expected = _fetch_tree(updated_source_path)
+    inode = os.stat(os.path.join(target_path, "bin", "foo")).st_ino
+
+    statistics = qip.filesystem.update_tree(updated_source_path, target_path)
+    assert statistics == {
+        "created": 1, "replaced": 2, "removed": 1, "unchanged": 1
+    }
+
+    assert _fetch_tree(target_path) == expected
+    assert os.listdir(os.path.dirname(target_path)) == ["Foo-0.1.0"]
+
+    # Unchanged file is not rewritten.
+    assert os.stat(os.path.join(target_path, "bin", "foo")).st_ino == inode
+
+    # Source folder is left untouched.
+    assert _fetch_tree(updated_source_path) == expected
+
+
+def test_update_tree_in_single_step(
+    mocker, updated_source_path, target_path
+):
+    """Replace existing folder with updated folder in a single step."""
+    mocked_remove_tree = mocker.patch.object(qip.filesystem, "remove_tree")
+    spy = mocker.spy(qip.filesystem, "_replace")
+
+    inode = os.stat(os.path.join(target_path, "bin", "foo")).st_ino
+    qip.filesystem.update_tree(updated_source_path, target_path)
+
+    spy.assert_called_once_with(mocker.ANY, target_path)
+
+    # Previous folder is left intact until it is removed.
+    previous_path = mocked_remove_tree.call_args[0][0]
+    assert qip.filesystem.TEMPORARY_PATTERN.match(
+        os.path.basename(previous_path)
+    ).group("type") == "old"
+    assert _read(
+        os.path.join(previous_path, "lib", "foo", "__init__.py")
+    ) == b"import os\n"
+    assert os.path.islink(os.path.join(previous_path, "bin", "foo-link"))
+
+    # Unchanged files are shared between both folders.
+    assert os.stat(os.path.join(previous_path, "bin", "foo")).st_ino == inode
+
+
+def test_update_tree_error(mocker, updated_source_path, target_path):
+    """Leave existing folder untouched when update fails."""
+    expected = _fetch_tree(target_path)
+
+    mocker.patch.object(
+        qip.filesystem, "_copy_with_stat", side_effect=OSError("Oops")
+    )
+
+    with pytest.raises(RuntimeError):
+        qip.filesystem.update_tree(updated_source_path, target_path)
+
+    assert _fetch_tree(target_path) == expected
+    assert os.listdir(os.path.dirname(target_path)) == ["Foo-0.1.0"]
+
+
+def test_update_tree_without_link(mocker, updated_source_path, target_path):
+    """Copy unchanged files when hard links cannot be created."""
+    expected = _fetch_tree(updated_source_path)
+
+    mocker.patch.object(
+        os, "link", side_effect=OSError(errno.EXDEV, "Oops")
+    )
+
+    statistics = qip.filesystem.update_tree(updated_source_path, target_path)
+    assert statistics["unchanged"] == 1
+
+    assert _fetch_tree(target_path) == expected
+
+
+def test_update_tree_move(updated_source_path, target_path):
+    """Update existing folder by moving changed files."""
+    expected = _fetch_tree(updated_source_path)
+
+    qip.filesystem.update_tree(updated_source_path, target_path, move=True)
+
+    assert _fetch_tree(target_path) == expected
+    assert os.listdir(updated_source_path) == []
+
+
+def test_update_tree_mode(source_path, target_path):
+    """Update mode of unchanged file."""
+    os.makedirs(os.path.dirname(target_path))
+    qip.filesystem.copy_tree(source_path, target_path, jobs=1)
+
+    os.chmod(os.path.join(source_path, "lib", "foo", "__init__.py"), 0o755)
+
+    statistics = qip.filesystem.update_tree(source_path, target_path)
+    assert statistics["unchanged"] == 4
+
+    assert os.stat(
+        os.path.join(target_path, "lib", "foo", "__init__.py")
+    ).st_mode & stat.S_IXUSR
+
+
+def test_update_tree_with_record(mocker, temporary_directory, target_path):
+    """Compare files with hashes from RECORD files."""
+    record = (
+        "foo/__init__.py,sha256=abc,10\n"
+        "foo/data.py,sha256=def,10\n"
+        "Foo-0.1.0.dist-info/RECORD,,\n"
+    )
+
+    for path, content in [
+        (os.path.join(temporary_directory, "source"), "import re\n"),
+        (target_path, "import os\n"),
+    ]:
+        library_path = os.path.join(path, "lib", "site-packages")
+        _write(os.path.join(library_path, "foo", "__init__.py"), content)
+        _write(os.path.join(library_path, "foo", "data.py"), content)
+        _write(
+            os.path.join(library_path, "Foo-0.1.0.dist-info", "RECORD"),
+            record if path == target_path else record.replace("def", "ghij")
+        )
+
+    os.utime(
+        os.path.join(
+            temporary_directory, "source", "lib", "site-packages", "foo",
+            "__init__.py"
+        ), (0, 0)
+    )
+
+    spy = mocker.spy(qip.filesystem, "_hash_file")
+
+    statistics = qip.filesystem.update_tree(
+        os.path.join(temporary_directory, "source"), target_path
+    )
+    assert statistics == {
+        "created": 0, "replaced": 2, "removed": 0, "unchanged": 1
+    }
+
+    # Files are not read.
+    spy.assert_not_called()
+
+    # File with identical hash recorded is left unchanged.
+    library_path = os.path.join(target_path, "lib", "site-packages")
+    assert _read(os.path.join(library_path, "foo", "__init__.py")) == (
+        b"import os\n"
+    )
+    assert _read(os.path.join(library_path, "foo", "data.py")) == (
+        b"import re\n"
+    )
+
+
+def test_publish_with_delta_update(mocker, source_path, target_path):
+    """Update existing folder within context."""
+    os.makedirs(target_path)
+
+    mocked_update_tree = mocker.patch.object(qip.filesystem, "update_tree")
+
+    with qip.filesystem.delta_update():
+        qip.filesystem.publish(source_path, target_path, move=True)
+
+    mocked_update_tree.assert_called_once_with(
+        source_path, target_path, move=True
+    )
+    assert qip.filesystem._PUBLISH_OPTIONS == {"delta": False}
+
+
+@pytest.fixture()
+def store_path(temporary_directory):
+    """Return path to content store."""
+    return os.path.join(temporary_directory, "destination", ".qip-store")
+
+
+def _fetch_store(path):
+    """Return sorted list of file names within content store *path*."""
+    return sorted(
+        name for _, _, names in os.walk(path) for name in names
+    )
+
+
+def _store_name(path):
+    """Return name of file *path* within content store."""
+    return "{}-{:o}".format(
+        qip.filesystem._hash_file(path), stat.S_IMODE(os.stat(path).st_mode)
+    )
+
+
+@pytest.mark.parametrize("jobs", [None, 2], ids=[
+    "default",
+    "several-jobs",
+])
+def test_copy_tree_with_content_store(
+    temporary_directory, source_path, store_path, jobs
+):
+    """Link identical files to content store within context."""
+    _write(os.path.join(source_path, "lib", "foo", "bar.py"), "import os\n")
+
+    path1 = os.path.join(temporary_directory, "destination", "foo1")
+    path2 = os.path.join(temporary_directory, "destination", "foo2")
+
+    with qip.filesystem.parallel_copy(jobs=jobs):
+        with qip.filesystem.content_store(store_path):
+            qip.filesystem.copy_tree(source_path, path1)
+            qip.filesystem.copy_tree(source_path, path2)
+
+    assert qip.filesystem._COPY_OPTIONS == {"jobs": None, "store": None}
+
+    # Files with same content and mode are stored once.
+    assert _fetch_store(store_path) == sorted([
+        _store_name(os.path.join(source_path, "bin", "foo")),
+        _store_name(os.path.join(source_path, "lib", "foo", "__init__.py")),
+    ])
+
+    inodes = set(
+        os.stat(os.path.join(path, "lib", "foo", name)).st_ino
+        for path in [path1, path2] for name in ["__init__.py", "bar.py"]
+    )
+    assert len(inodes) == 1
+
+    assert os.path.samefile(
+        os.path.join(path1, "bin", "foo"), os.path.join(path2, "bin", "foo")
+    )
+    assert os.stat(os.path.join(path1, "bin", "foo")).st_mode & stat.S_IXUSR
+    assert _read(os.path.join(path2, "bin", "foo")) == b"#!/bin/sh\n"
+
+
+def test_copy_tree_with_content_store_unsupported(
+    mocker, temporary_directory, source_path, store_path
+):
+    """Copy files when hard links cannot be created."""
+    mocker.patch.object(
+        os, "link", side_effect=OSError(errno.EXDEV, "Oops")
+    )
+
+    path = os.path.join(temporary_directory, "destination", "foo")
+
+    with qip.filesystem.content_store(store_path):
+        qip.filesystem.copy_tree(source_path, path, jobs=2)
+
+    assert os.stat(os.path.join(path, "bin", "foo")).st_nlink == 1
+    assert _read(os.path.join(path, "bin", "foo")) == b"#!/bin/sh\n"
+
+
+def test_copy_tree_with_content_store_error(
+    mocker, temporary_directory, source_path, store_path
+):
+    """Fail to link files to content store."""
+    mocker.patch.object(
+        os, "link", side_effect=OSError(errno.EACCES, "Oops")
+    )
+
+    path = os.path.join(temporary_directory, "destination", "foo")
+
+    with pytest.raises(RuntimeError):
+        with qip.filesystem.content_store(store_path):
+            qip.filesystem.copy_tree(source_path, path, jobs=2)
+
+
+def test_add_to_store_existing(temporary_directory, source_path, store_path):
+    """Keep entry added concurrently to content store."""
+    path = os.path.join(store_path, "ab", "abcdef-644")
+    _write(path, "import os\n")
+    inode = os.stat(path).st_ino
+
+    qip.filesystem._add_to_store(
+        os.path.join(source_path, "lib", "foo", "__init__.py"), path
+    )
+
+    assert os.stat(path).st_ino == inode
+    assert os.listdir(os.path.dirname(path)) == ["abcdef-644"]
+
+
+def test_add_to_store_error(
+    mocker, temporary_directory, source_path, store_path
+):
+    """Remove temporary file when entry cannot be added to content store."""
+    mocker.patch.object(
+        os, "link", side_effect=OSError(errno.EACCES, "Oops")
+    )
+    path = os.path.join(store_path, "ab", "abcdef-644")
+
+    with pytest.raises(OSError):
+        qip.filesystem._add_to_store(
+            os.path.join(source_path, "lib", "foo", "__init__.py"), path
+        )
+
+    assert os.listdir(os.path.dirname(path)) == []
+
+
+def test_update_tree_with_content_store(
+    updated_source_path, target_path, store_path
+):
+    """Link files created or replaced to content store within context."""
+    with qip.filesystem.content_store(store_path):
+        qip.filesystem.update_tree(updated_source_path, target_path, move=True)
+
+    assert _fetch_tree(target_path) == _fetch_tree(updated_source_path)
+
+    # Files created are linked instead of being moved.
+    path = os.path.join(target_path, "lib", "foo", "new.py")
+    assert os.stat(path).st_nlink == 2
+    assert os.path.isfile(os.path.join(store_path, "e3", _store_name(path)))
+    assert os.path.isfile(
+        os.path.join(updated_source_path, "lib", "foo", "new.py")
+    )
+
+
+def test_remove_tree(temporary_directory):
+    """Remove folder."""
+    path = os.path.join(temporary_directory, "folder")
+    _write(os.path.join(path, "file.py"), "")
+
+    qip.filesystem.remove_tree(path)
+    assert not os.path.exists(path)
+
+
+def test_remove_tree_deferred(mocker, temporary_directory):
+    """Remove folders in background."""
+    paths = [
+        os.path.join(temporary_directory, "folder{}".format(index))
+        for index in range(3)
+    ]
+
+    for path in paths:
+        _write(os.path.join(path, "file.py"), "")
+
+    with qip.filesystem.deferred_removal():
+        for path in paths:
+            qip.filesystem.remove_tree(path)
+
+    assert os.listdir(temporary_directory) == []
+    assert qip.filesystem._REMOVAL_STATE == {"queue": None}
+
+
+@pytest.mark.parametrize("delay, expected", [
+    (None, [".Foo-0.1.0.qip-old-1a2b3c"]),
+    (0, [".Foo-0.1.0.qip-new-4d5e6f", ".Foo-0.1.0.qip-old-1a2b3c"]),
+], ids=[
+    "default-delay",
+    "without-delay",
+])
+def test_collect_garbage(temporary_directory, delay, expected):
+    """Remove temporary folders left in installation path."""
+    folder = os.path.join(temporary_directory, "Foo")
+
+    for name in [
+        "Foo-0.1.0", ".Foo-0.1.0.qip-old-1a2b3c", ".Foo-0.1.0.qip-new-4d5e6f",
+        ".Foo-0.1.0.other"
+    ]:
+        _write(os.path.join(folder, name, "file.py"), "")
+
+    options = {}
+    if delay is not None:
+        options["delay"] = delay
+
+    removed = qip.filesystem.collect_garbage(temporary_directory, **options)
+    assert removed == [os.path.join(folder, name) for name in expected]
+
+    assert sorted(os.listdir(folder)) == sorted(
+        set(["Foo-0.1.0", ".Foo-0.1.0.qip-old-1a2b3c",
+             ".Foo-0.1.0.qip-new-4d5e6f", ".Foo-0.1.0.other"])
+        - set(expected)
+    )
+
+
+@pytest.mark.parametrize("delay, expected", [
+    (None, ["tmp1a2b3c"]),
+    (0, ["tmp1a2b3c", "tmp4d5e6f"]),
+], ids=[
+    "default-delay",
+    "without-delay",
+])
+def test_collect_garbage_staging(temporary_directory, delay, expected):
+    """Remove staging folders left in installation path."""
+    staging_path = os.path.join(temporary_directory, ".qip-staging")
+
+    _write(os.path.join(staging_path, "tmp1a2b3c", "Foo", "file.py"), "")
+    _write(os.path.join(staging_path, "tmp4d5e6f", "Bar", "file.py"), "")
+
+    for path in [
+        os.path.join(staging_path, "tmp1a2b3c", "Foo"),
+        os.path.join(staging_path, "tmp1a2b3c"),
+        os.path.join(staging_path, "tmp4d5e6f"),
+    ]:
+        os.utime(path, (1000, 1000))
+
+    options = {}
+    if delay is not None:
+        options["delay"] = delay
+
+    removed = qip.filesystem.collect_garbage(temporary_directory, **options)
+    assert removed == [os.path.join(staging_path, name) for name in expected]
+
+    assert sorted(os.listdir(staging_path)) == sorted(
+        set(["tmp1a2b3c", "tmp4d5e6f"]) - set(expected)
+    )
+
+
+def test_collect_garbage_missing(temporary_directory):
+    """Return empty list when installation path does not exist."""
+    assert qip.filesystem.collect_garbage(
+        os.path.join(temporary_directory, "missing")
+    ) == []
+
+
+@pytest.mark.parametrize("delay, expected", [
+    (None, []),
+    (0, ["1a2b3c-644", ".1a2b3c-644.qip-new-4d5e6f"]),
+], ids=[
+    "default",
+    "without-delay",
+])
+def test_prune_store(temporary_directory, delay, expected):
+    """Remove unused files from content store."""
+    folder = os.path.join(temporary_directory, ".qip-store", "1a")
+
+    for name in ["1a2b3c-644", "1a4d5e-644", ".1a2b3c-644.qip-new-4d5e6f"]:
+        _write(os.path.join(folder, name), "foo")
+
+    os.link(
+        os.path.join(folder, "1a4d5e-644"),
+        os.path.join(temporary_directory, "file.py")
+    )
+
+    options = {}
+    if delay is not None:
+        options["delay"] = delay
+
+    removed = qip.filesystem.prune_store(
+        os.path.join(temporary_directory, ".qip-store"), **options
+    )
+    assert removed == {"files": len(expected), "size": 3 * len(expected)}
+
+    assert sorted(os.listdir(folder)) == sorted(
+        set(["1a2b3c-644", "1a4d5e-644", ".1a2b3c-644.qip-new-4d5e6f"])
+        - set(expected)
+    )
+
+
+def test_prune_store_missing(temporary_directory):
+    """Return empty statistics when content store does not exist."""
+    assert qip.filesystem.prune_store(
+        os.path.join(temporary_directory, "missing")
+    ) == {"files": 0, "size": 0}
+
+
+def test_execute_parallel():
+    """Execute function for each item with several threads."""
+    items = []
+    qip.filesystem.execute_parallel(items.append, range(10), 4)
+    assert sorted(items) == list(range(10))
+
+
+def test_execute_parallel_error():
+    """Fail to execute function for one item."""
+    def _function(item):
+        if item == 5:
+            raise IOError("Oops")
+
+    with pytest.raises(RuntimeError) as error:
+        qip.filesystem.execute_parallel(_function, range(10), 4)
+
+    assert str(error.value) == "Oops"
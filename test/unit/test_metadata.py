@@ -0,0 +1,297 @@
+# :coding: utf-8
+
+import os
+import textwrap
+
+import pytest
+
+import qip.metadata
+
+
+def _write(path, content=""):
+    """Write *content* into file *path*."""
+    folder = os.path.dirname(path)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    with open(path, "w") as stream:
+        stream.write(textwrap.dedent(content).lstrip())
+
+
+@pytest.fixture()
+def dist_info_path(temporary_directory):
+    """Return path to library containing wheel metadata for 'Foo_Bar'."""
+    path = os.path.join(temporary_directory, "lib")
+    metadata_path = os.path.join(path, "Foo_Bar-0.1.0.dist-info")
+
+    _write(
+        os.path.join(metadata_path, "METADATA"),
+        """
+        Metadata-Version: 2.1
+        Name: Foo-Bar
+        Version: 0.1.0
+        Summary: This is a Python package
+        Classifier: Operating System :: OS Independent
+        Classifier: Programming Language :: Python
+        Requires-Dist: bim (<3,>=2)
+        Requires-Dist: baz ; extra == 'test'
+
+        Description of the package.
+        """
+    )
+    _write(
+        os.path.join(metadata_path, "entry_points.txt"),
+        """
+        [console_scripts]
+        foo = foo.__main__:main
+        foo-test = foo.test:main [test]
+
+        [gui_scripts]
+        foo-gui = foo.gui:main
+        """
+    )
+    _write(os.path.join(metadata_path, "top_level.txt"), "foo\n")
+    _write(os.path.join(path, "Other-0.2.0.dist-info", "METADATA"))
+
+    return path
+
+
+@pytest.fixture()
+def egg_info_path(temporary_directory):
+    """Return path to library containing egg metadata for 'Foo'."""
+    path = os.path.join(temporary_directory, "lib")
+    metadata_path = os.path.join(path, "Foo-0.1.0-py2.7.egg-info")
+
+    _write(
+        os.path.join(metadata_path, "PKG-INFO"),
+        """
+        Metadata-Version: 1.0
+        Name: Foo
+        Version: 0.1.0
+        Summary: UNKNOWN
+        """
+    )
+    _write(
+        os.path.join(metadata_path, "requires.txt"),
+        """
+        bim<3,>=2
+
+        [:python_version < "3"]
+        enum34
+
+        [test]
+        baz
+
+        [doc:sys_platform == "win32"]
+        sphinx
+        """
+    )
+
+    return path
+
+
+def test_fetch_dist_info(dist_info_path):
+    """Fetch metadata from wheel metadata folder."""
+    metadata = qip.metadata.fetch("foo_bar", [dist_info_path])
+    assert metadata == {
+        "name": "Foo-Bar",
+        "version": "0.1.0",
+        "summary": "This is a Python package",
+        "location": dist_info_path,
+        "classifiers": [
+            "Operating System :: OS Independent",
+            "Programming Language :: Python",
+        ],
+        "requirements": ["bim (<3,>=2)", "baz ; extra == 'test'"],
+        "entry-points": {
+            "console_scripts": {
+                "foo": "foo.__main__:main",
+                "foo-test": "foo.test:main [test]",
+            },
+            "gui_scripts": {
+                "foo-gui": "foo.gui:main",
+            }
+        },
+        "top-level": ["foo"],
+    }
+
+
+def test_fetch_egg_info(egg_info_path):
+    """Fetch metadata from egg metadata folder."""
+    metadata = qip.metadata.fetch("Foo", [egg_info_path])
+    assert metadata == {
+        "name": "Foo",
+        "version": "0.1.0",
+        "summary": "UNKNOWN",
+        "location": egg_info_path,
+        "classifiers": [],
+        "requirements": [
+            "bim<3,>=2",
+            "enum34; (python_version < \"3\")",
+            "baz; extra == \"test\"",
+            "sphinx; (sys_platform == \"win32\") and extra == \"doc\"",
+        ],
+        "entry-points": {},
+        "top-level": [],
+    }
+
+
+def test_fetch_egg_link(temporary_directory):
+    """Fetch metadata from source folder of package installed in editable
+    mode."""
+    path = os.path.join(temporary_directory, "lib")
+    source_path = os.path.join(temporary_directory, "source")
+
+    _write(os.path.join(path, "Foo.egg-link"), "{}\n.".format(source_path))
+    _write(
+        os.path.join(source_path, "Foo.egg-info", "PKG-INFO"),
+        "Name: Foo\nVersion: 0.1.0\n"
+    )
+
+    metadata = qip.metadata.fetch("foo", [path])
+    assert metadata["name"] == "Foo"
+    assert metadata["version"] == "0.1.0"
+    assert metadata["location"] == source_path
+
+
+def test_fetch_missing(dist_info_path, temporary_directory):
+    """Return None if distribution is not installed."""
+    assert qip.metadata.fetch("bim", [dist_info_path]) is None
+    assert qip.metadata.fetch(
+        "foo_bar", [os.path.join(temporary_directory, "missing")]
+    ) is None
+
+
+def test_find(dist_info_path, temporary_directory):
+    """Return path to metadata folder of distribution."""
+    assert qip.metadata.find("foo-bar", [dist_info_path]) == os.path.join(
+        dist_info_path, "Foo_Bar-0.1.0.dist-info"
+    )
+    assert qip.metadata.find("bim", [dist_info_path]) is None
+
+
+def test_extract_record(dist_info_path):
+    """Extract files installed from wheel metadata folder."""
+    path = os.path.join(dist_info_path, "Foo_Bar-0.1.0.dist-info")
+    _write(
+        os.path.join(path, "RECORD"),
+        """
+        Foo_Bar-0.1.0.dist-info/METADATA,sha256=abc,10
+        Foo_Bar-0.1.0.dist-info/RECORD,,
+        "foo/file,with comma.py",sha256=def,20
+        ../../../bin/foo,sha256=ghi,30
+        """
+    )
+
+    assert qip.metadata.extract_record(path) == [
+        "Foo_Bar-0.1.0.dist-info/METADATA",
+        "Foo_Bar-0.1.0.dist-info/RECORD",
+        "foo/file,with comma.py",
+        "../../../bin/foo",
+    ]
+
+
+def test_extract_record_from_egg_info(egg_info_path):
+    """Extract files installed from egg metadata folder."""
+    path = os.path.join(egg_info_path, "Foo-0.1.0-py2.7.egg-info")
+    _write(
+        os.path.join(path, "installed-files.txt"),
+        """
+        ../foo/__init__.py
+        ./
+        PKG-INFO
+        """
+    )
+
+    assert qip.metadata.extract_record(path) == [
+        os.path.join("foo", "__init__.py"),
+        "Foo-0.1.0-py2.7.egg-info",
+        os.path.join("Foo-0.1.0-py2.7.egg-info", "PKG-INFO"),
+    ]
+
+
+def test_extract_record_missing(egg_info_path):
+    """Fail to extract files installed without record."""
+    path = os.path.join(egg_info_path, "Foo-0.1.0-py2.7.egg-info")
+
+    with pytest.raises(RuntimeError) as error:
+        qip.metadata.extract_record(path)
+
+    assert "Impossible to find files installed from" in str(error.value)
+
+
+def test_load_egg_info_file(temporary_directory):
+    """Load metadata from single file installed by distutils."""
+    path = os.path.join(temporary_directory, "Foo-0.1.0-py2.7.egg-info")
+    _write(path, "Name: Foo\nVersion: 0.1.0\n")
+
+    metadata = qip.metadata.load(path)
+    assert metadata["name"] == "Foo"
+    assert metadata["version"] == "0.1.0"
+    assert metadata["requirements"] == []
+
+
+def test_load_report_item():
+    """Load metadata from installation report item."""
+    metadata = qip.metadata.load_report_item({
+        "requested": True,
+        "metadata": {
+            "metadata_version": "2.1",
+            "name": "Foo",
+            "version": "0.1.0",
+            "summary": "This is a Python package ",
+            "classifier": ["Operating System :: OS Independent"],
+            "requires_dist": ["bim<3,>=2", "baz; extra == \"test\""],
+        }
+    })
+    assert metadata == {
+        "name": "Foo",
+        "version": "0.1.0",
+        "summary": "This is a Python package",
+        "classifiers": ["Operating System :: OS Independent"],
+        "requirements": ["bim<3,>=2", "baz; extra == \"test\""],
+    }
+
+
+def test_load_report_item_minimal():
+    """Load metadata from installation report item without optional fields."""
+    metadata = qip.metadata.load_report_item({
+        "metadata": {"name": "Foo", "version": "0.1.0"}
+    })
+    assert metadata == {
+        "name": "Foo",
+        "version": "0.1.0",
+        "classifiers": [],
+        "requirements": [],
+    }
+
+
+@pytest.mark.parametrize("extra_keywords, environment, expected", [
+    (None, {"python_version": "2.7"}, ["bim", "enum34"]),
+    (None, {"python_version": "3.11"}, ["bim"]),
+    (["test"], {"python_version": "3.11"}, ["bim", "baz"]),
+    (
+        ["doc", "test"], {"python_version": "3.11", "sys_platform": "win32"},
+        ["bim", "baz", "sphinx"]
+    ),
+    (
+        ["doc"], {"python_version": "3.11", "sys_platform": "linux"},
+        ["bim"]
+    ),
+], ids=[
+    "python-2",
+    "python-3",
+    "with-extra",
+    "with-extras-and-platform",
+    "with-extra-wrong-platform",
+])
+def test_extract_requirements(
+    egg_info_path, extra_keywords, environment, expected
+):
+    """Extract requirements matching extra keywords and environment."""
+    metadata = qip.metadata.fetch("foo", [egg_info_path])
+
+    requirements = qip.metadata.extract_requirements(
+        metadata, extra_keywords=extra_keywords, environment=environment
+    )
+    assert [requirement.name for requirement in requirements] == expected
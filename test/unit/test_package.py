@@ -1,13 +1,69 @@
 # :coding: utf-8
 
-import re
+import json
+import os
+import subprocess
+import tempfile
 
 import pytest
 
+import qip.cache
 import qip.command
 import qip.system
-import qip.environ
+import qip.metadata
 import qip.package
+import qip.wheel
+
+
+@pytest.fixture(autouse=True)
+def reset_git_commits():
+    """Ensure that Git commits resolved are not shared between tests."""
+    qip.package._GIT_COMMITS.clear()
+    qip.package._SOURCE_FINGERPRINTS.clear()
+
+
+@pytest.fixture()
+def git_repository(temporary_directory):
+    """Return path to bare Git repository with one tagged commit."""
+    source_path = os.path.join(temporary_directory, "source")
+    repository_path = os.path.join(temporary_directory, "foo.git")
+
+    environ = dict(os.environ)
+    environ.update({
+        "GIT_AUTHOR_NAME": "qip", "GIT_AUTHOR_EMAIL": "qip@localhost",
+        "GIT_COMMITTER_NAME": "qip", "GIT_COMMITTER_EMAIL": "qip@localhost",
+    })
+
+    for command in [
+        ["git", "init", "--quiet", source_path],
+        ["git", "-C", source_path, "commit", "--quiet", "--allow-empty",
+         "-m", "Initial commit"],
+        ["git", "-C", source_path, "tag", "0.1.0"],
+        ["git", "-C", source_path, "commit", "--quiet", "--allow-empty",
+         "-m", "Second commit"],
+        ["git", "clone", "--quiet", "--bare", source_path, repository_path],
+    ]:
+        subprocess.check_call(command, env=environ)
+
+    return repository_path
+
+
+@pytest.fixture()
+def mocked_resolve_git_request(mocker):
+    """Return mocked 'resolve_git_request' function"""
+    return mocker.patch.object(qip.package, "resolve_git_request")
+
+
+@pytest.fixture()
+def mocked_cache_fetch_revision_wheel(mocker):
+    """Return mocked 'qip.cache.fetch_revision_wheel' function"""
+    return mocker.patch.object(qip.cache, "fetch_revision_wheel")
+
+
+@pytest.fixture()
+def mocked_cache_fetch_revision_mapping(mocker):
+    """Return mocked 'qip.cache.fetch_revision_mapping' function"""
+    return mocker.patch.object(qip.cache, "fetch_revision_mapping")
 
 
 @pytest.fixture()
@@ -22,12 +78,54 @@ def mocked_command_execute(mocker):
     return mocker.patch.object(qip.command, "execute")
 
 
+@pytest.fixture()
+def mocked_cache_fetch_wheel(mocker):
+    """Return mocked 'qip.cache.fetch_wheel' function"""
+    return mocker.patch.object(qip.cache, "fetch_wheel")
+
+
+@pytest.fixture()
+def mocked_cache_store_wheel(mocker):
+    """Return mocked 'qip.cache.store_wheel' function"""
+    return mocker.patch.object(qip.cache, "store_wheel")
+
+
+@pytest.fixture()
+def mocked_fetch_wheel(mocker):
+    """Return mocked 'fetch_wheel' function"""
+    return mocker.patch.object(qip.package, "fetch_wheel")
+
+
+@pytest.fixture()
+def mocked_fetch_git_wheel(mocker):
+    """Return mocked 'fetch_git_wheel' function"""
+    return mocker.patch.object(qip.package, "fetch_git_wheel")
+
+
+@pytest.fixture()
+def mocked_fetch_source_wheel(mocker):
+    """Return mocked 'fetch_source_wheel' function"""
+    return mocker.patch.object(qip.package, "fetch_source_wheel")
+
+
+@pytest.fixture()
+def mocked_resolve_source_request(mocker):
+    """Return mocked 'resolve_source_request' function"""
+    return mocker.patch.object(qip.package, "resolve_source_request")
+
+
 @pytest.fixture()
 def mocked_fetch_mapping_from_environ(mocker):
     """Return mocked 'fetch_mapping_from_environ' function"""
     return mocker.patch.object(qip.package, "fetch_mapping_from_environ")
 
 
+@pytest.fixture()
+def mocked_metadata_fetch(mocker):
+    """Return mocked 'qip.metadata.fetch' function"""
+    return mocker.patch.object(qip.metadata, "fetch")
+
+
 @pytest.fixture()
 def mocked_extract_dependency_mapping(mocker):
     """Return mocked 'extract_dependency_mapping' function"""
@@ -93,7 +191,7 @@ def test_install(
         package, "/path", {"environ": "__ENV__"}, "/cache"
     )
     mocked_fetch_mapping_from_environ.assert_called_once_with(
-        "foo", {"environ": "__ENV__"}, extra_keywords=[]
+        "foo", {"environ": "__ENV__"}, extra_keywords=[], metadata=None
     )
     assert result == {"request": expected, "extra": []}
 
@@ -107,15 +205,1019 @@ def test_install_fail(mocked_command_execute):
     assert str(error.value) == "Package name could not be extracted from 'foo'."
 
 
+def test_build(mocked_command_execute):
+    """Build package."""
+    mocked_command_execute.return_value = "Installing collected packages: foo"
+
+    result = qip.package.build(
+        "foo[test, dev]", "/path", {"environ": "__ENV__"}, "/cache",
+        editable_mode=True
+    )
+    assert result == {
+        "request": "foo[test, dev]",
+        "name": "foo",
+        "extra": ["dev", "test"]
+    }
+
+    mocked_command_execute.assert_called_once_with(
+        "python -m pip install --ignore-installed --no-deps --prefix /path "
+        "--no-warn-script-location --disable-pip-version-check "
+        "--cache-dir /cache -e 'foo[test, dev]'",
+        "__ENV__"
+    )
+
+
+def test_build_with_report(mocker, temporary_directory, mocked_command_execute):
+    """Build package and read metadata from installation report."""
+    report_path = os.path.join(temporary_directory, "report.json")
+    mocker.patch.object(
+        tempfile, "mkstemp",
+        return_value=(os.open(report_path, os.O_CREAT), report_path)
+    )
+
+    def _execute(*args, **kwargs):
+        """Write installation report."""
+        with open(report_path, "w") as stream:
+            json.dump({
+                "version": "1",
+                "install": [{
+                    "requested": True,
+                    "metadata": {
+                        "name": "Foo",
+                        "version": "0.1.0",
+                        "summary": "This is a Python package",
+                        "classifier": ["Operating System :: Unix"],
+                        "requires_dist": ["bim<3,>=2"],
+                    }
+                }]
+            }, stream)
+
+        return "__OUTPUT__"
+
+    mocked_command_execute.side_effect = _execute
+
+    result = qip.package.build(
+        "foo[test]", "/path", {
+            "environ": "__ENV__", "python": {"pip-version": "23.1.2"}
+        }, "/cache"
+    )
+    assert result == {
+        "request": "foo[test]",
+        "name": "Foo",
+        "extra": ["test"],
+        "metadata": {
+            "name": "Foo",
+            "version": "0.1.0",
+            "summary": "This is a Python package",
+            "classifiers": ["Operating System :: Unix"],
+            "requirements": ["bim<3,>=2"],
+        }
+    }
+
+    mocked_command_execute.assert_called_once_with(
+        "python -m pip install --ignore-installed --no-deps --prefix /path "
+        "--no-warn-script-location --disable-pip-version-check "
+        "--cache-dir /cache --report {} 'foo[test]'".format(report_path),
+        "__ENV__"
+    )
+
+    # Report has been removed.
+    assert not os.path.exists(report_path)
+
+
+@pytest.mark.parametrize("pip_version", [
+    "22.2", "invalid",
+], ids=[
+    "old-version",
+    "invalid-version",
+])
+def test_build_without_report(mocker, mocked_command_execute, pip_version):
+    """Build package without installation report with old version of Pip."""
+    mocked_mkstemp = mocker.patch.object(tempfile, "mkstemp")
+    mocked_command_execute.return_value = "Installing collected packages: foo"
+
+    result = qip.package.build(
+        "foo", "/path", {
+            "environ": "__ENV__", "python": {"pip-version": pip_version}
+        }, "/cache"
+    )
+    assert result == {"request": "foo", "name": "foo", "extra": []}
+
+    mocked_mkstemp.assert_not_called()
+    mocked_command_execute.assert_called_once_with(
+        "python -m pip install --ignore-installed --no-deps --prefix /path "
+        "--no-warn-script-location --disable-pip-version-check "
+        "--cache-dir /cache 'foo'",
+        "__ENV__"
+    )
+
+
+@pytest.mark.parametrize("request_, editable_mode, expected", [
+    ("foo==0.1.0", False, "/cache/foo-0.1.0-py3-none-any.whl"),
+    ("foo[test] >= 0.1", False, "foo[test] >= 0.1"),
+    ("foo==0.1.0", True, "foo==0.1.0"),
+    (".", False, "/cache/_revisions/abcd/foo-0.1.0-py3-none-any.whl"),
+    (".", True, "."),
+    ("/path/to/foo", False, "/path/to/foo"),
+    (
+        "git@gitlab:rnd/foo.git@0.1.0", False,
+        "/cache/_revisions/0123/foo-0.1.0-py3-none-any.whl"
+    ),
+    (
+        "git@gitlab:rnd/foo.git@0.1.0", True,
+        "git+ssh://git@gitlab/rnd/foo.git@0.1.0"
+    ),
+    (
+        "foo @ https://host/foo-0.1.0.tar.gz", False,
+        "foo @ https://host/foo-0.1.0.tar.gz"
+    ),
+], ids=[
+    "pinned",
+    "with-specifier",
+    "editable",
+    "current-path",
+    "current-path-editable",
+    "missing-path",
+    "git",
+    "git-editable",
+    "direct-reference",
+])
+def test_build_with_artifact_cache(
+    mocked_command_execute, mocked_fetch_wheel, mocked_fetch_git_wheel,
+    mocked_fetch_source_wheel, request_, editable_mode, expected
+):
+    """Build package with artifact cache."""
+    mocked_command_execute.return_value = "Installing collected packages: foo"
+    mocked_fetch_wheel.return_value = "/cache/foo-0.1.0-py3-none-any.whl"
+    mocked_fetch_git_wheel.return_value = (
+        "/cache/_revisions/0123/foo-0.1.0-py3-none-any.whl"
+    )
+    mocked_fetch_source_wheel.return_value = (
+        "/cache/_revisions/abcd/foo-0.1.0-py3-none-any.whl"
+    )
+
+    context_mapping = {
+        "environ": "__ENV__", "python": {"identifier": "3.7"}
+    }
+
+    result = qip.package.build(
+        request_, "/path", context_mapping, "/cache/pip",
+        editable_mode=editable_mode, artifact_cache_path="/cache"
+    )
+    assert result["name"] == "foo"
+    assert result["request"] == qip.package.convert_request(request_)
+
+    if expected == mocked_fetch_wheel.return_value:
+        mocked_fetch_wheel.assert_called_once_with(
+            request_, context_mapping, "/cache/pip", "/cache"
+        )
+    else:
+        mocked_fetch_wheel.assert_not_called()
+
+    if expected == mocked_fetch_git_wheel.return_value:
+        mocked_fetch_git_wheel.assert_called_once_with(
+            request_, context_mapping, "/cache/pip", "/cache"
+        )
+    else:
+        mocked_fetch_git_wheel.assert_not_called()
+
+    if expected == mocked_fetch_source_wheel.return_value:
+        mocked_fetch_source_wheel.assert_called_once_with(
+            request_, context_mapping, "/cache/pip", "/cache"
+        )
+    else:
+        mocked_fetch_source_wheel.assert_not_called()
+
+    mocked_command_execute.assert_called_once_with(
+        "python -m pip install --ignore-installed --no-deps --prefix /path "
+        "--no-warn-script-location --disable-pip-version-check "
+        "--cache-dir /cache/pip {}'{}'".format(
+            "-e " if editable_mode else "", expected
+        ),
+        "__ENV__"
+    )
+
+
+def test_build_unpack_cached_wheel(
+    mocker, temporary_directory, mocked_command_execute, mocked_fetch_wheel
+):
+    """Build package by unpacking wheel from artifact cache."""
+    wheel_path = os.path.join(temporary_directory, "foo-0.1.0-py3-none-any.whl")
+    open(wheel_path, "w").close()
+
+    mocked_fetch_wheel.return_value = wheel_path
+    mocked_wheel_install = mocker.patch.object(
+        qip.wheel, "install", return_value={"name": "Foo", "version": "0.1.0"}
+    )
+
+    context_mapping = {
+        "environ": "__ENV__", "python": {"identifier": "3.7"}
+    }
+
+    result = qip.package.build(
+        "foo[test]==0.1.0", "/path", context_mapping, "/cache/pip",
+        artifact_cache_path="/cache"
+    )
+    assert result == {
+        "request": "foo[test]==0.1.0",
+        "name": "Foo",
+        "extra": ["test"],
+    }
+
+    mocked_wheel_install.assert_called_once_with(
+        wheel_path, "/path", context_mapping
+    )
+    mocked_command_execute.assert_not_called()
+
+
+def test_build_unpack_cached_wheel_fail(
+    mocker, temporary_directory, mocked_command_execute, mocked_fetch_wheel,
+    logger
+):
+    """Build package with Pip when wheel from artifact cache cannot be
+    unpacked."""
+    wheel_path = os.path.join(temporary_directory, "foo-0.1.0-py3-none-any.whl")
+    open(wheel_path, "w").close()
+
+    path = os.path.join(temporary_directory, "prefix")
+    os.makedirs(os.path.join(path, "lib"))
+
+    mocked_fetch_wheel.return_value = wheel_path
+    mocker.patch.object(
+        qip.wheel, "install", side_effect=RuntimeError("Oh Shit")
+    )
+    mocked_command_execute.return_value = "Installing collected packages: foo"
+
+    result = qip.package.build(
+        "foo==0.1.0", path, {
+            "environ": "__ENV__", "python": {"identifier": "3.7"}
+        }, "/cache/pip", artifact_cache_path="/cache"
+    )
+    assert result == {"request": "foo==0.1.0", "name": "foo", "extra": []}
+
+    # Partial installation has been removed.
+    assert os.listdir(path) == []
+
+    mocked_command_execute.assert_called_once_with(
+        "python -m pip install --ignore-installed --no-deps --prefix {} "
+        "--no-warn-script-location --disable-pip-version-check "
+        "--cache-dir /cache/pip '{}'".format(path, wheel_path),
+        "__ENV__"
+    )
+    logger.warning.assert_called_once_with(
+        "Impossible to unpack '{}', Pip will be used instead:\nOh Shit"
+        .format(wheel_path)
+    )
+
+
+def test_build_batch(mocked_command_execute):
+    """Build packages with a single command."""
+    result = qip.package.build_batch(
+        ["foo==0.1.0", "Bim_Baz[test]==2.1.0"], "/path", {
+            "environ": "__ENV__"
+        }, "/cache"
+    )
+    assert result == [
+        {"request": "foo==0.1.0", "name": "foo", "extra": []},
+        {
+            "request": "Bim_Baz[test]==2.1.0", "name": "Bim_Baz",
+            "extra": ["test"]
+        },
+    ]
+
+    mocked_command_execute.assert_called_once_with(
+        "python -m pip install --ignore-installed --no-deps --prefix /path "
+        "--no-warn-script-location --disable-pip-version-check "
+        "--cache-dir /cache 'foo==0.1.0' 'Bim_Baz[test]==2.1.0'",
+        "__ENV__"
+    )
+
+
+def test_extract_distribution(temporary_directory):
+    """Move files of distribution into its own installation folder."""
+    source_path = os.path.join(temporary_directory, "source")
+    destination_path = os.path.join(temporary_directory, "destination")
+    library_path = os.path.join(source_path, "lib", "site-packages")
+
+    files = {
+        "Foo-0.1.0.dist-info": ["METADATA"],
+        "foo": ["__init__.py"],
+        "Bar-0.2.0.dist-info": ["METADATA", "RECORD"],
+        "bar": ["__init__.py"],
+    }
+
+    for folder, names in files.items():
+        os.makedirs(os.path.join(library_path, folder))
+        for name in names:
+            open(os.path.join(library_path, folder, name), "w").close()
+
+    os.makedirs(os.path.join(source_path, "bin"))
+    open(os.path.join(source_path, "bin", "foo"), "w").close()
+
+    with open(
+        os.path.join(library_path, "Foo-0.1.0.dist-info", "RECORD"), "w"
+    ) as stream:
+        stream.write(
+            "Foo-0.1.0.dist-info/METADATA,sha256=abc,10\n"
+            "Foo-0.1.0.dist-info/RECORD,,\n"
+            "foo/__init__.py,sha256=def,20\n"
+            "foo/__init__.pyc,,\n"
+            "../../bin/foo,sha256=ghi,30\n"
+            "../../../outside,,\n"
+        )
+
+    qip.package.extract_distribution(
+        "foo", source_path, destination_path,
+        {"python": {"library-path": os.path.join("lib", "site-packages")}}
+    )
+
+    result = sorted(
+        os.path.relpath(os.path.join(root, name), destination_path)
+        for root, _, names in os.walk(destination_path) for name in names
+    )
+    assert result == [
+        os.path.join("bin", "foo"),
+        os.path.join("lib", "site-packages", "Foo-0.1.0.dist-info", "METADATA"),
+        os.path.join("lib", "site-packages", "Foo-0.1.0.dist-info", "RECORD"),
+        os.path.join("lib", "site-packages", "foo", "__init__.py"),
+    ]
+
+    # Other distributions are left in source folder.
+    assert os.path.isfile(os.path.join(library_path, "bar", "__init__.py"))
+    assert not os.path.exists(os.path.join(source_path, "bin", "foo"))
+
+
+def test_extract_distribution_missing(temporary_directory):
+    """Fail to extract distribution which is not installed."""
+    with pytest.raises(RuntimeError) as error:
+        qip.package.extract_distribution(
+            "foo", temporary_directory, "/destination",
+            {"python": {"library-path": "lib"}}
+        )
+
+    assert str(error.value) == "Impossible to fetch installed package for 'foo'"
+
+
+def test_fetch_wheel_from_cache(
+    mocked_command_execute, mocked_cache_fetch_wheel, mocked_cache_store_wheel
+):
+    """Fetch wheel from artifact cache."""
+    mocked_cache_fetch_wheel.return_value = "/cache/foo.whl"
+
+    result = qip.package.fetch_wheel(
+        "foo[test]==0.1.0", {"environ": "__ENV__", "python": {
+            "identifier": "3.7"
+        }}, "/cache/pip", "/cache"
+    )
+    assert result == "/cache/foo.whl"
+
+    mocked_cache_fetch_wheel.assert_called_once_with(
+        "/cache", "foo", "0.1.0", "3.7"
+    )
+    mocked_command_execute.assert_not_called()
+    mocked_cache_store_wheel.assert_not_called()
+
+
+@pytest.mark.parametrize("request_, fetched", [
+    ("foo==0.1.0", True),
+    ("foo >= 0.1", False),
+], ids=[
+    "pinned",
+    "not-pinned",
+])
+def test_fetch_wheel_build(
+    mocker, temporary_directory, mocked_command_execute,
+    mocked_cache_fetch_wheel, mocked_cache_store_wheel, request_, fetched
+):
+    """Build wheel and store it in artifact cache."""
+    mocker.patch.object(
+        tempfile, "mkdtemp", return_value=temporary_directory
+    )
+    mocked_cache_fetch_wheel.return_value = None
+    mocked_cache_store_wheel.return_value = "/cache/foo.whl"
+
+    wheel_path = os.path.join(
+        temporary_directory, "foo-0.1.0-py3-none-any.whl"
+    )
+
+    def _execute(*args, **kwargs):
+        """Create wheel in temporary directory."""
+        open(wheel_path, "w").close()
+
+    mocked_command_execute.side_effect = _execute
+
+    result = qip.package.fetch_wheel(
+        request_, {"environ": "__ENV__", "python": {"identifier": "3.7"}},
+        "/cache/pip", "/cache"
+    )
+    assert result == "/cache/foo.whl"
+
+    assert mocked_cache_fetch_wheel.called is fetched
+
+    mocked_command_execute.assert_called_once_with(
+        "python -m pip wheel --no-deps --wheel-dir {} "
+        "--disable-pip-version-check --cache-dir /cache/pip '{}'".format(
+            temporary_directory, request_
+        ),
+        "__ENV__"
+    )
+    mocked_cache_store_wheel.assert_called_once_with(
+        "/cache", wheel_path, "3.7", revision=None
+    )
+
+    # Temporary directory has been removed.
+    assert not os.path.exists(temporary_directory)
+    os.makedirs(temporary_directory)
+
+
+def test_fetch_wheel_build_fail(
+    mocker, temporary_directory, mocked_command_execute,
+    mocked_cache_fetch_wheel, mocked_cache_store_wheel
+):
+    """Fail to build wheel."""
+    mocker.patch.object(
+        tempfile, "mkdtemp", return_value=temporary_directory
+    )
+    mocked_cache_fetch_wheel.return_value = None
+
+    with pytest.raises(RuntimeError) as error:
+        qip.package.fetch_wheel(
+            "foo==0.1.0", {"environ": "__ENV__", "python": {
+                "identifier": "3.7"
+            }}, "/cache/pip", "/cache"
+        )
+
+    assert "Impossible to build wheel for 'foo==0.1.0'" in str(error.value)
+    mocked_cache_store_wheel.assert_not_called()
+
+    os.makedirs(temporary_directory)
+
+
+def test_fetch_git_wheel_from_cache(
+    mocked_resolve_git_request, mocked_cache_fetch_revision_wheel,
+    mocked_command_execute
+):
+    """Fetch wheel built from Git commit from artifact cache."""
+    mocked_resolve_git_request.return_value = {
+        "mirror": "/cache/git/foo.git", "commit": "0123"
+    }
+    mocked_cache_fetch_revision_wheel.return_value = "/cache/foo.whl"
+
+    result = qip.package.fetch_git_wheel(
+        "git@gitlab:rnd/foo.git@dev", {"environ": "__ENV__", "python": {
+            "identifier": "3.7"
+        }}, "/cache/pip", "/cache"
+    )
+    assert result == "/cache/foo.whl"
+
+    mocked_resolve_git_request.assert_called_once_with(
+        "git@gitlab:rnd/foo.git@dev", "/cache"
+    )
+    mocked_cache_fetch_revision_wheel.assert_called_once_with(
+        "/cache", "0123", "3.7"
+    )
+    mocked_command_execute.assert_not_called()
+
+
+def test_fetch_git_wheel_build(
+    mocker, temporary_directory, mocked_resolve_git_request,
+    mocked_cache_fetch_revision_wheel, mocked_cache_store_wheel,
+    mocked_command_execute
+):
+    """Build wheel from Git mirror and store it in artifact cache."""
+    mocker.patch.object(
+        tempfile, "mkdtemp", return_value=temporary_directory
+    )
+    mocked_resolve_git_request.return_value = {
+        "mirror": "/cache/git/foo.git", "commit": "0123"
+    }
+    mocked_cache_fetch_revision_wheel.return_value = None
+    mocked_cache_store_wheel.return_value = "/cache/foo.whl"
+
+    wheel_path = os.path.join(
+        temporary_directory, "foo-0.1.0-py3-none-any.whl"
+    )
+
+    def _execute(*args, **kwargs):
+        """Create wheel in temporary directory."""
+        open(wheel_path, "w").close()
+
+    mocked_command_execute.side_effect = _execute
+
+    result = qip.package.fetch_git_wheel(
+        "git@gitlab:rnd/foo.git@dev", {"environ": "__ENV__", "python": {
+            "identifier": "3.7"
+        }}, "/cache/pip", "/cache"
+    )
+    assert result == "/cache/foo.whl"
+
+    mocked_command_execute.assert_called_once_with(
+        "python -m pip wheel --no-deps --wheel-dir {} "
+        "--disable-pip-version-check --cache-dir /cache/pip "
+        "'git+file:///cache/git/foo.git@0123'".format(temporary_directory),
+        "__ENV__"
+    )
+    mocked_cache_store_wheel.assert_called_once_with(
+        "/cache", wheel_path, "3.7", revision="0123"
+    )
+
+    os.makedirs(temporary_directory)
+
+
+def test_fetch_source_wheel_from_cache(
+    mocked_resolve_source_request, mocked_cache_fetch_revision_wheel,
+    mocked_command_execute
+):
+    """Fetch wheel built from source tree from artifact cache."""
+    mocked_resolve_source_request.return_value = "abcd"
+    mocked_cache_fetch_revision_wheel.return_value = "/cache/foo.whl"
+
+    result = qip.package.fetch_source_wheel(
+        ".", {"environ": "__ENV__", "python": {"identifier": "3.7"}},
+        "/cache/pip", "/cache"
+    )
+    assert result == "/cache/foo.whl"
+
+    mocked_resolve_source_request.assert_called_once_with(".", "/cache")
+    mocked_cache_fetch_revision_wheel.assert_called_once_with(
+        "/cache", "abcd", "3.7"
+    )
+    mocked_command_execute.assert_not_called()
+
+
+def test_fetch_source_wheel_build(
+    mocker, temporary_directory, mocked_resolve_source_request,
+    mocked_cache_fetch_revision_wheel, mocked_cache_store_wheel,
+    mocked_command_execute
+):
+    """Build wheel from source tree and store it in artifact cache."""
+    mocker.patch.object(
+        tempfile, "mkdtemp", return_value=temporary_directory
+    )
+    mocked_resolve_source_request.return_value = "abcd"
+    mocked_cache_fetch_revision_wheel.return_value = None
+    mocked_cache_store_wheel.return_value = "/cache/foo.whl"
+
+    wheel_path = os.path.join(
+        temporary_directory, "foo-0.1.0-py3-none-any.whl"
+    )
+
+    def _execute(*args, **kwargs):
+        """Create wheel in temporary directory."""
+        open(wheel_path, "w").close()
+
+    mocked_command_execute.side_effect = _execute
+
+    result = qip.package.fetch_source_wheel(
+        ".[test]", {"environ": "__ENV__", "python": {"identifier": "3.7"}},
+        "/cache/pip", "/cache"
+    )
+    assert result == "/cache/foo.whl"
+
+    mocked_command_execute.assert_called_once_with(
+        "python -m pip wheel --no-deps --wheel-dir {} "
+        "--disable-pip-version-check --cache-dir /cache/pip "
+        "'.'".format(temporary_directory),
+        "__ENV__"
+    )
+    mocked_cache_store_wheel.assert_called_once_with(
+        "/cache", wheel_path, "3.7", revision="abcd"
+    )
+
+    os.makedirs(temporary_directory)
+
+
+def test_resolve_source_request(mocker, temporary_directory):
+    """Resolve fingerprint of source tree once per process."""
+    mocked_fetch_source_fingerprint = mocker.patch.object(
+        qip.cache, "fetch_source_fingerprint", return_value="abcd"
+    )
+
+    source_path = os.path.join(temporary_directory, "foo")
+    os.makedirs(source_path)
+
+    for _ in range(2):
+        result = qip.package.resolve_source_request(
+            source_path + "[test]", "/cache"
+        )
+        assert result == "abcd"
+
+    mocked_fetch_source_fingerprint.assert_called_once_with(
+        "/cache", source_path
+    )
+
+
+def test_resolve_source_request_fail():
+    """Fail to resolve fingerprint from request which is not a path."""
+    with pytest.raises(ValueError) as error:
+        qip.package.resolve_source_request("foo", "/cache")
+
+    assert "'foo' is not a source tree." in str(error.value)
+
+
+@pytest.mark.parametrize("request_, expected", [
+    (".", "."),
+    ("./[test]", "./"),
+    ("{path}", "{path}"),
+    ("{path}[test, dev]", "{path}"),
+    ("{path}/missing", None),
+    ("foo", None),
+    ("foo==0.1.0", None),
+    ("git@gitlab:rnd/foo.git@dev", None),
+], ids=[
+    "current-path",
+    "current-path-with-extra",
+    "path",
+    "path-with-extra",
+    "missing-path",
+    "name",
+    "pinned",
+    "git",
+])
+def test_extract_source_path(temporary_directory, request_, expected):
+    """Extract path from local source tree request."""
+    request_ = request_.format(path=temporary_directory)
+    if expected is not None:
+        expected = expected.format(path=temporary_directory)
+
+    assert qip.package._extract_source_path(request_) == expected
+
+
+def test_resolve_git_request(mocker, temporary_directory, git_repository):
+    """Resolve Git request from local bare repository."""
+    cache_path = os.path.join(temporary_directory, "cache")
+
+    head = subprocess.check_output(
+        ["git", "--git-dir", git_repository, "rev-parse", "HEAD"]
+    ).decode("utf-8").strip()
+    tag = subprocess.check_output(
+        ["git", "--git-dir", git_repository, "rev-parse", "0.1.0^{}"]
+    ).decode("utf-8").strip()
+
+    result = qip.package.resolve_git_request(
+        "git+file://{}".format(git_repository), cache_path
+    )
+    assert result["commit"] == head
+    assert result["mirror"].startswith(os.path.join(cache_path, "git"))
+
+    result = qip.package.resolve_git_request(
+        "git+file://{}@0.1.0".format(git_repository), cache_path
+    )
+    assert result["commit"] == tag
+
+    # Results are kept for the lifetime of the process.
+    spy = mocker.spy(qip.cache, "fetch_git_mirror")
+
+    assert qip.package.resolve_git_request(
+        "git+file://{}@0.1.0".format(git_repository), cache_path
+    ) == result
+    spy.assert_not_called()
+
+
+def test_resolve_git_request_fail(temporary_directory, git_repository):
+    """Fail to resolve incorrect reference."""
+    cache_path = os.path.join(temporary_directory, "cache")
+
+    with pytest.raises(RuntimeError) as error:
+        qip.package.resolve_git_request(
+            "git+file://{}@incorrect".format(git_repository), cache_path
+        )
+
+    assert (
+        "Impossible to resolve reference 'incorrect' from "
+        "'file://{}'".format(git_repository)
+    ) in str(error.value)
+
+
+@pytest.mark.parametrize("request_, expected", [
+    ("git@gitlab:rnd/foo.git", ("git@gitlab:rnd/foo.git", None)),
+    ("git@gitlab:rnd/foo.git@dev", ("git@gitlab:rnd/foo.git", "dev")),
+    ("git@gitlab:rnd/foo@0.1.0", ("git@gitlab:rnd/foo", "0.1.0")),
+    (
+        "git+ssh://git@gitlab/rnd/foo.git@dev",
+        ("ssh://git@gitlab/rnd/foo.git", "dev")
+    ),
+    (
+        "git+ssh://git@gitlab/rnd/foo.git",
+        ("ssh://git@gitlab/rnd/foo.git", None)
+    ),
+    (
+        "git+file:///path/to/foo.git@dev#egg=foo",
+        ("file:///path/to/foo.git", "dev")
+    ),
+], ids=[
+    "without-reference",
+    "with-reference",
+    "without-extension",
+    "ssh-with-reference",
+    "ssh-without-reference",
+    "file-with-egg",
+])
+def test_extract_git_url(request_, expected):
+    """Extract URL and reference from Git request."""
+    assert qip.package._extract_git_url(request_) == expected
+
+
+def test_extract_git_url_fail():
+    """Fail to extract URL from request which is not a Git request."""
+    with pytest.raises(ValueError) as error:
+        qip.package._extract_git_url("foo")
+
+    assert "'foo' is not a Git request." in str(error.value)
+
+
+def test_extract_revision_mapping(
+    mocked_resolve_git_request, mocked_cache_fetch_revision_mapping
+):
+    """Extract name and version of package built from Git commit."""
+    mocked_resolve_git_request.return_value = {
+        "mirror": "/cache/git/foo.git", "commit": "0123"
+    }
+    mocked_cache_fetch_revision_mapping.return_value = {
+        "name": "Foo", "version": "0.2.0.dev1"
+    }
+
+    result = qip.package.extract_revision_mapping(
+        "git@gitlab:rnd/foo.git@dev", "/cache"
+    )
+    assert result == {"name": "Foo", "version": "0.2.0.dev1", "extra": []}
+
+    mocked_resolve_git_request.assert_called_once_with(
+        "git@gitlab:rnd/foo.git@dev", "/cache"
+    )
+    mocked_cache_fetch_revision_mapping.assert_called_once_with(
+        "/cache", "0123"
+    )
+
+
+def test_extract_revision_mapping_from_source(
+    mocked_resolve_source_request, mocked_cache_fetch_revision_mapping
+):
+    """Extract name and version of package built from source tree."""
+    mocked_resolve_source_request.return_value = "abcd"
+    mocked_cache_fetch_revision_mapping.return_value = {
+        "name": "Foo", "version": "0.1.0"
+    }
+
+    result = qip.package.extract_revision_mapping(".[test]", "/cache")
+    assert result == {"name": "Foo", "version": "0.1.0", "extra": ["test"]}
+
+    mocked_resolve_source_request.assert_called_once_with(".[test]", "/cache")
+    mocked_cache_fetch_revision_mapping.assert_called_once_with(
+        "/cache", "abcd"
+    )
+
+
+@pytest.mark.parametrize("request_, resolved, recorded", [
+    ("foo==0.1.0", None, None),
+    ("/path/to/missing", None, None),
+    ("git@gitlab:rnd/foo.git@dev", RuntimeError("Oh Shit"), None),
+    (
+        "git@gitlab:rnd/foo.git@dev",
+        {"mirror": "/cache/git/foo.git", "commit": "0123"}, None
+    ),
+], ids=[
+    "not-git",
+    "missing-path",
+    "resolution-failed",
+    "not-recorded",
+])
+def test_extract_revision_mapping_none(
+    mocked_resolve_git_request, mocked_cache_fetch_revision_mapping,
+    request_, resolved, recorded
+):
+    """Do not extract name and version from Git commit."""
+    if isinstance(resolved, Exception):
+        mocked_resolve_git_request.side_effect = resolved
+    else:
+        mocked_resolve_git_request.return_value = resolved
+
+    mocked_cache_fetch_revision_mapping.return_value = recorded
+
+    assert qip.package.extract_revision_mapping(request_, "/cache") is None
+
+
+def test_fetch_mapping(mocked_fetch_mapping_from_environ):
+    """Fetch mapping from package built."""
+    mocked_fetch_mapping_from_environ.return_value = {"identifier": "foo"}
+
+    result = qip.package.fetch_mapping(
+        {"request": "foo[test]", "name": "foo", "extra": ["test"]},
+        {"environ": "__ENV__"}
+    )
+    assert result == {
+        "identifier": "foo",
+        "request": "foo[test]",
+        "extra": ["test"]
+    }
+
+    mocked_fetch_mapping_from_environ.assert_called_once_with(
+        "foo", {"environ": "__ENV__"}, extra_keywords=["test"], metadata=None
+    )
+
+
+def test_fetch_mapping_with_metadata(mocked_fetch_mapping_from_environ):
+    """Fetch mapping from package built with metadata from report."""
+    mocked_fetch_mapping_from_environ.return_value = {"identifier": "foo"}
+
+    qip.package.fetch_mapping(
+        {
+            "request": "foo", "name": "Foo", "extra": [],
+            "metadata": {"name": "Foo", "version": "0.1.0"}
+        },
+        {"environ": "__ENV__"}
+    )
+
+    mocked_fetch_mapping_from_environ.assert_called_once_with(
+        "Foo", {"environ": "__ENV__"}, extra_keywords=[],
+        metadata={"name": "Foo", "version": "0.1.0"}
+    )
+
+
+@pytest.mark.parametrize("request_, expected", [
+    ("foo", []),
+    ("foo[test]", ["test"]),
+    ("foo[test, dev] >= 0.1.0", ["dev", "test"]),
+    ("foo[]", []),
+], ids=[
+    "no-extra",
+    "one-extra",
+    "several-extras",
+    "empty-extra",
+])
+def test_extract_extra_keywords(request_, expected):
+    """Extract extra keywords from request."""
+    assert qip.package.extract_extra_keywords(request_) == expected
+
+
+@pytest.mark.parametrize("request_, expected", [
+    ("foo==0.1.0", {"name": "foo", "version": "0.1.0", "extra": []}),
+    ("Foo == 1.0a1", {"name": "Foo", "version": "1.0a1", "extra": []}),
+    ("foo===0.1.0", {"name": "foo", "version": "0.1.0", "extra": []}),
+    (
+        "foo[test]==0.1.0",
+        {"name": "foo", "version": "0.1.0", "extra": ["test"]}
+    ),
+    (
+        "git@gitlab:rnd/foo.git@0.1.0",
+        {"name": "foo", "version": "0.1.0", "extra": []}
+    ),
+    (
+        "git@gitlab:rnd/foo@v0.1.0",
+        {"name": "foo", "version": "0.1.0", "extra": []}
+    ),
+    ("git@gitlab:rnd/foo.git@dev", None),
+    ("git@gitlab:rnd/foo.git", None),
+    ("foo", None),
+    ("foo==0.1.*", None),
+    ("foo >= 0.1.0", None),
+    ("foo >= 0.1.0, == 0.1.0", None),
+    ("foo @ https://host/foo-0.1.0.tar.gz", None),
+    (".", None),
+    ("/path/to/foo", None),
+], ids=[
+    "pinned",
+    "pinned-pre-release",
+    "pinned-arbitrary-equality",
+    "pinned-with-extra",
+    "git-tag",
+    "git-tag-with-prefix",
+    "git-branch",
+    "git",
+    "not-pinned",
+    "wildcard",
+    "specifier",
+    "several-specifiers",
+    "direct-reference",
+    "current-path",
+    "path",
+])
+def test_extract_pinned_mapping(request_, expected):
+    """Extract name and version from pinned request."""
+    assert qip.package.extract_pinned_mapping(request_) == expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("foo", "foo"),
+    ("Foo_Bar", "Foo-Bar"),
+    ("foo.bar", "foo.bar"),
+    ("foo__-bar", "foo-bar"),
+], ids=[
+    "simple",
+    "underscore",
+    "dot",
+    "several-characters",
+])
+def test_extract_safe_name(name, expected):
+    """Extract safe name."""
+    assert qip.package.extract_safe_name(name) == expected
+
+
+def test_resolve(mocked_command_execute):
+    """Resolve dependency closure."""
+    mocked_command_execute.return_value = json.dumps({
+        "version": "1",
+        "install": [
+            {
+                "download_info": {
+                    "url": "https://host/foo-0.1.0-py2.py3-none-any.whl",
+                    "archive_info": {}
+                },
+                "is_direct": False,
+                "requested": True,
+                "metadata": {
+                    "name": "Foo",
+                    "version": "0.1.0",
+                    "requires_dist": ["bim<3,>=2", "baz"]
+                }
+            },
+            {
+                "download_info": {
+                    "url": "https://host/bim-2.1.0.tar.gz",
+                    "archive_info": {}
+                },
+                "is_direct": False,
+                "requested": False,
+                "metadata": {
+                    "name": "BIM",
+                    "version": "2.1.0",
+                }
+            },
+            {
+                "download_info": {
+                    "url": "ssh://git@gitlab/rnd/baz.git",
+                    "vcs_info": {"vcs": "git", "commit_id": "c0ffee"}
+                },
+                "is_direct": True,
+                "requested": False,
+                "metadata": {
+                    "name": "baz",
+                    "version": "0.5.0",
+                }
+            },
+        ]
+    })
+
+    result = qip.package.resolve(
+        ["foo", "git@gitlab:rnd/bar.git"], {"environ": "__ENV__"}, "/cache"
+    )
+
+    mocked_command_execute.assert_called_once_with(
+        "python -m pip install --dry-run --ignore-installed --quiet "
+        "--report - --disable-pip-version-check --cache-dir /cache "
+        "'foo' 'git+ssh://git@gitlab/rnd/bar.git'",
+        "__ENV__", quiet=True
+    )
+
+    assert result == [
+        {
+            "identifier": "Foo-0.1.0",
+            "key": "foo",
+            "request": "Foo==0.1.0",
+            "version": "0.1.0",
+            "requested": True,
+            "requirements": ["bim<3,>=2", "baz"]
+        },
+        {
+            "identifier": "BIM-2.1.0",
+            "key": "bim",
+            "request": "BIM==2.1.0",
+            "version": "2.1.0",
+            "requested": False,
+            "requirements": []
+        },
+        {
+            "identifier": "baz-0.5.0",
+            "key": "baz",
+            "request": "baz @ git+ssh://git@gitlab/rnd/baz.git@c0ffee",
+            "version": "0.5.0",
+            "requested": False,
+            "requirements": []
+        },
+    ]
+
+
+def test_resolve_fail(mocked_command_execute):
+    """Fail to resolve dependency closure."""
+    mocked_command_execute.return_value = "__FAIL__"
+
+    with pytest.raises(RuntimeError) as error:
+        qip.package.resolve(["foo"], {"environ": "__ENV__"}, "/cache")
+
+    assert str(error.value) == (
+        "Impossible to resolve dependency closure for 'foo'"
+    )
+
+
 def test_fetch_mapping_from_environ(
     mocked_extract_dependency_mapping, mocked_extract_identifier,
     mocked_extract_key, mocked_is_system_required,
     mocked_extract_command_mapping, mocked_extract_target_path,
-    mocked_command_execute, mocked_system_query
+    mocked_metadata_fetch, mocked_system_query
 ):
     """Return a package mapping from environment."""
     context = {
-        "environ": "__ENV__",
+        "environ": {"PYTHONPATH": "/path/to/lib"},
         "python": {
             "identifier": "2.8"
         }
@@ -128,7 +1230,7 @@ def test_fetch_mapping_from_environ(
         "installed_version": "0.1.0"
     }
 
-    mocked_command_execute.return_value = ""
+    mocked_metadata_fetch.return_value = {"location": "/path/to/lib"}
     mocked_extract_dependency_mapping.return_value = {
         "package": package,
         "requirements": []
@@ -150,12 +1252,13 @@ def test_fetch_mapping_from_environ(
         "python": {
             "identifier": "2.8"
         },
-        "target": "/path/to/target"
+        "target": "/path/to/target",
+        "location": "/path/to/lib"
     }
 
-    mocked_command_execute.assert_called_once_with(
-        "python -m pip show --disable-pip-version-check 'foo' -v", "__ENV__",
-        quiet=True
+    mocked_metadata_fetch.assert_called_once_with("foo", ["/path/to/lib"])
+    mocked_extract_dependency_mapping.assert_called_once_with(
+        {"location": "/path/to/lib"}, extra_keywords=None, environment=None
     )
     mocked_system_query.assert_not_called()
     mocked_extract_identifier.assert_called_once_with(
@@ -170,11 +1273,11 @@ def test_fetch_mapping_from_environ_with_extra(
     mocked_extract_dependency_mapping, mocked_extract_identifier,
     mocked_extract_key, mocked_is_system_required,
     mocked_extract_command_mapping, mocked_extract_target_path,
-    mocked_command_execute, mocked_system_query
+    mocked_metadata_fetch, mocked_system_query
 ):
     """Return a package mapping from environment with extra keywords."""
     context = {
-        "environ": "__ENV__",
+        "environ": {"PYTHONPATH": "/path/to/lib"},
         "python": {
             "identifier": "2.8"
         }
@@ -187,7 +1290,7 @@ def test_fetch_mapping_from_environ_with_extra(
         "installed_version": "0.1.0"
     }
 
-    mocked_command_execute.return_value = ""
+    mocked_metadata_fetch.return_value = {"location": "/path/to/lib"}
     mocked_extract_dependency_mapping.return_value = {
         "package": package,
         "requirements": []
@@ -211,13 +1314,11 @@ def test_fetch_mapping_from_environ_with_extra(
         "python": {
             "identifier": "2.8"
         },
-        "target": "/path/to/target"
+        "target": "/path/to/target",
+        "location": "/path/to/lib"
     }
 
-    mocked_command_execute.assert_called_once_with(
-        "python -m pip show --disable-pip-version-check 'foo' -v", "__ENV__",
-        quiet=True
-    )
+    mocked_metadata_fetch.assert_called_once_with("foo", ["/path/to/lib"])
     mocked_system_query.assert_not_called()
     mocked_extract_identifier.assert_called_once_with(
         package, extra_keywords=["doc", "test"]
@@ -231,11 +1332,11 @@ def test_fetch_mapping_from_environ_with_system(
     mocked_extract_dependency_mapping, mocked_extract_identifier,
     mocked_extract_key, mocked_is_system_required,
     mocked_extract_command_mapping, mocked_extract_target_path,
-    mocked_command_execute, mocked_system_query
+    mocked_metadata_fetch, mocked_system_query
 ):
     """Return a package mapping from environment with system."""
     context = {
-        "environ": "__ENV__",
+        "environ": {"PYTHONPATH": "/path/to/lib"},
         "python": {
             "identifier": "2.8"
         }
@@ -248,7 +1349,7 @@ def test_fetch_mapping_from_environ_with_system(
         "installed_version": "0.1.0"
     }
 
-    mocked_command_execute.return_value = ""
+    mocked_metadata_fetch.return_value = {"location": "/path/to/lib"}
     mocked_extract_dependency_mapping.return_value = {
         "package": package,
         "requirements": []
@@ -272,13 +1373,11 @@ def test_fetch_mapping_from_environ_with_system(
             "identifier": "2.8"
         },
         "target": "/path/to/target",
+        "location": "/path/to/lib",
         "system": {"os": "__SYSTEM__"}
     }
 
-    mocked_command_execute.assert_called_once_with(
-        "python -m pip show --disable-pip-version-check 'foo' -v", "__ENV__",
-        quiet=True
-    )
+    mocked_metadata_fetch.assert_called_once_with("foo", ["/path/to/lib"])
     mocked_system_query.assert_called_once()
     mocked_extract_identifier.assert_called_once_with(
         package, extra_keywords=None
@@ -292,11 +1391,11 @@ def test_fetch_mapping_from_environ_with_description(
     mocked_extract_dependency_mapping, mocked_extract_identifier,
     mocked_extract_key, mocked_is_system_required,
     mocked_extract_command_mapping, mocked_extract_target_path,
-    mocked_command_execute, mocked_system_query
+    mocked_metadata_fetch, mocked_system_query
 ):
     """Return a package mapping from environment with description."""
     context = {
-        "environ": "__ENV__",
+        "environ": {"PYTHONPATH": "/path/to/lib"},
         "python": {
             "identifier": "2.8"
         }
@@ -309,7 +1408,9 @@ def test_fetch_mapping_from_environ_with_description(
         "installed_version": "0.1.0"
     }
 
-    mocked_command_execute.return_value = "Summary: This is a test"
+    mocked_metadata_fetch.return_value = {
+        "location": "/path/to/lib", "summary": "This is a test"
+    }
     mocked_extract_dependency_mapping.return_value = {
         "package": package,
         "requirements": []
@@ -332,13 +1433,11 @@ def test_fetch_mapping_from_environ_with_description(
             "identifier": "2.8"
         },
         "target": "/path/to/target",
+        "location": "/path/to/lib",
         "description": "This is a test"
     }
 
-    mocked_command_execute.assert_called_once_with(
-        "python -m pip show --disable-pip-version-check 'foo' -v", "__ENV__",
-        quiet=True
-    )
+    mocked_metadata_fetch.assert_called_once_with("foo", ["/path/to/lib"])
     mocked_system_query.assert_not_called()
     mocked_extract_identifier.assert_called_once_with(
         package, extra_keywords=None
@@ -352,11 +1451,11 @@ def test_fetch_mapping_from_environ_with_location(
     mocked_extract_dependency_mapping, mocked_extract_identifier,
     mocked_extract_key, mocked_is_system_required,
     mocked_extract_command_mapping, mocked_extract_target_path,
-    mocked_command_execute, mocked_system_query
+    mocked_metadata_fetch, mocked_system_query
 ):
     """Return a package mapping from environment with location."""
     context = {
-        "environ": "__ENV__",
+        "environ": {"PYTHONPATH": "/path/to/lib"},
         "python": {
             "identifier": "2.8"
         }
@@ -369,7 +1468,7 @@ def test_fetch_mapping_from_environ_with_location(
         "installed_version": "0.1.0"
     }
 
-    mocked_command_execute.return_value = "Location: /path/to/package"
+    mocked_metadata_fetch.return_value = {"location": "/path/to/package"}
     mocked_extract_dependency_mapping.return_value = {
         "package": package,
         "requirements": []
@@ -395,10 +1494,7 @@ def test_fetch_mapping_from_environ_with_location(
         "location": "/path/to/package"
     }
 
-    mocked_command_execute.assert_called_once_with(
-        "python -m pip show --disable-pip-version-check 'foo' -v", "__ENV__",
-        quiet=True
-    )
+    mocked_metadata_fetch.assert_called_once_with("foo", ["/path/to/lib"])
     mocked_system_query.assert_not_called()
     mocked_extract_identifier.assert_called_once_with(
         package, extra_keywords=None
@@ -408,15 +1504,71 @@ def test_fetch_mapping_from_environ_with_location(
     )
 
 
+def test_fetch_mapping_from_environ_with_metadata(
+    mocked_extract_dependency_mapping, mocked_extract_identifier,
+    mocked_extract_key, mocked_is_system_required,
+    mocked_extract_command_mapping, mocked_extract_target_path,
+    mocked_metadata_fetch
+):
+    """Return a package mapping from environment with metadata from report."""
+    context = {
+        "environ": {"PYTHONPATH": "/path/to/lib"},
+        "python": {
+            "identifier": "2.8"
+        }
+    }
+
+    mocked_metadata_fetch.return_value = {
+        "name": "Foo",
+        "summary": "Old summary",
+        "location": "/path/to/package",
+        "entry-points": {},
+    }
+    mocked_extract_dependency_mapping.return_value = {
+        "package": {
+            "key": "foo",
+            "package_name": "Foo",
+            "module_name": "foo",
+            "installed_version": "0.1.0"
+        },
+        "requirements": []
+    }
+
+    mocked_extract_identifier.return_value = "Foo-0.1.0"
+    mocked_extract_key.return_value = "foo"
+    mocked_is_system_required.return_value = False
+    mocked_extract_command_mapping.return_value = {}
+    mocked_extract_target_path.return_value = "/path/to/target"
+
+    mapping = qip.package.fetch_mapping_from_environ(
+        "foo", context, metadata={"name": "Foo", "summary": "New summary"}
+    )
+    assert mapping["description"] == "New summary"
+    assert mapping["location"] == "/path/to/package"
+
+    metadata = {
+        "name": "Foo",
+        "summary": "New summary",
+        "location": "/path/to/package",
+        "entry-points": {},
+    }
+    mocked_extract_dependency_mapping.assert_called_once_with(
+        metadata, extra_keywords=None, environment=None
+    )
+    mocked_extract_command_mapping.assert_called_once_with(
+        metadata, extra_keywords=None
+    )
+
+
 def test_fetch_mapping_from_environ_with_commands(
     mocked_extract_dependency_mapping, mocked_extract_identifier,
     mocked_extract_key, mocked_is_system_required,
     mocked_extract_command_mapping, mocked_extract_target_path,
-    mocked_command_execute, mocked_system_query
+    mocked_metadata_fetch, mocked_system_query
 ):
     """Return a package mapping from environment with commands."""
     context = {
-        "environ": "__ENV__",
+        "environ": {"PYTHONPATH": "/path/to/lib"},
         "python": {
             "identifier": "2.8"
         }
@@ -429,7 +1581,7 @@ def test_fetch_mapping_from_environ_with_commands(
         "installed_version": "0.1.0"
     }
 
-    mocked_command_execute.return_value = ""
+    mocked_metadata_fetch.return_value = {"location": "/path/to/lib"}
     mocked_extract_dependency_mapping.return_value = {
         "package": package,
         "requirements": []
@@ -452,13 +1604,11 @@ def test_fetch_mapping_from_environ_with_commands(
             "identifier": "2.8"
         },
         "target": "/path/to/target",
+        "location": "/path/to/lib",
         "command": {"foo": "python -m foo"}
     }
 
-    mocked_command_execute.assert_called_once_with(
-        "python -m pip show --disable-pip-version-check 'foo' -v", "__ENV__",
-        quiet=True
-    )
+    mocked_metadata_fetch.assert_called_once_with("foo", ["/path/to/lib"])
     mocked_system_query.assert_not_called()
     mocked_extract_identifier.assert_called_once_with(
         package, extra_keywords=None
@@ -472,11 +1622,11 @@ def test_fetch_mapping_from_environ_with_requirements(
     mocked_extract_dependency_mapping, mocked_extract_identifier,
     mocked_extract_key, mocked_is_system_required,
     mocked_extract_command_mapping, mocked_extract_target_path,
-    mocked_command_execute, mocked_system_query
+    mocked_metadata_fetch, mocked_system_query
 ):
     """Return a package mapping from environment with requirements."""
     context = {
-        "environ": "__ENV__",
+        "environ": {"PYTHONPATH": "/path/to/lib"},
         "python": {
             "identifier": "2.8"
         }
@@ -489,7 +1639,7 @@ def test_fetch_mapping_from_environ_with_requirements(
         "installed_version": "0.1.0"
     }
 
-    mocked_command_execute.return_value = ""
+    mocked_metadata_fetch.return_value = {"location": "/path/to/lib"}
     mocked_extract_dependency_mapping.return_value = {
         "package": package,
         "requirements": [
@@ -515,16 +1665,14 @@ def test_fetch_mapping_from_environ_with_requirements(
             "identifier": "2.8"
         },
         "target": "/path/to/target",
+        "location": "/path/to/lib",
         "requirements": [
             "bim >= 0.1.0, < 1",
             "baz"
         ]
     }
 
-    mocked_command_execute.assert_called_once_with(
-        "python -m pip show --disable-pip-version-check 'foo' -v", "__ENV__",
-        quiet=True
-    )
+    mocked_metadata_fetch.assert_called_once_with("foo", ["/path/to/lib"])
     mocked_system_query.assert_not_called()
     mocked_extract_identifier.assert_called_once_with(
         package, extra_keywords=None
@@ -534,43 +1682,76 @@ def test_fetch_mapping_from_environ_with_requirements(
     )
 
 
-def test_extract_dependency_mapping(mocker, mocked_command_execute):
-    """Return package mapping from dependency mapping."""
-    mocked_command_execute.return_value = "{\"package\": {\"key\": \"foo\"}}"
+def test_fetch_mapping_from_environ_fail(mocked_metadata_fetch):
+    """Fail to return a package mapping if the package is not installed."""
+    context = {
+        "environ": {"PYTHONPATH": "/path/to/lib"},
+        "python": {
+            "identifier": "2.8"
+        }
+    }
+
+    mocked_metadata_fetch.return_value = None
 
-    mapping = qip.package.extract_dependency_mapping("foo", {})
+    with pytest.raises(RuntimeError) as error:
+        qip.package.fetch_mapping_from_environ("foo", context)
 
-    mocked_command_execute.assert_called_once_with(mocker.ANY, {}, quiet=True)
-    assert re.match(
-        "python .+ foo", mocked_command_execute.call_args_list[0][0][0]
-    )
-    assert mapping == {"package": {"key": "foo"}}
+    assert str(error.value) == "Impossible to fetch installed package for 'foo'"
 
 
-def test_extract_dependency_mapping_with_extra(mocker, mocked_command_execute):
-    """Return package mapping from dependency mapping with extra requirements.
-    """
-    mocked_command_execute.return_value = "{\"package\": {\"key\": \"foo\"}}"
+def test_extract_dependency_mapping():
+    """Return package mapping from metadata."""
+    metadata = {
+        "name": "foo_bar",
+        "version": "0.1.0",
+        "top-level": [],
+        "requirements": [
+            "bim (<3,>=2)",
+            "baz; python_version < \"3\"",
+            "bam; python_version >= \"3\"",
+            "Foo_Test>=1; extra == \"test\"",
+        ]
+    }
 
     mapping = qip.package.extract_dependency_mapping(
-        "foo", {}, extra_keywords=["doc", "test"]
-    )
-    mocked_command_execute.assert_called_once_with(mocker.ANY, {}, quiet=True)
-    assert re.match(
-        r"python .+ foo\[doc,test]",
-        mocked_command_execute.call_args_list[0][0][0]
+        metadata, environment={"python_version": "2.7"}
     )
-    assert mapping == {"package": {"key": "foo"}}
-
+    assert mapping == {
+        "package": {
+            "key": "foo-bar",
+            "package_name": "foo-bar",
+            "module_name": "foo-bar",
+            "installed_version": "0.1.0",
+        },
+        "requirements": ["bim<3,>=2", "baz"]
+    }
 
-def test_extract_dependency_mapping_fail_tree(mocked_command_execute):
-    """Fail to return package mapping if pip_query returns nothing."""
-    mocked_command_execute.return_value = ""
 
-    with pytest.raises(RuntimeError) as error:
-        qip.package.extract_dependency_mapping("foo", {})
+def test_extract_dependency_mapping_with_extra():
+    """Return package mapping from metadata with extra requirements."""
+    metadata = {
+        "name": "Foo",
+        "version": "0.1.0",
+        "top-level": ["foo"],
+        "requirements": [
+            "bim (<3,>=2)",
+            "Foo_Test>=1; extra == \"test\"",
+            "sphinx; extra == \"doc\"",
+        ]
+    }
 
-    assert str(error.value) == "Impossible to fetch installed package for 'foo'"
+    mapping = qip.package.extract_dependency_mapping(
+        metadata, extra_keywords=["test"]
+    )
+    assert mapping == {
+        "package": {
+            "key": "foo",
+            "package_name": "Foo",
+            "module_name": "foo",
+            "installed_version": "0.1.0",
+        },
+        "requirements": ["bim<3,>=2", "foo-test>=1"]
+    }
 
 
 def test_extract_identifier():
@@ -625,52 +1806,50 @@ def test_extract_key_with_extra():
     assert identifier == "foo-doc-test"
 
 
-@pytest.mark.parametrize("metadata, expected", [
-    ("", False),
-    ("Operating System :: OS Independent", False),
+@pytest.mark.parametrize("classifiers, expected", [
+    ([], False),
+    (["Operating System :: OS Independent"], False),
     (
-        (
-            "Operating System :: OS Independent"
+        [
+            "Operating System :: OS Independent",
             "Operating System :: Linux"
-        ),
+        ],
         True
     ),
     (
-        (
-            "Operating System :: Mac"
+        [
+            "Operating System :: Mac",
             "Operating System :: Linux"
-        ),
-        True
-    ),
-    (
-        (
-            "Operating System :: Mac"
-        ),
+        ],
         True
     ),
+    (["Operating System :: Mac"], True),
+    (["Programming Language :: Python"], False),
 ], ids=[
     "no-metadata",
     "independent",
     "confusing-classifiers",
     "multi-platforms",
     "single-platform",
+    "other-classifiers",
 ])
-def test_is_system_required(metadata, expected):
+def test_is_system_required(classifiers, expected):
     """Indicate whether package is platform-specific."""
+    metadata = {"classifiers": classifiers}
     assert qip.package.is_system_required(metadata) == expected
 
 
-@pytest.mark.parametrize("metadata, expected", [
-    ("", {}),
+@pytest.mark.parametrize("entry_points, expected", [
+    ({}, {}),
     (
-        (
-            "Entry-points:\n"
-            "  [console_scripts]\n"
-            "  sphinx-apidoc = sphinx.ext.apidoc:main\n"
-            "  sphinx-autogen = sphinx.ext.autosummary.generate:main\n"
-            "  sphinx-build = sphinx.cmd.build:main\n"
-            "  sphinx-quickstart = sphinx.cmd.quickstart:main\n"
-        ),
+        {
+            "console_scripts": {
+                "sphinx-apidoc": "sphinx.ext.apidoc:main",
+                "sphinx-autogen": "sphinx.ext.autosummary.generate:main",
+                "sphinx-build": "sphinx.cmd.build:main",
+                "sphinx-quickstart": "sphinx.cmd.quickstart:main",
+            }
+        },
         {
             "sphinx-apidoc": "python -m sphinx.ext.apidoc",
             "sphinx-autogen": "python -m sphinx.ext.autosummary.generate",
@@ -679,11 +1858,10 @@ def test_is_system_required(metadata, expected):
         }
     ),
     (
-        (
-            "Entry-points:\n"
-            "  [console_scripts]\n"
-            "  qip = qip.__main__:main\n"
-        ),
+        {
+            "console_scripts": {"qip": "qip.__main__:main"},
+            "gui_scripts": {"qip-gui": "qip.gui:main"},
+        },
         {
             "qip": "python -m qip"
         }
@@ -693,19 +1871,22 @@ def test_is_system_required(metadata, expected):
     "multi-commands",
     "main-command",
 ])
-def test_extract_command_mapping(metadata, expected):
+def test_extract_command_mapping(entry_points, expected):
     """Extract command mapping from entry points"""
+    metadata = {"entry-points": entry_points}
     assert qip.package.extract_command_mapping(metadata) == expected
 
 
 def test_extract_command_mapping_with_extra():
     """Extract command mapping from entry points with extra keywords"""
-    metadata = (
-        "Entry-points:\n"
-        "  [console_scripts]\n"
-        "  foo = foo.__main__:main [test]\n"
-        "  bar = bar.__main__:main [doc]\n"
-    )
+    metadata = {
+        "entry-points": {
+            "console_scripts": {
+                "foo": "foo.__main__:main [test]",
+                "bar": "bar.__main__:main [doc]",
+            }
+        }
+    }
 
     assert qip.package.extract_command_mapping(metadata) == {}
 
@@ -728,6 +1909,13 @@ def test_extract_command_mapping_with_extra():
         "bar": "python -m bar"
     }
 
+    assert qip.package.extract_command_mapping(
+        metadata, extra_keywords=["doc", "test"]
+    ) == {
+        "foo": "python -m foo",
+        "bar": "python -m bar"
+    }
+
 
 def test_extract_target_path():
     """Return the corresponding target path from package."""
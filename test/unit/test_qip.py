@@ -13,6 +13,8 @@ import wiz.filesystem
 import qip
 import qip.package
 import qip.definition
+import qip.filesystem
+import qip.system
 
 
 @pytest.fixture()
@@ -28,9 +30,9 @@ def mocked_shutil_rmtree(mocker):
 
 
 @pytest.fixture()
-def mocked_shutil_copytree(mocker):
-    """Return mocked 'shutil.copytree' function"""
-    return mocker.patch.object(shutil, "copytree")
+def mocked_filesystem_publish(mocker):
+    """Return mocked 'qip.filesystem.publish' function"""
+    return mocker.patch.object(qip.filesystem, "publish")
 
 
 @pytest.fixture()
@@ -51,6 +53,54 @@ def mocked_install(mocker):
     return mocker.patch.object(qip, "_install")
 
 
+@pytest.fixture()
+def mocked_command_terminate(mocker):
+    """Return mocked 'qip.command.terminate' function"""
+    return mocker.patch.object(qip.command, "terminate")
+
+
+@pytest.fixture()
+def mocked_plan(mocker):
+    """Return mocked 'qip._plan' function"""
+    return mocker.patch.object(qip, "_plan")
+
+
+@pytest.fixture()
+def mocked_install_batch(mocker):
+    """Return mocked 'qip._install_batch' function"""
+    return mocker.patch.object(qip, "_install_batch")
+
+
+@pytest.fixture()
+def mocked_skip_before_build(mocker):
+    """Return mocked 'qip._skip_before_build' function"""
+    return mocker.patch.object(qip, "_skip_before_build")
+
+
+@pytest.fixture()
+def mocked_package_build_batch(mocker):
+    """Return mocked 'qip.package.build_batch' function"""
+    return mocker.patch.object(qip.package, "build_batch")
+
+
+@pytest.fixture()
+def mocked_package_extract_distribution(mocker):
+    """Return mocked 'qip.package.extract_distribution' function"""
+    return mocker.patch.object(qip.package, "extract_distribution")
+
+
+@pytest.fixture()
+def mocked_package_fetch_mapping(mocker):
+    """Return mocked 'qip.package.fetch_mapping' function"""
+    return mocker.patch.object(qip.package, "fetch_mapping")
+
+
+@pytest.fixture()
+def mocked_package_resolve(mocker):
+    """Return mocked 'qip.package.resolve' function"""
+    return mocker.patch.object(qip.package, "resolve")
+
+
 @pytest.fixture()
 def mocked_copy_to_destination(mocker):
     """Return mocked 'qip.copy_to_destination' function"""
@@ -65,8 +115,8 @@ def mocked_fetch_context_mapping(mocker):
 
 @pytest.fixture()
 def mocked_fetch_definition_mapping(mocker):
-    """Return mocked 'wiz.fetch_definition_mapping' function"""
-    return mocker.patch.object(wiz, "fetch_definition_mapping")
+    """Return mocked 'qip.definition.fetch_definition_mapping' function"""
+    return mocker.patch.object(qip.definition, "fetch_definition_mapping")
 
 
 @pytest.fixture()
@@ -99,6 +149,24 @@ def mocked_definition_fetch_custom(mocker):
     return mocker.patch.object(qip.definition, "fetch_custom")
 
 
+@pytest.fixture()
+def mocked_cache_acquire_lock(mocker):
+    """Return mocked 'qip.cache.acquire_lock' function"""
+    return mocker.patch.object(qip.cache, "acquire_lock")
+
+
+@pytest.fixture()
+def mocked_cache_release_lock(mocker):
+    """Return mocked 'qip.cache.release_lock' function"""
+    return mocker.patch.object(qip.cache, "release_lock")
+
+
+@pytest.fixture()
+def mocked_cache_prune(mocker):
+    """Return mocked 'qip.cache.prune' function"""
+    return mocker.patch.object(qip.cache, "prune")
+
+
 @pytest.fixture()
 def mocked_fetch_environ(mocker):
     """Return mocked 'qip.environ.fetch' function"""
@@ -160,9 +228,23 @@ def test_install_requests(
     mocked_fetch_definition_mapping.return_value = "__MAPPING__"
 
     mocked_install.side_effect = [
-        ({"identifier": "foo", "requirements": ["bim"]}, overwrite),
-        ({"identifier": "bar", "requirements": ["foo"]}, overwrite),
-        ({"identifier": "bim"}, overwrite)
+        (
+            {
+                "identifier": "foo", "name": "foo", "version": "0.1.0",
+                "requirements": ["bim"]
+            }, overwrite
+        ),
+        (
+            {
+                "identifier": "bar", "name": "bar", "version": "0.1.0",
+                "requirements": ["foo"]
+            }, overwrite
+        ),
+        (
+            {
+                "identifier": "bim", "name": "bim", "version": "0.1.0"
+            }, overwrite
+        )
     ]
 
     result = qip.install(["foo", "bar"], "/path/to/install", **options)
@@ -175,44 +257,52 @@ def test_install_requests(
     mocked_filesystem_ensure_directory.assert_any_call("/path/to/site-packages")
     mocked_filesystem_ensure_directory.assert_any_call("/tmp2")
 
-    mocked_fetch_definition_mapping.assert_called_once_with(registry_paths)
+    mocked_fetch_definition_mapping.assert_not_called()
 
-    mocked_fetch_context_mapping.assert_called_once_with("/tmp2", python_target)
+    mocked_fetch_context_mapping.assert_called_once_with(
+        "/tmp2", python_target, cache_path=None
+    )
 
     assert mocked_install.call_count == 3
     mocked_install.assert_any_call(
-        "foo", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
+        "foo", "/path/to/install", context, None, "/tmp2", "/tmp1",
         mocker.ANY,
         definition_path=None,
         overwrite=overwrite,
         editable_mode=editable_mode,
         parent_identifier=None,
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
     mocked_install.assert_any_call(
-        "bar", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
+        "bar", "/path/to/install", context, None, "/tmp2", "/tmp1",
         mocker.ANY,
         definition_path=None,
         overwrite=overwrite,
         editable_mode=editable_mode,
         parent_identifier=None,
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
     mocked_install.assert_any_call(
-        "bim", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
+        "bim", "/path/to/install", context, None, "/tmp2", "/tmp1",
         mocker.ANY,
         definition_path=None,
         overwrite=overwrite,
         editable_mode=False,
         parent_identifier="foo",
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
 
     assert mocked_shutil_rmtree.call_count == 5
-    mocked_shutil_rmtree.assert_any_call("/tmp1")
+    mocked_shutil_rmtree.assert_any_call("/tmp1", ignore_errors=True)
     mocked_shutil_rmtree.assert_any_call("/tmp2")
 
     logger.info.assert_called_once_with("Packages installed: bar, bim, foo")
@@ -267,9 +357,23 @@ def test_install_requests_with_definition_path(
     mocked_fetch_definition_mapping.return_value = "__MAPPING__"
 
     mocked_install.side_effect = [
-        ({"identifier": "foo", "requirements": ["bim"]}, overwrite),
-        ({"identifier": "bar", "requirements": ["foo"]}, overwrite),
-        ({"identifier": "bim"}, overwrite)
+        (
+            {
+                "identifier": "foo", "name": "foo", "version": "0.1.0",
+                "requirements": ["bim"]
+            }, overwrite
+        ),
+        (
+            {
+                "identifier": "bar", "name": "bar", "version": "0.1.0",
+                "requirements": ["foo"]
+            }, overwrite
+        ),
+        (
+            {
+                "identifier": "bim", "name": "bim", "version": "0.1.0"
+            }, overwrite
+        )
     ]
 
     result = qip.install(
@@ -286,9 +390,13 @@ def test_install_requests_with_definition_path(
     mocked_filesystem_ensure_directory.assert_any_call("/path/to/site-packages")
     mocked_filesystem_ensure_directory.assert_any_call("/tmp2")
 
-    mocked_fetch_definition_mapping.assert_called_once_with(registry_paths)
+    mocked_fetch_definition_mapping.assert_called_once_with(
+        registry_paths, cache_path=None, background=True
+    )
 
-    mocked_fetch_context_mapping.assert_called_once_with("/tmp2", python_target)
+    mocked_fetch_context_mapping.assert_called_once_with(
+        "/tmp2", python_target, cache_path=None
+    )
 
     assert mocked_install.call_count == 3
     mocked_install.assert_any_call(
@@ -299,7 +407,9 @@ def test_install_requests_with_definition_path(
         editable_mode=editable_mode,
         parent_identifier=None,
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
     mocked_install.assert_any_call(
         "bar", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
@@ -309,7 +419,9 @@ def test_install_requests_with_definition_path(
         editable_mode=editable_mode,
         parent_identifier=None,
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
     mocked_install.assert_any_call(
         "bim", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
@@ -319,11 +431,13 @@ def test_install_requests_with_definition_path(
         editable_mode=False,
         parent_identifier="foo",
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
 
     assert mocked_shutil_rmtree.call_count == 5
-    mocked_shutil_rmtree.assert_any_call("/tmp1")
+    mocked_shutil_rmtree.assert_any_call("/tmp1", ignore_errors=True)
     mocked_shutil_rmtree.assert_any_call("/tmp2")
 
     logger.info.assert_called_once_with("Packages installed: bar, bim, foo")
@@ -378,8 +492,18 @@ def test_install_requests_without_dependencies(
     mocked_fetch_definition_mapping.return_value = "__MAPPING__"
 
     mocked_install.side_effect = [
-        ({"identifier": "foo", "requirements": ["bim"]}, overwrite),
-        ({"identifier": "bar", "requirements": ["foo"]}, overwrite)
+        (
+            {
+                "identifier": "foo", "name": "foo", "version": "0.1.0",
+                "requirements": ["bim"]
+            }, overwrite
+        ),
+        (
+            {
+                "identifier": "bar", "name": "bar", "version": "0.1.0",
+                "requirements": ["foo"]
+            }, overwrite
+        )
     ]
 
     result = qip.install(
@@ -396,34 +520,40 @@ def test_install_requests_without_dependencies(
     mocked_filesystem_ensure_directory.assert_any_call("/path/to/site-packages")
     mocked_filesystem_ensure_directory.assert_any_call("/tmp2")
 
-    mocked_fetch_definition_mapping.assert_called_once_with(registry_paths)
+    mocked_fetch_definition_mapping.assert_not_called()
 
-    mocked_fetch_context_mapping.assert_called_once_with("/tmp2", python_target)
+    mocked_fetch_context_mapping.assert_called_once_with(
+        "/tmp2", python_target, cache_path=None
+    )
 
     assert mocked_install.call_count == 2
     mocked_install.assert_any_call(
-        "foo", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
+        "foo", "/path/to/install", context, None, "/tmp2", "/tmp1",
         mocker.ANY,
         definition_path=None,
         overwrite=overwrite,
         editable_mode=editable_mode,
         parent_identifier=None,
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
     mocked_install.assert_any_call(
-        "bar", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
+        "bar", "/path/to/install", context, None, "/tmp2", "/tmp1",
         mocker.ANY,
         definition_path=None,
         overwrite=overwrite,
         editable_mode=editable_mode,
         parent_identifier=None,
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
 
     assert mocked_shutil_rmtree.call_count == 4
-    mocked_shutil_rmtree.assert_any_call("/tmp1")
+    mocked_shutil_rmtree.assert_any_call("/tmp1", ignore_errors=True)
     mocked_shutil_rmtree.assert_any_call("/tmp2")
 
     logger.info.assert_called_once_with("Packages installed: bar, foo")
@@ -479,7 +609,11 @@ def test_install_requests_skip_installed(
 
     mocked_install.side_effect = [
         (None, overwrite),
-        ({"identifier": "bar"}, overwrite),
+        (
+            {
+                "identifier": "bar", "name": "bar", "version": "0.1.0"
+            }, overwrite
+        ),
     ]
 
     result = qip.install(["foo", "bar"], "/path/to/install", **options)
@@ -492,34 +626,40 @@ def test_install_requests_skip_installed(
     mocked_filesystem_ensure_directory.assert_any_call("/path/to/site-packages")
     mocked_filesystem_ensure_directory.assert_any_call("/tmp2")
 
-    mocked_fetch_definition_mapping.assert_called_once_with(registry_paths)
+    mocked_fetch_definition_mapping.assert_not_called()
 
-    mocked_fetch_context_mapping.assert_called_once_with("/tmp2", python_target)
+    mocked_fetch_context_mapping.assert_called_once_with(
+        "/tmp2", python_target, cache_path=None
+    )
 
     assert mocked_install.call_count == 2
     mocked_install.assert_any_call(
-        "foo", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
+        "foo", "/path/to/install", context, None, "/tmp2", "/tmp1",
         mocker.ANY,
         definition_path=None,
         overwrite=overwrite,
         editable_mode=editable_mode,
         parent_identifier=None,
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
     mocked_install.assert_any_call(
-        "bar", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
+        "bar", "/path/to/install", context, None, "/tmp2", "/tmp1",
         mocker.ANY,
         definition_path=None,
         overwrite=overwrite,
         editable_mode=editable_mode,
         parent_identifier=None,
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
 
     assert mocked_shutil_rmtree.call_count == 4
-    mocked_shutil_rmtree.assert_any_call("/tmp1")
+    mocked_shutil_rmtree.assert_any_call("/tmp1", ignore_errors=True)
     mocked_shutil_rmtree.assert_any_call("/tmp2")
 
     logger.info.assert_called_once_with("Packages installed: bar")
@@ -575,11 +715,22 @@ def test_install_requests_skip_existing(
 
     mocked_install.side_effect = [
         (
-            {"identifier": "foo", "requirements": ["bim"], "skipped": True},
+            {
+                "identifier": "foo", "name": "foo", "version": "0.1.0",
+                "requirements": ["bim"], "skipped": True
+            },
             overwrite
         ),
-        ({"identifier": "bar"}, overwrite),
-        ({"identifier": "bim"}, overwrite),
+        (
+            {
+                "identifier": "bar", "name": "bar", "version": "0.1.0"
+            }, overwrite
+        ),
+        (
+            {
+                "identifier": "bim", "name": "bim", "version": "0.1.0"
+            }, overwrite
+        ),
     ]
 
     result = qip.install(["foo", "bar"], "/path/to/install", **options)
@@ -592,44 +743,52 @@ def test_install_requests_skip_existing(
     mocked_filesystem_ensure_directory.assert_any_call("/path/to/site-packages")
     mocked_filesystem_ensure_directory.assert_any_call("/tmp2")
 
-    mocked_fetch_definition_mapping.assert_called_once_with(registry_paths)
+    mocked_fetch_definition_mapping.assert_not_called()
 
-    mocked_fetch_context_mapping.assert_called_once_with("/tmp2", python_target)
+    mocked_fetch_context_mapping.assert_called_once_with(
+        "/tmp2", python_target, cache_path=None
+    )
 
     assert mocked_install.call_count == 3
     mocked_install.assert_any_call(
-        "foo", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
+        "foo", "/path/to/install", context, None, "/tmp2", "/tmp1",
         mocker.ANY,
         definition_path=None,
         overwrite=overwrite,
         editable_mode=editable_mode,
         parent_identifier=None,
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
     mocked_install.assert_any_call(
-        "bar", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
+        "bar", "/path/to/install", context, None, "/tmp2", "/tmp1",
         mocker.ANY,
         definition_path=None,
         overwrite=overwrite,
         editable_mode=editable_mode,
         parent_identifier=None,
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
     mocked_install.assert_any_call(
-        "bim", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
+        "bim", "/path/to/install", context, None, "/tmp2", "/tmp1",
         mocker.ANY,
         definition_path=None,
         overwrite=overwrite,
         editable_mode=False,
         parent_identifier="foo",
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
 
     assert mocked_shutil_rmtree.call_count == 5
-    mocked_shutil_rmtree.assert_any_call("/tmp1")
+    mocked_shutil_rmtree.assert_any_call("/tmp1", ignore_errors=True)
     mocked_shutil_rmtree.assert_any_call("/tmp2")
 
     logger.info.assert_called_once_with("Packages installed: bar, bim")
@@ -679,8 +838,16 @@ def test_install_requests_overwrite_changed(
     mocked_fetch_definition_mapping.return_value = "__MAPPING__"
 
     mocked_install.side_effect = [
-        ({"identifier": "foo"}, True),
-        ({"identifier": "bar"}, True),
+        (
+            {
+                "identifier": "foo", "name": "foo", "version": "0.1.0"
+            }, True
+        ),
+        (
+            {
+                "identifier": "bar", "name": "bar", "version": "0.1.0"
+            }, True
+        ),
     ]
 
     result = qip.install(
@@ -696,34 +863,40 @@ def test_install_requests_overwrite_changed(
     mocked_filesystem_ensure_directory.assert_any_call("/path/to/site-packages")
     mocked_filesystem_ensure_directory.assert_any_call("/tmp2")
 
-    mocked_fetch_definition_mapping.assert_called_once_with(registry_paths)
+    mocked_fetch_definition_mapping.assert_not_called()
 
-    mocked_fetch_context_mapping.assert_called_once_with("/tmp2", python_target)
+    mocked_fetch_context_mapping.assert_called_once_with(
+        "/tmp2", python_target, cache_path=None
+    )
 
     assert mocked_install.call_count == 2
     mocked_install.assert_any_call(
-        "foo", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
+        "foo", "/path/to/install", context, None, "/tmp2", "/tmp1",
         mocker.ANY,
         definition_path=None,
         overwrite=None,
         editable_mode=editable_mode,
         parent_identifier=None,
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
     mocked_install.assert_any_call(
-        "bar", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
+        "bar", "/path/to/install", context, None, "/tmp2", "/tmp1",
         mocker.ANY,
         definition_path=None,
         overwrite=True,
         editable_mode=editable_mode,
         parent_identifier=None,
         update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
     )
 
     assert mocked_shutil_rmtree.call_count == 4
-    mocked_shutil_rmtree.assert_any_call("/tmp1")
+    mocked_shutil_rmtree.assert_any_call("/tmp1", ignore_errors=True)
     mocked_shutil_rmtree.assert_any_call("/tmp2")
 
     logger.info.assert_called_once_with("Packages installed: bar, foo")
@@ -771,46 +944,1170 @@ def test_install_requests_none(
     python_target, registry_paths, update_existing_definitions,
     continue_on_error
 ):
-    """Install no packages."""
-    context = {"environ": {"PYTHONPATH": "/path/to/site-packages"}}
-    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
-    mocked_fetch_context_mapping.return_value = context
-    mocked_fetch_definition_mapping.return_value = "__MAPPING__"
+    """Install no packages."""
+    context = {"environ": {"PYTHONPATH": "/path/to/site-packages"}}
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
+    mocked_fetch_context_mapping.return_value = context
+    mocked_fetch_definition_mapping.return_value = "__MAPPING__"
+
+    mocked_install.side_effect = [(None, overwrite)]
+
+    result = qip.install(["foo"], "/path/to/install", **options)
+    assert result is False
+
+    assert mocked_tempfile_mkdtemp.call_count == 2
+
+    assert mocked_filesystem_ensure_directory.call_count == 3
+    mocked_filesystem_ensure_directory.assert_any_call("/path/to/install")
+    mocked_filesystem_ensure_directory.assert_any_call("/path/to/site-packages")
+    mocked_filesystem_ensure_directory.assert_any_call("/tmp2")
+
+    mocked_fetch_definition_mapping.assert_not_called()
+
+    mocked_fetch_context_mapping.assert_called_once_with(
+        "/tmp2", python_target, cache_path=None
+    )
+
+    mocked_install.assert_called_once_with(
+        "foo", "/path/to/install", context, None, "/tmp2", "/tmp1",
+        mocker.ANY,
+        definition_path=None,
+        overwrite=overwrite,
+        editable_mode=editable_mode,
+        parent_identifier=None,
+        update_existing_definitions=update_existing_definitions,
+        continue_on_error=continue_on_error,
+        artifact_cache_path=None,
+        log_path=None
+    )
+
+    assert mocked_shutil_rmtree.call_count == 3
+    mocked_shutil_rmtree.assert_any_call("/tmp1", ignore_errors=True)
+    mocked_shutil_rmtree.assert_any_call("/tmp2")
+
+    logger.info.assert_not_called()
+
+
+def test_install_requests_with_time_limits(
+    mocker, mocked_filesystem_ensure_directory, mocked_tempfile_mkdtemp,
+    mocked_fetch_context_mapping, mocked_install, mocked_shutil_rmtree
+):
+    """Install packages with time limits for commands executed."""
+    mocked_time_limit = mocker.patch.object(
+        qip.command, "time_limit", new=mocker.MagicMock()
+    )
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
+    mocked_fetch_context_mapping.return_value = {
+        "environ": {"PYTHONPATH": "/path/to/site-packages"}
+    }
+    mocked_install.return_value = (
+        {"identifier": "foo", "name": "foo", "version": "0.1.0"}, False
+    )
+
+    result = qip.install(
+        ["foo"], "/path/to/install", timeout=600, total_timeout=3600
+    )
+    assert result is True
+
+    mocked_time_limit.assert_called_once_with(
+        timeout=600, total_timeout=3600
+    )
+    mocked_install.assert_called_once()
+
+
+def test_install_requests_with_fork_server(
+    mocker, mocked_filesystem_ensure_directory, mocked_tempfile_mkdtemp,
+    mocked_fetch_context_mapping, mocked_install, mocked_shutil_rmtree
+):
+    """Install packages with fork server."""
+    mocked_fork_server = mocker.patch.object(
+        qip.command, "fork_server", new=mocker.MagicMock()
+    )
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
+    mocked_fetch_context_mapping.return_value = {
+        "environ": {"PYTHONPATH": "/path/to/site-packages"}
+    }
+    mocked_install.return_value = (
+        {"identifier": "foo", "name": "foo", "version": "0.1.0"}, False
+    )
+
+    result = qip.install(["foo"], "/path/to/install", use_fork_server=True)
+    assert result is True
+
+    mocked_fork_server.assert_called_once_with(enabled=True)
+    mocked_install.assert_called_once()
+
+
+def test_install_requests_with_copy_jobs(
+    mocker, mocked_filesystem_ensure_directory, mocked_tempfile_mkdtemp,
+    mocked_fetch_context_mapping, mocked_install, mocked_shutil_rmtree
+):
+    """Install packages with several threads to copy files."""
+    mocked_parallel_copy = mocker.patch.object(
+        qip.filesystem, "parallel_copy", new=mocker.MagicMock()
+    )
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
+    mocked_fetch_context_mapping.return_value = {
+        "environ": {"PYTHONPATH": "/path/to/site-packages"}
+    }
+    mocked_install.return_value = (
+        {"identifier": "foo", "name": "foo", "version": "0.1.0"}, False
+    )
+
+    result = qip.install(["foo"], "/path/to/install", copy_jobs=8)
+    assert result is True
+
+    mocked_parallel_copy.assert_called_once_with(jobs=8)
+    mocked_install.assert_called_once()
+
+
+def test_install_requests_with_delta_overwrite(
+    mocker, mocked_filesystem_ensure_directory, mocked_tempfile_mkdtemp,
+    mocked_fetch_context_mapping, mocked_install, mocked_shutil_rmtree
+):
+    """Install packages with delta overwrite."""
+    mocked_delta_update = mocker.patch.object(
+        qip.filesystem, "delta_update", new=mocker.MagicMock()
+    )
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
+    mocked_fetch_context_mapping.return_value = {
+        "environ": {"PYTHONPATH": "/path/to/site-packages"}
+    }
+    mocked_install.return_value = (
+        {"identifier": "foo", "name": "foo", "version": "0.1.0"}, False
+    )
+
+    result = qip.install(
+        ["foo"], "/path/to/install", overwrite=True, delta_overwrite=True
+    )
+    assert result is True
+
+    mocked_delta_update.assert_called_once_with(enabled=True)
+    mocked_install.assert_called_once()
+
+
+def test_install_requests_with_deduplicate(
+    mocker, mocked_filesystem_ensure_directory, mocked_tempfile_mkdtemp,
+    mocked_fetch_context_mapping, mocked_install, mocked_shutil_rmtree
+):
+    """Install packages with files deduplicated."""
+    mocked_content_store = mocker.patch.object(
+        qip.filesystem, "content_store", new=mocker.MagicMock()
+    )
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
+    mocked_fetch_context_mapping.return_value = {
+        "environ": {"PYTHONPATH": "/path/to/site-packages"}
+    }
+    mocked_install.return_value = (
+        {"identifier": "foo", "name": "foo", "version": "0.1.0"}, False
+    )
+
+    result = qip.install(
+        ["foo"], "/path/to/install", deduplicate=True
+    )
+    assert result is True
+
+    mocked_content_store.assert_called_once_with(
+        path=os.path.join("/path/to/install", ".qip-store")
+    )
+    mocked_install.assert_called_once()
+
+
+def test_install_requests_with_stage_in_output(
+    mocker, mocked_filesystem_ensure_directory, mocked_fetch_definition_mapping,
+    mocked_tempfile_mkdtemp, mocked_fetch_context_mapping, mocked_install,
+    mocked_shutil_rmtree
+):
+    """Install packages with staging folder within output path."""
+    context = {"environ": {"PYTHONPATH": "/path/to/site-packages"}}
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
+    mocked_fetch_context_mapping.return_value = context
+
+    mocked_install.side_effect = [
+        (
+            {"identifier": "foo", "name": "foo", "version": "0.1.0"}, False
+        ),
+    ]
+
+    result = qip.install(["foo"], "/path/to/install", stage_in_output=True)
+    assert result is True
+
+    staging_path = os.path.join("/path/to/install", ".qip-staging")
+
+    mocked_filesystem_ensure_directory.assert_any_call(staging_path)
+
+    # Pip cache folder is not created within output path.
+    assert mocked_tempfile_mkdtemp.call_args_list == [
+        mocker.call(), mocker.call(dir=staging_path)
+    ]
+
+    mocked_fetch_context_mapping.assert_called_once_with(
+        "/tmp2", sys.executable, cache_path=None
+    )
+
+    mocked_install.assert_called_once_with(
+        "foo", "/path/to/install", context, None, "/tmp2", "/tmp1",
+        mocker.ANY,
+        definition_path=None,
+        overwrite=False,
+        editable_mode=False,
+        parent_identifier=None,
+        update_existing_definitions=False,
+        continue_on_error=False,
+        artifact_cache_path=None,
+        log_path=None
+    )
+
+
+@pytest.mark.parametrize("cache_size_limit", [None, 1024], ids=[
+    "without-size-limit",
+    "with-size-limit",
+])
+def test_install_requests_with_cache(
+    mocker, mocked_filesystem_ensure_directory, mocked_fetch_definition_mapping,
+    mocked_tempfile_mkdtemp, mocked_fetch_context_mapping, mocked_install,
+    mocked_shutil_rmtree, mocked_cache_acquire_lock, mocked_cache_release_lock,
+    mocked_cache_prune, cache_size_limit
+):
+    """Install packages with persistent cache."""
+    context = {"environ": {"PYTHONPATH": "/path/to/site-packages"}}
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1"]
+    mocked_fetch_context_mapping.return_value = context
+    mocked_fetch_definition_mapping.return_value = "__MAPPING__"
+    mocked_cache_acquire_lock.return_value = "__LOCK__"
+
+    mocked_install.side_effect = [
+        (
+            {"identifier": "foo", "name": "foo", "version": "0.1.0"}, False
+        ),
+    ]
+
+    result = qip.install(
+        ["foo"], "/path/to/install", cache_path="/path/to/cache",
+        cache_size_limit=cache_size_limit
+    )
+    assert result is True
+
+    assert mocked_tempfile_mkdtemp.call_count == 1
+
+    mocked_filesystem_ensure_directory.assert_any_call(
+        os.path.join("/path/to/cache", "pip")
+    )
+
+    mocked_cache_acquire_lock.assert_called_once_with(
+        "/path/to/cache", shared=True
+    )
+    mocked_cache_release_lock.assert_called_once_with("__LOCK__")
+
+    mocked_fetch_context_mapping.assert_called_once_with(
+        "/tmp1", sys.executable, cache_path="/path/to/cache"
+    )
+    mocked_fetch_definition_mapping.assert_not_called()
+
+    mocked_install.assert_called_once_with(
+        "foo", "/path/to/install", context, None, "/tmp1",
+        os.path.join("/path/to/cache", "pip"),
+        mocker.ANY,
+        definition_path=None,
+        overwrite=False,
+        editable_mode=False,
+        parent_identifier=None,
+        update_existing_definitions=False,
+        continue_on_error=False,
+        artifact_cache_path="/path/to/cache",
+        log_path=None
+    )
+
+    # Persistent cache is not removed.
+    assert mocked_shutil_rmtree.call_count == 2
+    mocked_shutil_rmtree.assert_any_call("/tmp1", ignore_errors=True)
+
+    if cache_size_limit is None:
+        mocked_cache_prune.assert_not_called()
+    else:
+        mocked_cache_prune.assert_called_once_with(
+            "/path/to/cache", cache_size_limit, blocking=False
+        )
+
+
+def test_install_requests_with_cache_not_usable(
+    mocker, mocked_filesystem_ensure_directory, mocked_fetch_definition_mapping,
+    mocked_tempfile_mkdtemp, mocked_fetch_context_mapping, mocked_install,
+    mocked_shutil_rmtree, mocked_cache_acquire_lock, mocked_cache_release_lock,
+    mocked_cache_prune, logger
+):
+    """Install packages without persistent cache which cannot be used."""
+    context = {"environ": {"PYTHONPATH": "/path/to/site-packages"}}
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
+    mocked_fetch_context_mapping.return_value = context
+    mocked_cache_acquire_lock.side_effect = RuntimeError("Oh Shit")
+
+    mocked_install.side_effect = [
+        (
+            {"identifier": "foo", "name": "foo", "version": "0.1.0"}, False
+        ),
+    ]
+
+    result = qip.install(
+        ["foo"], "/path/to/install", cache_path="/path/to/cache",
+        cache_size_limit=1024
+    )
+    assert result is True
+
+    mocked_fetch_context_mapping.assert_called_once_with(
+        "/tmp2", sys.executable, cache_path=None
+    )
+    mocked_install.assert_called_once_with(
+        "foo", "/path/to/install", context, None, "/tmp2", "/tmp1",
+        mocker.ANY,
+        definition_path=None,
+        overwrite=False,
+        editable_mode=False,
+        parent_identifier=None,
+        update_existing_definitions=False,
+        continue_on_error=False,
+        artifact_cache_path=None,
+        log_path=None
+    )
+
+    # Temporary cache is removed.
+    mocked_shutil_rmtree.assert_any_call("/tmp1", ignore_errors=True)
+    mocked_cache_release_lock.assert_not_called()
+    mocked_cache_prune.assert_not_called()
+
+    logger.warning.assert_called_once_with(
+        "Packages will be installed without persistent cache:\nOh Shit"
+    )
+
+
+def test_install_requests_satisfied(
+    mocker, mocked_filesystem_ensure_directory, mocked_fetch_definition_mapping,
+    mocked_tempfile_mkdtemp, mocked_fetch_context_mapping, mocked_install,
+    mocked_shutil_rmtree, logger
+):
+    """Skip requests already satisfied by packages installed."""
+    context = {"environ": {"PYTHONPATH": "/path/to/site-packages"}}
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
+    mocked_fetch_context_mapping.return_value = context
+    mocked_fetch_definition_mapping.return_value = "__MAPPING__"
+
+    mocked_install.side_effect = [
+        (
+            {
+                "identifier": "Foo-1.4", "name": "Foo", "version": "1.4",
+                "requirements": ["bim >= 1", "FOO >= 1, < 2"]
+            }, False
+        ),
+        (
+            {
+                "identifier": "Foo-test-1.4", "name": "Foo", "version": "1.4",
+                "extra": ["test"]
+            }, False
+        ),
+        (None, False),
+        (
+            {"identifier": "bim-0.1.0", "name": "bim", "version": "0.1.0"},
+            False
+        ),
+    ]
+
+    result = qip.install(
+        ["foo", "Foo", "foo>=1", "foo >= 1, < 2", "foo[test]", "foo>=2"],
+        "/path/to/install"
+    )
+    assert result is True
+
+    assert [
+        _call[0][0] for _call in mocked_install.call_args_list
+    ] == ["foo", "foo[test]", "foo>=2", "bim >= 1"]
+
+    logger.info.assert_called_once_with(
+        "Packages installed: bim-0.1.0, Foo-1.4, Foo-test-1.4"
+    )
+
+
+@pytest.mark.parametrize("request_, expected", [
+    ("foo", True),
+    ("Foo", True),
+    ("foo_bar", False),
+    ("foo>=1", True),
+    ("foo >= 1, < 2", True),
+    ("foo >= 2", False),
+    ("foo==1.4", True),
+    ("foo[test]", False),
+    ("bar[test,dev]==0.1.0", True),
+    ("bar[test]==0.1.0", False),
+    ("bar[dev, test]>0.1.0", False),
+    ("bar[dev, test]>=0.1.0", True),
+    ("baz", False),
+    (".", False),
+    ("/path/to/foo", False),
+    ("git@gitlab:rnd/foo.git", False),
+    ("foo @ git+ssh://git@gitlab/rnd/foo.git", False),
+], ids=[
+    "same-name",
+    "different-case",
+    "different-name",
+    "specifier",
+    "several-specifiers",
+    "non-matching-specifier",
+    "pinned",
+    "non-matching-extras",
+    "extras",
+    "partial-extras",
+    "extras-with-non-matching-specifier",
+    "extras-with-specifier",
+    "not-installed",
+    "current-path",
+    "path",
+    "git",
+    "direct-reference",
+])
+def test_is_satisfied(request_, expected):
+    """Indicate whether request is satisfied by distributions installed."""
+    index = {}
+    qip._index_distribution(
+        index, {"identifier": "Foo-1.4", "name": "Foo", "version": "1.4"}
+    )
+    qip._index_distribution(
+        index, {
+            "identifier": "bar-dev-test-0.1.0", "name": "bar",
+            "version": "0.1.0", "extra": ["test", "dev"]
+        }
+    )
+
+    assert qip._is_satisfied(request_, index) is expected
+
+
+def test_install_requests_with_plan(
+    mocker, mocked_filesystem_ensure_directory, mocked_fetch_definition_mapping,
+    mocked_tempfile_mkdtemp, mocked_fetch_context_mapping, mocked_install,
+    mocked_shutil_rmtree, mocked_plan, logger
+):
+    """Install packages with dependency closure resolved first."""
+    context = {"environ": {"PYTHONPATH": "/path/to/site-packages"}}
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
+    mocked_fetch_context_mapping.return_value = context
+    mocked_fetch_definition_mapping.return_value = "__MAPPING__"
+    mocked_plan.return_value = [("bim==0.1.0", "foo")]
+
+    mocked_install.side_effect = [
+        (
+            {
+                "identifier": "foo", "name": "foo", "version": "0.1.0",
+                "requirements": ["bim"]
+            }, False
+        ),
+        (
+            {
+                "identifier": "bar", "name": "bar", "version": "0.1.0",
+                "requirements": ["foo"]
+            }, False
+        ),
+        (
+            {
+                "identifier": "bim", "name": "bim", "version": "0.1.0"
+            }, False
+        )
+    ]
+
+    result = qip.install(["foo", "bar"], "/path/to/install", plan=True)
+    assert result is True
+
+    mocked_plan.assert_called_once_with(
+        ["foo", "bar"], context, "/tmp1", include_requested=False
+    )
+
+    assert mocked_install.call_count == 3
+    mocked_install.assert_any_call(
+        "bim==0.1.0", "/path/to/install", context, None, "/tmp2",
+        "/tmp1", mocker.ANY,
+        definition_path=None,
+        overwrite=False,
+        editable_mode=False,
+        parent_identifier="foo",
+        update_existing_definitions=False,
+        continue_on_error=False,
+        artifact_cache_path=None,
+        log_path=None
+    )
+
+    logger.info.assert_called_once_with("Packages installed: bar, bim, foo")
+
+
+def test_install_requests_with_plan_fallback(
+    mocker, mocked_filesystem_ensure_directory, mocked_fetch_definition_mapping,
+    mocked_tempfile_mkdtemp, mocked_fetch_context_mapping, mocked_install,
+    mocked_shutil_rmtree, mocked_plan, logger
+):
+    """Install packages when dependency closure cannot be resolved first."""
+    context = {"environ": {"PYTHONPATH": "/path/to/site-packages"}}
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
+    mocked_fetch_context_mapping.return_value = context
+    mocked_fetch_definition_mapping.return_value = "__MAPPING__"
+    mocked_plan.return_value = None
+
+    mocked_install.side_effect = [
+        (
+            {
+                "identifier": "foo", "name": "foo", "version": "0.1.0",
+                "requirements": ["bim"]
+            }, False
+        ),
+        (
+            {
+                "identifier": "bim", "name": "bim", "version": "0.1.0"
+            }, False
+        )
+    ]
+
+    result = qip.install(["foo"], "/path/to/install", plan=True)
+    assert result is True
+
+    assert mocked_install.call_count == 2
+    mocked_install.assert_any_call(
+        "bim", "/path/to/install", context, None, "/tmp2",
+        "/tmp1", mocker.ANY,
+        definition_path=None,
+        overwrite=False,
+        editable_mode=False,
+        parent_identifier="foo",
+        update_existing_definitions=False,
+        continue_on_error=False,
+        artifact_cache_path=None,
+        log_path=None
+    )
+
+    logger.info.assert_called_once_with("Packages installed: bim, foo")
+
+
+def test_install_requests_with_plan_without_dependencies(
+    mocked_filesystem_ensure_directory, mocked_fetch_definition_mapping,
+    mocked_tempfile_mkdtemp, mocked_fetch_context_mapping, mocked_install,
+    mocked_shutil_rmtree, mocked_plan, logger
+):
+    """Skip dependency closure resolution without dependencies."""
+    context = {"environ": {"PYTHONPATH": "/path/to/site-packages"}}
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
+    mocked_fetch_context_mapping.return_value = context
+
+    mocked_install.side_effect = [
+        (
+            {
+                "identifier": "foo", "name": "foo", "version": "0.1.0",
+                "requirements": ["bim"]
+            }, False
+        ),
+    ]
+
+    result = qip.install(
+        ["foo"], "/path/to/install", plan=True, no_dependencies=True
+    )
+    assert result is True
+
+    mocked_plan.assert_not_called()
+    assert mocked_install.call_count == 1
+
+
+def test_plan(mocked_package_resolve, logger):
+    """Return dependency requests resolved."""
+    mocked_package_resolve.return_value = [
+        {
+            "identifier": "Foo-0.1.0",
+            "key": "foo",
+            "request": "Foo==0.1.0",
+            "requested": True,
+            "requirements": ["bim<3,>=2", "baz; extra == 'test'"]
+        },
+        {
+            "identifier": "BIM-2.1.0",
+            "key": "bim",
+            "request": "BIM==2.1.0",
+            "requested": False,
+            "requirements": ["baz", "__INVALID__ ++"]
+        },
+        {
+            "identifier": "baz-0.5.0",
+            "key": "baz",
+            "request": "baz==0.5.0",
+            "requested": False,
+            "requirements": []
+        },
+    ]
+
+    result = qip._plan(["foo"], "__CONTEXT__", "/tmp/cache")
+    assert result == [
+        ("BIM==2.1.0", "Foo-0.1.0"),
+        ("baz==0.5.0", "Foo-0.1.0"),
+    ]
+
+    mocked_package_resolve.assert_called_once_with(
+        ["foo"], "__CONTEXT__", "/tmp/cache"
+    )
+    logger.warning.assert_not_called()
+
+
+def test_plan_include_requested(mocked_package_resolve, logger):
+    """Return all requests resolved including requested packages."""
+    mocked_package_resolve.return_value = [
+        {
+            "identifier": "Foo-0.1.0",
+            "key": "foo",
+            "request": "Foo==0.1.0",
+            "requested": True,
+            "requirements": ["bim<3,>=2"]
+        },
+        {
+            "identifier": "BIM-2.1.0",
+            "key": "bim",
+            "request": "BIM==2.1.0",
+            "requested": False,
+            "requirements": []
+        },
+    ]
+
+    result = qip._plan(
+        ["foo"], "__CONTEXT__", "/tmp/cache", include_requested=True
+    )
+    assert result == [
+        ("Foo==0.1.0", None),
+        ("BIM==2.1.0", "Foo-0.1.0"),
+    ]
+
+
+def test_plan_fail(mocked_package_resolve, logger):
+    """Fail to resolve dependency closure."""
+    mocked_package_resolve.side_effect = RuntimeError("Oh Shit")
+
+    assert qip._plan(["foo"], "__CONTEXT__", "/tmp/cache") is None
+
+    logger.warning.assert_called_once_with(
+        "Impossible to resolve dependency closure, dependencies will be "
+        "extracted from each package installed:\nOh Shit"
+    )
+
+
+@pytest.mark.parametrize("options, include_requested", [
+    ({}, True),
+    ({"editable_mode": True}, False),
+], ids=[
+    "simple",
+    "with-editable-mode",
+])
+def test_install_requests_with_batch(
+    mocker, mocked_filesystem_ensure_directory, mocked_fetch_definition_mapping,
+    mocked_tempfile_mkdtemp, mocked_fetch_context_mapping, mocked_install,
+    mocked_shutil_rmtree, mocked_plan, mocked_install_batch, logger,
+    options, include_requested
+):
+    """Install packages from dependency closure in batch."""
+    context = {"environ": {"PYTHONPATH": "/path/to/site-packages"}}
+    mocked_tempfile_mkdtemp.side_effect = ["/tmp1", "/tmp2"]
+    mocked_fetch_context_mapping.return_value = context
+    mocked_plan.return_value = [("foo==0.1.0", None), ("bim==0.1.0", "foo")]
+
+    def _install_batch(planned_requests, *args, **kwargs):
+        """Install all planned requests."""
+        args[4].update(["foo", "bim"])
+        args[5].update(["foo==0.1.0", "bim==0.1.0"])
+        args[7].update({
+            "foo": [("0.1.0", (), "foo")], "bim": [("0.1.0", (), "bim")]
+        })
+        return True
+
+    mocked_install_batch.side_effect = _install_batch
+
+    result = qip.install(["foo"], "/path/to/install", batch=True, **options)
+    assert result is True
+
+    mocked_plan.assert_called_once_with(
+        ["foo"], context, "/tmp1", include_requested=include_requested
+    )
+    mocked_install_batch.assert_called_once_with(
+        [("foo==0.1.0", None), ("bim==0.1.0", "foo")], "/path/to/install",
+        context, None, "/tmp1", mocker.ANY, mocker.ANY, mocker.ANY,
+        mocker.ANY,
+        definition_path=None,
+        overwrite=False,
+        update_existing_definitions=False,
+        continue_on_error=False,
+        artifact_cache_path=None,
+        log_path=None,
+        staging_path=None
+    )
+
+    # Requests are satisfied by packages installed in batch.
+    mocked_install.assert_not_called()
+
+    logger.info.assert_called_once_with("Packages installed: bim, foo")
+
+
+def test_install_batch(
+    mocker, mocked_tempfile_mkdtemp, mocked_shutil_rmtree,
+    mocked_filesystem_ensure_directory, mocked_skip_before_build,
+    mocked_package_build_batch, mocked_package_extract_distribution,
+    mocked_install, logger
+):
+    """Install planned requests with a single command."""
+    context = {
+        "environ": {"PYTHONPATH": "/path/to/site-packages"},
+        "python": {"library-path": "lib"}
+    }
+    mocked_tempfile_mkdtemp.side_effect = ["/batch", "/package"]
+    mocked_skip_before_build.side_effect = [
+        None, {"identifier": "bim", "name": "bim", "version": "0.1.0"}, None
+    ]
+
+    build_mappings = [
+        {"request": "foo==0.1.0", "name": "foo", "extra": []},
+        {"request": "baz==0.2.0", "name": "baz", "extra": []},
+    ]
+    mocked_package_build_batch.return_value = build_mappings
+
+    mocked_install.side_effect = [
+        ({"identifier": "foo", "name": "foo", "version": "0.1.0"}, False),
+        (
+            {
+                "identifier": "baz", "name": "baz", "version": "0.2.0",
+                "skipped": True
+            }, False
+        ),
+    ]
+
+    installed_packages = set()
+    installed_requests = set()
+    skipped_packages = set()
+    distribution_index = {}
+
+    overwrite = qip._install_batch(
+        [
+            ("foo==0.1.0", None),
+            ("git@gitlab:rnd/bar.git", None),
+            ("bim==0.1.0", "foo"),
+            ("baz==0.2.0", "foo"),
+        ], "/path/to/install", context, "__MAPPING__", "/cache",
+        installed_packages, installed_requests, skipped_packages,
+        distribution_index, definition_path="/definitions"
+    )
+    assert overwrite is False
+
+    assert installed_packages == {"foo", "bim", "baz"}
+    assert installed_requests == {"foo==0.1.0", "bim==0.1.0", "baz==0.2.0"}
+    assert skipped_packages == {"bim", "baz"}
+    assert sorted(distribution_index.keys()) == ["baz", "bim", "foo"]
+
+    assert mocked_skip_before_build.call_count == 3
+    mocked_package_build_batch.assert_called_once_with(
+        ["foo==0.1.0", "baz==0.2.0"], "/batch", {
+            "environ": {"PYTHONPATH": "/batch/lib"},
+            "python": {"library-path": "lib"}
+        }, "/cache"
+    )
+
+    assert mocked_package_extract_distribution.call_count == 2
+    mocked_package_extract_distribution.assert_any_call(
+        "foo", "/batch", "/package", context
+    )
+    mocked_package_extract_distribution.assert_any_call(
+        "baz", "/batch", "/package", context
+    )
+
+    assert mocked_install.call_count == 2
+    mocked_install.assert_any_call(
+        "baz==0.2.0", "/path/to/install", {
+            "environ": {"PYTHONPATH": "/package/lib"},
+            "python": {"library-path": "lib"}
+        }, "__MAPPING__", "/package", "/cache", installed_packages,
+        definition_path="/definitions",
+        overwrite=False,
+        update_existing_definitions=False,
+        parent_identifier="foo",
+        continue_on_error=False,
+        artifact_cache_path=None,
+        log_path=None,
+        build_mapping=build_mappings[1]
+    )
+
+    mocked_shutil_rmtree.assert_any_call("/batch", ignore_errors=True)
+    mocked_shutil_rmtree.assert_any_call("/package", ignore_errors=True)
+    logger.warning.assert_not_called()
+
+
+def test_install_batch_fail(
+    mocked_tempfile_mkdtemp, mocked_shutil_rmtree, mocked_skip_before_build,
+    mocked_package_build_batch, mocked_package_extract_distribution,
+    mocked_install, logger
+):
+    """Leave all requests to be installed one at a time if command fails."""
+    context = {
+        "environ": {"PYTHONPATH": "/path/to/site-packages"},
+        "python": {"library-path": "lib"}
+    }
+    mocked_tempfile_mkdtemp.side_effect = ["/batch", "/package"]
+    mocked_skip_before_build.return_value = None
+    mocked_package_build_batch.side_effect = RuntimeError("Oh Shit")
+
+    installed_requests = set()
+
+    overwrite = qip._install_batch(
+        [("foo==0.1.0", None)], "/path/to/install", context, "__MAPPING__",
+        "/cache", set(), installed_requests, set(), {}, overwrite=None
+    )
+    assert overwrite is None
+    assert installed_requests == set()
+
+    mocked_package_extract_distribution.assert_not_called()
+    mocked_install.assert_not_called()
+
+    logger.warning.assert_called_once_with(
+        "Impossible to install packages in batch, packages will be installed "
+        "one at a time:\nOh Shit"
+    )
+
+
+def test_install_batch_extract_fail(
+    mocked_tempfile_mkdtemp, mocked_shutil_rmtree,
+    mocked_filesystem_ensure_directory, mocked_skip_before_build,
+    mocked_package_build_batch, mocked_package_extract_distribution,
+    mocked_install, logger
+):
+    """Leave request to be installed on its own if it cannot be extracted."""
+    context = {
+        "environ": {"PYTHONPATH": "/path/to/site-packages"},
+        "python": {"library-path": "lib"}
+    }
+    mocked_tempfile_mkdtemp.side_effect = ["/batch", "/package"]
+    mocked_skip_before_build.return_value = None
+    mocked_package_build_batch.return_value = [
+        {"request": "foo==0.1.0", "name": "foo", "extra": []},
+    ]
+    mocked_package_extract_distribution.side_effect = RuntimeError("Oh Shit")
+
+    installed_requests = set()
+
+    qip._install_batch(
+        [("foo==0.1.0", None)], "/path/to/install", context, "__MAPPING__",
+        "/cache", set(), installed_requests, set(), {}
+    )
+    assert installed_requests == set()
+
+    mocked_install.assert_not_called()
+
+    logger.warning.assert_called_once_with(
+        "Impossible to extract 'foo==0.1.0' from batch, package will be "
+        "installed on its own:\nOh Shit"
+    )
+
+
+@pytest.fixture()
+def mocked_pipeline(
+    mocker, mocked_fetch_definition_mapping, mocked_fetch_context_mapping,
+    mocked_command_terminate, mocked_definition_fetch_custom,
+    mocked_definition_fetch_existing, mocked_definition_export,
+    mocked_copy_to_destination
+):
+    """Mock functions used by each stage of the installation pipeline."""
+    mocked_fetch_context_mapping.side_effect = lambda path, *args, **kwargs: {
+        "environ": {"PYTHONPATH": os.path.join(path, "lib")},
+        "python": {"library-path": "lib"}
+    }
+    mocked_fetch_definition_mapping.return_value = "__MAPPING__"
+    mocked_definition_fetch_custom.return_value = None
+    mocked_definition_fetch_existing.return_value = None
+    mocked_copy_to_destination.side_effect = (
+        lambda mapping, path, output_path, overwrite, move: (False, overwrite)
+    )
+
+    python_mapping = {"identifier": "2.7"}
+
+    mapping = {
+        "foo": {
+            "identifier": "foo", "name": "foo", "version": "0.1.0",
+            "python": python_mapping, "requirements": ["bim"]
+        },
+        "/path/to/foo": {
+            "identifier": "foo", "name": "foo", "version": "0.1.0",
+            "python": python_mapping, "requirements": ["bim"]
+        },
+        "bar": {
+            "identifier": "bar", "name": "bar", "version": "0.1.0",
+            "python": python_mapping, "requirements": ["foo", "bim"]
+        },
+        "bim": {
+            "identifier": "bim", "name": "bim", "version": "0.1.0",
+            "python": python_mapping
+        },
+    }
+
+    def _build(request, path, context_mapping, *args, **kwargs):
+        assert context_mapping["environ"]["PYTHONPATH"] == (
+            os.path.join(path, "lib")
+        )
+        return {"request": request, "name": request, "extra": []}
+
+    return mocker.Mock(
+        build=mocker.patch.object(
+            qip.package, "build", side_effect=_build
+        ),
+        fetch_mapping=mocker.patch.object(
+            qip.package, "fetch_mapping",
+            side_effect=lambda _mapping, _: dict(mapping[_mapping["name"]])
+        ),
+        copy_to_destination=mocked_copy_to_destination,
+        export=mocked_definition_export,
+        terminate=mocked_command_terminate,
+    )
+
+
+@pytest.mark.parametrize("options", [
+    {"jobs": 3},
+    {"jobs": 3, "overwrite": True},
+    {"jobs": 3, "continue_on_error": True},
+    {"stage_jobs": {"copy": 2, "export": 2}},
+    {"jobs": 2, "stage_jobs": {"probe": 1, "copy": 4}},
+], ids=[
+    "simple",
+    "with-overwrite-packages",
+    "with-continue-on-error",
+    "with-stage-jobs",
+    "with-jobs-and-stage-jobs",
+])
+def test_install_requests_concurrently(
+    mocker, temporary_directory, mocked_pipeline, logger, options
+):
+    """Install packages with several workers."""
+    output_path = os.path.join(temporary_directory, "output")
+
+    result = qip.install(
+        ["foo", "bar"], output_path,
+        definition_path=os.path.join(temporary_directory, "definitions"),
+        **options
+    )
+    assert result is True
+
+    assert sorted(
+        _call[0][0] for _call in mocked_pipeline.build.call_args_list
+    ) == ["bar", "bim", "foo"]
+
+    assert sorted(
+        _call[0][0]["identifier"] for _call in
+        mocked_pipeline.copy_to_destination.call_args_list
+    ) == ["bar", "bim", "foo"]
+
+    assert sorted(
+        _call[0][1]["identifier"] for _call in
+        mocked_pipeline.export.call_args_list
+    ) == ["bar", "bim", "foo"]
+
+    mocked_pipeline.terminate.assert_not_called()
+
+    logger.info.assert_any_call("Packages installed: bar, bim, foo")
+    logger.error.assert_not_called()
+
+
+def test_install_requests_concurrently_same_identifier(
+    temporary_directory, mocked_pipeline, logger
+):
+    """Install packages with several workers and identical identifiers."""
+    output_path = os.path.join(temporary_directory, "output")
+
+    result = qip.install(
+        ["foo", "/path/to/foo"], output_path, jobs=2, no_dependencies=True
+    )
+    assert result is True
+
+    assert mocked_pipeline.build.call_count == 2
+    mocked_pipeline.copy_to_destination.assert_called_once()
+
+    logger.info.assert_any_call("Packages installed: foo")
+
+
+def test_install_requests_concurrently_skipped_with_dependency(
+    mocker, temporary_directory, mocked_pipeline, logger
+):
+    """Install dependency of package skipped before build with workers."""
+    output_path = os.path.join(temporary_directory, "output")
+
+    mocker.patch.object(
+        qip, "_skip_before_build", side_effect=lambda request, *_, **__: (
+            {
+                "identifier": "foo", "name": "foo", "version": "0.1.0",
+                "requirements": ["bim"], "skipped": True
+            } if request == "foo==0.1.0" else None
+        )
+    )
+
+    result = qip.install(["foo==0.1.0"], output_path, jobs=2)
+    assert result is True
+
+    mocked_pipeline.build.assert_called_once_with(
+        "bim", mocker.ANY, mocker.ANY, mocker.ANY, editable_mode=False,
+        artifact_cache_path=None
+    )
+    mocked_pipeline.copy_to_destination.assert_called_once()
+
+    logger.info.assert_any_call("Packages installed: bim")
+
+
+def test_install_requests_concurrently_satisfied(
+    temporary_directory, mocked_pipeline, logger
+):
+    """Skip requests already satisfied with several workers."""
+    output_path = os.path.join(temporary_directory, "output")
+
+    python_mapping = {"identifier": "2.7"}
+
+    mapping = {
+        "foo": {
+            "identifier": "foo", "name": "foo", "version": "0.1.0",
+            "python": python_mapping, "requirements": ["bim"]
+        },
+        "bim": {
+            "identifier": "bim", "name": "bim", "version": "0.1.0",
+            "python": python_mapping, "requirements": [
+                "Foo >= 0.1, < 1", "FOO", "foo[test]"
+            ]
+        },
+        "foo[test]": {
+            "identifier": "foo-test", "name": "foo", "version": "0.1.0",
+            "extra": ["test"], "python": python_mapping,
+        },
+    }
+
+    mocked_pipeline.fetch_mapping.side_effect = (
+        lambda _mapping, _: dict(mapping[_mapping["name"]])
+    )
+
+    result = qip.install(["foo"], output_path, jobs=2)
+    assert result is True
+
+    assert sorted(
+        _call[0][0] for _call in mocked_pipeline.build.call_args_list
+    ) == ["bim", "foo", "foo[test]"]
+
+    logger.info.assert_any_call("Packages installed: bim, foo, foo-test")
+
+
+def test_install_requests_concurrently_confirm_overwrite(
+    temporary_directory, mocked_pipeline, logger
+):
+    """Install packages with several workers and confirm overwrite."""
+    output_path = os.path.join(temporary_directory, "output")
 
-    mocked_install.side_effect = [(None, overwrite)]
+    overwrite_values = []
 
-    result = qip.install(["foo"], "/path/to/install", **options)
-    assert result is False
+    def _copy(mapping, path, output_path, overwrite, move):
+        overwrite_values.append(overwrite)
+        return False, True
 
-    assert mocked_tempfile_mkdtemp.call_count == 2
+    mocked_pipeline.copy_to_destination.side_effect = _copy
 
-    assert mocked_filesystem_ensure_directory.call_count == 3
-    mocked_filesystem_ensure_directory.assert_any_call("/path/to/install")
-    mocked_filesystem_ensure_directory.assert_any_call("/path/to/site-packages")
-    mocked_filesystem_ensure_directory.assert_any_call("/tmp2")
+    result = qip.install(
+        ["foo", "bar"], output_path, overwrite=None,
+        stage_jobs={"build": 2, "copy": 1}
+    )
+    assert result is True
 
-    mocked_fetch_definition_mapping.assert_called_once_with(registry_paths)
+    assert overwrite_values == [None, True, True]
+    mocked_pipeline.export.assert_not_called()
 
-    mocked_fetch_context_mapping.assert_called_once_with("/tmp2", python_target)
 
-    mocked_install.assert_called_once_with(
-        "foo", "/path/to/install", context, "__MAPPING__", "/tmp2", "/tmp1",
-        mocker.ANY,
-        definition_path=None,
-        overwrite=overwrite,
-        editable_mode=editable_mode,
-        parent_identifier=None,
-        update_existing_definitions=update_existing_definitions,
-        continue_on_error=continue_on_error
+def test_install_requests_concurrently_skip(
+    temporary_directory, mocked_pipeline, logger
+):
+    """Install packages with several workers and skip existing packages."""
+    output_path = os.path.join(temporary_directory, "output")
+
+    mocked_pipeline.copy_to_destination.side_effect = (
+        lambda mapping, path, output_path, overwrite, move: (
+            mapping["identifier"] == "bim", overwrite
+        )
     )
 
-    assert mocked_shutil_rmtree.call_count == 3
-    mocked_shutil_rmtree.assert_any_call("/tmp1")
-    mocked_shutil_rmtree.assert_any_call("/tmp2")
+    result = qip.install(
+        ["foo"], output_path,
+        definition_path=os.path.join(temporary_directory, "definitions"),
+        jobs=2
+    )
+    assert result is True
+
+    assert mocked_pipeline.copy_to_destination.call_count == 2
+    assert mocked_pipeline.export.call_count == 1
+
+    logger.info.assert_any_call("Packages installed: foo")
 
+
+def test_install_requests_concurrently_fail(
+    temporary_directory, mocked_pipeline, logger
+):
+    """Fail to install packages with several workers."""
+    output_path = os.path.join(temporary_directory, "output")
+
+    mocked_pipeline.build.side_effect = RuntimeError("Oh Shit")
+
+    with pytest.raises(RuntimeError) as error:
+        qip.install(["foo", "bar"], output_path, jobs=2)
+
+    assert "Oh Shit" in str(error.value)
+
+    mocked_pipeline.terminate.assert_called()
+    mocked_pipeline.copy_to_destination.assert_not_called()
     logger.info.assert_not_called()
 
 
+def test_install_requests_concurrently_continue_on_error(
+    temporary_directory, mocked_pipeline, logger
+):
+    """Continue installation with several workers when a package fails."""
+    output_path = os.path.join(temporary_directory, "output")
+
+    def _build(request, *args, **kwargs):
+        if request == "bim":
+            raise RuntimeError("Oh Shit")
+        return {"request": request, "name": request, "extra": []}
+
+    mocked_pipeline.build.side_effect = _build
+
+    result = qip.install(
+        ["foo"], output_path, jobs=2, continue_on_error=True
+    )
+    assert result is True
+
+    mocked_pipeline.terminate.assert_not_called()
+    logger.error.assert_called_once_with(
+        "Request 'bim' has failed [from 'foo']:\nOh Shit"
+    )
+    logger.info.assert_any_call("Packages installed: foo")
+
+
+def test_relocate_context_mapping():
+    """Return context mapping targeting another installation path."""
+    context_mapping = {
+        "environ": {
+            "PATH": "/path/to/bin",
+            "PYTHONPATH": "/path1/lib/python2.7/site-packages",
+        },
+        "python": {
+            "library-path": "lib/python2.7/site-packages"
+        }
+    }
+
+    assert qip._relocate_context_mapping(context_mapping, "/path2") == {
+        "environ": {
+            "PATH": "/path/to/bin",
+            "PYTHONPATH": "/path2/lib/python2.7/site-packages",
+        },
+        "python": {
+            "library-path": "lib/python2.7/site-packages"
+        }
+    }
+
+    # Initial mapping is not mutated.
+    assert context_mapping["environ"]["PYTHONPATH"] == (
+        "/path1/lib/python2.7/site-packages"
+    )
+
+
 @pytest.mark.parametrize(
     "options, overwrite, editable_mode", [
         ({}, False, False),
@@ -843,7 +2140,8 @@ def test_install_one_request(
 
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
-        editable_mode=editable_mode
+        editable_mode=editable_mode,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_not_called()
@@ -852,7 +2150,7 @@ def test_install_one_request(
 
     mocked_copy_to_destination.assert_called_once_with(
         mapping, "/tmp/packages", "/path/to/install",
-        overwrite=overwrite
+        overwrite=overwrite, move=True
     )
 
     logger.warning.assert_not_called()
@@ -904,7 +2202,8 @@ def test_install_one_request_with_definition_path(
 
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
-        editable_mode=editable_mode
+        editable_mode=editable_mode,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_called_once_with(mapping)
@@ -920,7 +2219,7 @@ def test_install_one_request_with_definition_path(
 
     mocked_copy_to_destination.assert_called_once_with(
         mapping, "/tmp/packages", "/path/to/install",
-        overwrite=overwrite
+        overwrite=overwrite, move=True
     )
 
     logger.warning.assert_not_called()
@@ -977,7 +2276,8 @@ def test_install_one_request_with_custom_definition(
 
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
-        editable_mode=editable_mode
+        editable_mode=editable_mode,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_called_once_with(mapping)
@@ -993,7 +2293,7 @@ def test_install_one_request_with_custom_definition(
 
     mocked_copy_to_destination.assert_called_once_with(
         mapping, "/tmp/packages", "/path/to/install",
-        overwrite=overwrite
+        overwrite=overwrite, move=True
     )
 
     logger.warning.assert_not_called()
@@ -1054,7 +2354,8 @@ def test_install_one_request_with_existing_definition_in_output(
 
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
-        editable_mode=editable_mode
+        editable_mode=editable_mode,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_called_once_with(mapping)
@@ -1070,7 +2371,7 @@ def test_install_one_request_with_existing_definition_in_output(
 
     mocked_copy_to_destination.assert_called_once_with(
         mapping, "/tmp/packages", "/path/to/install",
-        overwrite=overwrite
+        overwrite=overwrite, move=True
     )
 
     logger.warning.assert_not_called()
@@ -1131,7 +2432,8 @@ def test_install_one_request_with_existing_definition_with_different_variant(
 
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
-        editable_mode=editable_mode
+        editable_mode=editable_mode,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_called_once_with(mapping)
@@ -1147,7 +2449,7 @@ def test_install_one_request_with_existing_definition_with_different_variant(
 
     mocked_copy_to_destination.assert_called_once_with(
         mapping, "/tmp/packages", "/path/to/install",
-        overwrite=overwrite
+        overwrite=overwrite, move=True
     )
 
     logger.warning.assert_not_called()
@@ -1207,7 +2509,8 @@ def test_install_one_request_with_existing_definition_in_editable_mode(
 
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
-        editable_mode=True
+        editable_mode=True,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_called_once_with(mapping)
@@ -1224,7 +2527,7 @@ def test_install_one_request_with_existing_definition_in_editable_mode(
 
     mocked_copy_to_destination.assert_called_once_with(
         mapping, "/tmp/packages", "/path/to/install",
-        overwrite=overwrite
+        overwrite=overwrite, move=True
     )
 
     logger.warning.assert_not_called()
@@ -1283,7 +2586,8 @@ def test_install_one_request_skip_existing_definition(
 
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
-        editable_mode=False
+        editable_mode=False,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_called_once_with(mapping)
@@ -1338,7 +2642,8 @@ def test_install_one_request_skip_installed(
 
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
-        editable_mode=editable_mode
+        editable_mode=editable_mode,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_not_called()
@@ -1383,7 +2688,8 @@ def test_install_one_request_overwrite_changed(
 
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
-        editable_mode=editable_mode
+        editable_mode=editable_mode,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_not_called()
@@ -1392,7 +2698,7 @@ def test_install_one_request_overwrite_changed(
 
     mocked_copy_to_destination.assert_called_once_with(
         mapping, "/tmp/packages", "/path/to/install",
-        overwrite=None
+        overwrite=None, move=True
     )
 
     logger.warning.assert_not_called()
@@ -1444,7 +2750,8 @@ def test_install_one_request_copy_skipped(
 
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
-        editable_mode=editable_mode
+        editable_mode=editable_mode,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_called_once_with(mapping)
@@ -1455,7 +2762,7 @@ def test_install_one_request_copy_skipped(
 
     mocked_copy_to_destination.assert_called_once_with(
         mapping, "/tmp/packages", "/path/to/install",
-        overwrite=overwrite
+        overwrite=overwrite, move=True
     )
 
     logger.warning.assert_not_called()
@@ -1498,7 +2805,8 @@ def test_install_one_request_with_parent(
 
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
-        editable_mode=editable_mode
+        editable_mode=editable_mode,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_not_called()
@@ -1507,7 +2815,7 @@ def test_install_one_request_with_parent(
 
     mocked_copy_to_destination.assert_called_once_with(
         mapping, "/tmp/packages", "/path/to/install",
-        overwrite=overwrite
+        overwrite=overwrite, move=True
     )
 
     logger.warning.assert_not_called()
@@ -1517,6 +2825,333 @@ def test_install_one_request_with_parent(
     assert mapping.get("skipped") is False
 
 
+def test_install_one_request_skip_before_build(
+    mocked_package_install, mocked_definition_fetch_custom,
+    mocked_definition_fetch_existing, mocked_copy_to_destination,
+    mocked_definition_export, logger
+):
+    """Skip pinned package because of existing definition before build."""
+    installed_packages = set()
+
+    existing_definition = wiz.definition.Definition(
+        {
+            "identifier": "foo",
+            "variants": [{"identifier": "3.8"}]
+        },
+        registry_path="/somewhere/else"
+    )
+
+    mocked_definition_fetch_existing.return_value = existing_definition
+
+    context_mapping = {"python": {"identifier": "3.8"}}
+
+    result = qip._install(
+        "Foo_Bar[test]==0.1.0", "/path/to/install", context_mapping,
+        "__MAPPING__", "/tmp/packages", "/tmp/cache", installed_packages,
+        definition_path="/path/definitions",
+    )
+
+    mapping = {
+        "identifier": "Foo_Bar-test-0.1.0",
+        "key": "foo-bar-test",
+        "name": "Foo_Bar",
+        "version": "0.1.0",
+        "extra": ["test"],
+        "python": {"identifier": "3.8"},
+        "skipped": True
+    }
+    assert result == (mapping, False)
+
+    mocked_package_install.assert_not_called()
+    mocked_definition_fetch_custom.assert_not_called()
+    mocked_definition_fetch_existing.assert_called_once_with(
+        mapping, "__MAPPING__"
+    )
+    mocked_definition_export.assert_not_called()
+    mocked_copy_to_destination.assert_not_called()
+
+    logger.warning.assert_called_once_with(
+        "Skip 'foo-bar-test[3.8]==0.1.0' which already exists in Wiz "
+        "registries."
+    )
+
+
+def test_skip_before_build_existing_with_requirements(
+    mocked_definition_fetch_existing
+):
+    """Skip pinned package with requirements from existing definition."""
+    mocked_definition_fetch_existing.return_value = wiz.definition.Definition(
+        {
+            "identifier": "foo",
+            "variants": [
+                {
+                    "identifier": "3.8",
+                    "requirements": [
+                        "python >=3.8, <3.9",
+                        "library::bim[3.8] >=2, <3",
+                        "library::baz[3.8]",
+                    ]
+                },
+                {
+                    "identifier": "2.7",
+                    "requirements": ["library::bar[2.7]"]
+                }
+            ]
+        },
+        registry_path="/somewhere/else"
+    )
+
+    context_mapping = {"python": {"identifier": "3.8"}}
+
+    result = qip._skip_before_build(
+        "foo==0.1.0", "/path/to/install", context_mapping, "__MAPPING__",
+        definition_path="/path/definitions"
+    )
+    assert result["skipped"] is True
+    assert result["requirements"] == ["bim<3,>=2", "baz"]
+
+
+def test_install_one_request_with_build_mapping(
+    mocked_package_install, mocked_package_fetch_mapping,
+    mocked_skip_before_build, mocked_copy_to_destination, logger
+):
+    """Install package already built."""
+    mapping = {"identifier": "foo"}
+    mocked_package_fetch_mapping.return_value = mapping
+    mocked_copy_to_destination.return_value = (False, False)
+
+    build_mapping = {"request": "foo==0.1.0", "name": "foo", "extra": []}
+
+    result = qip._install(
+        "foo==0.1.0", "/path/to/install", "__CONTEXT__", "__MAPPING__",
+        "/tmp/packages", "/tmp/cache", set(), build_mapping=build_mapping
+    )
+    assert result == (mapping, False)
+
+    mocked_skip_before_build.assert_not_called()
+    mocked_package_install.assert_not_called()
+    mocked_package_fetch_mapping.assert_called_once_with(
+        build_mapping, "__CONTEXT__"
+    )
+    mocked_copy_to_destination.assert_called_once_with(
+        mapping, "/tmp/packages", "/path/to/install", overwrite=False,
+        move=True
+    )
+
+
+@pytest.mark.parametrize("request_, options", [
+    ("foo", {}),
+    ("foo >= 0.1.0", {}),
+    ("git@gitlab:rnd/foo.git@dev", {}),
+    ("foo==0.1.0", {"editable_mode": True}),
+    ("foo==0.1.0", {"overwrite": True}),
+    ("foo==0.1.0", {"overwrite": None}),
+    ("foo==0.2.0", {}),
+    ("foo[test]==0.1.0", {}),
+    ("bar==0.1.0", {}),
+], ids=[
+    "not-pinned",
+    "with-specifier",
+    "git-branch",
+    "editable",
+    "overwrite",
+    "confirm-overwrite",
+    "other-version",
+    "other-extra",
+    "not-installed",
+])
+def test_skip_before_build_not_skipped(
+    temporary_directory, mocked_definition_fetch_existing, logger, request_,
+    options
+):
+    """Do not skip package before build."""
+    os.makedirs(os.path.join(temporary_directory, "Foo", "Foo-0.1.0-py38"))
+    mocked_definition_fetch_existing.return_value = None
+
+    context_mapping = {"python": {"identifier": "3.8"}}
+
+    assert qip._skip_before_build(
+        request_, temporary_directory, context_mapping, "__MAPPING__",
+        **options
+    ) is None
+
+    logger.warning.assert_not_called()
+
+
+@pytest.mark.parametrize("request_, path, identifier", [
+    ("Foo==0.1.0", "Foo/Foo-0.1.0-py38", "Foo-0.1.0"),
+    ("foo==0.1", "Foo/Foo-0.1-py38", "Foo-0.1"),
+    ("foo[test]==0.1.0", "Foo/Foo-test-0.1.0-py38", "Foo-test-0.1.0"),
+    ("foo==0.1.0", "Foo/Foo-0.1.0-py38-centos7", "Foo-0.1.0"),
+    (
+        "git@gitlab:rnd/foo.git@v0.1.0", "Foo/Foo-0.1.0-py38",
+        "Foo-0.1.0"
+    ),
+], ids=[
+    "same-name",
+    "canonical-name",
+    "with-extra",
+    "with-system",
+    "git-tag",
+])
+def test_skip_before_build_installed(
+    mocker, temporary_directory, logger, request_, path, identifier
+):
+    """Skip package installed before build."""
+    os.makedirs(os.path.join(temporary_directory, path))
+    mocker.patch.object(
+        qip.system, "query", return_value={
+            "os": {"name": "centos", "major_version": 7}
+        }
+    )
+
+    context_mapping = {"python": {"identifier": "3.8", "library-path": "lib"}}
+
+    result = qip._skip_before_build(
+        request_, temporary_directory, context_mapping, "__MAPPING__",
+    )
+    assert result["identifier"] == identifier
+    assert result["skipped"] is True
+    assert "requirements" not in result
+
+    logger.warning.assert_called_once_with(
+        "Skip '{}' which is already installed.".format(identifier)
+    )
+
+
+def test_skip_before_build_installed_with_requirements(
+    temporary_directory, logger
+):
+    """Skip package installed before build with requirements from metadata."""
+    path = os.path.join(
+        temporary_directory, "Foo", "Foo-test-0.1.0-py38", "lib",
+        "Foo-0.1.0.dist-info"
+    )
+    os.makedirs(path)
+
+    with open(os.path.join(path, "METADATA"), "w") as stream:
+        stream.write(
+            "Metadata-Version: 2.1\n"
+            "Name: Foo\n"
+            "Version: 0.1.0\n"
+            "Requires-Dist: bim (>=2)\n"
+            "Requires-Dist: pytest ; extra == 'test'\n"
+            "Requires-Dist: sphinx ; extra == 'doc'\n"
+        )
+
+    context_mapping = {"python": {"identifier": "3.8", "library-path": "lib"}}
+
+    result = qip._skip_before_build(
+        "foo[test]==0.1.0", temporary_directory, context_mapping,
+        "__MAPPING__",
+    )
+    assert result["identifier"] == "Foo-test-0.1.0"
+    assert result["requirements"] == ["bim>=2", "pytest"]
+
+
+@pytest.mark.parametrize("commit_mapping, expected", [
+    ({"name": "Foo", "version": "0.2.0.dev1", "extra": []}, "Foo-0.2.0.dev1"),
+    ({"name": "Foo", "version": "0.3.0", "extra": []}, None),
+    (None, None),
+], ids=[
+    "installed",
+    "not-installed",
+    "not-recorded",
+])
+def test_skip_before_build_git_commit(
+    mocker, temporary_directory, logger, commit_mapping, expected
+):
+    """Skip package built from Git commit already installed."""
+    os.makedirs(os.path.join(temporary_directory, "Foo/Foo-0.2.0.dev1-py38"))
+    mocker.patch.object(
+        qip.system, "query", return_value={
+            "os": {"name": "centos", "major_version": 7}
+        }
+    )
+    mocked_extract_revision_mapping = mocker.patch.object(
+        qip.package, "extract_revision_mapping", return_value=commit_mapping
+    )
+
+    context_mapping = {"python": {"identifier": "3.8", "library-path": "lib"}}
+
+    result = qip._skip_before_build(
+        "git@gitlab:rnd/foo.git@dev", temporary_directory, context_mapping,
+        "__MAPPING__", artifact_cache_path="/cache"
+    )
+
+    mocked_extract_revision_mapping.assert_called_once_with(
+        "git@gitlab:rnd/foo.git@dev", "/cache"
+    )
+
+    if expected is None:
+        assert result is None
+        logger.warning.assert_not_called()
+
+    else:
+        assert result["identifier"] == expected
+        assert result["skipped"] is True
+
+        logger.warning.assert_called_once_with(
+            "Skip '{}' which is already installed.".format(expected)
+        )
+
+
+def test_install_one_request_with_log_path(
+    mocker, mocked_package_install, mocked_copy_to_destination
+):
+    """Install package and write output of commands into log file."""
+    mocked_log_file = mocker.patch.object(
+        qip.command, "log_file", new=mocker.MagicMock()
+    )
+    mocked_package_install.return_value = {"identifier": "foo"}
+    mocked_copy_to_destination.return_value = (False, False)
+
+    qip._install(
+        "foo", "/path/to/install", "__CONTEXT__", "__MAPPING__",
+        "/tmp/packages", "/tmp/cache", set(), log_path="/path/to/logs"
+    )
+
+    mocked_log_file.assert_called_once_with(
+        os.path.join("/path/to/logs", "foo.log")
+    )
+
+
+@pytest.mark.parametrize("request_, expected", [
+    ("foo", "foo.log"),
+    ("foo[test] >= 0.1, < 1", "foo_test_=_0.1_1.log"),
+    ("git@gitlab:rnd/foo.git@dev", "git_gitlab_rnd_foo.git_dev.log"),
+], ids=[
+    "simple",
+    "with-specifiers",
+    "git",
+])
+def test_fetch_log_file(request_, expected):
+    """Return path to log file for request."""
+    assert qip._fetch_log_file("/path/to/logs", request_) == os.path.join(
+        "/path/to/logs", expected
+    )
+
+
+def test_fetch_log_file_from_source_tree(mocker, temporary_directory):
+    """Return path to log file for local source tree request."""
+    os.makedirs(os.path.join(temporary_directory, "foo"))
+    request = os.path.join(temporary_directory, "foo", "..")
+
+    mocked_abspath = mocker.patch.object(
+        os.path, "abspath", return_value="/path/to/source"
+    )
+
+    result = qip._fetch_log_file("/path/to/logs", request)
+    assert result == os.path.join("/path/to/logs", "path_to_source.log")
+
+    mocked_abspath.assert_called_once_with(request)
+
+
+def test_fetch_log_file_none():
+    """Do not return log file without log path."""
+    assert qip._fetch_log_file(None, "foo") is None
+
+
 @pytest.mark.parametrize(
     "options, overwrite, editable_mode", [
         ({}, False, False),
@@ -1550,6 +3185,7 @@ def test_install_one_request_fail(
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
         editable_mode=editable_mode,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_not_called()
@@ -1593,6 +3229,7 @@ def test_install_one_request_continue_on_error(
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
         editable_mode=editable_mode,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_not_called()
@@ -1638,6 +3275,7 @@ def test_install_one_request_continue_on_error_with_parent(
     mocked_package_install.assert_called_once_with(
         "foo", "/tmp/packages", "__CONTEXT__", "/tmp/cache",
         editable_mode=editable_mode,
+        artifact_cache_path=None
     )
 
     mocked_definition_fetch_custom.assert_not_called()
@@ -1653,7 +3291,7 @@ def test_install_one_request_continue_on_error_with_parent(
 
 
 def test_copy_to_destination(
-    mocked_click_prompt, mocked_shutil_rmtree, mocked_shutil_copytree,
+    mocked_click_prompt, mocked_shutil_rmtree, mocked_filesystem_publish,
     mocked_filesystem_ensure_directory, logger
 ):
     """Copy package to destination."""
@@ -1671,9 +3309,10 @@ def test_copy_to_destination(
     mocked_click_prompt.assert_not_called()
     mocked_shutil_rmtree.assert_not_called()
 
-    mocked_shutil_copytree.assert_called_once_with(
+    mocked_filesystem_publish.assert_called_once_with(
         "/path/to/installed/package",
-        "/path/to/destination/Foo/Foo-0.2.3"
+        "/path/to/destination/Foo/Foo-0.2.3",
+        move=False
     )
 
     mocked_filesystem_ensure_directory.assert_called_once_with(
@@ -1685,7 +3324,7 @@ def test_copy_to_destination(
 
 
 def test_copy_to_destination_with_system_restriction(
-    mocked_click_prompt, mocked_shutil_rmtree, mocked_shutil_copytree,
+    mocked_click_prompt, mocked_shutil_rmtree, mocked_filesystem_publish,
     mocked_filesystem_ensure_directory, logger
 ):
     """Copy package with system restriction to destination."""
@@ -1709,9 +3348,10 @@ def test_copy_to_destination_with_system_restriction(
     mocked_click_prompt.assert_not_called()
     mocked_shutil_rmtree.assert_not_called()
 
-    mocked_shutil_copytree.assert_called_once_with(
+    mocked_filesystem_publish.assert_called_once_with(
         "/path/to/installed/package",
-        "/path/to/destination/Foo/Foo-0.2.3-centos7"
+        "/path/to/destination/Foo/Foo-0.2.3-centos7",
+        move=False
     )
 
     mocked_filesystem_ensure_directory.assert_called_once_with(
@@ -1724,7 +3364,7 @@ def test_copy_to_destination_with_system_restriction(
 
 def test_copy_to_destination_skip_existing(
     temporary_directory, mocked_click_prompt, mocked_shutil_rmtree,
-    mocked_shutil_copytree, mocked_filesystem_ensure_directory, logger
+    mocked_filesystem_publish, mocked_filesystem_ensure_directory, logger
 ):
     """Copy package to destination by skipping existing package."""
     path = os.path.join(temporary_directory, "Foo", "Foo-0.2.3")
@@ -1744,7 +3384,7 @@ def test_copy_to_destination_skip_existing(
     mocked_click_prompt.assert_not_called()
     mocked_shutil_rmtree.assert_not_called()
 
-    mocked_shutil_copytree.assert_not_called()
+    mocked_filesystem_publish.assert_not_called()
     mocked_filesystem_ensure_directory.assert_not_called()
 
     logger.warning.assert_called_once_with(
@@ -1755,7 +3395,7 @@ def test_copy_to_destination_skip_existing(
 
 def test_copy_to_destination_overwrite_existing(
     temporary_directory, mocked_click_prompt, mocked_shutil_rmtree,
-    mocked_shutil_copytree, mocked_filesystem_ensure_directory, logger
+    mocked_filesystem_publish, mocked_filesystem_ensure_directory, logger
 ):
     """Copy package to destination by overwriting existing package."""
     path = os.path.join(temporary_directory, "Foo", "Foo-0.2.3")
@@ -1775,10 +3415,11 @@ def test_copy_to_destination_overwrite_existing(
 
     mocked_click_prompt.assert_not_called()
 
-    mocked_shutil_rmtree.assert_called_once_with(path)
+    # Existing package is replaced when the new one is published.
+    mocked_shutil_rmtree.assert_not_called()
 
-    mocked_shutil_copytree.assert_called_once_with(
-        "/path/to/installed/package", path
+    mocked_filesystem_publish.assert_called_once_with(
+        "/path/to/installed/package", path, move=False
     )
 
     mocked_filesystem_ensure_directory.assert_called_once_with(
@@ -1804,7 +3445,7 @@ def test_copy_to_destination_overwrite_existing(
 ])
 def test_copy_to_destination_confirm_overwrite(
     temporary_directory, mocked_confirm_overwrite, mocked_shutil_rmtree,
-    mocked_shutil_copytree, mocked_filesystem_ensure_directory, logger,
+    mocked_filesystem_publish, mocked_filesystem_ensure_directory, logger,
     overwrite, overwrite_next, expected
 ):
     """Ask user to confirm overwrite existing package."""
@@ -1825,15 +3466,15 @@ def test_copy_to_destination_confirm_overwrite(
     )
     assert result == (not overwrite, expected)
 
+    mocked_shutil_rmtree.assert_not_called()
+
     if overwrite:
-        mocked_shutil_rmtree.assert_called_once()
-        mocked_shutil_copytree.assert_called_once()
+        mocked_filesystem_publish.assert_called_once()
         mocked_filesystem_ensure_directory.assert_called_once()
         logger.warning.assert_called_once()
 
     else:
-        mocked_shutil_rmtree.assert_not_called()
-        mocked_shutil_copytree.assert_not_called()
+        mocked_filesystem_publish.assert_not_called()
         mocked_filesystem_ensure_directory.assert_not_called()
 
         logger.warning.assert_called_once_with(
@@ -1842,6 +3483,31 @@ def test_copy_to_destination_confirm_overwrite(
         logger.info.assert_not_called()
 
 
+def test_copy_to_destination_move(
+    mocked_filesystem_publish, mocked_filesystem_ensure_directory, logger
+):
+    """Move package to destination."""
+    mapping = {
+        "identifier": "Foo-0.2.3",
+        "name": "Foo",
+        "target": "Foo/Foo-0.2.3"
+    }
+
+    result = qip.copy_to_destination(
+        mapping, "/path/to/installed/package", "/path/to/destination",
+        move=True
+    )
+    assert result == (False, False)
+
+    mocked_filesystem_publish.assert_called_once_with(
+        "/path/to/installed/package",
+        "/path/to/destination/Foo/Foo-0.2.3",
+        move=True
+    )
+
+    logger.info.assert_called_once_with("\tInstalled 'Foo-0.2.3'.")
+
+
 @pytest.mark.parametrize("answer, expected", [
     ("y", (True, None)),
     ("n", (False, None)),
@@ -1891,3 +3557,30 @@ def test_fetch_context_mapping(
             "library-path": "lib/python2.7/site-packages"
         }
     }
+
+    mocked_fetch_environ.assert_called_once_with(
+        "python==2.7.*", mapping={"PYTHONWARNINGS": "ignore"}, cache_path=None
+    )
+    mocked_fetch_python_mapping.assert_called_once_with(
+        mocked_fetch_environ.return_value, cache_path=None
+    )
+
+
+def test_fetch_context_mapping_with_cache(
+    mocked_fetch_environ, mocked_fetch_python_mapping
+):
+    """Return context mapping with persistent cache."""
+    mocked_fetch_environ.return_value = {"PATH": "/path/to/bin"}
+    mocked_fetch_python_mapping.return_value = {
+        "library-path": "lib/python2.7/site-packages"
+    }
+
+    qip.fetch_context_mapping("/path", "python==2.7.*", cache_path="/cache")
+
+    mocked_fetch_environ.assert_called_once_with(
+        "python==2.7.*", mapping={"PYTHONWARNINGS": "ignore"},
+        cache_path="/cache"
+    )
+    mocked_fetch_python_mapping.assert_called_once_with(
+        mocked_fetch_environ.return_value, cache_path="/cache"
+    )
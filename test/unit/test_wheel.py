@@ -0,0 +1,334 @@
+# :coding: utf-8
+
+import csv
+import os
+import stat
+import sys
+import zipfile
+
+import pytest
+import six
+
+import qip.metadata
+import qip.wheel
+
+
+@pytest.fixture()
+def context_mapping():
+    """Return context mapping for Python 3.7."""
+    return {
+        "environ": dict(
+            os.environ, PATH=os.pathsep.join([
+                os.path.dirname(sys.executable), os.environ.get("PATH", "")
+            ])
+        ),
+        "python": {
+            "identifier": "3.7",
+            "library-path": os.path.join("lib", "python3.7", "site-packages"),
+            "executable": sys.executable,
+        }
+    }
+
+
+def _compiled_path(path):
+    """Return path to file compiled from Python file *path*."""
+    if six.PY2:
+        return path + "c"
+
+    import importlib.util
+    return importlib.util.cache_from_source(path)
+
+
+@pytest.fixture()
+def wheel_path(temporary_directory):
+    """Return path to wheel for 'Foo_Bar'."""
+    path = os.path.join(temporary_directory, "Foo_Bar-0.1.0-py3-none-any.whl")
+
+    members = [
+        ("foo/__init__.py", b"", zipfile.ZIP_DEFLATED, 0o644),
+        ("foo/data.bin", b"\x00" * 1024, zipfile.ZIP_STORED, 0o644),
+        ("foo/run.sh", b"#!/bin/sh\n", zipfile.ZIP_DEFLATED, 0o755),
+        (
+            "Foo_Bar-0.1.0.data/scripts/foo-tool",
+            b"#!python\nimport foo\n", zipfile.ZIP_DEFLATED, 0o644
+        ),
+        (
+            "Foo_Bar-0.1.0.data/headers/foo.h",
+            b"#define FOO\n", zipfile.ZIP_DEFLATED, 0o644
+        ),
+        (
+            "Foo_Bar-0.1.0.data/data/share/foo.txt",
+            b"foo\n", zipfile.ZIP_DEFLATED, 0o644
+        ),
+        (
+            "Foo_Bar-0.1.0.dist-info/METADATA",
+            b"Metadata-Version: 2.1\nName: Foo-Bar\nVersion: 0.1.0\n",
+            zipfile.ZIP_DEFLATED, 0o644
+        ),
+        (
+            "Foo_Bar-0.1.0.dist-info/WHEEL",
+            b"Wheel-Version: 1.0\nRoot-Is-Purelib: true\n",
+            zipfile.ZIP_DEFLATED, 0o644
+        ),
+        (
+            "Foo_Bar-0.1.0.dist-info/entry_points.txt",
+            b"[console_scripts]\nfoo = foo.__main__:main [test]\n",
+            zipfile.ZIP_DEFLATED, 0o644
+        ),
+        (
+            "Foo_Bar-0.1.0.dist-info/RECORD",
+            b"foo/__init__.py,,\n", zipfile.ZIP_DEFLATED, 0o644
+        ),
+    ]
+
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, content, compression, mode in members:
+            info = zipfile.ZipInfo(name)
+            info.compress_type = compression
+            info.external_attr = mode << 16
+            archive.writestr(info, content)
+
+    return path
+
+
+def test_install(temporary_directory, wheel_path, context_mapping):
+    """Install wheel without Pip."""
+    prefix = os.path.join(temporary_directory, "prefix")
+    library_path = os.path.join(prefix, "lib", "python3.7", "site-packages")
+    metadata_path = os.path.join(library_path, "Foo_Bar-0.1.0.dist-info")
+
+    metadata = qip.wheel.install(wheel_path, prefix, context_mapping)
+    assert metadata["name"] == "Foo-Bar"
+    assert metadata["version"] == "0.1.0"
+    assert metadata["location"] == library_path
+
+    result = sorted(
+        os.path.relpath(os.path.join(root, name), prefix)
+        for root, _, names in os.walk(prefix) for name in names
+    )
+    assert result == sorted([
+        os.path.join("bin", "foo"),
+        os.path.join("bin", "foo-tool"),
+        os.path.join("include", "python3.7", "Foo_Bar", "foo.h"),
+        os.path.join("share", "foo.txt"),
+        os.path.relpath(os.path.join(metadata_path, "INSTALLER"), prefix),
+        os.path.relpath(os.path.join(metadata_path, "METADATA"), prefix),
+        os.path.relpath(os.path.join(metadata_path, "RECORD"), prefix),
+        os.path.relpath(os.path.join(metadata_path, "REQUESTED"), prefix),
+        os.path.relpath(os.path.join(metadata_path, "WHEEL"), prefix),
+        os.path.relpath(
+            os.path.join(metadata_path, "entry_points.txt"), prefix
+        ),
+        os.path.relpath(
+            os.path.join(library_path, "foo", "__init__.py"), prefix
+        ),
+        os.path.relpath(
+            _compiled_path(os.path.join(library_path, "foo", "__init__.py")),
+            prefix
+        ),
+        os.path.relpath(os.path.join(library_path, "foo", "data.bin"), prefix),
+        os.path.relpath(os.path.join(library_path, "foo", "run.sh"), prefix),
+    ])
+
+    with open(os.path.join(library_path, "foo", "data.bin"), "rb") as stream:
+        assert stream.read() == b"\x00" * 1024
+
+    # Executable mode is preserved.
+    for path in [
+        os.path.join(library_path, "foo", "run.sh"),
+        os.path.join(prefix, "bin", "foo"),
+        os.path.join(prefix, "bin", "foo-tool"),
+    ]:
+        assert os.stat(path).st_mode & stat.S_IXUSR
+
+    assert not os.stat(
+        os.path.join(library_path, "foo", "__init__.py")
+    ).st_mode & stat.S_IXUSR
+
+    # Interpreter placeholder is replaced with targeted interpreter.
+    with open(os.path.join(prefix, "bin", "foo-tool"), "r") as stream:
+        assert stream.read() == "#!{}\nimport foo\n".format(sys.executable)
+
+    with open(os.path.join(prefix, "bin", "foo"), "r") as stream:
+        content = stream.read()
+        assert content.startswith("#!{}\n".format(sys.executable))
+        assert "from foo.__main__ import main" in content
+        assert "sys.exit(main())" in content
+
+    with open(os.path.join(metadata_path, "INSTALLER"), "r") as stream:
+        assert stream.read() == "qip\n"
+
+    # Record is rewritten with all files installed.
+    with open(os.path.join(metadata_path, "RECORD"), "r") as stream:
+        rows = list(csv.reader(stream))
+
+    assert len(rows) == 14
+    assert ["Foo_Bar-0.1.0.dist-info/RECORD", "", ""] in rows
+    assert [
+        "foo/data.bin",
+        "sha256=X3C_GKCGAHAW6UiwSu07ghA6Nr6kF1W2zd-vEKzjxu8",
+        "1024"
+    ] in rows
+    assert ["../../../bin/foo-tool"] == [
+        row[0] for row in rows if row[0].endswith("foo-tool")
+    ]
+    assert [
+        os.path.relpath(
+            _compiled_path(os.path.join(library_path, "foo", "__init__.py")),
+            library_path
+        ).replace(os.sep, "/")
+    ] == [row[0] for row in rows if row[0].endswith(".pyc")]
+
+
+def test_install_in_chunks(
+    mocker, temporary_directory, wheel_path, context_mapping
+):
+    """Install wheel with members extracted in several chunks."""
+    mocker.patch.object(qip.wheel, "CHUNK_SIZE", 100)
+    prefix = os.path.join(temporary_directory, "prefix")
+    library_path = os.path.join(prefix, "lib", "python3.7", "site-packages")
+
+    qip.wheel.install(wheel_path, prefix, context_mapping)
+
+    with open(os.path.join(library_path, "foo", "data.bin"), "rb") as stream:
+        assert stream.read() == b"\x00" * 1024
+
+
+def test_install_corrupted(temporary_directory, context_mapping):
+    """Fail to install wheel with corrupted member."""
+    path = os.path.join(temporary_directory, "foo-0.1.0-py3-none-any.whl")
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("foo-0.1.0.dist-info/WHEEL", "")
+        archive.writestr("foo/__init__.py", "import os\n")
+
+    # Alter content of member without updating its checksum.
+    with open(path, "rb") as stream:
+        content = stream.read()
+
+    with open(path, "wb") as stream:
+        stream.write(content.replace(b"import os", b"import re"))
+
+    with pytest.raises(RuntimeError) as error:
+        qip.wheel.install(path, temporary_directory, context_mapping)
+
+    assert str(error.value) == "Corrupted member 'foo/__init__.py'"
+
+
+def test_install_compile_error(temporary_directory, context_mapping):
+    """Install wheel with Python file which cannot be compiled."""
+    path = os.path.join(temporary_directory, "foo-0.1.0-py3-none-any.whl")
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(
+            "foo-0.1.0.dist-info/METADATA",
+            "Metadata-Version: 2.1\nName: foo\nVersion: 0.1.0\n"
+        )
+        archive.writestr("foo-0.1.0.dist-info/WHEEL", "")
+        archive.writestr("foo/__init__.py", "import os\n")
+        archive.writestr("foo/invalid.py", "def (:\n")
+
+    prefix = os.path.join(temporary_directory, "prefix")
+    library_path = os.path.join(prefix, "lib", "python3.7", "site-packages")
+
+    qip.wheel.install(path, prefix, context_mapping)
+
+    assert os.path.isfile(
+        _compiled_path(os.path.join(library_path, "foo", "__init__.py"))
+    )
+    assert not os.path.isfile(
+        _compiled_path(os.path.join(library_path, "foo", "invalid.py"))
+    )
+
+
+@pytest.mark.parametrize("executable, expected", [
+    (None, "#!/usr/bin/env python"),
+    ("/path/to/python", "#!/path/to/python"),
+    (
+        "/path with space/python",
+        "#!/bin/sh\n'''exec' '/path with space/python' \"$0\" \"$@\"\n' '''"
+    ),
+    (
+        "/" + "a" * 130 + "/python",
+        "#!/bin/sh\n'''exec' /" + "a" * 130 + "/python \"$0\" \"$@\"\n' '''"
+    ),
+], ids=[
+    "unknown",
+    "simple",
+    "with-space",
+    "too-long",
+])
+def test_create_shebang(executable, expected):
+    """Return shebang line for interpreter."""
+    assert qip.wheel._create_shebang(executable) == expected
+
+
+def test_install_invalid(temporary_directory, context_mapping):
+    """Fail to install invalid wheel."""
+    path = os.path.join(temporary_directory, "foo-0.1.0-py3-none-any.whl")
+    with open(path, "w") as stream:
+        stream.write("__INVALID__")
+
+    with pytest.raises(RuntimeError) as error:
+        qip.wheel.install(path, temporary_directory, context_mapping)
+
+    assert "Impossible to read wheel" in str(error.value)
+
+
+def test_install_without_metadata(temporary_directory, context_mapping):
+    """Fail to install wheel without metadata folder."""
+    path = os.path.join(temporary_directory, "foo-0.1.0-py3-none-any.whl")
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("foo/__init__.py", "")
+
+    with pytest.raises(RuntimeError) as error:
+        qip.wheel.install(path, temporary_directory, context_mapping)
+
+    assert str(error.value) == (
+        "Impossible to find metadata folder in wheel '{}'".format(path)
+    )
+
+
+def test_install_outside_prefix(temporary_directory, context_mapping):
+    """Fail to install wheel with member outside of installation folder."""
+    path = os.path.join(temporary_directory, "foo-0.1.0-py3-none-any.whl")
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("foo-0.1.0.dist-info/WHEEL", "")
+        archive.writestr("../../../../foo.py", "")
+
+    with pytest.raises(RuntimeError) as error:
+        qip.wheel.install(path, temporary_directory, context_mapping)
+
+    assert str(error.value) == "Invalid path for '../../../../foo.py'"
+
+
+def test_install_folder_error(
+    temporary_directory, wheel_path, context_mapping
+):
+    """Fail to install wheel when installation folders cannot be created."""
+    prefix = os.path.join(temporary_directory, "prefix")
+    os.makedirs(prefix)
+
+    # Prevent creation of the script folder.
+    with open(os.path.join(prefix, "bin"), "w") as stream:
+        stream.write("")
+
+    with pytest.raises(RuntimeError) as error:
+        qip.wheel.install(wheel_path, prefix, context_mapping)
+
+    assert str(error.value).startswith(
+        "Impossible to install wheel '{}': ".format(wheel_path)
+    )
+
+
+def test_install_metadata_error(
+    mocker, temporary_directory, wheel_path, context_mapping
+):
+    """Fail to install wheel when metadata cannot be loaded."""
+    mocker.patch.object(qip.metadata, "load", side_effect=IOError("Oh no!"))
+    prefix = os.path.join(temporary_directory, "prefix")
+
+    with pytest.raises(RuntimeError) as error:
+        qip.wheel.install(wheel_path, prefix, context_mapping)
+
+    assert str(error.value) == (
+        "Impossible to install wheel '{}': Oh no!".format(wheel_path)
+    )